@@ -0,0 +1 @@
+# benchmarkهای آفلاین (python -m benchmarks.parse_bench)
@@ -0,0 +1,507 @@
+# موارد benchmark پردازش صفحه؛ همه روی fixtureهای HTML ذخیره‌شده و بدون شبکه.
+#
+# هر مورد یک تابع setup است که یک تابع بدون آرگومان run برمی‌گرداند؛ هر اجرای run یک واحد کار
+# (یک صفحه یا یک دسته فراخوانی) است. setup خروجی run را یک بار بررسی می‌کند تا اگر fixture
+# با انتخابگرهای extractor نخواند، به‌جای اندازه‌گیری کار خالی خطا بدهد.
+# importها داخل setup هستند تا نبود یک وابستگی فقط همان موارد را skip کند.
+
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+for path in (ROOT, os.path.join(ROOT, "crawlers"), os.path.join(ROOT, "crawlers", "scrapy", "TabnakNews")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+SITE_URLS = {
+    "tabnak": "https://www.tabnak.ir",
+    "entekhab": "https://www.entekhab.ir",
+    "irna": "https://www.irna.ir",
+    "parsine": "https://www.parsine.com",
+    "fararu": "https://fararu.com",
+    "khabaronline": "https://www.khabaronline.ir",
+    "aftabnews": "https://aftabnews.ir",
+    "eghtesadonline": "https://www.eghtesadonline.com",
+}
+ARCHIVE_DATE = "1402/01/15"
+
+CASES = {}
+# موارد چند میکروثانیه‌ای (تاریخ، پاک‌سازی کوتاه) به GC و حافظه نهان حساس‌ترند؛ بین دو اجرا تا ۲۵٪ نوسان
+MICRO_THRESHOLD = 0.45
+
+
+class Case:
+    __slots__ = ("name", "setup", "unit", "batch", "threshold")
+
+    def __init__(self, name, setup, unit="pages", batch=1, threshold=None):
+        self.name = name
+        self.setup = setup
+        self.unit = unit
+        self.batch = batch  # تعداد واحد (صفحه/فراخوانی) در هر اجرای run
+        # افت مجاز همین مورد اگر از --threshold بزرگ‌تر باشد (موارد پرنوسان)
+        self.threshold = threshold
+
+
+def case(name, unit="pages", batch=1, threshold=None):
+    def register(setup):
+        CASES[name] = Case(name, setup, unit, batch, threshold)
+        return setup
+
+    return register
+
+
+def fixture_path(site, name):
+    return os.path.join(FIXTURES_DIR, site, f"{name}.html")
+
+
+def fixture(site, name):
+    with open(fixture_path(site, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def checked(run, what):
+    result = run()
+    if not result:
+        raise AssertionError(f"{what} extracted nothing from its fixture")
+    return run
+
+
+# -------------------------------------------------------------
+# crawlerهای قدیمی (crawlers/*.py)
+# -------------------------------------------------------------
+def _legacy_article(module_name, site, name="article"):
+    def setup():
+        module = __import__(module_name)
+        html = fixture(site, name)
+        link = f"{SITE_URLS[site]}/fa/news/1041860/"
+        return checked(lambda: module.parse_news(html, link).body, f"{module_name}.parse_news")
+
+    return setup
+
+
+def _legacy_archive(module_name, site, name="archive"):
+    def setup():
+        module = __import__(module_name)
+        html = fixture(site, name)
+        return checked(lambda: module.parse_news_links(html), f"{module_name}.parse_news_links")
+
+    return setup
+
+
+@case("legacy/tabnak/article")
+def _():
+    import tabnak_crawler
+
+    html = fixture("tabnak", "article")
+    return checked(lambda: tabnak_crawler.parse_news(html)[0], "tabnak_crawler.parse_news")
+
+
+for _site, _module in (
+    ("entekhab", "entekhab_crawler"),
+    ("parsine", "parsine_crawler"),
+    ("aftabnews", "aftabnews_crawler"),
+    ("fararu", "fararu_crawler"),
+    ("khabaronline", "khabaronline_crawler"),
+    ("eghtesadonline", "eghtesadonline_crawler"),
+):
+    case(f"legacy/{_site}/article")(_legacy_article(_module, _site))
+case("legacy/irna/article")(_legacy_article("irna_crawler", "irna", "article_legacy"))
+case("legacy/entekhab/archive")(_legacy_archive("entekhab_crawler", "entekhab"))
+case("legacy/parsine/archive")(_legacy_archive("parsine_crawler", "parsine"))
+case("legacy/irna/archive")(_legacy_archive("irna_crawler", "irna", "archive_legacy"))
+case("legacy/eghtesadonline/archive")(
+    _legacy_archive("eghtesadonline_crawler", "eghtesadonline", "archive_legacy")
+)
+
+
+# تجزیه جریانی (utils/page_stream.py): parse_news فقط روی عنصرهای NEWS_FIELDS (fragment)؛
+# مقایسه با legacy/<site>/article (کل صفحه)
+def _stream_article(module_name, site, name="article"):
+    def setup():
+        from utils.page_stream import parse_page
+
+        module = __import__(module_name)
+        html = fixture(site, name)
+        link = f"{SITE_URLS[site]}/fa/news/1041860/"
+        page = parse_page(html, module.NEWS_FIELDS)
+        if not page.complete:
+            raise AssertionError(f"{module_name}.NEWS_FIELDS are not all present in its fixture")
+        if module.parse_news(page.fragment(), link).to_dict() != module.parse_news(html, link).to_dict():
+            raise AssertionError(f"{module_name}.parse_news differs on the streamed fragment")
+
+        def run():
+            return module.parse_news(parse_page(html, module.NEWS_FIELDS).fragment(), link).body
+
+        return checked(run, f"{module_name}.parse_news (streamed)")
+
+    return setup
+
+
+for _site, _module in (
+    ("entekhab", "entekhab_crawler"),
+    ("parsine", "parsine_crawler"),
+    ("aftabnews", "aftabnews_crawler"),
+    ("fararu", "fararu_crawler"),
+):
+    case(f"stream/{_site}/article")(_stream_article(_module, _site))
+case("stream/irna/article")(_stream_article("irna_crawler", "irna", "article_legacy"))
+
+
+# -------------------------------------------------------------
+# اسپایدرهای Scrapy
+# -------------------------------------------------------------
+def _spider(spider_cls, **kwargs):
+    from scrapy.crawler import Crawler
+    from scrapy.utils.test import get_reactor_settings
+
+    # همان ترتیب Crawler.crawl: ساخت اسپایدر پیش از freeze تنظیمات (CmsArchiveSpider
+    # در from_crawler تنظیم DOWNLOAD_SLOTS را می‌نویسد)
+    crawler = Crawler(spider_cls, {"TELNETCONSOLE_ENABLED": False, **get_reactor_settings()})
+    spider = spider_cls.from_crawler(crawler, **kwargs)
+    crawler._apply_settings()
+    return spider
+
+
+def _callback_run(callback, html, url, meta):
+    from scrapy import Request
+    from scrapy.http import HtmlResponse
+
+    body = html.encode("utf-8")
+
+    def run():
+        # پاسخ تازه در هر اجرا: Selector روی خود response کش می‌شود
+        response = HtmlResponse(url, body=body, encoding="utf-8", request=Request(url, meta=meta))
+        return list(callback(response) or ())
+
+    return checked(run, callback.__qualname__)
+
+
+@case("scrapy/tabnak_daily/archive")
+def _():
+    from TabnakNews.spiders.tabnak_spider import TabnakDailyCrawler
+
+    spider = _spider(TabnakDailyCrawler)
+    url = f"{SITE_URLS['tabnak']}/fa/archive?service_id=24&from_date={ARCHIVE_DATE}&to_date={ARCHIVE_DATE}"
+    meta = {"category_name": "سیاسی", "archive_date": ARCHIVE_DATE}
+    return _callback_run(spider.parse, fixture("tabnak", "archive"), url, meta)
+
+
+@case("scrapy/tabnak_daily/article")
+def _():
+    from TabnakNews.spiders.tabnak_spider import TabnakDailyCrawler
+
+    spider = _spider(TabnakDailyCrawler)
+    url = f"{SITE_URLS['tabnak']}/fa/news/1041860/"
+    return _callback_run(spider.parse_news, fixture("tabnak", "article"), url, {})
+
+
+@case("scrapy/entekhab/archive")
+def _():
+    from TabnakNews.spiders.entekhab import EntekhabSpider
+
+    spider = _spider(EntekhabSpider)
+    url = f"{SITE_URLS['entekhab']}/fa/archive?service_id=5&cat_id=2&from_date={ARCHIVE_DATE}&p=1"
+    meta = {"category_name": "سیاسی", "category_id": 2, "archive_date": ARCHIVE_DATE, "page": 1}
+    return _callback_run(spider.parse_archive, fixture("entekhab", "archive"), url, meta)
+
+
+@case("scrapy/entekhab/article")
+def _():
+    from TabnakNews.spiders.entekhab import EntekhabSpider
+
+    spider = _spider(EntekhabSpider)
+    url = f"{SITE_URLS['entekhab']}/fa/news/412345/"
+    return _callback_run(
+        spider.parse_news, fixture("entekhab", "article"), url, {"category_name": "سیاسی"}
+    )
+
+
+@case("scrapy/irna/archive")
+def _():
+    from TabnakNews.spiders.irna_archive_crawler import IrnaSpider
+
+    spider = _spider(IrnaSpider)
+    url = f"{SITE_URLS['irna']}/archive?tp=5&pi=1&yr=1404&mn=7&dy=13"
+    meta = {
+        "category_name": "سیاسی", "category_id": 5, "archive_date": "1404/07/13",
+        "year": 1404, "month": 7, "day": 13, "page": 1,
+    }
+    return _callback_run(spider.parse_archive, fixture("irna", "archive"), url, meta)
+
+
+@case("scrapy/irna/article")
+def _():
+    from TabnakNews.spiders.irna_archive_crawler import IrnaSpider
+
+    spider = _spider(IrnaSpider)
+    url = f"{SITE_URLS['irna']}/news/85960001/"
+    return _callback_run(spider.parse_news, fixture("irna", "article"), url, {"category_name": "سیاسی"})
+
+
+def _cms_setup(site, kind):
+    def setup():
+        from TabnakNews.spiders.cms_archive import CmsArchiveSpider
+
+        spider = _spider(CmsArchiveSpider, sites=site)
+        config = spider.sites[site]
+        category, category_id = next(iter(config["categories"].items()))
+        meta = {"site": site, "category_name": category, "archive_date": ARCHIVE_DATE}
+        if kind == "archive":
+            meta.update(category_id=category_id, page=1)
+            url = spider.archive_url(config, category_id, ARCHIVE_DATE, 1)
+            return _callback_run(spider.parse_archive, fixture(site, "archive"), url, meta)
+        url = f"{config['base_url']}/fa/news/1041860/"
+        return _callback_run(spider.parse_news, fixture(site, "article"), url, meta)
+
+    return setup
+
+
+for _site in ("tabnak", "entekhab", "parsine", "aftabnews", "eghtesadonline"):
+    for _kind in ("archive", "article"):
+        case(f"scrapy/cms/{_site}/{_kind}")(_cms_setup(_site, _kind))
+
+
+# -------------------------------------------------------------
+# تبدیل تاریخ و پاک‌سازی متن
+# -------------------------------------------------------------
+JALALI_DATES = [f"{1390 + i % 14}/{1 + i % 12:02d}/{1 + i % 29:02d}" for i in range(100)]
+GREGORIAN_DATES = [f"{2011 + i % 14}-{1 + i % 12:02d}-{1 + i % 28:02d}" for i in range(100)]
+
+
+@case("jalali/persian_to_gregorian", unit="dates", batch=len(JALALI_DATES), threshold=MICRO_THRESHOLD)
+def _():
+    from utils import jalali
+
+    return checked(
+        lambda: [jalali.Persian(d).gregorian_string() for d in JALALI_DATES], "jalali.Persian"
+    )
+
+
+@case("jalali/gregorian_to_persian", unit="dates", batch=len(GREGORIAN_DATES), threshold=MICRO_THRESHOLD)
+def _():
+    from utils import jalali
+
+    return checked(
+        lambda: [jalali.Gregorian(d).persian_string() for d in GREGORIAN_DATES], "jalali.Gregorian"
+    )
+
+
+@case("dates/cms_jalali_text", unit="dates", batch=100, threshold=MICRO_THRESHOLD)
+def _():
+    from TabnakNews.spiders.cms_archive import parse_news_date
+
+    raw = ["تاریخ انتشار: ۰۹:۰۰ - ۱۸ مهر ۱۳۹۷", "۱۴۰۲/۰۳/۱۱ - ۱۴:۲۰"] * 50
+    return checked(lambda: [parse_news_date(r, "jalali") for r in raw], "parse_news_date")
+
+
+@case("dates/cms_english", unit="dates", batch=100, threshold=MICRO_THRESHOLD)
+def _():
+    from TabnakNews.spiders.cms_archive import parse_news_date
+
+    raw = ["02 September 2020"] * 100
+    return checked(lambda: [parse_news_date(r, "%d %B %Y") for r in raw], "parse_news_date")
+
+
+def _article_text():
+    """متن بدنه fixture خبر تابناک (حدود ۲۰ کیلوبایت) به‌عنوان ورودی پاک‌کننده‌ها."""
+    from scrapy.selector import Selector
+
+    paragraphs = Selector(text=fixture("tabnak", "article")).css("div.body p::text").getall()
+    return "\u200f\n".join(paragraphs) + "\u200e\u202a\u200c"
+
+
+@case("cleaners/clean_persian_text")
+def _():
+    from TabnakNews.spiders.tabnak_spider import clean_persian_text
+
+    text = _article_text()
+    return checked(lambda: clean_persian_text(text), "clean_persian_text")
+
+
+@case("cleaners/cms_clean_text")
+def _():
+    from TabnakNews.spiders.cms_archive import clean_text
+
+    text = _article_text()
+    return checked(lambda: clean_text(text), "clean_text")
+
+
+@case("cleaners/spider_clean_rtl_chars", threshold=MICRO_THRESHOLD)
+def _():
+    from TabnakNews.spiders.entekhab import EntekhabSpider
+
+    text = _article_text()
+    # متد به self نیازی ندارد
+    return checked(lambda: EntekhabSpider.clean_rtl_chars(None, text), "clean_rtl_chars")
+
+
+@case("cleaners/legacy_clean_rtl_chars", threshold=MICRO_THRESHOLD)
+def _():
+    import tabnak_crawler
+
+    text = _article_text()
+    return checked(lambda: tabnak_crawler.clean_rtl_chars(text), "clean_rtl_chars")
+
+
+@case("cleaners/persian_text_normalize")
+def _():
+    from utils.persian_text import normalize
+
+    text = _article_text()
+    return checked(lambda: normalize(text), "normalize")
+
+
+# -------------------------------------------------------------
+# استخراج بدنه خبر (utils/article_body.py)
+# -------------------------------------------------------------
+BODY_ROOTS = {
+    "entekhab": "div.khabar-matn",
+    "parsine": "section.body",
+    "aftabnews": "div.body",
+    "eghtesadonline": 'div[itemprop="articlebody"]',
+}
+LARGE_PAGE_REPEAT = 128  # بزرگ‌ترین fixture خبر با بدنه ۱۲۸ برابر: حدود ۲ مگابایت
+# حداکثر نسبت هزینه هر نویسه ورودی بزرگ به ورودی کوچک؛ ورودی بزرگ ۸ تا ۱۶ برابر است، پس رفتار
+# درجه دو دست‌کم ۸ برابر می‌شود و نوسان زمان‌سنجی (حافظه نهان، GC) زیر ۳ برابر می‌ماند
+LINEAR_SLACK = 3.0
+LINEAR_MIN_SMALL = 128 * 1024  # ورودی کوچک‌تر بیشتر هزینه ثابت (ساخت درخت، فراخوانی) را می‌سنجد
+LINEAR_ROUNDS = 7
+LINEAR_MIN_TIME = 0.02  # هر دور دست‌کم این مدت (چند اجرای پیاپی برای ورودی کوچک)
+
+
+def _large_article(repeat=LARGE_PAGE_REPEAT):
+    """بزرگ‌ترین fixture خبر (تابناک) با پاراگراف‌های بدنه تکرارشده و همان حاشیه‌ها."""
+    html = fixture("tabnak", "article")
+    start = html.index('<div class="body">') + len('<div class="body">')
+    end = html.index('<p class="ad">', start)
+    return html[:start] + html[start:end] * repeat + html[end:]
+
+
+def _unclosed_script_article(size):
+    """بدنه‌ای پر از «var ... error» بدون «});» پایانی: ورودی بدترین حالت regex قدیمی انتخاب."""
+    paragraph = "<p>var player = jwplayer; error: function(e) { خبر " + "متن " * 20 + "</p>\n"
+    return (
+        '<html><body><div class="khabar-matn">' + paragraph * (size // len(paragraph))
+        + "</div></body></html>"
+    )
+
+
+def _median_time(run, rounds=LINEAR_ROUNDS, min_time=LINEAR_MIN_TIME):
+    """میانه زمان یک اجرا در rounds دور؛ هر دور آن‌قدر تکرار می‌شود که دست‌کم min_time طول بکشد."""
+    import statistics
+    import time
+
+    loops = 1
+    times = []
+    while len(times) < rounds:
+        started = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - started
+        if elapsed < min_time and not times:
+            loops *= 2
+            continue
+        times.append(elapsed / loops)
+    return statistics.median(times)
+
+
+def linear(make_run, small, large, what):
+    """
+    هزینه هر نویسه ورودی بزرگ (large) حداکثر LINEAR_SLACK برابر ورودی کوچک (small)؛ رفتار
+    فوق‌خطی (مثل backtracking regex) پیش از اندازه‌گیری خطا می‌دهد. ورودی کوچک باید از همان
+    جنس باشد (نه صفحه عادی که بیشتر آن حاشیه حذف‌شده است).
+    """
+    if len(small.encode("utf-8")) < LINEAR_MIN_SMALL:
+        raise ValueError(f"small input of {what} must be at least {LINEAR_MIN_SMALL // 1024} KB")
+    small_run, large_run = make_run(small), make_run(large)
+    ratio = (_median_time(large_run) / len(large)) / (_median_time(small_run) / len(small))
+    if ratio > LINEAR_SLACK:
+        raise AssertionError(
+            f"{what} is not linear: {ratio:.1f}x cost per character on a "
+            f"{len(large.encode('utf-8')) // 1024} KB page"
+        )
+    return checked(large_run, what)
+
+
+def _body_lxml(site):
+    def setup():
+        from scrapy.selector import Selector
+
+        from utils.article_body import BodyRules, extract_body
+
+        node, rules = Selector(text=fixture(site, "article")).root, BodyRules(root=BODY_ROOTS[site])
+        return checked(lambda: extract_body(node, rules), "extract_body")
+
+    return setup
+
+
+for _site in BODY_ROOTS:
+    case(f"body/{_site}/lxml")(_body_lxml(_site))
+
+
+@case("body/entekhab/soup")
+def _():
+    from bs4 import BeautifulSoup
+
+    from utils.article_body import BodyRules, extract_body
+
+    soup = BeautifulSoup(fixture("entekhab", "article"), "html.parser")
+    rules = BodyRules(root=BODY_ROOTS["entekhab"])
+    return checked(lambda: extract_body(soup, rules), "extract_body")
+
+
+@case("body/entekhab/html")
+def _():
+    from utils.article_body import BodyRules, extract_body
+
+    html, rules = fixture("entekhab", "article"), BodyRules(root=BODY_ROOTS["entekhab"])
+    return checked(lambda: extract_body(html, rules), "extract_body")
+
+
+@case("body/fararu/scored")
+def _():
+    from scrapy.selector import Selector
+
+    from utils.article_body import extract_body
+
+    # بدون root: انتخاب بدنه فقط با امتیاز چگالی متن
+    node = Selector(text=fixture("fararu", "article")).root
+    return checked(lambda: extract_body(node), "extract_body")
+
+
+@case("body/large/lxml")
+def _():
+    from scrapy.selector import Selector
+
+    from utils.article_body import extract_body
+
+    def make_run(html):
+        node = Selector(text=html).root
+        return lambda: extract_body(node)
+
+    return linear(make_run, _large_article(LARGE_PAGE_REPEAT // 8), _large_article(), "extract_body")
+
+
+@case("body/large/html")
+def _():
+    from utils.article_body import extract_body
+
+    small, large = _large_article(LARGE_PAGE_REPEAT // 8), _large_article()
+    return linear(lambda html: lambda: extract_body(html), small, large, "extract_body")
+
+
+@case("body/unclosed_script/lxml")
+def _():
+    from scrapy.selector import Selector
+
+    from utils.article_body import BodyRules, extract_body
+
+    rules = BodyRules(root=BODY_ROOTS["entekhab"])
+
+    def make_run(html):
+        node = Selector(text=html).root
+        return lambda: extract_body(node, rules)
+
+    small, large = _unclosed_script_article(128 * 1024), _unclosed_script_article(2 * 1024 * 1024)
+    return linear(make_run, small, large, "extract_body")
@@ -0,0 +1,212 @@
+# آزمون بار end-to-end کراولرها روی شبیه‌ساز محلی سایت‌ها (benchmarks/mock_site.py)
+#
+#   python -m benchmarks.load_test legacy --ids 1000000:1000500 --mode "d0=TABNAK_CRAWL_DELAY=0"
+#   python -m benchmarks.load_test scrapy tabnak_daily_crawler -a from_date=1402/01/01 -a to_date=1402/01/05
+#   python -m benchmarks.load_test scrapy cms_archive_crawler -a sites=tabnak,entekhab \
+#       -a from_date=1402/01/01 -a to_date=1402/01/10 --latency pareto:40,1.5 --error-rate 0.02 \
+#       --mode "c8=-s CONCURRENT_REQUESTS_PER_DOMAIN=8" \
+#       --mode "adaptive=-s ADAPTIVE_CONCURRENCY_ENABLED=1 -s AUTOTHROTTLE_ENABLED=0"
+#
+# هر mode یک اجرای جدا در پروسه جدید است و سرور قبل از هر اجرا reset می‌شود، پس همه modeها با یک
+# seed دقیقاً همان پاسخ‌ها (تأخیر، 404، خطا) را می‌بینند. گزارش هر اجرا: items/sec، درخواست در
+# ثانیه، تأخیر p50/p95/p99 سمت سرور، p99 دانلود سمت کراولر (مرز bucket)، بیشینه RSS و وضعیت پاسخ‌ها.
+# خروجی، لاگ و metrics.json هر اجرا در --workdir/<mode> می‌ماند.
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_site import MockNewsSite, Profile, add_profile_arguments
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+SCRAPY_PROJECT = os.path.join(ROOT, "crawlers", "scrapy", "TabnakNews")
+MOCK_HANDLER = "TabnakNews.mock_handler.MockSiteDownloadHandler"
+
+
+def parse_mode(value):
+    name, sep, args = value.partition("=")
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"Expected NAME=ARGS, got {value!r}")
+    return name, shlex.split(args)
+
+
+def run_process(command, cwd, env, log_path, max_seconds):
+    """اجرای کراولر؛ (کد خروج، ثانیه، بیشینه RSS به MB)."""
+    started = time.perf_counter()
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        deadline = started + max_seconds if max_seconds else None
+        while True:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            if deadline and time.perf_counter() > deadline:
+                process.terminate()
+                deadline = None
+            time.sleep(0.05)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss در لینوکس به KB است
+    return process.returncode, time.perf_counter() - started, usage.ru_maxrss / 1024
+
+
+def crawl_metrics(path):
+    """(تعداد item، p99 تأخیر دانلود سمت کراولر) از snapshot نهایی utils.crawl_metrics."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None, None, None
+    metrics = snapshot.get("metrics", {})
+    items = sum(s["value"] for s in metrics.get("crawl_items_total", {}).get("samples", []))
+    latency = metrics.get("crawl_download_latency_seconds", {}).get("samples", [])
+    p99 = max((s["p99"] for s in latency), default=None)
+    return items, p99, snapshot.get("uptime")
+
+
+def legacy_command(args, workdir, mock_url, mode_args):
+    start, _, end = args.ids.partition(":")
+    command = [sys.executable, os.path.join(ROOT, "crawlers", "tabnak_crawler.py"), start, end]
+    env = {
+        "CRAWL_MOCK_SITE_URL": mock_url,
+        "TABNAK_CRAWL_DELAY": str(args.delay),
+        "TABNAK_OUTPUT_DIR": os.path.join(workdir, "output"),
+        "CRAWL_METRICS_JSON": os.path.join(workdir, "metrics.json"),
+        "CRAWL_METRICS_JSON_INTERVAL": "3600",
+    }
+    # modeهای crawler قدیمی متغیر محیطی هستند، مثلاً "d05=TABNAK_CRAWL_DELAY=0.5"
+    for assignment in mode_args:
+        name, _, value = assignment.partition("=")
+        env[name] = value
+    return command, env
+
+
+def scrapy_command(args, workdir, mock_url, mode_args):
+    handlers = json.dumps({"http": MOCK_HANDLER, "https": MOCK_HANDLER})
+    command = [sys.executable, "-m", "scrapy", "crawl", args.spider]
+    for value in args.spider_args or ():
+        command += ["-a", value]
+    for setting in (
+        f"MOCK_SITE_URL={mock_url}",
+        f"DOWNLOAD_HANDLERS={handlers}",
+        f"METRICS_JSON_PATH={os.path.join(workdir, 'metrics.json')}",
+        "METRICS_JSON_INTERVAL=3600",
+        "LOG_FILE=scrapy.log",
+        f"LOG_LEVEL={args.log_level}",
+        "HTTPCACHE_ENABLED=False",
+    ):
+        command += ["-s", setting]
+    for value in args.setting or ():
+        command += ["-s", value]
+    command += mode_args
+    # cwd پوشه اجرا است تا FEEDS، output، .crawl_state و لاگ‌ها آنجا نوشته شوند
+    env = {
+        "SCRAPY_SETTINGS_MODULE": "TabnakNews.settings",
+        "PYTHONPATH": os.pathsep.join(filter(None, (SCRAPY_PROJECT, os.environ.get("PYTHONPATH")))),
+    }
+    return command, env
+
+
+def run_modes(args, site, mock_url):
+    results = []
+    for name, mode_args in args.mode or [("default", [])]:
+        workdir = os.path.join(args.workdir, name)
+        os.makedirs(workdir, exist_ok=True)
+        if args.target == "legacy":
+            command, extra_env = legacy_command(args, workdir, mock_url, mode_args)
+        else:
+            command, extra_env = scrapy_command(args, workdir, mock_url, mode_args)
+        site.reset()
+        print(f"[{name}] {shlex.join(command)}", file=sys.stderr)
+        code, wall, rss_mb = run_process(
+            command, workdir, {**os.environ, **extra_env},
+            os.path.join(workdir, "stdout.log"), args.max_seconds,
+        )
+        stats = site.stats()
+        items, client_p99, uptime = crawl_metrics(os.path.join(workdir, "metrics.json"))
+        # زمان از شروع کراول (بدون بالا آمدن پروسه)، اگر metrics ثبت شده باشد
+        seconds = uptime or wall
+        results.append(
+            {
+                "mode": name,
+                "exit_code": code,
+                "seconds": round(seconds, 2),
+                "items": items,
+                "items_per_sec": round(items / seconds, 2) if items is not None else None,
+                "requests_per_sec": round(stats["requests"] / seconds, 2),
+                "server_latency_ms": stats["latency_ms"],
+                "client_p99_bucket_s": client_p99,
+                "max_rss_mb": round(rss_mb, 1),
+                "statuses": stats["statuses"],
+                "timeouts": stats["timeouts"],
+                "workdir": workdir,
+            }
+        )
+    return results
+
+
+def report(results, out=sys.stdout):
+    out.write(
+        f"{'mode':<14}{'items':>8}{'items/s':>9}{'req/s':>8}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}"
+        f"{'cli p99':>8}{'RSS MB':>8}  statuses\n"
+    )
+    for r in results:
+        latency = r["server_latency_ms"]
+        statuses = " ".join(f"{k}={v}" for k, v in r["statuses"].items())
+        if r["timeouts"]:
+            statuses += f" timeout={r['timeouts']}"
+        if r["exit_code"]:
+            statuses += f"  (exit {r['exit_code']}, see {r['workdir']})"
+        client_p99 = f"≤{r['client_p99_bucket_s']:g}s" if r["client_p99_bucket_s"] is not None else "-"
+        out.write(
+            f"{r['mode']:<14}{r['items'] if r['items'] is not None else '-':>8}"
+            f"{r['items_per_sec'] if r['items_per_sec'] is not None else '-':>9}{r['requests_per_sec']:>8}"
+            f"{latency['p50']:>8}{latency['p95']:>8}{latency['p99']:>8}{client_p99:>8}"
+            f"{r['max_rss_mb']:>8}  {statuses}\n"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end crawl load test against the local mock site.")
+    targets = parser.add_subparsers(dest="target", required=True)
+    legacy = targets.add_parser("legacy", help="crawlers/tabnak_crawler.py over a news ID range")
+    legacy.add_argument("--ids", default="1000000:1000500", help="START:END news IDs (END exclusive)")
+    legacy.add_argument("--delay", type=float, default=0.0, help="TABNAK_CRAWL_DELAY between items")
+    scrapy_cmd = targets.add_parser("scrapy", help="a Scrapy spider of the TabnakNews project")
+    scrapy_cmd.add_argument("spider")
+    scrapy_cmd.add_argument("-a", dest="spider_args", action="append", metavar="NAME=VALUE")
+    scrapy_cmd.add_argument("-s", dest="setting", action="append", metavar="NAME=VALUE",
+                            help="setting shared by all modes")
+    scrapy_cmd.add_argument("--mode", type=parse_mode, action="append", metavar="NAME=ARGS",
+                            help='named run with extra scrapy arguments, e.g. "c16=-s CONCURRENT_REQUESTS=16"')
+    scrapy_cmd.add_argument("--log-level", default="INFO")
+    legacy.add_argument("--mode", type=parse_mode, action="append", metavar="NAME=ENV",
+                        help='named run with extra environment, e.g. "slow=TABNAK_CRAWL_DELAY=0.5"')
+    for sub in (legacy, scrapy_cmd):
+        sub.add_argument("--workdir", help="directory for per-run output (default: a new temp dir)")
+        sub.add_argument("--max-seconds", type=float, default=0, help="stop a run after this long")
+        sub.add_argument("--json", help="also write the results to this file")
+        add_profile_arguments(sub)
+    args = parser.parse_args(argv)
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="load_test_")
+
+    site = MockNewsSite(Profile.from_args(args))
+    port = site.start()
+    try:
+        results = run_modes(args, site, f"http://127.0.0.1:{port}")
+    finally:
+        site.stop()
+    report(results)
+    print(f"\nRun directories: {args.workdir}", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"profile": site.profile.to_dict(), "results": results}, f, ensure_ascii=False, indent=2)
+    return 1 if any(r["exit_code"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
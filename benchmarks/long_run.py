@@ -0,0 +1,150 @@
+# آزمون سقف حافظه حالت اجرای طولانی (TabnakNews.longrun) با کراول چندساله روی شبیه‌ساز محلی
+#
+#   python -m benchmarks.long_run                                  # ۱۰ سال، سقف پیش‌فرض
+#   python -m benchmarks.long_run --years 2 --max-rss-mb 220 --workdir /tmp/long_run
+#
+# tabnak_daily_crawler با LONG_RUN_ENABLED=1 روی همه روزهای بازه اجرا می‌شود. برای کوتاه ماندن
+# آزمون هر روز شبیه‌ساز فقط --per-day خبر دارد، ولی تعداد روزها، درخواست‌های شروع و اثرانگشت‌ها
+# همان کراول واقعی چندساله است. کد خروج 1 اگر:
+#   - بیشینه RSS پروسه کراولر از --max-rss-mb بیشتر شود،
+#   - RSS یک‌پنجم پایانی اجرا بیش از --max-growth-mb بالاتر از یک‌پنجم ابتدایی (پس از گرم شدن) باشد،
+#   - یا کراول کامل نشود (کد خروج کراولر یا کمبود item نسبت به خبرهای موجود شبیه‌ساز).
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+import jdatetime
+
+from benchmarks.load_test import crawl_metrics, run_process, scrapy_command
+from benchmarks.mock_site import MockNewsSite, Profile
+
+SPIDER = "tabnak_daily_crawler"
+SERVICE_IDS = ("2", "6", "24")  # service_id دسته‌های TabnakDailyCrawler.TARGET_CATEGORIES
+DEFAULT_MAX_RSS_MB = 256
+DEFAULT_MAX_GROWTH_MB = 32
+
+
+def date_range(years, end="1401/12/29"):
+    to_date = jdatetime.datetime.strptime(end, "%Y/%m/%d").date()
+    from_date = to_date - jdatetime.timedelta(days=round(years * 365.25) - 1)
+    return from_date, to_date
+
+
+def expected_items(ids, from_date, to_date):
+    """خبرهای یکتای موجود در آرشیو دسته‌های اسپایدر (دسته‌هایی که در شبیه‌ساز هم‌پوشانی دارند یک بار)."""
+    news, day = set(), from_date
+    while day <= to_date:
+        for service_id in SERVICE_IDS:
+            news.update(ids.archive_ids(day, service_id))
+        day += jdatetime.timedelta(days=1)
+    return len(news)
+
+
+def memory_samples(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+def growth(samples):
+    """(RSS میانه یک‌پنجم ابتدایی، میانه یک‌پنجم پایانی) پس از کنار گذاشتن ۱۰٪ اول برای گرم شدن."""
+    rss = [s["rss_mb"] for s in samples]
+    rss = rss[len(rss) // 10:]
+    if len(rss) < 10:
+        return None, None
+    fifth = len(rss) // 5
+    return statistics.median(rss[:fifth]), statistics.median(rss[-fifth:])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RSS ceiling regression for a simulated multi-year long run.")
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--per-day", type=int, default=12, help="news per day on the mock site (all categories)")
+    parser.add_argument("--max-rss-mb", type=float, default=DEFAULT_MAX_RSS_MB)
+    parser.add_argument("--max-growth-mb", type=float, default=DEFAULT_MAX_GROWTH_MB)
+    parser.add_argument("--interval", type=float, default=5.0, help="LONG_RUN_MEMORY_INTERVAL in seconds")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("-s", dest="setting", action="append", metavar="NAME=VALUE",
+                        help="extra scrapy setting")
+    parser.add_argument("--workdir", help="directory for output, logs and memory.jsonl (default: a new temp dir)")
+    parser.add_argument("--max-seconds", type=float, default=0, help="stop the crawl after this long")
+    args = parser.parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="long_run_")
+    os.makedirs(workdir, exist_ok=True)
+
+    from_date, to_date = date_range(args.years)
+    profile = Profile(per_day=args.per_day, not_found=0.05, epoch="1390/01/01", days=6000)
+    memory_log = os.path.join(workdir, "memory.jsonl")
+    if os.path.exists(memory_log):
+        os.remove(memory_log)
+    settings = [
+        "LONG_RUN_ENABLED=1",
+        f"LONG_RUN_MEMORY_INTERVAL={args.interval}",
+        f"LONG_RUN_MEMORY_LOG={memory_log}",
+        f"JOBDIR={os.path.join(workdir, 'job')}",
+        # سرعت کراول فقط به شبیه‌ساز بستگی دارد
+        "AUTOTHROTTLE_ENABLED=0",
+        "DOWNLOAD_DELAY=0",
+        f"CONCURRENT_REQUESTS={args.concurrency}",
+        f"CONCURRENT_REQUESTS_PER_DOMAIN={args.concurrency}",
+        *(args.setting or ()),
+    ]
+    crawl_args = argparse.Namespace(
+        spider=SPIDER,
+        spider_args=[f"from_date={from_date:%Y/%m/%d}", f"to_date={to_date:%Y/%m/%d}"],
+        setting=settings,
+        log_level="INFO",
+    )
+    days = (to_date - from_date).days + 1
+    print(f"Crawling {days} days ({from_date:%Y/%m/%d} - {to_date:%Y/%m/%d}) in {workdir}", file=sys.stderr)
+
+    site = MockNewsSite(profile)
+    port = site.start()
+    try:
+        command, extra_env = scrapy_command(crawl_args, workdir, f"http://127.0.0.1:{port}", [])
+        code, seconds, peak_rss = run_process(
+            command, workdir, {**os.environ, **extra_env},
+            os.path.join(workdir, "stdout.log"), args.max_seconds,
+        )
+        stats = site.stats()
+    finally:
+        site.stop()
+
+    items, _, _ = crawl_metrics(os.path.join(workdir, "metrics.json"))
+    samples = memory_samples(memory_log)
+    first, last = growth(samples)
+    expected = expected_items(site.ids, from_date, to_date)
+    live_max = {}
+    for sample in samples:
+        for name, count in sample["live"].items():
+            live_max[name] = max(live_max.get(name, 0), count)
+
+    print(f"requests        {stats['requests']} in {seconds:.0f}s ({stats['requests'] / seconds:.1f}/s)")
+    print(f"items           {items} of {expected}")
+    print(f"peak RSS        {peak_rss:.1f} MB (ceiling {args.max_rss_mb:g})")
+    if first is not None:
+        print(f"RSS first/last  {first:.1f} / {last:.1f} MB (max growth {args.max_growth_mb:g})")
+    print("live max        " + " ".join(f"{k}={v}" for k, v in sorted(live_max.items())))
+
+    failures = []
+    if code:
+        failures.append(f"crawler exited with {code} (see {workdir}/scrapy.log)")
+    if not items or items < expected * 0.99:
+        failures.append(f"only {items} of {expected} items scraped")
+    if peak_rss > args.max_rss_mb:
+        failures.append(f"peak RSS {peak_rss:.1f} MB above {args.max_rss_mb:g} MB")
+    if first is not None and last - first > args.max_growth_mb:
+        failures.append(f"RSS grew {last - first:.1f} MB during the run")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,558 @@
+# شبیه‌ساز محلی سایت‌های خبری (CMS مشترک /fa/archive و /fa/news/<id>) برای آزمون بار کراول
+#
+#   python -m benchmarks.mock_site --port 8800 --latency lognormal:80,0.6 --not-found 0.2 \
+#       --error-rate 0.01 --timeout-rate 0.002 --rate-limit 50
+#   curl -x http://127.0.0.1:8800 http://www.entekhab.ir/fa/news/1000123
+#   curl http://127.0.0.1:8800/__mock__/stats
+#
+# سرور مثل یک proxy HTTP کار می‌کند: کراولر آدرس واقعی سایت را درخواست می‌کند (Scrapy با
+# TabnakNews.mock_handler و crawlerهای قدیمی با CRAWL_MOCK_SITE_URL) و سبک صفحه از نام میزبان
+# تعیین می‌شود (entekhab.ir -> انتخاب، بقیه -> تابناک). صفحه‌ها از fixtureهای
+# benchmarks/fixtures/<site>/{archive,article}.html ساخته می‌شوند.
+#
+# فضای شناسه: از --first-id هر روز --per-day خبر (از --epoch شمسی به بعد)؛ دسته هر خبر
+# id % --categories است و سهم --not-found از شناسه‌ها 404 (خبر حذف‌شده) است.
+# همه تصمیم‌های تصادفی (تأخیر، 404، خطا، timeout) از hash(seed، آدرس، شماره تلاش) گرفته می‌شوند
+# تا دو اجرا با یک seed، با هر ترتیب و هم‌روندی درخواست‌ها، همان پاسخ‌ها را ببینند.
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import jdatetime
+
+from benchmarks.cases import fixture
+
+ENGLISH_MONTHS = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+)
+PERSIAN_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+ERROR_STATUSES = (500, 502, 503, 504)
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    429: "Too Many Requests", 500: "Internal Server Error", 502: "Bad Gateway",
+    503: "Service Unavailable", 504: "Gateway Timeout",
+}
+NEWS_PATH = re.compile(r"^/fa/news/(\d+)(?:/|$)")
+NOT_FOUND_PAGE = "<html><body><h1>404</h1><p>خبر یافت نشد</p></body></html>".encode()
+ROBOTS_TXT = b"User-agent: *\nAllow: /\n"
+
+# سبک صفحه هر سایت: fixture و الگوی متن تاریخ صفحه خبر
+SITE_STYLES = {
+    "tabnak": {"date_pattern": r'(class="en_date">)[^<]*', "date_style": "english"},
+    "entekhab": {"date_pattern": r'(class="news_pdate_c">)[^<]*', "date_style": "persian"},
+}
+DEFAULT_STYLE = "tabnak"
+
+ITEM = re.compile(r'<div class="linear_news_item">.*?</span></div>', re.S)
+ITEM_TITLE = re.compile(r'class="title5"[^>]*>([^<]*)<')
+ITEM_ID = re.compile(r"(?<=/fa/news/)\d+|(?<=/)\d+(?=_thumb)")
+PAGINATION = re.compile(r'<div class="pagination">.*?</div>', re.S)
+ARTICLE_TITLE = re.compile(r"(<h1[^>]*>)[^<]*")
+
+
+def parse_latency(spec):
+    """
+    توزیع تأخیر (میلی‌ثانیه) -> تابع rng -> ثانیه:
+    none، fixed:50، uniform:20,200، exp:80، lognormal:80,0.6 (میانه، sigma)، pareto:40,1.5 (حداقل، alpha)
+    """
+    name, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec {spec!r}") from None
+    shapes = {
+        "none": (0, lambda rng: 0.0),
+        "fixed": (1, lambda rng: values[0]),
+        "uniform": (2, lambda rng: rng.uniform(values[0], values[1])),
+        "exp": (1, lambda rng: rng.expovariate(1 / values[0]) if values[0] else 0.0),
+        "lognormal": (2, lambda rng: values[0] * math.exp(values[1] * rng.gauss(0, 1))),
+        "pareto": (2, lambda rng: values[0] * rng.paretovariate(values[1])),
+    }
+    if name not in shapes or len(values) != shapes[name][0]:
+        raise ValueError(
+            f"Invalid latency spec {spec!r}; expected none, fixed:MS, uniform:LO,HI, exp:MEAN, "
+            "lognormal:MEDIAN,SIGMA or pareto:MIN,ALPHA"
+        )
+    sample = shapes[name][1]
+    return lambda rng: max(sample(rng), 0.0) / 1000
+
+
+def _latency_arg(spec):
+    try:
+        parse_latency(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from e
+    return spec
+
+
+def _fraction(value):
+    value = float(value)
+    if not 0 <= value <= 1:
+        raise argparse.ArgumentTypeError(f"{value} is not between 0 and 1")
+    return value
+
+
+def unit(seed, *parts):
+    """عدد شبه‌تصادفی پایدار در [0، 1) برای (seed، parts)."""
+    key = ":".join(str(p) for p in (seed, *parts)).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big") / 2**64
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+class Profile:
+    """رفتار سرور شبیه‌ساز (همان آرگومان‌های خط فرمان)."""
+
+    def __init__(self, latency="lognormal:80,0.5", archive_latency=None, not_found=0.1,
+                 error_rate=0.0, timeout_rate=0.0, hang=120.0, rate_limit=0.0, burst=None,
+                 first_id=1_000_000, per_day=240, categories=6, epoch="1390/01/01",
+                 days=6000, gzip=True, seed=1):
+        self.latency = latency
+        self.archive_latency = archive_latency or latency
+        self.not_found = not_found
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.rate_limit = rate_limit
+        self.burst = burst or max(1.0, rate_limit)
+        self.first_id = first_id
+        self.per_day = per_day
+        self.categories = categories
+        self.epoch = epoch
+        self.days = days
+        self.gzip = gzip
+        self.seed = seed
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(**{name: getattr(args, name) for name in PROFILE_ARGUMENTS})
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+PROFILE_ARGUMENTS = (
+    "latency", "archive_latency", "not_found", "error_rate", "timeout_rate", "hang",
+    "rate_limit", "burst", "first_id", "per_day", "categories", "epoch", "days", "gzip", "seed",
+)
+
+
+def add_profile_arguments(parser):
+    group = parser.add_argument_group("mock site profile")
+    group.add_argument("--latency", type=_latency_arg, default="lognormal:80,0.5",
+                       help="response latency distribution in ms (default lognormal:80,0.5)")
+    group.add_argument("--archive-latency", type=_latency_arg,
+                       help="latency distribution of archive pages (default: --latency)")
+    group.add_argument("--not-found", type=_fraction, default=0.1,
+                       help="fraction of news IDs that return 404")
+    group.add_argument("--error-rate", type=_fraction, default=0.0, help="fraction of 5xx responses")
+    group.add_argument("--timeout-rate", type=_fraction, default=0.0,
+                       help="fraction of requests that never get a response")
+    group.add_argument("--hang", type=float, default=120.0,
+                       help="seconds a timed-out request is held before the connection is closed")
+    group.add_argument("--rate-limit", type=float, default=0.0,
+                       help="requests/sec per client address before 429 (0: unlimited)")
+    group.add_argument("--burst", type=float, help="rate limit bucket size (default: one second)")
+    group.add_argument("--first-id", type=int, default=1_000_000)
+    group.add_argument("--per-day", type=int, default=240, help="news IDs per archive day")
+    group.add_argument("--categories", type=int, default=6)
+    group.add_argument("--epoch", default="1390/01/01", help="Jalali date of --first-id")
+    group.add_argument("--days", type=int, default=6000, help="days covered by the ID space")
+    group.add_argument("--no-gzip", dest="gzip", action="store_false")
+    group.add_argument("--seed", type=int, default=1)
+    return group
+
+
+class IdSpace:
+    """نگاشت شناسه خبر <-> روز و دسته آرشیو."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.epoch = jdatetime.date(*(int(p) for p in profile.epoch.split("/")))
+        self.last_id = profile.first_id + profile.days * profile.per_day
+
+    def exists(self, news_id):
+        p = self.profile
+        return p.first_id <= news_id < self.last_id and unit(p.seed, "gone", news_id) >= p.not_found
+
+    def day_of(self, news_id):
+        return self.epoch + jdatetime.timedelta(days=(news_id - self.profile.first_id) // self.profile.per_day)
+
+    def category_index(self, category):
+        category = str(category)
+        if category.lstrip("-").isdigit():
+            return int(category) % self.profile.categories
+        return zlib.crc32(category.encode("utf-8")) % self.profile.categories
+
+    def archive_ids(self, day, category):
+        """شناسه‌های موجود یک دسته در یک روز، از جدید به قدیم."""
+        p = self.profile
+        offset = (day - self.epoch).days
+        if not 0 <= offset < p.days:
+            return []
+        first = p.first_id + offset * p.per_day
+        index = self.category_index(category)
+        return [
+            news_id
+            for news_id in range(first + p.per_day - 1, first - 1, -1)
+            if news_id % p.categories == index and unit(p.seed, "gone", news_id) >= p.not_found
+        ]
+
+
+class SiteTemplate:
+    """صفحه آرشیو و خبر یک سایت، ساخته‌شده از fixtureهای آن."""
+
+    def __init__(self, site, date_pattern, date_style):
+        self.date_style = date_style
+        archive = fixture(site, "archive")
+        items = list(ITEM.finditer(archive))
+        if not items:
+            raise ValueError(f"No archive items found in the {site} fixture")
+        self.archive_head = archive[: items[0].start()]
+        tail = PAGINATION.sub("\x00", archive[items[-1].end():], count=1)
+        self.archive_tail = tail.split("\x00", 1) if "\x00" in tail else [tail, ""]
+        self.items = [ITEM_ID.sub("\x00", m.group()).split("\x00") for m in items]
+        self.titles = [ITEM_TITLE.search(m.group()).group(1) for m in items]
+        article = fixture(site, "article")
+        title, date = ARTICLE_TITLE.search(article), re.search(date_pattern, article)
+        if title is None or date is None:
+            raise ValueError(f"Could not find the title and date in the {site} article fixture")
+        self.date_first = date.start() < title.start()
+        article = ARTICLE_TITLE.sub(lambda m: m.group(1) + "\x00", article, count=1)
+        self.article = re.sub(date_pattern, lambda m: m.group(1) + "\x00", article, count=1).split("\x00")
+
+    def archive_page(self, ids, path, query, page, pages):
+        parts = [self.archive_head]
+        for news_id in ids:
+            parts.append(str(news_id).join(self.items[news_id % len(self.items)]))
+        parts.append(self.archive_tail[0])
+        if pages:
+            links = [
+                f'<a href="{path}?{urlencode({**query, "p": n}, safe="/")}">{str(n).translate(PERSIAN_DIGITS)}</a>'
+                for n in range(1, pages + 1)
+            ]
+            if page < pages:
+                links.append(f'<a href="{path}?{urlencode({**query, "p": page + 1}, safe="/")}">►</a>')
+            parts.append(f'<div class="pagination">{"".join(links)}</div>')
+        parts.append(self.archive_tail[1])
+        return "".join(parts)
+
+    def article_page(self, news_id, day):
+        title = self.titles[news_id % len(self.titles)]
+        if self.date_style == "english":
+            g = day.togregorian()
+            date = f"{g.day:02d} {ENGLISH_MONTHS[g.month - 1]} {g.year}"
+        else:
+            date = (
+                f"تاریخ انتشار: {news_id * 7 % 24:02d}:{news_id % 60:02d} - "
+                f"{day.day:02d} {jdatetime.date.j_months_fa[day.month - 1]} {day.year}"
+            ).translate(PERSIAN_DIGITS)
+        first, second = (date, title) if self.date_first else (title, date)
+        head, middle, tail = self.article
+        return "".join((head, first, middle, second, tail))
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class MockNewsSite:
+    """سرور HTTP/1.1 (keep-alive) روی asyncio؛ تأخیرها بدون thread اعمال می‌شوند."""
+
+    def __init__(self, profile=None):
+        self.profile = profile or Profile()
+        self.ids = IdSpace(self.profile)
+        self.latency = parse_latency(self.profile.latency)
+        self.archive_latency = parse_latency(self.profile.archive_latency)
+        self.templates = {}
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.reset()
+
+    def reset(self):
+        """آمار، شمارش تلاش‌ها و rate limit از صفر (برای اجرای بعدی با همان پاسخ‌ها)."""
+        self.attempts = {}
+        self.buckets = {}
+        self.started_at = time.time()
+        self.statuses = Counter()
+        self.kinds = Counter()
+        self.bytes_sent = 0
+        self.timeouts = 0
+        self.latencies = array("d")
+
+    def template(self, host):
+        host = (host or "").split(":")[0].lower().removeprefix("www.")
+        site = host.split(".")[0]
+        if site not in SITE_STYLES:
+            site = DEFAULT_STYLE
+        template = self.templates.get(site)
+        if template is None:
+            template = self.templates[site] = SiteTemplate(site, **SITE_STYLES[site])
+        return template
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        requests = sum(self.statuses.values()) + self.timeouts
+        return {
+            "uptime": round(elapsed, 3),
+            "requests": requests,
+            "requests_per_sec": round(requests / elapsed, 2),
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "kinds": dict(self.kinds),
+            "timeouts": self.timeouts,
+            "bytes_sent": self.bytes_sent,
+            "latency_ms": {
+                name: round(percentile(latencies, q) * 1000, 1)
+                for name, q in (("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+            },
+            "profile": self.profile.to_dict(),
+        }
+
+    # -------------------------------------------------------------
+    # پردازش درخواست
+    # -------------------------------------------------------------
+    async def handle(self, reader, writer):
+        peer = (writer.get_extra_info("peername") or ("?",))[0]
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    writer.write(self.encode(400, b"", {}, {}))
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                started = time.perf_counter()
+                if target.startswith("/__mock__/"):
+                    writer.write(self.control(target))
+                    await writer.drain()
+                    continue
+                response = await self.respond(method, target, headers, peer)
+                if response is None:
+                    # timeout شبیه‌سازی‌شده: بدون پاسخ تا وقتی کلاینت خودش قطع کند
+                    self.timeouts += 1
+                    await asyncio.sleep(self.profile.hang)
+                    break
+                writer.write(response)
+                await writer.drain()
+                self.latencies.append(time.perf_counter() - started)
+                self.bytes_sent += len(response)
+                connection = (headers.get("connection") or headers.get("proxy-connection") or "").lower()
+                if connection == "close" or (version == "HTTP/1.0" and connection != "keep-alive"):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # توقف سرور (stop) در حین تأخیر یا timeout شبیه‌سازی‌شده
+            pass
+        finally:
+            writer.close()
+
+    def encode(self, status, body, extra_headers, request_headers, content_type="text/html; charset=utf-8",
+               head=False, counted=True):
+        if counted:
+            self.statuses[status] += 1
+        if self.profile.gzip and len(body) > 1024 and "gzip" in request_headers.get("accept-encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            extra_headers = {**extra_headers, "Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+        lines = [
+            f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            *(f"{name}: {value}" for name, value in extra_headers.items()),
+            "",
+            "",
+        ]
+        return "\r\n".join(lines).encode("latin-1") + (b"" if head else body)
+
+    async def respond(self, method, target, headers, peer):
+        url = urlsplit(target)
+        host = url.netloc or headers.get("host", "")
+        path = url.path or "/"
+        if method not in ("GET", "HEAD"):
+            return self.encode(405, b"", {"Allow": "GET, HEAD"}, headers)
+        head = method == "HEAD"
+        if path == "/robots.txt":
+            self.kinds["robots"] += 1
+            return self.encode(200, ROBOTS_TXT, {}, headers, "text/plain", head)
+
+        profile = self.profile
+        if profile.rate_limit:
+            now = time.monotonic()
+            bucket = self.buckets.get(peer)
+            if bucket is None:
+                bucket = self.buckets[peer] = TokenBucket(profile.rate_limit, profile.burst, now)
+            if not bucket.take(now):
+                self.kinds["rate_limited"] += 1
+                retry_after = max(1, math.ceil(1 / profile.rate_limit))
+                return self.encode(429, b"", {"Retry-After": retry_after}, headers, head=head)
+
+        key = f"{host}{path}?{url.query}"
+        attempt = self.attempts.get(key, 0)
+        rng = random.Random(f"{profile.seed}:{key}:{attempt}")
+        roll = rng.random()
+        if roll < profile.timeout_rate + profile.error_rate:
+            self.attempts[key] = attempt + 1
+            if roll < profile.timeout_rate:
+                self.kinds["timeout"] += 1
+                return None
+            self.kinds["error"] += 1
+            await asyncio.sleep(self.latency(rng))
+            return self.encode(rng.choice(ERROR_STATUSES), b"", {}, headers, head=head)
+        self.attempts.pop(key, None)
+
+        template = self.template(host)
+        if path.rstrip("/") == "/fa/archive":
+            self.kinds["archive"] += 1
+            await asyncio.sleep(self.archive_latency(rng))
+            return self.encode(200, self.archive(template, path, url.query), {}, headers, head=head)
+        match = NEWS_PATH.match(path)
+        if match and self.ids.exists(int(match.group(1))):
+            news_id = int(match.group(1))
+            self.kinds["article"] += 1
+            await asyncio.sleep(self.latency(rng))
+            body = template.article_page(news_id, self.ids.day_of(news_id)).encode("utf-8")
+            return self.encode(200, body, {}, headers, head=head)
+        self.kinds["not_found"] += 1
+        await asyncio.sleep(self.latency(rng))
+        return self.encode(404, NOT_FOUND_PAGE, {}, headers, head=head)
+
+    def archive(self, template, path, query_string):
+        query = dict(parse_qsl(query_string))
+        category = query.get("cat_id") or query.get("service_id") or query.get("tp") or "0"
+        try:
+            day = jdatetime.date(*(int(p) for p in query.get("from_date", "").split("/")))
+            page = max(1, int(query.get("p", 1)))
+            rpp = min(100, max(1, int(query.get("rpp", 50))))
+        except (TypeError, ValueError):
+            day, page, rpp = None, 1, 50
+        ids = self.ids.archive_ids(day, category) if day else []
+        pages = math.ceil(len(ids) / rpp)
+        # صفحه بعد از آخرین صفحه: آرشیو خالی (اسپایدرها با نبود لینک متوقف می‌شوند)
+        shown = ids[(page - 1) * rpp: page * rpp]
+        return template.archive_page(shown, path, query, page, pages).encode("utf-8")
+
+    def control(self, target):
+        """/__mock__/stats و /__mock__/reset؛ در آمار شمرده نمی‌شوند."""
+        path = urlsplit(target).path
+        if path == "/__mock__/reset":
+            self.reset()
+        elif path != "/__mock__/stats":
+            return self.encode(404, b"", {}, {}, counted=False)
+        body = json.dumps(self.stats(), ensure_ascii=False).encode("utf-8")
+        return self.encode(200, body, {}, {}, "application/json", counted=False)
+
+    # -------------------------------------------------------------
+    # اجرا
+    # -------------------------------------------------------------
+    async def serve(self, host="127.0.0.1", port=8800):
+        for site in SITE_STYLES:
+            self.template(site)
+        self.server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        return self.server.sockets[0].getsockname()[1]
+
+    def start(self, host="127.0.0.1", port=0):
+        """اجرای سرور در یک thread پس‌زمینه؛ پورت واقعی را برمی‌گرداند."""
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        result = {}
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            try:
+                result["port"] = self.loop.run_until_complete(self.serve(host, port))
+            except Exception as e:
+                result["error"] = e
+                return
+            finally:
+                started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, name="mock-news-site", daemon=True)
+        self.thread.start()
+        started.wait()
+        if "error" in result:
+            raise result["error"]
+        return result["port"]
+
+    def stop(self):
+        if self.loop is None:
+            return
+
+        async def shutdown():
+            self.server.close()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout=10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=10)
+        self.loop = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock news site for crawl load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    site = MockNewsSite(Profile.from_args(args))
+
+    async def run():
+        port = await site.serve(args.host, args.port)
+        print(f"Mock news site listening on http://{args.host}:{port} (stats: /__mock__/stats)")
+        async with site.server:
+            await site.server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print(json.dumps(site.stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# benchmark آفلاین سرعت پردازش صفحه (صفحه در ثانیه) و حافظه تخصیص‌یافته هر extractor
+#
+#   python -m benchmarks.parse_bench run                      # مقایسه با baselines.json؛ کد خروج 1 در صورت افت
+#   python -m benchmarks.parse_bench run -k scrapy/cms        # فقط موارد منطبق
+#   python -m benchmarks.parse_bench run --update-baseline    # ثبت نتایج فعلی به‌عنوان مبنا
+#   python -m benchmarks.parse_bench list
+#   python -m benchmarks.parse_bench freeze tabnak article https://www.tabnak.ir/fa/news/1041860
+#
+# سرعت ماشین‌ها (و بار لحظه‌ای آن‌ها) فرق می‌کند؛ برای همین کنار هر مورد یک بار کاری ثابت
+# (calibration) هم به‌تناوب اندازه‌گیری و در baseline ذخیره می‌شود و سرعت مورد انتظار هر مورد
+# به نسبت calibration فعلی به مبنا مقیاس می‌شود.
+# حافظه: اوج حافظه tracemalloc در یک اجرا (KB) و حافظه باقی‌مانده پس از آن.
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.cases import CASES, FIXTURES_DIR
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_THRESHOLD = 0.3  # افت مجاز سرعت نسبت به مبنا (موارد پرنوسان: Case.threshold)
+DEFAULT_MEMORY_THRESHOLD = 0.5  # رشد مجاز اوج حافظه نسبت به مبنا
+MEMORY_SLACK_KB = 64  # تغییرات کوچک‌تر از این نادیده گرفته می‌شوند
+
+
+def calibration_workload():
+    """بار ثابت پایتون خالص (dict، رشته، regex) برای مقایسه سرعت ماشین‌ها."""
+    words = [f"w{i % 97}" for i in range(2000)]
+    counts = {}
+    for word in words:
+        counts[word] = counts.get(word, 0) + 1
+    text = " ".join(words)
+    return len(re.findall(r"w(\d+)", text)) + len(sorted(counts.items(), key=lambda kv: kv[1]))
+
+
+def rate(run, min_time):
+    """تعداد اجرا در ثانیه در یک دور دست‌کم min_time ثانیه‌ای."""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return loops / elapsed
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9) * 1.1))
+
+
+def paired_rate(run, min_time, repeat):
+    """(میانه سرعت run، میانه سرعت calibration) با دورهای یک‌درمیان تا نوسان بار ماشین
+    روی هر دو یکسان اثر بگذارد؛ میانه یک دور استثنایی سریع یا کند را نادیده می‌گیرد."""
+    run()
+    runs, calibrations = [], []
+    for _ in range(repeat):
+        calibrations.append(rate(calibration_workload, min_time))
+        runs.append(rate(run, min_time))
+    return statistics.median(runs), statistics.median(calibrations)
+
+
+def memory(run):
+    """(اوج، باقی‌مانده) حافظه تخصیص‌یافته در یک اجرا به KB."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = run()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (peak - before) / 1024, max(retained - before, 0) / 1024
+
+
+def measure(case, min_time, repeat):
+    try:
+        run = case.setup()
+    except ImportError as e:
+        return {"status": "skipped", "reason": f"{type(e).__name__}: {e}"}
+    except Exception as e:
+        return {"status": "error", "reason": f"{type(e).__name__}: {e}"}
+    peak_kb, retained_kb = memory(run)
+    runs_per_sec, calibration = paired_rate(run, min_time, repeat)
+    return {
+        "status": "ok",
+        "unit": case.unit,
+        "per_sec": runs_per_sec * case.batch,
+        "calibration": calibration,
+        "peak_kb": round(peak_kb, 1),
+        "retained_kb": round(retained_kb, 1),
+    }
+
+
+def run_cases(names, min_time, repeat):
+    return {name: measure(CASES[name], min_time, repeat) for name in names}
+
+
+def confirm_slower(results, min_time, repeat):
+    """موارد کندتر از مبنا یک بار دیگر با دورهای بیشتر اندازه‌گیری می‌شوند و بهترین نسبت
+    به calibration نگه داشته می‌شود؛ یک وقفه گذرای ماشین نباید شکست گزارش کند."""
+    for name, result in results.items():
+        if result.get("verdict") != "slower":
+            continue
+        again = measure(CASES[name], min_time, repeat * 2)
+        if again["status"] == "ok" and (
+            again["per_sec"] / again["calibration"] > result["per_sec"] / result["calibration"]
+        ):
+            result.update(per_sec=again["per_sec"], calibration=again["calibration"])
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    """وضعیت هر مورد نسبت به مبنا: ok / slower / memory / new."""
+    for name, result in results.items():
+        if result["status"] != "ok":
+            continue
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            result["verdict"] = "new"
+            continue
+        expected = base["per_sec"] * result["calibration"] / base["calibration"]
+        result["vs_baseline"] = result["per_sec"] / expected - 1
+        grew = result["peak_kb"] - base["peak_kb"]
+        case = CASES.get(name)
+        if result["vs_baseline"] < -max(threshold, (case and case.threshold) or 0.0):
+            result["verdict"] = "slower"
+        elif grew > MEMORY_SLACK_KB and grew > base["peak_kb"] * memory_threshold:
+            result["verdict"] = "memory"
+        else:
+            result["verdict"] = "ok"
+
+
+def report(results, out=sys.stdout):
+    out.write(f"{'case':<38}{'per sec':>12} {'unit':<6}{'vs base':>9}{'peak KB':>10}{'kept KB':>9}  status\n")
+    for name, result in results.items():
+        if result["status"] != "ok":
+            out.write(f"{name:<38}{'':>12} {'':<6}{'':>9}{'':>10}{'':>9}  {result['status']}: {result['reason']}\n")
+            continue
+        change = f"{result['vs_baseline']:+.0%}" if "vs_baseline" in result else ""
+        out.write(
+            f"{name:<38}{result['per_sec']:>12,.1f} {result['unit']:<6}{change:>9}"
+            f"{result['peak_kb']:>10,.0f}{result['retained_kb']:>9,.0f}  {result.get('verdict', '')}\n"
+        )
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, previous):
+    cases = dict(previous.get("cases", {}))
+    for name, result in results.items():
+        if result["status"] == "ok":
+            cases[name] = {
+                "unit": result["unit"],
+                "per_sec": round(result["per_sec"], 1),
+                "calibration": round(result["calibration"], 1),
+                "peak_kb": result["peak_kb"],
+            }
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "updated": time.strftime("%Y-%m-%d"),
+        "cases": {name: cases[name] for name in sorted(cases)},
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def freeze(site, name, url):
+    """ذخیره نسخه زنده یک صفحه به‌عنوان fixture (تنها دستوری که به شبکه نیاز دارد)."""
+    from utils.http_session import make_session
+
+    response = make_session().get(url, timeout=30)
+    response.raise_for_status()
+    response.encoding = response.encoding or "utf-8"
+    path = os.path.join(FIXTURES_DIR, site, f"{name}.html")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(response.text)
+    print(f"Saved {url} to {path}; re-run with --update-baseline", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline page-parsing throughput benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run benchmarks and compare with the baseline")
+    run.add_argument("-k", "--filter", action="append", help="substring of case names (repeatable)")
+    run.add_argument("--baseline", default=BASELINE_PATH)
+    run.add_argument("--update-baseline", action="store_true")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    run.add_argument("--memory-threshold", type=float, default=DEFAULT_MEMORY_THRESHOLD)
+    run.add_argument("--min-time", type=float, default=0.1, help="seconds per timing round")
+    run.add_argument("--repeat", type=int, default=7, help="timing rounds per case (median)")
+    run.add_argument("--json", help="also write raw results to this file")
+    commands.add_parser("list", help="list benchmark cases")
+    freeze_cmd = commands.add_parser("freeze", help="save a live page as a fixture")
+    freeze_cmd.add_argument("site")
+    freeze_cmd.add_argument("name", help="fixture name, e.g. archive or article")
+    freeze_cmd.add_argument("url")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name, case in CASES.items():
+            print(f"{name}  ({case.unit})")
+        return 0
+    if args.command == "freeze":
+        freeze(args.site, args.name, args.url)
+        return 0
+
+    names = [
+        name for name in CASES if not args.filter or any(part in name for part in args.filter)
+    ]
+    if not names:
+        parser.error("no benchmark matches the filter")
+    # لاگ هشدار اسپایدرها (مثلاً در صورت خطای fixture) در زمان‌سنجی خروجی نگیرد
+    logging.disable(logging.WARNING)
+    results = run_cases(names, args.min_time, args.repeat)
+    baseline = load_baseline(args.baseline)
+    compare(results, baseline, args.threshold, args.memory_threshold)
+    if not args.update_baseline:
+        confirm_slower(results, args.min_time, args.repeat)
+        compare(results, baseline, args.threshold, args.memory_threshold)
+    report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        save_baseline(args.baseline, results, baseline)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    errors = [name for name, r in results.items() if r["status"] == "error"]
+    regressions = [name for name, r in results.items() if r.get("verdict") in ("slower", "memory")]
+    for name in errors:
+        print(f"ERROR {name}: {results[name]['reason']}", file=sys.stderr)
+    for name in regressions:
+        print(f"REGRESSION {name}: {results[name]['verdict']}", file=sys.stderr)
+    return 1 if errors or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,29 @@
 import re
 import sys
-import requests
 from bs4 import BeautifulSoup
-from pymongo import MongoClient
 from unidecode import unidecode
+import os
+
+# ریشه مخزن برای دسترسی به ماژول‌های مشترک utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from utils.article_body import BodyRules, extract_body
+from utils.http_session import shared_session
+from utils.news_record import NewsRecord
+
+# نشست مشترک: فشرده‌سازی، رد پاسخ‌های غیر HTML/بزرگ و رسانه، گزارش بایت به ازای هر خبر
+session = shared_session()
 
 server_url = "http://www.eghtesadonline.com"
+# ظرف متن خبر برای استخراج‌کننده مشترک بدنه (utils/article_body.py)
+BODY_RULES = BodyRules(root='div[itemprop="articlebody"]')
 
 mongo_server = "localhost"
 mongo_port = 27017
-client = MongoClient(mongo_server, mongo_port)
-db = client['news_sites']
-news = db['eghtesadonline']
 
-def get_news_links(nextpage = ""):
-    links_list = []
-    base_url = server_url + "/newsstudios/archive/"
-    latest_url = base_url +  nextpage
 
-    content = requests.get(latest_url).text
+def parse_news_links(content):
+    """(لینک خبرها، query صفحه بعد) یک صفحه آرشیو."""
+    links_list = []
     soup = BeautifulSoup(content, "html.parser")
     nextpage = re.findall("(\?.*)", str(soup.findAll('a', attrs={'class': 'transition02'})[0]['href']))[0]
 
@@ -33,52 +38,71 @@ def get_news_links(nextpage = ""):
     return link_nextpage_dict
 
 
+def get_news_links(nextpage = ""):
+    base_url = server_url + "/newsstudios/archive/"
+    latest_url = base_url +  nextpage
+    return parse_news_links(session.get(latest_url).text)
+
+
+def parse_news(content, link):
+    """NewsRecord یک صفحه خبر (سند Mongo با to_dict)."""
+    soup = BeautifulSoup(content, "html.parser")
+
+    title = str(soup.h1.getText().strip())
+
+    subtitle = None
+    if len(soup.findAll("p", {"itemprop": "description"})) > 0:
+        subtitle = str(soup.findAll("p", {"itemprop": "description"})[0].getText().strip())
+    else:
+        subtitle = ""
+    body = extract_body(soup, BODY_RULES)
+
+    date, time = soup.findAll("time", {"itemprop": "datepublished"})[0].getText().strip().replace("تاریخ انتشار:", "").split('-')
+    date = str(date).strip()
+    time = str(time).strip()
+
+    comments_count = 0
+    if(soup.find('ul', {'class': 'level-0'}) != None):
+        parent = soup.find('ul', {'class': 'level-0'})
+        children = parent.findChildren("li", recursive=False)
+        comments_count = len(children)
+
+    return NewsRecord(
+        site="eghtesadonline",
+        title=title,
+        abstract=subtitle,
+        body=body,
+        date_shamsi=date,
+        time=time,
+        comment_count=comments_count,
+        link=link,
+    )
+
+
 pagination_num = 30
 
-news_cnt = 0
-nextpage = ""
-for i in range(1, pagination_num):
-    links, nextpage = get_news_links(nextpage)
-    # print("nextpage", nextpage)
-    docs = []
-    for link in links:
-        print(link)
-        news_cnt += 1
-        content = requests.get(link).text
-        soup = BeautifulSoup(content, "html.parser")
-
-        body_raw_txt = ''.join([str(i) for i in soup.findAll("div", {"itemprop": "articlebody"})])
-        soup_body = BeautifulSoup(str(re.sub('<br.*?>', '\n', body_raw_txt)), "html.parser")
-
-        title = str(soup.h1.getText().strip())
-
-        subtitle = None
-        if len(soup.findAll("p", {"itemprop": "description"})) > 0:
-            subtitle = str(soup.findAll("p", {"itemprop": "description"})[0].getText().strip())
-        else:
-            subtitle = ""
-        body = str(soup_body.getText())
-
-        date, time = soup.findAll("time", {"itemprop": "datepublished"})[0].getText().strip().replace("تاریخ انتشار:", "").split('-')
-        date = str(date).strip()
-        time = str(time).strip()
-
-        comments_count = 0
-        if(soup.find('ul', {'class': 'level-0'}) != None):
-            parent = soup.find('ul', {'class': 'level-0'})
-            children = parent.findChildren("li", recursive=False)
-            comments_count = len(children)
-
-        doc = {
-            "title": title,
-            "abstract": subtitle,
-            "body": body,
-            "date_shamsi": date,
-            "time": time,
-            "comment_count": comments_count,
-            "link": str(link)
-        }
-        docs.append(doc)
-
-    news.insert_many(docs)
-    print("news_cnt : " + str(news_cnt))
\ No newline at end of file
+
+def main():
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_server, mongo_port)
+    news = client['news_sites']['eghtesadonline']
+
+    news_cnt = 0
+    nextpage = ""
+    for _ in range(1, pagination_num):
+        links, nextpage = get_news_links(nextpage)
+        # print("nextpage", nextpage)
+        docs = []
+        for link in links:
+            print(link)
+            news_cnt += 1
+            docs.append(parse_news(session.get(link).text, link).to_dict())
+            session.bandwidth.observe_item(link)
+
+        news.insert_many(docs)
+        print("news_cnt : " + str(news_cnt))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,37 @@
 import re
 import sys
-import requests
 from bs4 import BeautifulSoup
-from pymongo import MongoClient
 from unidecode import unidecode
+import os
+
+# ریشه مخزن برای دسترسی به ماژول‌های مشترک utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from utils.article_body import BodyRules, extract_body
+from utils.http_session import shared_session
+from utils.news_record import NewsRecord
+from utils.page_stream import fetch_html
+
+# نشست مشترک: فشرده‌سازی، رد پاسخ‌های غیر HTML/بزرگ و رسانه، گزارش بایت به ازای هر خبر
+session = shared_session()
 
 server_url = "http://www.entekhab.ir"
+# ظرف متن خبر برای استخراج‌کننده مشترک بدنه (utils/article_body.py)
+BODY_RULES = BodyRules(root="div.khabar-matn")
+# عنصرهای لازم parse_news؛ صفحه فقط تا بسته شدن همه آن‌ها خوانده و تجزیه می شود (utils/page_stream.py)
+NEWS_FIELDS = {
+    "title": "h1",
+    "abstract": "div.subtitle",
+    "body": "div.khabar-matn",
+    "date": "div.news_pdate_c",
+}
 
 mongo_server = "localhost"
 mongo_port = 27017
-client = MongoClient(mongo_server, mongo_port)
-db = client['news_sites']
-news = db['entekhab']
 
-def get_news_links(page_number):
-    links_list = []
-    base_url = server_url + "/fa/archive?service_id=0&sec_id=0&cat_id=0&rpp=10&from_date=1397/07/20&to_date=1397/08/05&p=1"
-    latest_url = base_url + str(page_number)
 
-    content = requests.get(latest_url).text
+def parse_news_links(content):
+    """لینک خبرهای یک صفحه آرشیو."""
+    links_list = []
     soup = BeautifulSoup(content, "html.parser")
 
     archive_content_txt = ''.join([str(i) for i in soup.select("div.archive_content")])
@@ -35,43 +48,63 @@ def get_news_links(page_number):
     return links_list
 
 
+def get_news_links(page_number):
+    base_url = server_url + "/fa/archive?service_id=0&sec_id=0&cat_id=0&rpp=10&from_date=1397/07/20&to_date=1397/08/05&p=1"
+    latest_url = base_url + str(page_number)
+    return parse_news_links(session.get(latest_url).text)
+
+
+def parse_news(content, link):
+    """NewsRecord یک صفحه خبر (سند Mongo با to_dict)."""
+    soup = BeautifulSoup(content, "html.parser")
+
+    title = str(soup.h1.getText().strip())
+    subtitle = None
+    if len(soup.select('div.subtitle')) > 0:
+        subtitle = str(soup.select('div.subtitle')[0].getText().strip())
+    else:
+        subtitle = ""
+
+    # بدنه در همان درخت soup و بدون regex: اسکریپت پخش‌کننده ویدئو در پیمایش کنار گذاشته می‌شود
+    body = extract_body(soup, BODY_RULES)
+
+    time, date = soup.select('div.news_pdate_c')[0].getText().strip().replace("تاریخ انتشار:", "").split('-')
+    date = str(date)
+    time = str(time)
+
+    return NewsRecord(
+        site="entekhab",
+        title=title,
+        abstract=subtitle,
+        body=body,
+        date_shamsi=date,
+        time=time,
+        link=link,
+    )
+
+
 pagination_num = 30
 
-news_cnt = 0
-for i in range(1, pagination_num):
-    links = get_news_links(i)
-    docs = []
-    for link in links:
-        print(link)
-        news_cnt += 1
-        content = requests.get(link).text
-        soup = BeautifulSoup(content, "html.parser")
-        body_raw_txt  = ''.join([str(i) for i in soup.select("div.khabar-matn")])
-        soup_body = BeautifulSoup(str(re.sub('<br.*?>', '\n', body_raw_txt)),"html.parser")
-
-        title = str(soup.h1.getText().strip())
-        subtitle = None
-        if len(soup.select('div.subtitle')) > 0:
-            subtitle = str(soup.select('div.subtitle')[0].getText().strip())
-        else:
-            subtitle = ""
-
-        body = str(soup_body.getText())
-        body = str(re.sub('(var.*?error.*}\);)', '', body))
-
-        time, date = soup.select('div.news_pdate_c')[0].getText().strip().replace("تاریخ انتشار:", "").split('-')
-        date = str(date)
-        time = str(time)
-
-        doc = {
-            "title": title,
-            "abstract": subtitle,
-            "body": body,
-            "date_shamsi": date,
-            "time": time,
-            "link": str(link)
-        }
-        docs.append(doc)
-
-    news.insert_many(docs)
-    print("news_cnt : " + str(news_cnt))
\ No newline at end of file
+
+def main():
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_server, mongo_port)
+    news = client['news_sites']['entekhab']
+
+    news_cnt = 0
+    for i in range(1, pagination_num):
+        links = get_news_links(i)
+        docs = []
+        for link in links:
+            print(link)
+            news_cnt += 1
+            docs.append(parse_news(fetch_html(session, link, NEWS_FIELDS), link).to_dict())
+            session.bandwidth.observe_item(link)
+
+        news.insert_many(docs)
+        print("news_cnt : " + str(news_cnt))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,110 @@
-import requests
-import time
 import re
 from bs4 import BeautifulSoup
-from pymongo import MongoClient
-from textblob import TextBlob
 import sys
 from unidecode import unidecode
+import os
+
+# ریشه مخزن برای دسترسی به ماژول‌های مشترک utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from utils.http_session import shared_session
+from utils.news_record import NewsRecord
+from utils.page_stream import fetch_html
+
+# نشست مشترک: فشرده‌سازی، رد پاسخ‌های غیر HTML/بزرگ و رسانه، گزارش بایت به ازای هر خبر
+session = shared_session()
 
 server_url = "https://fararu.com/fa/news/"
+# عنصرهای لازم parse_news؛ صفحه فقط تا بسته شدن همه آن‌ها خوانده و تجزیه می شود (utils/page_stream.py)
+NEWS_FIELDS = {
+    "title": "div.title_rutitr_body",
+    "abstract": "div.news_body_lead",
+    "body": "div.body",
+    "comments": 'a[href="#comments"]',
+    "likes": "span.like_number",
+    "date": "div.news_pdate_c",
+}
+
 path_log = "./log/fararu.log"
 
 mongo_server = "localhost"
 mongo_port = 27017
-client = MongoClient(mongo_server, mongo_port)
-db = client['news_sites']
-news = db['fararu']
-
-if len(sys.argv)>1:
-    start = sys.argv[1]
-    end = sys.argv[2]
-else:
-    f = open(path_log, "r+") #845147, 845829
-    start, end = str(f.read()).split(",")
-
-docs = []
-for i in range(int(start), int(end)):
-    try:
-        link = server_url + str(i)
-        print(link)
-        request = requests.get(link)
-        content = request.text
-
-        soup = BeautifulSoup(content, "html.parser")
-
-        title = str(soup.select('div.title_rutitr_body')[0].getText().strip())
-        title = re.sub(r"\s+", " ", title, flags=re.UNICODE)
-
-        subtitle = None
-        if len(soup.select('div.news_body_lead'))>0:
-            subtitle = str(soup.select('div.news_body_lead')[0].getText().strip())
-        else:
-            subtitle = ""
-
-        body = str(soup.select('div.body')[0].getText().strip())
-
-        comments_count = soup.findAll("a", {"href": "#comments"})
-        if len(comments_count) > 0:
-            comments_count = unidecode(comments_count[0].getText().strip())
-            comments_count = re.findall(r'\d+', comments_count)[0]
-        else:
-            comments_count = 0
-
-        like_count = soup.select("span.like_number")[0].getText().strip()
-        like_count = re.findall(r'\d+', like_count)[0]
-        if len(like_count) == 0:
-            like_count = 0
-
-        time, date = soup.select('div.news_pdate_c')[0].getText().strip().replace("تاریخ انتشار:","").split('-')
-        time = str(unidecode(time)).strip()
-        date = str(date).strip()
-
-        doc = {
-                "title": title,
-                "body" : body,
-                "abstract": subtitle,
-                "time": time,
-                "date_shamsi": date,
-                "comment_count": comments_count,
-                "like_count" : like_count,
-                "link": link
-        }
-        docs.append(doc)
-        if len(docs)>=2:
-            news.insert_many(docs)
-            docs.clear()
-
-            f = open(path_log, "w+")
-            f.write(str(i) + "," + str(end))
-
-    except Exception as e:
-        print(e)
-        pass
\ No newline at end of file
+
+
+def parse_news(content, link):
+    """NewsRecord یک صفحه خبر (سند Mongo با to_dict)."""
+    soup = BeautifulSoup(content, "html.parser")
+
+    title = str(soup.select('div.title_rutitr_body')[0].getText().strip())
+    title = re.sub(r"\s+", " ", title, flags=re.UNICODE)
+
+    subtitle = None
+    if len(soup.select('div.news_body_lead'))>0:
+        subtitle = str(soup.select('div.news_body_lead')[0].getText().strip())
+    else:
+        subtitle = ""
+
+    body = str(soup.select('div.body')[0].getText().strip())
+
+    comments_count = soup.findAll("a", {"href": "#comments"})
+    if len(comments_count) > 0:
+        comments_count = unidecode(comments_count[0].getText().strip())
+        comments_count = re.findall(r'\d+', comments_count)[0]
+    else:
+        comments_count = 0
+
+    like_count = soup.select("span.like_number")[0].getText().strip()
+    like_count = re.findall(r'\d+', like_count)[0]
+    if len(like_count) == 0:
+        like_count = 0
+
+    time, date = soup.select('div.news_pdate_c')[0].getText().strip().replace("تاریخ انتشار:","").split('-')
+    time = str(unidecode(time)).strip()
+    date = str(date).strip()
+
+    return NewsRecord(
+        site="fararu",
+        title=title,
+        body=body,
+        abstract=subtitle,
+        time=time,
+        date_shamsi=date,
+        comment_count=comments_count,
+        like_count=like_count,
+        link=link,
+    )
+
+
+def main():
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_server, mongo_port)
+    news = client['news_sites']['fararu']
+
+    if len(sys.argv)>1:
+        start = sys.argv[1]
+        end = sys.argv[2]
+    else:
+        f = open(path_log, "r+") #845147, 845829
+        start, end = str(f.read()).split(",")
+
+    docs = []
+    for i in range(int(start), int(end)):
+        try:
+            link = server_url + str(i)
+            print(link)
+            docs.append(parse_news(fetch_html(session, link, NEWS_FIELDS), link).to_dict())
+            session.bandwidth.observe_item(link)
+            if len(docs)>=2:
+                news.insert_many(docs)
+                docs.clear()
+
+                f = open(path_log, "w+")
+                f.write(str(i) + "," + str(end))
+
+        except Exception as e:
+            print(e)
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,26 @@
 import re
-import requests
 from bs4 import BeautifulSoup
-from pymongo import MongoClient
+import sys
+import os
+
+# ریشه مخزن برای دسترسی به ماژول‌های مشترک utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from utils.http_session import shared_session
+from utils.news_record import NewsRecord
+from utils.page_stream import fetch_html
+
+# نشست مشترک: فشرده‌سازی، رد پاسخ‌های غیر HTML/بزرگ و رسانه، گزارش بایت به ازای هر خبر
+session = shared_session()
 
 server_url = "http://www.irna.ir"
 
 mongo_server = "localhost"
 mongo_port = 27017
-client = MongoClient(mongo_server, mongo_port)
-db = client['news_sites']
-news = db['irna']
 
-def get_news_links(page_number):
-    links_list = []
-    base_url = server_url + "/fa/page/260/ResultSearch?zone=27&lm=Latest&area=0&title=Euw%2bvo0paBHX2%2bYCUoyt9w%3d%3d&lang=fa&minify=t&"
-    latest_url = base_url + str(page_number)
 
-    content = requests.get(latest_url).text
+def parse_news_links(content):
+    """لینک خبرهای یک صفحه نتایج جستجو."""
+    links_list = []
     soup = BeautifulSoup(content, "html.parser")
 
     tags = soup.find_all(lambda tag: tag.name == 'a' and 'title' in tag.attrs)
@@ -29,35 +33,67 @@ def get_news_links(page_number):
     return links_list
 
 
+def get_news_links(page_number):
+    base_url = server_url + "/fa/page/260/ResultSearch?zone=27&lm=Latest&area=0&title=Euw%2bvo0paBHX2%2bYCUoyt9w%3d%3d&lang=fa&minify=t&"
+    latest_url = base_url + str(page_number)
+    return parse_news_links(session.get(latest_url).text)
+
+
 BODY_ID = "ctl00_ctl00_ContentPlaceHolder_ContentPlaceHolder_NewsContent4_BodyLabel"
 DATE_ID = "ctl00_ctl00_ContentPlaceHolder_ContentPlaceHolder_NewsContent4_NofaDateLabel2"
 TIME_ID = "ctl00_ctl00_ContentPlaceHolder_ContentPlaceHolder_NewsContent4_NofaDateLabel3"
+# عنصرهای لازم parse_news؛ صفحه فقط تا بسته شدن همه آن‌ها خوانده و تجزیه می شود (utils/page_stream.py)
+NEWS_FIELDS = {
+    "title": "h1",
+    "abstract": "h3",
+    "body": f"p#{BODY_ID}",
+    "date": f"span#{DATE_ID}",
+    "time": f"span#{TIME_ID}",
+}
+
+
+def parse_news(content, link):
+    """NewsRecord یک صفحه خبر (سند Mongo با to_dict)."""
+    soup = BeautifulSoup(content, "html.parser")
+    soup_body = BeautifulSoup(re.sub('<br.*?>', '\n', str(soup.findAll("p", {"id": BODY_ID})[0])), "html.parser")
+
+    title = str(soup.h1.string)
+    abstract = str(soup.h3.string)
+    body = str(soup_body.p.text)
+    date_shamsi = str(soup.find_all('span', {'id': DATE_ID})[0].text).strip()
+    time = str(soup.find_all('span', {'id': TIME_ID})[0].text).strip()
+
+    return NewsRecord(
+        site="irna",
+        title=title,
+        abstract=abstract,
+        body=body,
+        date_shamsi=date_shamsi,
+        time=time,
+        link=link,
+    )
+
 
 pagination_num = 16
 
-news_cnt = 0
-for i in range(1, pagination_num):
-    links = get_news_links(i)
-    docs = []
-    for link in links:
-        news_cnt += 1
-        content = requests.get(link).text
-        soup = BeautifulSoup(content, "html.parser")
-        soup_body = BeautifulSoup(re.sub('<br.*?>', '\n', str(soup.findAll("p", {"id": BODY_ID})[0])), "html.parser")
-
-        title = str(soup.h1.string)
-        abstract = str(soup.h3.string)
-        body = str(soup_body.p.text)
-        date_shamsi = str(soup.find_all('span', {'id': DATE_ID})[0].text).strip()
-        time = str(soup.find_all('span', {'id': TIME_ID})[0].text).strip()
-
-        doc = {"title": title,
-                "abstract": abstract,
-                "body": body,
-                "date_shamsi": date_shamsi,
-                "time": time,
-                "link": str(link)}
-
-        docs.append(doc)
-    news.insert_many(docs)
-    print("news_cnt : " + str(news_cnt))
\ No newline at end of file
+
+def main():
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_server, mongo_port)
+    news = client['news_sites']['irna']
+
+    news_cnt = 0
+    for i in range(1, pagination_num):
+        links = get_news_links(i)
+        docs = []
+        for link in links:
+            news_cnt += 1
+            docs.append(parse_news(fetch_html(session, link, NEWS_FIELDS), link).to_dict())
+            session.bandwidth.observe_item(link)
+        news.insert_many(docs)
+        print("news_cnt : " + str(news_cnt))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,88 @@
-import requests
-import time
 import re
 from bs4 import BeautifulSoup
-from pymongo import MongoClient
-from textblob import TextBlob
 import sys
+import os
+
+# ریشه مخزن برای دسترسی به ماژول‌های مشترک utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from utils.http_session import shared_session
+from utils.news_record import NewsRecord
+
+# نشست مشترک: فشرده‌سازی، رد پاسخ‌های غیر HTML/بزرگ و رسانه، گزارش بایت به ازای هر خبر
+session = shared_session()
 
 server_url = "https://www.khabaronline.ir/detail/"
 path_log = "./log/khabaronline.log"
 
 mongo_server = "localhost"
 mongo_port = 27017
-client = MongoClient(mongo_server, mongo_port)
-db = client['news_sites']
-news = db['kahabaronline']
-
-if len(sys.argv)>1:
-    start = sys.argv[1]
-    end = sys.argv[2]
-else:
-    f = open(path_log, "r+") #812900, 815078
-    start, end = str(f.read()).split(",")
-
-docs = []
-for i in range(int(start), int(end)):
-    try:
-        link = server_url + str(i)
-        print(link)
-        request = requests.get(link)
-        content = request.text
-
-        soup = BeautifulSoup(content, "html.parser")
-
-        title = str(soup.select('h2')[0].getText().strip())
-        body = str(soup.select('div.body')[0].getText().strip())
-        abstract = str(soup.select('div.leadCont')[0].getText().strip())
-        time, date = soup.select('span.margin-l-md')[0].getText().strip().split('-')
-        time = str(time).strip()
-        date = str(date).strip()
-
-        raters  = soup.select('span.voteNewsNum')[0].getText().strip()
-        raters = int(re.findall(r'\d+', raters)[0])
-
-        if len(soup.select("div.commentInfo"))>1:
-            comments_count = soup.select('div.headerWrappers')[1].getText().strip()
-            comments_count = int(re.findall(r'\d+', comments_count)[0])
-        else:
-            comments_count = 0
-
-        doc = {
-                "title": title,
-                "body" : body,
-                "abstract" : abstract,
-                "time" : time,
-                "date_shamsi" : date,
-                "raters" : raters,
-                "comments_count" : comments_count,
-                "link": link
-        }
-        docs.append(doc)
-        if len(docs)>=20:
-            news.insert_many(docs)
-            docs.clear()
-
-            f = open(path_log, "w+")
-            f.write(str(i) + "," + str(end))
-
-    except Exception as e:
-        print(e)
-        pass
 
+
+def parse_news(content, link):
+    """NewsRecord یک صفحه خبر (سند Mongo با to_dict)."""
+    soup = BeautifulSoup(content, "html.parser")
+
+    title = str(soup.select('h2')[0].getText().strip())
+    body = str(soup.select('div.body')[0].getText().strip())
+    abstract = str(soup.select('div.leadCont')[0].getText().strip())
+    time, date = soup.select('span.margin-l-md')[0].getText().strip().split('-')
+    time = str(time).strip()
+    date = str(date).strip()
+
+    raters  = soup.select('span.voteNewsNum')[0].getText().strip()
+    raters = int(re.findall(r'\d+', raters)[0])
+
+    if len(soup.select("div.commentInfo"))>1:
+        comments_count = soup.select('div.headerWrappers')[1].getText().strip()
+        comments_count = int(re.findall(r'\d+', comments_count)[0])
+    else:
+        comments_count = 0
+
+    return NewsRecord(
+        site="khabaronline",
+        title=title,
+        body=body,
+        abstract=abstract,
+        time=time,
+        date_shamsi=date,
+        like_count=raters,
+        comment_count=comments_count,
+        link=link,
+    )
+
+
+def main():
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_server, mongo_port)
+    news = client['news_sites']['kahabaronline']
+
+    if len(sys.argv)>1:
+        start = sys.argv[1]
+        end = sys.argv[2]
+    else:
+        f = open(path_log, "r+") #812900, 815078
+        start, end = str(f.read()).split(",")
+
+    docs = []
+    for i in range(int(start), int(end)):
+        try:
+            link = server_url + str(i)
+            print(link)
+            request = session.get(link)
+            docs.append(parse_news(request.text, link).to_dict())
+            session.bandwidth.observe_item(link)
+            if len(docs)>=20:
+                news.insert_many(docs)
+                docs.clear()
+
+                f = open(path_log, "w+")
+                f.write(str(i) + "," + str(end))
+
+        except Exception as e:
+            print(e)
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# ریشه مخزن برای دسترسی به ماژول‌های مشترک utils (مثلاً utils.crawl_metrics)
+REPO_ROOT = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, os.pardir, os.pardir)
+)
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
@@ -0,0 +1,135 @@
+# پیکربندی سایت‌هایی که CMS مشترک آرشیو /fa/archive را دارند (اسپایدر cms_archive_crawler)
+#
+# افزودن سایت جدید = یک مدخل جدید در ARCHIVE_SITES (یا در فایل JSON با `-a config=sites.json`
+# که روی همین مقادیر ادغام می‌شود). کلیدها:
+#   base_url        آدرس پایه سایت
+#   archive_params  پارامترهای ثابت آدرس آرشیو (rpp، service_id، sec_id، ...)
+#   category_param  نام پارامتری که شناسه دسته در آن قرار می‌گیرد
+#   categories      نام دسته -> شناسه
+#   selectors       انتخابگرهای CSS (links، title، abstract، date، اختیاری category، و body اگر
+#                   body_extractor نباشد)
+#   body_extractor  قواعد استخراج‌کننده مشترک بدنه (utils/article_body.py): {"root": ..., "drop": [...]}؛
+#                   {} یعنی فقط امتیاز چگالی متن و null یعنی selectors.body. اسکریپت‌ها و حاشیه‌ها
+#                   در همان پیمایش حذف می‌شوند.
+#   date_format     "jalali" (مثل «۱۸ مهر ۱۳۹۷» یا 1397/07/18) یا قالب strptime برای تاریخ انگلیسی؛
+#                   نام ماه در %B/%b مستقل از locale خوانده می‌شود
+#   body_separator  جداکننده تکه‌های متن بدنه در حالت selectors.body (پیش‌فرض خط جدید)
+#   strip_patterns  regexهایی که از متن بدنه حذف می‌شوند (اختیاری؛ روی کل متن اجرا می‌شوند)
+#   concurrency/delay  ادب کراول برای دامنه این سایت (DOWNLOAD_SLOTS)
+
+import copy
+import json
+
+ARCHIVE_SITES = {
+    "tabnak": {
+        "base_url": "https://www.tabnak.ir",
+        "archive_params": {"rpp": 100},
+        "category_param": "service_id",
+        "categories": {
+            "سیاسی": 24,
+            "اقتصادی": 6,
+            "ورزشی": 2,
+            "اجتماعی": 3,
+            "فرهنگی": 21,
+            "بین‌الملل": 17,
+        },
+        "selectors": {
+            "links": "div.linear_news a.title5::attr(href)",
+            "title": "h1.Htag::text, h1.title::text",
+            "abstract": "div.subtitle::text",
+            "body": "div.body p::text",
+            "date": "span.en_date::text",
+            "category": "a.newsbody_servicename::text",
+        },
+        "date_format": "%d %B %Y",
+        "concurrency": 8,
+        "delay": 0,
+    },
+    "entekhab": {
+        "base_url": "https://www.entekhab.ir",
+        "archive_params": {"service_id": 5, "sec_id": -1, "rpp": 50},
+        "category_param": "cat_id",
+        "categories": {"سیاسی": 2, "اقتصادی": 5, "ورزشی": 9, "فناوری": 8},
+        "selectors": {
+            "links": "div.archive_content a.title5::attr(href)",
+            "title": "h1::text",
+            "abstract": "div.subtitle::text",
+            "date": "div.news_pdate_c::text",
+        },
+        "body_extractor": {"root": "div.khabar-matn"},
+        "date_format": "jalali",
+        "concurrency": 4,
+        "delay": 0.5,
+    },
+    "parsine": {
+        "base_url": "https://www.parsine.com",
+        "archive_params": {"sec_id": 0, "cat_id": 0, "rpp": 100},
+        "category_param": "service_id",
+        "categories": {"همه": 0},
+        "selectors": {
+            "links": "div.archive_content a.title5::attr(href)",
+            "title": "h1::text",
+            "abstract": "div.subtitle::text",
+            "date": "div.news_pdate_c::text",
+        },
+        "body_extractor": {"root": "section.body"},
+        "date_format": "jalali",
+        "concurrency": 4,
+        "delay": 0.5,
+    },
+    "aftabnews": {
+        "base_url": "https://aftabnews.ir",
+        "archive_params": {"sec_id": 0, "cat_id": 0, "rpp": 100},
+        "category_param": "service_id",
+        "categories": {"همه": 0},
+        "selectors": {
+            "links": "div.archive_content a.title5::attr(href)",
+            "title": "h1.title::text",
+            "abstract": "div.subtitle::text",
+            "date": "div.news_pdate_c::text",
+        },
+        "body_extractor": {"root": "div.body"},
+        "date_format": "jalali",
+        "concurrency": 4,
+        "delay": 0.5,
+    },
+    "eghtesadonline": {
+        "base_url": "https://www.eghtesadonline.com",
+        "archive_params": {"sec_id": 0, "cat_id": 0, "rpp": 100},
+        "category_param": "service_id",
+        "categories": {"همه": 0},
+        "selectors": {
+            "links": "div.archive_content a.title5::attr(href)",
+            "title": "h1::text",
+            "abstract": 'p[itemprop="description"]::text, div.subtitle::text',
+            "date": 'time[itemprop="datepublished"]::text, div.news_pdate_c::text',
+        },
+        "body_extractor": {"root": 'div[itemprop="articlebody"]'},
+        "date_format": "jalali",
+        "concurrency": 4,
+        "delay": 0.5,
+    },
+}
+
+
+def load_sites(names=None, config_path=None):
+    """
+    پیکربندی سایت‌های انتخاب‌شده؛ فایل JSON اختیاری روی پیش‌فرض‌ها ادغام می‌شود
+    (مدخل جدید = سایت جدید، مدخل موجود = بازنویسی کلیدهای داده‌شده).
+    """
+    sites = copy.deepcopy(ARCHIVE_SITES)
+    if config_path:
+        with open(config_path, encoding="utf-8") as f:
+            for name, overrides in json.load(f).items():
+                site = sites.setdefault(name, {})
+                for key, value in overrides.items():
+                    if isinstance(value, dict) and isinstance(site.get(key), dict):
+                        site[key].update(value)
+                    else:
+                        site[key] = value
+    if names:
+        unknown = [name for name in names if name not in sites]
+        if unknown:
+            raise ValueError(f"Unknown archive site(s): {', '.join(unknown)}")
+        sites = {name: sites[name] for name in names}
+    return sites
@@ -0,0 +1,256 @@
+# کنترل‌کننده تطبیقی هم‌روندی به ازای هر دامنه
+#
+# به جای مقادیر ثابت AUTOTHROTTLE_TARGET_CONCURRENCY / CONCURRENT_REQUESTS، هم‌روندی
+# هر slot دانلودر در بازه‌های کوتاه بر اساس تأخیر p50/p95، timeoutها، نرخ 429/5xx
+# و هدر Retry-After تنظیم می‌شود (افزایش جمعی، کاهش ضربی).
+#
+# فعال‌سازی در settings.py یا custom_settings:
+#   DOWNLOADER_MIDDLEWARES = {"TabnakNews.concurrency.AdaptiveConcurrencyMiddleware": 950}
+#   ADAPTIVE_CONCURRENCY_ENABLED = True
+#   AUTOTHROTTLE_ENABLED = False  # هر دو delay را تغییر می‌دهند
+
+import json
+import logging
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import scrapy.exceptions
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+from twisted.internet.error import TimeoutError as TxTimeoutError
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_EXCEPTIONS = tuple(
+    exc
+    for exc in (TxTimeoutError, getattr(scrapy.exceptions, "DownloadTimeoutError", None))
+    if exc is not None
+)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def parse_retry_after(value):
+    """مقدار هدر Retry-After (ثانیه یا تاریخ HTTP) را به ثانیه تبدیل می‌کند."""
+    if not value:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class DomainWindow:
+    """آمار یک slot در بازه جاری کنترل."""
+
+    __slots__ = (
+        "latencies",
+        "responses",
+        "timeouts",
+        "throttled",
+        "server_errors",
+        "retry_after",
+    )
+
+    def __init__(self):
+        self.latencies = []
+        self.responses = 0
+        self.timeouts = 0
+        self.throttled = 0
+        self.server_errors = 0
+        self.retry_after = None
+
+    @property
+    def total(self):
+        return self.responses + self.timeouts
+
+    @property
+    def errors(self):
+        return self.timeouts + self.throttled + self.server_errors
+
+
+class AdaptiveConcurrencyMiddleware:
+    """
+    Downloader middleware که هم‌روندی هر دامنه را پیوسته تنظیم می‌کند.
+
+    تصمیم‌ها (با دلیل و معیارهای همان بازه) در لاگ، در stats با پیشوند
+    `adaptive_concurrency/` و در صورت تعیین ADAPTIVE_CONCURRENCY_DECISION_LOG
+    به صورت JSONL ثبت می‌شوند.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_CONCURRENCY_ENABLED"):
+            raise NotConfigured
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.interval = settings.getfloat("ADAPTIVE_CONCURRENCY_INTERVAL", 5.0)
+        self.min_concurrency = settings.getint("ADAPTIVE_CONCURRENCY_MIN", 1)
+        self.max_concurrency = settings.getint("ADAPTIVE_CONCURRENCY_MAX", 32)
+        self.target_p95 = settings.getfloat("ADAPTIVE_CONCURRENCY_TARGET_P95", 2.0)
+        self.target_rps = settings.getfloat("ADAPTIVE_CONCURRENCY_TARGET_RPS", 0.0)
+        self.error_budget = settings.getfloat("ADAPTIVE_CONCURRENCY_ERROR_BUDGET", 0.05)
+        self.decrease_factor = settings.getfloat(
+            "ADAPTIVE_CONCURRENCY_DECREASE_FACTOR", 0.5
+        )
+        self.min_samples = settings.getint("ADAPTIVE_CONCURRENCY_MIN_SAMPLES", 5)
+        self.base_delay = settings.getfloat("DOWNLOAD_DELAY", 0.0)
+        self.decision_log_path = settings.get("ADAPTIVE_CONCURRENCY_DECISION_LOG")
+        self.decision_log = None
+        self.decisions = deque(maxlen=500)
+        self.windows = {}
+        self.loop = None
+
+        if settings.getbool("AUTOTHROTTLE_ENABLED"):
+            logger.warning(
+                "AdaptiveConcurrencyMiddleware is enabled together with AutoThrottle; "
+                "both adjust download delays. Consider AUTOTHROTTLE_ENABLED = False."
+            )
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mw = cls(crawler)
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def spider_opened(self, spider):
+        if self.decision_log_path:
+            self.decision_log = open(self.decision_log_path, "a", encoding="utf-8")
+        self.loop = task.LoopingCall(self.adjust)
+        self.loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.loop and self.loop.running:
+            self.loop.stop()
+        if self.decision_log:
+            self.decision_log.close()
+            self.decision_log = None
+
+    # -------------------------------------------------------------
+    # جمع‌آوری مشاهدات
+    # -------------------------------------------------------------
+    def _window(self, request):
+        key = request.meta.get("download_slot")
+        if key is None:
+            return None
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = DomainWindow()
+        return window
+
+    def process_response(self, request, response, spider=None):
+        window = self._window(request)
+        if window is None:
+            return response
+        window.responses += 1
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            window.latencies.append(latency)
+        if response.status == 429:
+            window.throttled += 1
+        elif response.status >= 500:
+            window.server_errors += 1
+        if response.status in (429, 503):
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                window.retry_after = max(window.retry_after or 0.0, retry_after)
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        if isinstance(exception, TIMEOUT_EXCEPTIONS):
+            window = self._window(request)
+            if window is not None:
+                window.timeouts += 1
+        return None
+
+    # -------------------------------------------------------------
+    # حلقه کنترل
+    # -------------------------------------------------------------
+    def adjust(self):
+        engine = self.crawler.engine
+        if engine is None or engine.downloader is None:
+            return
+        windows, self.windows = self.windows, {}
+        for key, window in windows.items():
+            slot = engine.downloader.slots.get(key)
+            if slot is None:
+                continue
+            self._adjust_slot(key, slot, window)
+
+    def _adjust_slot(self, key, slot, window):
+        latencies = sorted(window.latencies)
+        p50 = percentile(latencies, 0.50)
+        p95 = percentile(latencies, 0.95)
+        rps = window.responses / self.interval
+        error_rate = window.errors / window.total if window.total else 0.0
+
+        old_concurrency, old_delay = slot.concurrency, slot.delay
+        concurrency, delay = old_concurrency, old_delay
+        if window.retry_after is not None:
+            concurrency = max(self.min_concurrency, int(concurrency * self.decrease_factor))
+            delay = max(delay, window.retry_after)
+            reason = f"Retry-After {window.retry_after:.1f}s"
+        elif window.total < self.min_samples and window.errors:
+            # در سایت کند یا زیر بار، timeoutها خودشان نمونه‌ها را کم می‌کنند؛ کاهش منتظر نمی‌ماند
+            concurrency = max(self.min_concurrency, int(concurrency * self.decrease_factor))
+            reason = f"{window.errors} timeouts/429/5xx in only {window.total} samples"
+        elif window.total < self.min_samples:
+            reason = "not enough samples"
+        elif error_rate > self.error_budget:
+            concurrency = max(self.min_concurrency, int(concurrency * self.decrease_factor))
+            reason = f"error rate {error_rate:.1%} over budget {self.error_budget:.1%}"
+        elif p95 > self.target_p95:
+            concurrency = max(self.min_concurrency, concurrency - 1)
+            reason = f"p95 {p95:.2f}s over target {self.target_p95:.2f}s"
+        elif self.target_rps and rps >= self.target_rps:
+            reason = f"throughput {rps:.1f} req/s meets target {self.target_rps:.1f}"
+        else:
+            concurrency = min(self.max_concurrency, concurrency + 1)
+            # سایت سالم است؛ delay اضافه ناشی از Retry-After به تدریج برداشته می‌شود
+            delay = max(self.base_delay, delay / 2)
+            reason = "healthy, probing for more throughput"
+
+        slot.concurrency, slot.delay = concurrency, delay
+        decision = {
+            "time": time.time(),
+            "slot": key,
+            "concurrency": concurrency,
+            "previous_concurrency": old_concurrency,
+            "delay": round(delay, 3),
+            "reason": reason,
+            "responses": window.responses,
+            "timeouts": window.timeouts,
+            "throttled": window.throttled,
+            "server_errors": window.server_errors,
+            "error_rate": round(error_rate, 4),
+            "p50": round(p50, 3),
+            "p95": round(p95, 3),
+            "rps": round(rps, 2),
+        }
+        self.decisions.append(decision)
+        self.stats.set_value(f"adaptive_concurrency/{key}/concurrency", concurrency)
+        self.stats.set_value(f"adaptive_concurrency/{key}/delay", round(delay, 3))
+        self.stats.set_value(f"adaptive_concurrency/{key}/reason", reason)
+        if concurrency != old_concurrency or delay != old_delay:
+            self.stats.inc_value(f"adaptive_concurrency/{key}/changes")
+            logger.info(
+                f"Concurrency for {key}: {old_concurrency} -> {concurrency}, "
+                f"delay {old_delay:.2f}s -> {delay:.2f}s ({reason}; "
+                f"p50={p50:.2f}s p95={p95:.2f}s rps={rps:.1f} errors={error_rate:.1%})"
+            )
+        if self.decision_log:
+            self.decision_log.write(json.dumps(decision, ensure_ascii=False) + "\n")
+            self.decision_log.flush()
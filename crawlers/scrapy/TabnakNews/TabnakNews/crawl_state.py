@@ -0,0 +1,267 @@
+import json
+import logging
+import os
+from datetime import timedelta
+
+from jdatetime import date as jdate
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest
+
+# مسیر پیش‌فرض ذخیره وضعیت (نسبت به پوشه اجرای scrapy)
+DEFAULT_STATE_DIR = ".crawl_state"
+
+def is_incremental(value):
+    """مقدار آرگومان `-a incremental=...` را به bool تبدیل می‌کند."""
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+class CrawlState:
+    """
+    وضعیت پایدار کراول افزایشی به ازای هر سایت و هر دسته‌بندی.
+
+    برای هر دسته دو مقدار نگه‌داری می‌شود: آخرین روزی که کامل کراول شده
+    (`last_date`، شمسی) و بزرگ‌ترین ID خبری که همه خبرهای درخواست‌شده تا آن
+    دریافت شده‌اند (`max_news_id`). مقادیر اجرای قبلی در ابتدای اجرا ثابت می‌مانند
+    تا توقف صفحه‌بندی روی IDهای شناخته‌شده، به IDهای جدید همین اجرا وابسته نباشد.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._data = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._data = json.load(f)
+        # snapshot اجرای قبلی
+        self._known_ids = {
+            category: int(entry.get("max_news_id") or 0)
+            for category, entry in self._data.items()
+        }
+        self._completed = {}
+        self._requested = {}  # دسته -> IDهای درخواست‌شده که پاسخشان هنوز نرسیده
+        self._fetched = {}  # دسته -> IDهای دریافت‌شده
+
+    @classmethod
+    def for_site(cls, site, settings=None):
+        state_dir = DEFAULT_STATE_DIR
+        if settings is not None:
+            state_dir = settings.get("CRAWL_STATE_DIR", DEFAULT_STATE_DIR)
+        return cls(os.path.join(state_dir, f"{site}.json"))
+
+    # -------------------------------------------------------------
+    # خواندن وضعیت
+    # -------------------------------------------------------------
+    def last_date(self, category):
+        value = self._data.get(str(category), {}).get("last_date")
+        if not value:
+            return None
+        year, month, day = (int(p) for p in value.split("/"))
+        return jdate(year, month, day)
+
+    def next_date(self, category):
+        """اولین روزی که باید کراول شود (روز بعد از آخرین روز کامل)."""
+        last = self.last_date(category)
+        return last + timedelta(days=1) if last else None
+
+    def known_news_id(self, category):
+        return self._known_ids.get(str(category), 0)
+
+    def is_known(self, category, news_id):
+        known = self.known_news_id(category)
+        return bool(known) and news_id is not None and news_id <= known
+
+    # -------------------------------------------------------------
+    # به‌روزرسانی وضعیت در طول اجرا
+    # -------------------------------------------------------------
+    def request_news_id(self, category, news_id):
+        """خبر از صفحه آرشیو درخواست شد (هنوز در مرز IDهای شناخته‌شده حساب نمی‌شود)."""
+        if news_id is not None:
+            self._requested.setdefault(str(category), set()).add(news_id)
+
+    def discard_news_id(self, category, news_id):
+        """درخواست خبر هرگز پاسخی به callback نمی‌دهد (حذف dupefilter/offsite، شکست نهایی)؛ مرز را نگه نمی‌دارد."""
+        if news_id is not None:
+            self._requested.get(str(category), set()).discard(news_id)
+
+    def observe_news_id(self, category, news_id):
+        """پاسخ صفحه خبر به callback رسید؛ خطای دانلود این‌جا نمی‌رسد و خبر در اجرای بعد تکرار می‌شود."""
+        if news_id is None:
+            return
+        category = str(category)
+        self._requested.get(category, set()).discard(news_id)
+        self._fetched.setdefault(category, set()).add(news_id)
+
+    def commit_news_ids(self):
+        """
+        max_news_id را تا بزرگ‌ترین ID دریافت‌شده زیر کوچک‌ترین ID هنوز در جریان جلو می‌برد؛
+        خبری که پاسخش نرسیده (مثلاً کراول قطع شده) زیر مرز نمی‌ماند و اجرای بعد دوباره درخواست
+        می‌شود. خبری که کنار گذاشته شد یا شکست نهایی خورد با discard_news_id از جریان خارج است.
+        """
+        for category, fetched in self._fetched.items():
+            missing = self._requested.get(category)
+            limit = min(missing) if missing else None
+            done = [news_id for news_id in fetched if limit is None or news_id < limit]
+            if not done:
+                continue
+            entry = self._data.setdefault(category, {})
+            if max(done) > int(entry.get("max_news_id") or 0):
+                entry["max_news_id"] = max(done)
+
+    def mark_day_complete(self, category, day):
+        self._completed.setdefault(str(category), set()).add(day)
+
+    def commit_days(self, category, first_day, last_day):
+        """
+        آخرین روز کامل را تا جایی جلو می‌برد که روزهای پشت سر هم از
+        `first_day` کامل شده باشند (حداکثر تا `last_day`).
+        """
+        completed = self._completed.get(str(category), set())
+        day, last_complete = first_day, None
+        while day <= last_day and day in completed:
+            last_complete = day
+            day += timedelta(days=1)
+        if last_complete is None:
+            return None
+        previous = self.last_date(category)
+        if previous is None or last_complete > previous:
+            entry = self._data.setdefault(str(category), {})
+            entry["last_date"] = last_complete.strftime("%Y/%m/%d")
+        return last_complete
+
+    def save(self):
+        self.commit_news_ids()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+class IncrementalCrawlMixin:
+    """
+    حالت `-a incremental=1` مشترک spiderهای آرشیو (روز-محور، دسته‌ای). spider در from_crawler
+    load_crawl_state را صدا می‌زند؛ meta درخواست‌ها archive_date و category_name و در spider
+    چندسایته site دارد (در غیر این صورت STATE_SITE).
+
+    در صفحه آرشیو: is_known_article برای هر لینک، mark_archive_day_complete وقتی صفحه‌بندی روز
+    تمام شد (نه وقتی به سقف صفحه رسید). در callback خبر: observe_article و errback آن article_failed.
+    ID خبر (meta: news_id) وقتی درخواستش واقعاً زمان‌بندی شد در جریان ثبت می‌شود (سیگنال
+    request_scheduled) و اگر scheduler آن را کنار بگذارد (request_dropped) از جریان خارج می‌شود.
+    """
+
+    STATE_SITE = None  # نام فایل وضعیت spiderهای تک‌سایته
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # حالت افزایشی: ادامه از آخرین روز کامل اجرای قبلی تا امروز
+        self.incremental = is_incremental(kwargs.get("incremental", False))
+        self.crawl_states = {}  # site -> CrawlState
+        self.category_start_dates = {}  # (site، دسته) -> اولین روز این اجرا
+
+    def load_crawl_state(self, settings, categories, default_start):
+        """categories: site -> دسته‌ها. تاریخ شروع هر دسته از وضعیت اجرای قبلی تعیین می‌شود."""
+        for site, names in categories.items():
+            state = self.crawl_states[site] = CrawlState.for_site(site, settings)
+            for category in names:
+                start = state.next_date(category) or default_start
+                self.category_start_dates[(site, category)] = start
+                self.logger.info(
+                    f"INCREMENTAL: {site}/{category} from {start.strftime('%Y/%m/%d')}, "
+                    f"known max news ID: {state.known_news_id(category)}"
+                )
+        crawler = getattr(self, "crawler", None)
+        if crawler is not None:
+            crawler.signals.connect(self.article_scheduled, signal=signals.request_scheduled)
+            crawler.signals.connect(self.article_dropped, signal=signals.request_dropped)
+
+    def category_start(self, category, site=None):
+        return self.category_start_dates.get((site or self.STATE_SITE, category))
+
+    def iter_incremental_days(self):
+        """روزهای شمسی از اولین روز کراول‌نشده (کمترین بین دسته‌ها) تا امروز."""
+        day = min(self.category_start_dates.values())
+        today = jdate.today()
+        while day <= today:
+            yield day
+            day += timedelta(days=1)
+
+    def _state(self, meta):
+        return self.crawl_states.get(meta.get("site") or self.STATE_SITE)
+
+    def is_known_article(self, meta, news_id):
+        """
+        True اگر خبر در اجرای قبلی کراول شده است (آرشیو از جدید به قدیم مرتب است، پس صفحه‌بندی
+        می‌تواند متوقف شود).
+        """
+        state = self._state(meta)
+        return state is not None and state.is_known(meta["category_name"], news_id)
+
+    def _article_state(self, meta):
+        if meta.get("news_id") is None or meta.get("category_name") is None:
+            return None
+        return self._state(meta)
+
+    def article_scheduled(self, request, spider):
+        state = self._article_state(request.meta)
+        if state is not None:
+            state.request_news_id(request.meta["category_name"], request.meta["news_id"])
+
+    def article_dropped(self, request, spider):
+        state = self._article_state(request.meta)
+        if state is not None:
+            state.discard_news_id(request.meta["category_name"], request.meta["news_id"])
+
+    def article_failed(self, failure):
+        """
+        errback درخواست خبر (شکست نهایی پس از retryها، HttpError، IgnoreRequest): پاسخی به callback
+        نمی‌رسد و ID مرز را نگه نمی‌دارد.
+        """
+        request = failure.request
+        level = logging.DEBUG if failure.check(IgnoreRequest) else logging.WARNING
+        self.logger.log(level, f"Article request failed: {request.url}: {failure.value!r}")
+        self.article_dropped(request, self)
+
+    def observe_article(self, response):
+        """ابتدای callback خبر؛ meta: category_name و news_id (و site)."""
+        state = self._state(response.meta)
+        if state is not None and response.meta.get("category_name") is not None:
+            state.observe_news_id(response.meta["category_name"], response.meta.get("news_id"))
+
+    def mark_archive_day_complete(self, meta):
+        state = self._state(meta)
+        if state is None or not meta.get("archive_date"):
+            return
+        year, month, day = (int(p) for p in meta["archive_date"].split("/"))
+        state.mark_day_complete(meta["category_name"], jdate(year, month, day))
+
+    def page_cap_reached(self, meta):
+        """روز به سقف صفحه رسید و کامل حساب نمی‌شود؛ اجرای بعد همین روز را تکرار می‌کند."""
+        if self._state(meta) is not None:
+            self.logger.warning(
+                f"INCREMENTAL: page limit reached for {meta['category_name']} on {meta.get('archive_date')}; "
+                f"the day stays incomplete"
+            )
+
+    def last_archive_day(self):
+        """آخرین روزی که این اجرا کراول می‌کند (None: امروز)."""
+        return None
+
+    def closed(self, reason):
+        if not self.crawl_states:
+            return
+        # وضعیت فقط برای اجرای کامل ذخیره می‌شود؛ اجرای نیمه‌کاره از همان نقطه قبلی تکرار می‌شود
+        if reason != "finished":
+            self.logger.warning(
+                f"Crawl state not saved (close reason: {reason}). Next run resumes from the previous state."
+            )
+            return
+        # امروز هنوز کامل نشده است
+        last_day = jdate.today() - timedelta(days=1)
+        if self.last_archive_day() is not None:
+            last_day = min(last_day, self.last_archive_day())
+        for (site, category), start in self.category_start_dates.items():
+            committed = self.crawl_states[site].commit_days(category, start, last_day)
+            self.logger.info(f"INCREMENTAL: {site}/{category} complete up to {committed!s}")
+        for state in self.crawl_states.values():
+            state.save()
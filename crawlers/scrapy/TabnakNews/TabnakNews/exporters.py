@@ -0,0 +1,106 @@
+# خروجی Parquet (فشرده با zstd) برای feedهای Scrapy
+#
+# scrapy crawl tabnak_daily_crawler -o tabnak.parquet
+#
+# یا در FEEDS:
+#   "Tabnak_%(from_date_str)s.parquet": {
+#       "format": "parquet",
+#       "item_export_kwargs": {"row_group_size": 20000, "compression_level": 6},
+#   }
+#
+# سطرها در row groupهای جریانی نوشته می‌شوند؛ حافظه بافر به row_group_size سطر
+# و buffer_bytes بایت متن محدود است. بارگذاری: pandas.read_parquet("tabnak.parquet")
+# ستون‌ها همان فیلدهای NewsRecord (utils/news_record.py) به همان ترتیب هستند.
+
+from datetime import date
+
+from scrapy.exporters import BaseItemExporter
+
+from utils.news_record import FIELDS, TEXT_FIELDS, NewsRecord
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # وابستگی اختیاری: pip install pyarrow
+    pa = pq = None
+
+
+def news_schema():
+    types = {
+        "news_id": pa.int64(),
+        "date_georgian_iso": pa.date32(),
+        "comment_count": pa.int64(),
+        "view_count": pa.int64(),
+        "like_count": pa.int64(),
+    }
+    return pa.schema([(name, types.get(name, pa.string())) for name in FIELDS])
+
+
+class ParquetItemExporter(BaseItemExporter):
+    def __init__(
+        self,
+        file,
+        row_group_size=10000,
+        buffer_bytes=64 * 1024 * 1024,
+        compression="zstd",
+        compression_level=3,
+        **kwargs,
+    ):
+        if pa is None:
+            raise ImportError(
+                "The parquet feed format requires pyarrow (pip install pyarrow)"
+            )
+        super().__init__(dont_fail=True, **kwargs)
+        self.file = file
+        self.row_group_size = int(row_group_size)
+        self.buffer_bytes = int(buffer_bytes)
+        self.compression = compression
+        self.compression_level = compression_level
+        self.schema = news_schema()
+        self.writer = None
+        self._reset_buffer()
+
+    def _reset_buffer(self):
+        self.columns = {name: [] for name in FIELDS}
+        self.buffered_rows = 0
+        self.buffered_bytes = 0
+
+    def start_exporting(self):
+        self.writer = pq.ParquetWriter(
+            self.file,
+            self.schema,
+            compression=self.compression,
+            compression_level=self.compression_level,
+        )
+
+    def export_item(self, item):
+        record = NewsRecord.of(item)
+        for name in FIELDS:
+            self.columns[name].append(getattr(record, name))
+        self.buffered_rows += 1
+        # بایت UTF-8 (نه تعداد نویسه): متن فارسی دو بایت در هر نویسه است
+        self.buffered_bytes += sum(
+            len(getattr(record, name).encode("utf-8")) for name in TEXT_FIELDS
+        )
+        if (
+            self.buffered_rows >= self.row_group_size
+            or self.buffered_bytes >= self.buffer_bytes
+        ):
+            self._flush()
+
+    def _flush(self):
+        if not self.buffered_rows:
+            return
+        # date_georgian_iso در NewsRecord همیشه YYYY-MM-DD یا None است
+        self.columns["date_georgian_iso"] = [
+            date.fromisoformat(value) if value else None for value in self.columns["date_georgian_iso"]
+        ]
+        table = pa.Table.from_pydict(self.columns, schema=self.schema)
+        self.writer.write_table(table, row_group_size=self.buffered_rows)
+        self._reset_buffer()
+
+    def finish_exporting(self):
+        self._flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
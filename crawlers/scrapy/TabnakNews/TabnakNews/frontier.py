@@ -0,0 +1,670 @@
+# صف درخواست (frontier) و dupefilter مشترک بین چند پروسه/ماشین Scrapy
+#
+#   scrapy crawl tabnak_daily_crawler -s SCHEDULER=TabnakNews.frontier.FrontierScheduler \
+#       -s DUPEFILTER_CLASS=TabnakNews.frontier.FrontierDupeFilter \
+#       -s FRONTIER_URL=redis://10.0.0.5:6379/0
+#
+# - FRONTIER_URL: sqlite:///مسیر/فایل (پیش‌فرض؛ چند پروسه روی یک ماشین) یا redis://... (چند ماشین؛
+#   نیازمند pip install redis). هر اسپایدر صف خودش را دارد (FRONTIER_NAME، پیش‌فرض نام اسپایدر).
+# - at-least-once: درخواستی که از صف برداشته می‌شود حذف نمی‌شود بلکه به نام worker «در حال اجرا»
+#   علامت می‌خورد و فقط بعد از پردازش کامل ack می‌شود: FrontierAckMiddleware (spider middleware
+#   بیرونی، در settings.py فعال است) پایان خروجی callback را خبر می‌دهد، یعنی همه درخواست‌های
+#   فرزند در صف نوشته شده‌اند، و ack تا پایان pipeline همه itemهای آن پاسخ (item_scraped،
+#   item_dropped، item_error) صبر می‌کند. درخواستی که بدون پاسخ تمام شد (شکست نهایی دانلود،
+#   IgnoreRequest یک downloader middleware، redirect/retry که درخواست جایگزینش خودش در صف است)
+#   پس از FRONTIER_WORKER_TIMEOUT ثانیه بی‌پاسخ ماندن یا هنگام بستن ack می‌شود. هر درخواست
+#   ack نشده هنگام بستن (با هر دلیلی) یا مرگ worker به صف برمی‌گردد.
+# - هر worker هر FRONTIER_HEARTBEAT ثانیه زنده بودنش را ثبت می‌کند؛ درخواست‌های در حال اجرای
+#   workerی که FRONTIER_WORKER_TIMEOUT ثانیه خبری از آن نیست به صف برمی‌گردند.
+# - worker دوم به بعد: -s FRONTIER_SEED=0 تا درخواست‌های شروع دوباره وارد صف نشوند
+#   (بدون آن هم dupefilter مشترک تکراری‌ها را حذف می‌کند).
+# - امنیت: درخواست‌ها pickle ذخیره می‌شوند. بازکردن pickle فقط انواع داده ساده (و تاریخ) را
+#   می‌پذیرد تا داده دستکاری‌شده در صف کد اجرا نکند، اما هر کس به Redis/فایل SQLite دسترسی نوشتن
+#   دارد هنوز می‌تواند هر URL و هر callback اسپایدر را به همه workerها بدهد؛ frontier باید
+#   مورد اعتماد و فقط در دسترس workerها باشد (Redis با رمز/ACL و بدون دسترسی از بیرون).
+
+import io
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import time
+import uuid
+import weakref
+
+from scrapy import Request, signals
+from scrapy.dupefilters import BaseDupeFilter
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.misc import build_from_crawler, load_object
+from scrapy.utils.request import request_from_dict
+from twisted.internet import task
+
+from TabnakNews.tracing import TRACE_META_KEY
+
+logger = logging.getLogger(__name__)
+
+# تنها کلاس‌هایی که pickle درخواست می‌تواند بسازد (بقیه: dict، list، str، bytes، عدد، ...)
+SAFE_GLOBALS = {
+    ("datetime", "date"),
+    ("datetime", "datetime"),
+    ("datetime", "timedelta"),
+    ("datetime", "timezone"),
+}
+
+
+# انواعی که pickle بدون global می‌نویسد و بازکردنشان همیشه مجاز است
+PLAIN_TYPES = frozenset((type(None), bool, int, float, complex, str, bytes, tuple, list, dict, set, frozenset))
+
+# سیگنال FrontierAckMiddleware: خروجی callback درخواست کامل مصرف شد (request، items)
+request_processed = object()
+
+
+class _RequestPickler(pickle.Pickler):
+    """همان محدودیت _RequestUnpickler هنگام نوشتن، تا درخواست نامعتبر یک بار و پیش از صف رد شود."""
+
+    def reducer_override(self, obj):
+        cls = type(obj)
+        if cls in PLAIN_TYPES or (cls.__module__, cls.__qualname__) in SAFE_GLOBALS:
+            return NotImplemented
+        raise pickle.PicklingError(f"Frontier request data references {cls.__module__}.{cls.__qualname__}")
+
+
+class _RequestUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if (module, name) not in SAFE_GLOBALS:
+            raise pickle.UnpicklingError(f"Frontier request data references {module}.{name}")
+        return super().find_class(module, name)
+
+
+def dumps_request(request, spider):
+    """
+    دیکشنری درخواست به pickle؛ ValueError اگر meta شیئی دارد که workerها آن را باز نمی‌کنند.
+    رکورد trace (TRACE_META_KEY) مال همین پروسه است و به صف نمی‌رود.
+    """
+    data = request.to_dict(spider=spider)
+    # to_dict همان dict متای درخواست را برمی‌گرداند؛ کپی تا درخواست زنده دست نخورد
+    data["meta"] = {key: value for key, value in data["meta"].items() if key != TRACE_META_KEY}
+    buffer = io.BytesIO()
+    try:
+        _RequestPickler(buffer, protocol=4).dump(data)
+    except pickle.PicklingError as exc:
+        raise ValueError(f"Cannot store {request} in the frontier: {exc}") from None
+    return buffer.getvalue()
+
+
+def loads_request(payload):
+    return _RequestUnpickler(io.BytesIO(payload)).load()
+
+
+def worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def open_frontier(url, name):
+    """backend مناسب FRONTIER_URL: redis://... یا sqlite:///path (یا مسیر خام فایل)."""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisFrontier(url, name)
+    if url.startswith("sqlite://"):
+        url = url[len("sqlite://"):]
+        # sqlite:///rel/path -> rel/path ، sqlite:////abs/path -> /abs/path
+        url = url[1:] if url.startswith("/") else url
+    return SqliteFrontier(url, name)
+
+
+# -------------------------------------------------------------
+# backendها
+# -------------------------------------------------------------
+class SqliteFrontier:
+    """
+    frontier روی یک فایل SQLite (WAL)؛ برای چند پروسه روی یک ماشین.
+    برداشتن از صف یک UPDATE ... RETURNING اتمیک است، پس دو worker یک درخواست را نمی‌گیرند.
+    """
+
+    def __init__(self, path, name):
+        self.name = name
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS requests (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                frontier TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                worker TEXT
+            );
+            CREATE INDEX IF NOT EXISTS requests_next
+                ON requests (frontier, worker, priority DESC, id);
+            CREATE TABLE IF NOT EXISTS seen (
+                frontier TEXT NOT NULL,
+                fingerprint BLOB NOT NULL,
+                PRIMARY KEY (frontier, fingerprint)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS workers (
+                frontier TEXT NOT NULL,
+                worker TEXT NOT NULL,
+                heartbeat REAL NOT NULL,
+                PRIMARY KEY (frontier, worker)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def push(self, data, priority=0):
+        cursor = self.conn.execute(
+            "INSERT INTO requests (frontier, priority, data) VALUES (?, ?, ?)",
+            (self.name, priority, data),
+        )
+        return cursor.lastrowid
+
+    def pop(self, worker):
+        # fetchall: دستور باید کامل اجرا شود تا تراکنش ضمنی بسته و قفل آزاد شود
+        rows = self.conn.execute(
+            """
+            UPDATE requests SET worker = ? WHERE id = (
+                SELECT id FROM requests WHERE frontier = ? AND worker IS NULL
+                ORDER BY priority DESC, id LIMIT 1
+            ) RETURNING id, data
+            """,
+            (worker, self.name),
+        ).fetchall()
+        return rows[0] if rows else None
+
+    def ack(self, ids):
+        if ids:
+            self.conn.executemany("DELETE FROM requests WHERE id = ?", [(i,) for i in ids])
+
+    def release(self, worker, drop=False):
+        """درخواست‌های در حال اجرای یک worker: حذف (drop) یا بازگشت به صف."""
+        if drop:
+            sql = "DELETE FROM requests WHERE frontier = ? AND worker = ?"
+        else:
+            sql = "UPDATE requests SET worker = NULL WHERE frontier = ? AND worker = ?"
+        count = self.conn.execute(sql, (self.name, worker)).rowcount
+        self.conn.execute(
+            "DELETE FROM workers WHERE frontier = ? AND worker = ?", (self.name, worker)
+        )
+        return count
+
+    def seen(self, fingerprint):
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO seen (frontier, fingerprint) VALUES (?, ?)",
+            (self.name, fingerprint),
+        )
+        return cursor.rowcount == 0
+
+    def heartbeat(self, worker):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO workers (frontier, worker, heartbeat) VALUES (?, ?, ?)",
+            (self.name, worker, time.time()),
+        )
+
+    def reap(self, timeout):
+        """درخواست‌های workerهای مرده (بدون heartbeat در `timeout` ثانیه اخیر) به صف برمی‌گردند."""
+        cutoff = time.time() - timeout
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute(
+                "DELETE FROM workers WHERE frontier = ? AND heartbeat < ?",
+                (self.name, cutoff),
+            )
+            return self.conn.execute(
+                """
+                UPDATE requests SET worker = NULL
+                WHERE frontier = ? AND worker IS NOT NULL
+                  AND worker NOT IN (SELECT worker FROM workers WHERE frontier = ?)
+                """,
+                (self.name, self.name),
+            ).rowcount
+
+    def pending(self):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM requests WHERE frontier = ? AND worker IS NULL",
+            (self.name,),
+        ).fetchone()[0]
+
+    def in_flight(self, exclude=None):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM requests WHERE frontier = ? AND worker IS NOT NULL"
+            " AND worker != ?",
+            (self.name, exclude or ""),
+        ).fetchone()[0]
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for table in ("requests", "seen", "workers"):
+                self.conn.execute(f"DELETE FROM {table} WHERE frontier = ?", (self.name,))
+
+    def close(self):
+        self.conn.close()
+
+
+# KEYS: pending, inflight, data ؛ ARGV: worker
+_REDIS_POP = """
+local ids = redis.call('ZRANGE', KEYS[1], 0, 0)
+if #ids == 0 then return false end
+redis.call('ZREM', KEYS[1], ids[1])
+redis.call('HSET', KEYS[2], ids[1], ARGV[1])
+return {ids[1], redis.call('HGET', KEYS[3], ids[1])}
+"""
+
+# KEYS: inflight, pending, scores, data ؛ ARGV: worker، drop (0/1)
+_REDIS_RELEASE = """
+local n = 0
+local entries = redis.call('HGETALL', KEYS[1])
+for i = 1, #entries, 2 do
+  if entries[i + 1] == ARGV[1] then
+    redis.call('HDEL', KEYS[1], entries[i])
+    if ARGV[2] == '1' then
+      redis.call('HDEL', KEYS[3], entries[i])
+      redis.call('HDEL', KEYS[4], entries[i])
+    else
+      redis.call('ZADD', KEYS[2], redis.call('HGET', KEYS[3], entries[i]), entries[i])
+    end
+    n = n + 1
+  end
+end
+return n
+"""
+
+# KEYS: inflight, pending, scores, workers ؛ ARGV: cutoff
+_REDIS_REAP = """
+local live = {}
+local workers = redis.call('HGETALL', KEYS[4])
+for i = 1, #workers, 2 do
+  if tonumber(workers[i + 1]) >= tonumber(ARGV[1]) then
+    live[workers[i]] = true
+  else
+    redis.call('HDEL', KEYS[4], workers[i])
+  end
+end
+local n = 0
+local entries = redis.call('HGETALL', KEYS[1])
+for i = 1, #entries, 2 do
+  if not live[entries[i + 1]] then
+    redis.call('HDEL', KEYS[1], entries[i])
+    redis.call('ZADD', KEYS[2], redis.call('HGET', KEYS[3], entries[i]), entries[i])
+    n = n + 1
+  end
+end
+return n
+"""
+
+
+class RedisFrontier:
+    """
+    frontier روی Redis (یا هر سرور سازگار مثل Valkey/KeyDB) برای چند ماشین.
+    صف یک sorted set با امتیاز -priority است و شناسه‌ها صفرپر شده‌اند تا در هر اولویت FIFO بماند.
+    """
+
+    def __init__(self, url, name, prefix="frontier"):
+        try:
+            import redis
+        except ImportError:  # وابستگی اختیاری: pip install redis
+            raise ImportError(
+                "A redis:// FRONTIER_URL requires the redis package (pip install redis)"
+            ) from None
+        self.name = name
+        self.client = redis.Redis.from_url(url)
+        key = f"{prefix}:{name}"
+        self.keys = {
+            part: f"{key}:{part}"
+            for part in ("seq", "pending", "inflight", "data", "scores", "seen", "workers")
+        }
+        self._pop = self.client.register_script(_REDIS_POP)
+        self._release = self.client.register_script(_REDIS_RELEASE)
+        self._reap = self.client.register_script(_REDIS_REAP)
+
+    def _now(self):
+        # ساعت سرور، نه ماشین worker، تا اختلاف ساعت ماشین‌ها heartbeatها را خراب نکند
+        seconds, micros = self.client.time()
+        return seconds + micros / 1e6
+
+    def push(self, data, priority=0):
+        k = self.keys
+        request_id = f"{self.client.incr(k['seq']):012d}"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(k["data"], request_id, data)
+        pipe.hset(k["scores"], request_id, -priority)
+        pipe.zadd(k["pending"], {request_id: -priority})
+        pipe.execute()
+        return request_id
+
+    def pop(self, worker):
+        k = self.keys
+        result = self._pop(keys=[k["pending"], k["inflight"], k["data"]], args=[worker])
+        if not result:
+            return None
+        return result[0].decode(), result[1]
+
+    def ack(self, ids):
+        if ids:
+            k = self.keys
+            pipe = self.client.pipeline(transaction=True)
+            for name in ("inflight", "data", "scores"):
+                pipe.hdel(k[name], *ids)
+            pipe.execute()
+
+    def release(self, worker, drop=False):
+        k = self.keys
+        count = self._release(
+            keys=[k["inflight"], k["pending"], k["scores"], k["data"]],
+            args=[worker, "1" if drop else "0"],
+        )
+        self.client.hdel(k["workers"], worker)
+        return count
+
+    def seen(self, fingerprint):
+        return self.client.sadd(self.keys["seen"], fingerprint) == 0
+
+    def heartbeat(self, worker):
+        self.client.hset(self.keys["workers"], worker, self._now())
+
+    def reap(self, timeout):
+        k = self.keys
+        return self._reap(
+            keys=[k["inflight"], k["pending"], k["scores"], k["workers"]],
+            args=[self._now() - timeout],
+        )
+
+    def pending(self):
+        return self.client.zcard(self.keys["pending"])
+
+    def in_flight(self, exclude=None):
+        exclude = (exclude or "").encode()
+        return sum(1 for w in self.client.hvals(self.keys["inflight"]) if w != exclude)
+
+    def clear(self):
+        self.client.delete(*self.keys.values())
+
+    def close(self):
+        self.client.close()
+
+
+# -------------------------------------------------------------
+# اجزای Scrapy
+# -------------------------------------------------------------
+def _frontier_name(crawler):
+    return crawler.settings.get("FRONTIER_NAME") or crawler.spidercls.name
+
+
+class FrontierScheduler:
+    """
+    scheduler مبتنی بر frontier مشترک (تنظیم SCHEDULER). درخواست گرفته‌شده پس از پردازش کامل
+    (پایان callback و itemهایش، یا پایان بدون پاسخ) ack می‌شود؛ ackها در next_request بعدی، heartbeat
+    و بستن اسپایدر یک‌جا فرستاده می‌شوند.
+    """
+
+    def __init__(self, crawler, dupefilter):
+        self.crawler = crawler
+        self.settings = crawler.settings
+        self.stats = crawler.stats
+        self.df = dupefilter
+        self.worker = worker_id()
+        self.seed = self.settings.getbool("FRONTIER_SEED", True)
+        self.heartbeat_interval = self.settings.getfloat("FRONTIER_HEARTBEAT", 5.0)
+        self.worker_timeout = self.settings.getfloat("FRONTIER_WORKER_TIMEOUT", 60.0)
+        self.frontier = None
+        self.spider = None
+        # Request در حال اجرا -> شناسه در frontier؛ ضعیف تا درخواست کنارگذاشته‌شده در حافظه نماند
+        self.leased = weakref.WeakKeyDictionary()
+        # شناسه -> زمان؛ درخواست بیرون از دانلودر (پیش یا پس از آن) که پاسخی برایش نرسیده
+        self.unanswered = {}
+        self.items = {}  # شناسه -> itemهای ساخته‌شده منهای itemهایی که pipeline تمام کرده
+        self.processed = set()  # شناسه‌هایی که خروجی callback آن‌ها کامل مصرف شده
+        self.finished = []  # شناسه‌هایی که باید ack شوند
+        self.loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        dupefilter_cls = load_object(crawler.settings["DUPEFILTER_CLASS"])
+        scheduler = cls(crawler, build_from_crawler(dupefilter_cls, crawler))
+        for handler, signal in (
+            (scheduler.request_reached_downloader, signals.request_reached_downloader),
+            (scheduler.request_left_downloader, signals.request_left_downloader),
+            (scheduler.response_received, signals.response_received),
+            (scheduler.request_processed, request_processed),
+            (scheduler.item_done, signals.item_scraped),
+            (scheduler.item_done, signals.item_dropped),
+            (scheduler.item_done, signals.item_error),
+        ):
+            crawler.signals.connect(handler, signal=signal)
+        return scheduler
+
+    def open(self, spider):
+        self.spider = spider
+        self.frontier = open_frontier(
+            self.settings.get("FRONTIER_URL"), _frontier_name(self.crawler)
+        )
+        if self.settings.getbool("FRONTIER_FLUSH"):
+            self.frontier.clear()
+        self.frontier.heartbeat(self.worker)
+        requeued = self.frontier.reap(self.worker_timeout)
+        logger.info(
+            "Frontier %s opened as worker %s: %d pending, %d requeued from dead workers",
+            self.frontier.name, self.worker, self.frontier.pending(), requeued,
+        )
+        self.stats.inc_value("frontier/requeued", requeued)
+        middlewares = self.settings.getwithbase("SPIDER_MIDDLEWARES")
+        if not any(
+            order is not None and load_object(path) is FrontierAckMiddleware
+            for path, order in middlewares.items()
+        ):
+            logger.warning(
+                "FrontierAckMiddleware is not in SPIDER_MIDDLEWARES; answered requests are never"
+                " acked and return to the frontier when the spider closes"
+            )
+        self.loop = task.LoopingCall(self._heartbeat)
+        self.loop.start(self.heartbeat_interval, now=False)
+        return self.df.open()
+
+    def close(self, reason):
+        if self.loop and self.loop.running:
+            self.loop.stop()
+        # engine پیش از بستن scheduler کار درخواست‌های در جریان را تمام کرده است؛ بی‌پاسخ‌ها
+        # تمام شده‌اند و هر چه ack نشده (پردازش ناتمام) با هر دلیلی به صف برمی‌گردد
+        self._ack_unanswered()
+        self._ack_done()
+        count = self.frontier.release(self.worker)
+        if count:
+            logger.info("Requeued %d unfinished requests (%s)", count, reason)
+            self.stats.inc_value("frontier/requeued", count)
+        self.frontier.close()
+        return self.df.close(reason)
+
+    def _heartbeat(self):
+        self.frontier.heartbeat(self.worker)
+        self._ack_unanswered(time.monotonic() - self.worker_timeout)
+        self._ack_done()
+        requeued = self.frontier.reap(self.worker_timeout)
+        if requeued:
+            logger.info("Requeued %d in-flight requests from dead workers", requeued)
+            self.stats.inc_value("frontier/requeued", requeued)
+
+    def _ack_done(self):
+        if not self.finished:
+            return
+        done, self.finished = self.finished, []
+        self.frontier.ack(done)
+        self.stats.inc_value("frontier/acked", len(done))
+
+    def _ack_unanswered(self, before=None):
+        # بدون پاسخ: شکست نهایی، IgnoreRequest، یا redirect/retry که جایگزینش در صف است
+        for request_id, since in list(self.unanswered.items()):
+            if before is None or since < before:
+                del self.unanswered[request_id]
+                self.items.pop(request_id, None)
+                self.finished.append(request_id)
+
+    def _lease(self, request):
+        return self.leased.get(request) if request is not None else None
+
+    def request_reached_downloader(self, request, spider):
+        # صف اسلات دانلودر ممکن است طول بکشد؛ تا خروج از آن بی‌پاسخ حساب نمی‌شود
+        self.unanswered.pop(self._lease(request), None)
+
+    def request_left_downloader(self, request, spider):
+        request_id = self._lease(request)
+        if request_id is not None:
+            self.unanswered[request_id] = time.monotonic()
+
+    def response_received(self, response, request, spider):
+        # از این به بعد پایان callback (request_processed) ack را تعیین می‌کند
+        self.unanswered.pop(self._lease(request), None)
+
+    def request_processed(self, request, items):
+        request_id = self._lease(request)
+        if request_id is None:
+            return
+        self.unanswered.pop(request_id, None)
+        self.processed.add(request_id)
+        self.items[request_id] = self.items.get(request_id, 0) + items
+        self._finish(request, request_id)
+
+    def item_done(self, item, response, spider, **kwargs):
+        request_id = self._lease(getattr(response, "request", None))
+        if request_id is not None:
+            self.items[request_id] = self.items.get(request_id, 0) - 1
+            self._finish(response.request, request_id)
+
+    def _finish(self, request, request_id):
+        if request_id in self.processed and self.items[request_id] <= 0:
+            del self.leased[request]
+            del self.items[request_id]
+            self.processed.discard(request_id)
+            self.finished.append(request_id)
+
+    def has_pending_requests(self):
+        # درخواست در حال اجرای workerهای دیگر ممکن است درخواست جدید بسازد؛ تا تمام نشده‌اند بیکار نیستیم
+        return bool(self.frontier.pending() or self.frontier.in_flight(exclude=self.worker))
+
+    def enqueue_request(self, request):
+        if not self.seed and request.meta.get("is_start_request"):
+            return False
+        if not request.dont_filter and self.df.request_seen(request):
+            self.df.log(request, self.spider)
+            return False
+        try:
+            data = dumps_request(request, self.spider)
+        except ValueError as exc:
+            logger.error("Dropping %s: %s", request, exc, extra={"spider": self.spider})
+            self.stats.inc_value("frontier/unserializable")
+            return False
+        self.frontier.push(data, request.priority)
+        self.stats.inc_value("scheduler/enqueued/frontier")
+        self.stats.inc_value("scheduler/enqueued")
+        return True
+
+    def next_request(self):
+        self._ack_done()
+        while True:
+            row = self.frontier.pop(self.worker)
+            if row is None:
+                return None
+            request_id, data = row
+            try:
+                request = request_from_dict(loads_request(data), spider=self.spider)
+                break
+            except pickle.UnpicklingError as exc:
+                logger.error("Dropping frontier entry %s: %s", request_id, exc)
+                self.frontier.ack([request_id])
+                self.stats.inc_value("frontier/rejected")
+        self.leased[request] = request_id
+        self.unanswered[request_id] = time.monotonic()
+        self.stats.inc_value("scheduler/dequeued/frontier")
+        self.stats.inc_value("scheduler/dequeued")
+        return request
+
+    def __len__(self):
+        return self.frontier.pending() if self.frontier is not None else 0
+
+
+class FrontierAckMiddleware:
+    """
+    spider middleware بیرونی (SPIDER_MIDDLEWARES با کمترین ترتیب): وقتی خروجی callback کامل
+    مصرف شد سیگنال request_processed را با شمار itemهای آن می‌فرستد. بدون FrontierScheduler غیرفعال.
+    """
+
+    def __init__(self, crawler):
+        self.signals = crawler.signals
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not issubclass(load_object(crawler.settings["SCHEDULER"]), FrontierScheduler):
+            raise NotConfigured
+        return cls(crawler)
+
+    def process_spider_output(self, response, result, spider=None):
+        items = 0
+        try:
+            for output in result:
+                if output is not None and not isinstance(output, Request):
+                    items += 1
+                yield output
+        except Exception:
+            # callback با خطا تمام شد؛ دوباره اجرا کردنش همان خطا را می‌دهد
+            self._processed(response, items)
+            raise
+        # GeneratorExit (بسته شدن نیمه‌کاره) ack نمی‌کند
+        self._processed(response, items)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        items = 0
+        try:
+            async for output in result:
+                if output is not None and not isinstance(output, Request):
+                    items += 1
+                yield output
+        except Exception:
+            self._processed(response, items)
+            raise
+        self._processed(response, items)
+
+    def _processed(self, response, items):
+        self.signals.send_catch_log(request_processed, request=response.request, items=items)
+
+
+class FrontierDupeFilter(BaseDupeFilter):
+    """dupefilter با مجموعه اثرانگشت مشترک در همان frontier (تنظیم DUPEFILTER_CLASS)."""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.fingerprinter = crawler.request_fingerprinter
+        self.debug = crawler.settings.getbool("DUPEFILTER_DEBUG")
+        self.logdupes = True
+        self.frontier = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def open(self):
+        self.frontier = open_frontier(
+            self.crawler.settings.get("FRONTIER_URL"), _frontier_name(self.crawler)
+        )
+
+    def close(self, reason):
+        if self.frontier is not None:
+            self.frontier.close()
+
+    def request_seen(self, request):
+        return self.frontier.seen(self.fingerprinter.fingerprint(request))
+
+    def log(self, request, spider):
+        if self.debug:
+            logger.debug("Filtered duplicate request: %(request)s", {"request": request},
+                         extra={"spider": spider})
+        elif self.logdupes:
+            logger.debug(
+                "Filtered duplicate request: %(request)s - no more duplicates will be shown"
+                " (see DUPEFILTER_DEBUG to show all duplicates)",
+                {"request": request},
+                extra={"spider": spider},
+            )
+            self.logdupes = False
+        self.crawler.stats.inc_value("dupefilter/filtered")
@@ -0,0 +1,158 @@
+# کش HTTP آگاه از تاریخ برای آرشیو خبرگزاری‌ها
+#
+#   scrapy crawl tabnak_daily_crawler -s HTTPCACHE_ENABLED=1
+#
+# - ArchiveDatePolicy: صفحه آرشیو روزهای گذشته (قدیمی‌تر از HTTPCACHE_IMMUTABLE_AFTER_DAYS روز)
+#   و صفحه خبرها برای همیشه تازه‌اند؛ آرشیو امروز (و روزهای اخیر) فقط HTTPCACHE_TODAY_TTL ثانیه.
+# - CompressedShardedCacheStorage: هر پاسخ یک فایل gzip در <HTTPCACHE_DIR>/<spider>/ab/cd/<fingerprint>.gz
+#   (به جای ۶ فایل جدا برای هر درخواست در FilesystemCacheStorage)
+
+import gzip
+import logging
+import os
+import pickle
+from time import time
+from urllib.parse import parse_qs, urlsplit
+
+import jdatetime
+from scrapy.extensions.httpcache import DummyPolicy
+from scrapy.http.headers import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+
+from utils.news_ids import news_id_from_url
+
+logger = logging.getLogger(__name__)
+
+
+def archive_date_of(request):
+    """
+    تاریخ شمسی صفحه آرشیو (jdatetime.date) یا None اگر درخواست صفحه آرشیو نباشد.
+    اول meta["archive_date"] (همه اسپایدرها آن را می‌گذارند)، بعد پارامترهای URL.
+    """
+    url = urlsplit(request.url)
+    if "archive" not in url.path:
+        return None
+    raw = request.meta.get("archive_date")
+    query = parse_qs(url.query)
+    if not raw:
+        value = query.get("to_date") or query.get("from_date")
+        if value:
+            raw = value[0]
+        elif {"yr", "mn", "dy"} <= query.keys():  # IRNA
+            raw = f"{query['yr'][0]}/{query['mn'][0]}/{query['dy'][0]}"
+    try:
+        year, month, day = (int(part) for part in str(raw).split("/"))
+        return jdatetime.date(year, month, day)
+    except (TypeError, ValueError):
+        # آرشیو بدون تاریخ (مثلاً صفحه اول آرشیو) مثل آرشیو امروز رفتار می‌کند
+        return jdatetime.date.today()
+
+
+class ArchiveDatePolicy(DummyPolicy):
+    """سیاست کش بر اساس نوع صفحه و تاریخ آرشیو (HTTPCACHE_POLICY)."""
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.today_ttl = settings.getint("HTTPCACHE_TODAY_TTL", 600)
+        self.immutable_after_days = settings.getint("HTTPCACHE_IMMUTABLE_AFTER_DAYS", 2)
+        self.other_ttl = settings.getint("HTTPCACHE_OTHER_TTL", 3600)
+
+    def ttl(self, request):
+        """عمر مجاز پاسخ کش‌شده به ثانیه؛ None یعنی همیشه تازه."""
+        archive_date = archive_date_of(request)
+        if archive_date is not None:
+            # چند روز اخیر هنوز ممکن است خبر دیرهنگام بگیرند (و اختلاف منطقه زمانی با سرور)
+            age_days = (jdatetime.date.today() - archive_date).days
+            return None if age_days >= self.immutable_after_days else self.today_ttl
+        if news_id_from_url(request.url) is not None:
+            return None
+        return self.other_ttl
+
+    def should_cache_request(self, request):
+        return request.method == "GET" and super().should_cache_request(request)
+
+    def should_cache_response(self, response, request):
+        return response.status == 200 and super().should_cache_response(response, request)
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        ttl = self.ttl(request)
+        if ttl is None:
+            return True
+        return time() - request.meta.get("cache_timestamp", 0) < ttl
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        return response.status == 304
+
+
+class CompressedShardedCacheStorage:
+    """
+    ذخیره هر پاسخ در یک فایل gzip (pickle) با دو سطح پوشه بر اساس اثرانگشت درخواست
+    تا هیچ پوشه‌ای بیش از چند هزار فایل نداشته باشد. نوشتن اتمیک است (فایل موقت + rename).
+    """
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings["HTTPCACHE_DIR"])
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.compress_level = settings.getint("HTTPCACHE_COMPRESS_LEVEL", 6)
+        self._fingerprinter = None
+
+    def open_spider(self, spider):
+        logger.debug(
+            "Using compressed sharded cache storage in %(cachedir)s",
+            {"cachedir": self.cachedir},
+            extra={"spider": spider},
+        )
+        self._fingerprinter = spider.crawler.request_fingerprinter
+
+    def close_spider(self, spider):
+        pass
+
+    def _path(self, spider, request):
+        key = self._fingerprinter.fingerprint(request).hex()
+        return os.path.join(self.cachedir, spider.name, key[0:2], key[2:4], f"{key}.gz")
+
+    def retrieve_response(self, spider, request):
+        path = self._path(spider, request)
+        try:
+            with open(path, "rb") as f:
+                record = pickle.loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError):
+            logger.warning("Discarding corrupt cache entry %s", path)
+            return None
+        if 0 < self.expiration_secs < time() - record["timestamp"]:
+            return None
+        headers = Headers(record["headers"])
+        respcls = responsetypes.from_args(
+            headers=headers, url=record["response_url"], body=record["body"]
+        )
+        request.meta["cache_timestamp"] = record["timestamp"]
+        return respcls(
+            url=record["response_url"],
+            status=record["status"],
+            headers=headers,
+            body=record["body"],
+            flags=record.get("flags"),
+            protocol=record.get("protocol"),
+        )
+
+    def store_response(self, spider, request, response):
+        path = self._path(spider, request)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {
+            "url": request.url,
+            "timestamp": time(),
+            "response_url": response.url,
+            "status": response.status,
+            "headers": dict(response.headers),
+            "body": response.body,
+            "flags": [flag for flag in response.flags if flag != "cached"],
+            "protocol": response.protocol,
+        }
+        data = gzip.compress(pickle.dumps(record, protocol=4), self.compress_level)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
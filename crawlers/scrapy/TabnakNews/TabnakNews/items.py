@@ -2,11 +2,8 @@
 #
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
+#
+# همه اسپایدرها NewsRecord مشترک (utils/news_record.py) را yield می‌کنند؛ همان رکوردی که
+# crawlerهای قدیمی و خروجی‌های CSV/Parquet/Elasticsearch استفاده می‌کنند.
 
-import scrapy
-
-
-class TabnaknewsItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+from utils.news_record import NewsRecord  # noqa: F401
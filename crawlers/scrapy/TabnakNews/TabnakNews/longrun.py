@@ -0,0 +1,242 @@
+# حالت اجرای طولانی (کراول چندساله) با حافظه محدود
+#
+#   scrapy crawl tabnak_daily_crawler -a from_date=1392/01/01 -a to_date=1401/12/29 \
+#       -s LONG_RUN_ENABLED=1 -s JOBDIR=.crawl_state/jobs/tabnak-1392-1401
+#
+# - صف scheduler روی دیسک (JOBDIR) و به تفکیک دامنه (DownloaderAwarePriorityQueue)؛ بدون JOBDIR
+#   یک پوشه تازه زیر CRAWL_STATE_DIR/jobs ساخته می‌شود. ادامه اجرای قطع‌شده: همان JOBDIR.
+# - اثرانگشت درخواست‌ها به‌جای set در حافظه در SQLite همان JOBDIR (TabnakNews.frontier.FrontierDupeFilter).
+# - درخواست‌های شروع فقط وقتی خوانده می‌شوند که صف همان دامنه کمتر از
+#   LONG_RUN_MAX_PENDING_PER_DOMAIN درخواست داشته باشد.
+# - Response و Selector داخل meta/cb_kwargs درخواست‌های خروجی حذف می‌شوند تا پاسخ‌ها تا پایان
+#   دانلود درخواست بعدی در حافظه نمانند.
+# - هر LONG_RUN_MEMORY_INTERVAL ثانیه RSS، طول صف‌ها و تعداد Request/Response/Item زنده
+#   (scrapy.utils.trackref) در لاگ و در صورت تنظیم LONG_RUN_MEMORY_LOG در یک فایل JSONL ثبت می‌شود.
+#
+# آزمون سقف حافظه برای کراول ۱۰ ساله روی شبیه‌ساز محلی: python -m benchmarks.long_run
+
+import json
+import logging
+import os
+import resource
+import time
+
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+from scrapy.selector import Selector
+from scrapy.settings import SETTINGS_PRIORITIES, default_settings
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.trackref import live_refs
+from twisted.internet import task
+
+logger = logging.getLogger(__name__)
+
+PENDING_POLL_INTERVAL = 1.0  # ثانیه بین دو بررسی صف دامنه پر
+
+
+def override(settings, name, value):
+    """مقدار را با اولویت addon یا اولویت فعلی تنظیم (هر کدام بیشتر است) می‌نویسد."""
+    priority = max(settings.getpriority(name) or 0, SETTINGS_PRIORITIES["addon"])
+    settings.set(name, value, priority=priority)
+
+
+def is_default(settings, name):
+    # مقدار پیش‌فرض Scrapy، حتی اگر اسپایدر آن را در custom_settings تکرار کرده باشد
+    return settings.get(name) == getattr(default_settings, name)
+
+
+def rss_mb():
+    """RSS فعلی پروسه به MB (لینوکس)؛ در نبود /proc بیشینه RSS تا این لحظه."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    # ru_maxrss در لینوکس به KB و در macOS به بایت است
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def live_counts():
+    """تعداد نمونه‌های زنده هر کلاس ردیابی‌شده (Request، HtmlResponse، آیتم‌ها، Selector)."""
+    return {cls.__name__: len(refs) for cls, refs in list(live_refs.items()) if len(refs)}
+
+
+def pending_by_slot(engine):
+    """تعداد درخواست منتظر هر slot دانلود: صف scheduler (حافظه و دیسک) به‌علاوه صف slot دانلودر."""
+    counts = {}
+    slot = getattr(engine, "_slot", None)
+    scheduler = slot.scheduler if slot is not None else None
+    for queue in (getattr(scheduler, "mqs", None), getattr(scheduler, "dqs", None)):
+        for key, pq in getattr(queue, "pqueues", {}).items():
+            counts[key] = counts.get(key, 0) + len(pq)
+    for key, download_slot in engine.downloader.slots.items():
+        counts[key] = counts.get(key, 0) + len(download_slot.queue)
+    return counts
+
+
+class LongRunAddon:
+    """
+    add-on که با LONG_RUN_ENABLED تنظیمات صف دیسکی و dupefilter روی SQLite را پیش از ساخته شدن
+    scheduler اعمال می‌کند (در ADDONS فایل settings ثبت شده است).
+    """
+
+    def __init__(self, crawler):
+        self.spider_name = crawler.spidercls.name
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def update_settings(self, settings):
+        if not settings.getbool("LONG_RUN_ENABLED"):
+            raise NotConfigured
+        jobdir = settings.get("JOBDIR")
+        if not jobdir:
+            jobdir = os.path.join(
+                settings.get("CRAWL_STATE_DIR", ".crawl_state"), "jobs",
+                f"{self.spider_name}-{time.strftime('%Y%m%d-%H%M%S')}",
+            )
+            override(settings, "JOBDIR", jobdir)
+            logger.info(f"LONG_RUN: scheduler queues in {jobdir} (pass -s JOBDIR={jobdir} to resume)")
+        # مقدارهای سفارشی (مثلاً FrontierScheduler یا صف اولویت دیگر) دست نمی‌خورند
+        if is_default(settings, "SCHEDULER_PRIORITY_QUEUE") and not settings.getint(
+            "CONCURRENT_REQUESTS_PER_IP"
+        ):
+            override(settings, "SCHEDULER_PRIORITY_QUEUE", "scrapy.pqueues.DownloaderAwarePriorityQueue")
+        if is_default(settings, "SCHEDULER") and is_default(settings, "DUPEFILTER_CLASS"):
+            override(settings, "DUPEFILTER_CLASS", "TabnakNews.frontier.FrontierDupeFilter")
+            seen_path = os.path.abspath(os.path.join(jobdir, "seen.sqlite3"))
+            override(settings, "FRONTIER_URL", f"sqlite:///{seen_path}")
+        warning_mb = settings.getint("LONG_RUN_RSS_WARNING_MB")
+        if warning_mb:
+            override(settings, "MEMUSAGE_ENABLED", True)
+            override(settings, "MEMUSAGE_WARNING_MB", warning_mb)
+
+
+class LongRunSpiderMiddleware:
+    """سقف صف هر دامنه برای درخواست‌های شروع و حذف Response/Selector از meta درخواست‌های خروجی."""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.max_pending = crawler.settings.getint("LONG_RUN_MAX_PENDING_PER_DOMAIN", 0)
+        self.warned = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("LONG_RUN_ENABLED"):
+            raise NotConfigured
+        return cls(crawler)
+
+    async def process_start(self, start):
+        from twisted.internet import reactor
+
+        async for obj in start:
+            if self.max_pending and isinstance(obj, Request):
+                engine = self.crawler.engine
+                slot = engine.downloader.get_slot_key(obj)
+                while pending_by_slot(engine).get(slot, 0) >= self.max_pending:
+                    self.stats.inc_value("longrun/start_waits")
+                    await maybe_deferred_to_future(task.deferLater(reactor, PENDING_POLL_INTERVAL))
+            yield obj
+
+    def release(self, obj):
+        if not isinstance(obj, Request):
+            return obj
+        for mapping in (obj.meta, obj.cb_kwargs):
+            for key in [k for k, v in mapping.items() if isinstance(v, (Response, Selector))]:
+                value = mapping.pop(key)
+                self.stats.inc_value("longrun/meta_responses_dropped")
+                if not self.warned:
+                    logger.warning(
+                        f"Dropped a {type(value).__name__} under {key!r} from the request to "
+                        f"{obj.url}; pass extracted values instead of responses"
+                    )
+                    self.warned = True
+        return obj
+
+    def process_spider_output(self, response, result, spider=None):
+        for obj in result:
+            yield self.release(obj)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        async for obj in result:
+            yield self.release(obj)
+
+
+class MemoryReportExtension:
+    """گزارش دوره‌ای RSS، طول صف‌ها و اشیای زنده trackref در لاگ، stats و LONG_RUN_MEMORY_LOG."""
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.interval = settings.getfloat("LONG_RUN_MEMORY_INTERVAL", 60.0)
+        self.log_path = settings.get("LONG_RUN_MEMORY_LOG")
+        self.log_file = None
+        self.started = time.monotonic()
+        self.loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("LONG_RUN_ENABLED"):
+            raise NotConfigured
+        ext = cls(crawler)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        if self.log_path:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.log_file = open(self.log_path, "a", encoding="utf-8")
+        self.loop = task.LoopingCall(self.report)
+        self.loop.start(self.interval, now=True)
+
+    def spider_closed(self, spider):
+        if self.loop and self.loop.running:
+            self.loop.stop()
+        self.report()
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def snapshot(self):
+        engine = self.crawler.engine
+        slot = getattr(engine, "_slot", None)
+        pending = pending_by_slot(engine) if engine is not None else {}
+        return {
+            "time": round(time.time(), 1),
+            "elapsed": round(time.monotonic() - self.started, 1),
+            "rss_mb": round(rss_mb(), 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "scheduler": len(slot.scheduler) if slot is not None and slot.scheduler else 0,
+            "downloader": len(engine.downloader.active) if engine is not None else 0,
+            "max_pending_per_domain": max(pending.values(), default=0),
+            "items": self.stats.get_value("item_scraped_count", 0),
+            "live": live_counts(),
+        }
+
+    def report(self):
+        snapshot = self.snapshot()
+        live = " ".join(f"{name}={count}" for name, count in sorted(snapshot["live"].items()))
+        logger.info(
+            f"Memory: rss {snapshot['rss_mb']:.1f} MB (peak {snapshot['peak_rss_mb']:.1f}), "
+            f"scheduler {snapshot['scheduler']}, downloader {snapshot['downloader']}, "
+            f"items {snapshot['items']}, live {live or '-'}"
+        )
+        self.stats.max_value("longrun/rss_max_mb", snapshot["rss_mb"])
+        self.stats.max_value("longrun/pending_per_domain_max", snapshot["max_pending_per_domain"])
+        for name, count in snapshot["live"].items():
+            self.stats.max_value(f"longrun/live_max/{name}", count)
+        if self.log_file is not None:
+            self.log_file.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+            self.log_file.flush()
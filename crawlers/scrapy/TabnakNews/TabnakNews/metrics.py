@@ -0,0 +1,204 @@
+# اتصال معیارهای مشترک کراول (utils.crawl_metrics) به سیگنال‌های Scrapy
+#
+# scrapy crawl tabnak_daily_crawler -s METRICS_PORT=9410 -s METRICS_JSON_PATH=metrics.json
+# curl http://127.0.0.1:9410/metrics
+
+import logging
+import re
+import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+from utils.crawl_metrics import CrawlMetrics, site_of
+
+logger = logging.getLogger(__name__)
+
+# کلیدهای stats که نشان‌دهنده حذف درخواست/پاسخ هستند -> دلیل حذف
+STATS_DROP_REASONS = {
+    "offsite/filtered": "offsite",
+    "dupefilter/filtered": "duplicate_request",
+    "retry/max_reached": "retry_exhausted",
+    "httperror/response_ignored_count": "http_error",
+    "downloader/exception_count": "download_error",
+}
+
+REASON_LABEL = re.compile(r"^[a-z][a-z0-9_]{0,39}$")
+
+_shared_metrics = None
+_shared_users = 0
+
+
+def acquire_metrics(settings):
+    """
+    یک نمونه CrawlMetrics برای کل پروسه (چند crawler در یک پروسه روی یک پورت).
+    """
+    global _shared_metrics, _shared_users
+    if _shared_metrics is None:
+        _shared_metrics = CrawlMetrics()
+        port = settings.getint("METRICS_PORT", 0)
+        if port:
+            try:
+                _shared_metrics.serve(port, settings.get("METRICS_HOST", "127.0.0.1"))
+                logger.info(f"Serving Prometheus metrics on port {port}")
+            except OSError as e:
+                logger.error(f"Could not start metrics endpoint on port {port}: {e}")
+        json_path = settings.get("METRICS_JSON_PATH")
+        if json_path:
+            _shared_metrics.start_snapshots(
+                json_path, settings.getfloat("METRICS_JSON_INTERVAL", 30.0)
+            )
+    _shared_users += 1
+    return _shared_metrics
+
+
+def release_metrics():
+    global _shared_metrics, _shared_users
+    _shared_users -= 1
+    if _shared_users <= 0 and _shared_metrics is not None:
+        _shared_metrics.close()
+        _shared_metrics = None
+
+
+def drop_reason(exception):
+    """
+    برچسب reason حذف آیتم: ویژگی reason استثنا (شناسه کوتاه) یا نام کلاس آن، هرگز متن پیام
+    (پیام DropItem شناسه خبر و فاصله را دارد و تعداد سری‌های Prometheus را بی‌کران می‌کند).
+    """
+    reason = getattr(exception, "reason", None)
+    if isinstance(reason, str) and REASON_LABEL.match(reason):
+        return reason
+    return type(exception).__name__
+
+
+class CrawlMetricsExtension:
+    """درخواست، پاسخ، بایت، آیتم، حذف‌ها و عمق صف‌ها را ثبت می‌کند."""
+
+    def __init__(self, crawler, metrics):
+        self.crawler = crawler
+        self.metrics = metrics
+        self.interval = crawler.settings.getfloat("METRICS_QUEUE_INTERVAL", 5.0)
+        self.last_stats = {}
+        self.loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("METRICS_ENABLED"):
+            raise NotConfigured
+        ext = cls(crawler, acquire_metrics(crawler.settings))
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(
+            ext.request_reached_downloader, signal=signals.request_reached_downloader
+        )
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.bytes_received, signal=signals.bytes_received)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.item_dropped, signal=signals.item_dropped)
+        return ext
+
+    def spider_opened(self, spider):
+        self.loop = task.LoopingCall(self.update_queues)
+        self.loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.loop and self.loop.running:
+            self.loop.stop()
+        self.update_queues()
+        release_metrics()
+
+    def request_reached_downloader(self, request, spider):
+        self.metrics.observe_request(site_of(request.url))
+
+    def response_received(self, response, request, spider):
+        self.metrics.observe_response(
+            site_of(response.url),
+            response.status,
+            latency=request.meta.get("download_latency"),
+        )
+
+    def bytes_received(self, data, request, spider):
+        self.metrics.observe_bytes(site_of(request.url), len(data))
+
+    def item_scraped(self, item, response, spider):
+        self.metrics.observe_item(site_of(response.url) if response else spider.name)
+
+    def item_dropped(self, item, response, exception, spider):
+        self.metrics.observe_drop(drop_reason(exception))
+
+    def update_queues(self):
+        engine = self.crawler.engine
+        if engine is None:
+            return
+        slot = getattr(engine, "_slot", None) or getattr(engine, "slot", None)
+        if slot is not None and slot.scheduler is not None:
+            self.metrics.set_queue_depth("scheduler", len(slot.scheduler))
+        if engine.downloader is not None:
+            self.metrics.set_queue_depth("downloader", len(engine.downloader.active))
+        scraper_slot = getattr(engine.scraper, "slot", None)
+        if scraper_slot is not None:
+            self.metrics.set_queue_depth("scraper", len(scraper_slot.active))
+
+        stats = self.crawler.stats
+        for key, reason in STATS_DROP_REASONS.items():
+            value = stats.get_value(key, 0)
+            delta = value - self.last_stats.get(key, 0)
+            if delta > 0:
+                self.metrics.observe_drop(reason, delta)
+            self.last_stats[key] = value
+
+
+class ParseTimingMiddleware:
+    """
+    زمان اجرای callbackها (فقط کد خود callback، نه پردازش خروجی در engine).
+    باید نزدیک‌ترین spider middleware به spider باشد (عدد بزرگ در SPIDER_MIDDLEWARES).
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("METRICS_ENABLED"):
+            raise NotConfigured
+        mw = cls(acquire_metrics(crawler.settings))
+        crawler.signals.connect(release_metrics, signal=signals.spider_closed)
+        return mw
+
+    @staticmethod
+    def callback_name(response):
+        callback = getattr(response.request, "callback", None)
+        return getattr(callback, "__name__", None) or "parse"
+
+    def process_spider_output(self, response, result, spider=None):
+        elapsed = 0.0
+        iterator = iter(result)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    obj = next(iterator)
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield obj
+        except StopIteration:
+            pass
+        finally:
+            self.metrics.observe_parse(self.callback_name(response), elapsed)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        elapsed = 0.0
+        iterator = result.__aiter__()
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    obj = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield obj
+        finally:
+            self.metrics.observe_parse(self.callback_name(response), elapsed)
@@ -3,11 +3,23 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
+import logging
+import weakref
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from scrapy import Request, signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured, StopDownload
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from TabnakNews.quota import CategoryQuota
+from utils.crawl_metrics import site_of
+from utils.http_session import DEFAULT_MAX_BYTES, is_html_type, is_media_url
+
+logger = logging.getLogger(__name__)
+
 
 class TabnaknewsSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -101,3 +113,143 @@ class TabnaknewsDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+# -------------------------------------------------------------
+# صرفه‌جویی پهنای باند (همتای utils.http_session برای crawlerهای قدیمی)
+# -------------------------------------------------------------
+class BandwidthSaverMiddleware:
+    """
+    - الزام فشرده‌سازی (HttpCompressionMiddleware)، افزودن br به Accept-Encoding هر درخواست
+      (حتی اگر هدر را spider یا DEFAULT_REQUEST_HEADERS گذاشته باشد) و شمارش پاسخ‌های فشرده‌نشده هر سایت
+    - قطع دانلود پاسخ غیر HTML یا بزرگ‌تر از BANDWIDTH_MAX_RESPONSE_BYTES به محض دیدن هدرها
+      (یا رسیدن حجم دریافتی به سقف) و نادیده گرفتن آن بدون لاگ خطا
+    - گزارش بایت روی سیم به ازای هر item برای هر سایت در پایان (stats: bandwidth/...)
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.max_bytes = settings.getint("BANDWIDTH_MAX_RESPONSE_BYTES", DEFAULT_MAX_BYTES)
+        self.html_only = settings.getbool("BANDWIDTH_HTML_ONLY", True)
+        # Request -> بایت دریافتی تا این لحظه؛ ضعیف تا درخواستی که process_response/exception آن
+        # به این middleware نرسیده (مثلاً retry) در حافظه نماند
+        self.received = weakref.WeakKeyDictionary()
+        self.bytes = defaultdict(int)
+        self.items = defaultdict(int)
+        if not settings.getbool("COMPRESSION_ENABLED"):
+            raise ValueError("BANDWIDTH_SAVER_ENABLED requires COMPRESSION_ENABLED")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("BANDWIDTH_SAVER_ENABLED"):
+            raise NotConfigured
+        mw = cls(crawler)
+        crawler.signals.connect(mw.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(mw.bytes_received, signal=signals.bytes_received)
+        crawler.signals.connect(mw.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    @staticmethod
+    def exempt(request):
+        return (
+            request.meta.get("allow_non_html")
+            or urlsplit(request.url).path == "/robots.txt"
+        )
+
+    def stop(self, request, reason):
+        request.meta["bandwidth_skipped"] = reason
+        raise StopDownload(fail=False)
+
+    def process_request(self, request, spider=None):
+        # بعد از HttpCompressionMiddleware اجرا می‌شود که Accept-Encoding را فقط با setdefault می‌گذارد
+        encodings = request.headers.get(b"Accept-Encoding")
+        if encodings is None:
+            request.headers[b"Accept-Encoding"] = b"gzip, deflate, br"
+        elif b"br" not in [value.strip().lower() for value in encodings.split(b",")]:
+            request.headers[b"Accept-Encoding"] = encodings + b", br"
+
+    def headers_received(self, headers, body_length, request, spider):
+        if self.exempt(request):
+            return
+        if self.html_only and not is_html_type(headers.get(b"Content-Type")):
+            self.stop(request, "non_html")
+        # طول نامشخص (chunked) در Twisted یک ثابت رشته‌ای است، نه -1
+        if isinstance(body_length, int) and body_length > self.max_bytes:
+            self.stop(request, "too_large")
+
+    def bytes_received(self, data, request, spider):
+        # data فشرده (همان‌طور که روی سیم آمده) است
+        self.bytes[site_of(request.url)] += len(data)
+        if self.exempt(request):
+            return
+        received = self.received.get(request, 0) + len(data)
+        self.received[request] = received
+        if received > self.max_bytes:
+            self.stop(request, "too_large")
+
+    def process_response(self, request, response, spider=None):
+        self.received.pop(request, None)
+        reason = request.meta.get("bandwidth_skipped")
+        if reason and "download_stopped" in response.flags:
+            self.stats.inc_value(f"bandwidth/skipped/{reason}")
+            # IgnoreRequest از process_response به process_exception سهمیه نمی‌رسد
+            CategoryQuota.release_dropped(self.crawler, request)
+            raise IgnoreRequest(f"Skipped {reason} response: {response.url}")
+        if (
+            "cached" not in response.flags
+            and not response.headers.get(b"Content-Encoding")
+            and len(response.body) > 1024
+        ):
+            self.stats.inc_value(f"bandwidth/uncompressed/{site_of(response.url)}")
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        self.received.pop(request, None)
+
+    def item_scraped(self, item, response, spider):
+        if response is not None:
+            self.items[site_of(response.url)] += 1
+
+    def spider_closed(self, spider):
+        for site, nbytes in sorted(self.bytes.items()):
+            items = self.items.get(site, 0)
+            self.stats.set_value(f"bandwidth/bytes/{site}", nbytes)
+            self.stats.set_value(f"bandwidth/items/{site}", items)
+            if items:
+                self.stats.set_value(f"bandwidth/bytes_per_item/{site}", nbytes // items)
+            logger.info(
+                "Bandwidth %s: %.1f MB, %d items, %.1f KB/item",
+                site, nbytes / 1024**2, items, nbytes / 1024 / items if items else 0,
+            )
+
+
+class MediaRequestFilterMiddleware:
+    """درخواست‌های رسانه (تصویر، ویدیو، PDF، ...) از خروجی callbackها حذف می‌شوند و صف نمی‌شوند."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("BANDWIDTH_SAVER_ENABLED"):
+            raise NotConfigured
+        return cls(crawler.stats)
+
+    def keep(self, obj):
+        if isinstance(obj, Request) and is_media_url(obj.url):
+            self.stats.inc_value("bandwidth/media_dropped")
+            return False
+        return True
+
+    def process_spider_output(self, response, result, spider=None):
+        for obj in result:
+            if self.keep(obj):
+                yield obj
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        async for obj in result:
+            if self.keep(obj):
+                yield obj
@@ -0,0 +1,66 @@
+# هدایت همه درخواست‌ها به شبیه‌ساز محلی سایت‌ها (benchmarks/mock_site.py) برای آزمون بار
+#
+# scrapy crawl tabnak_daily_crawler -s MOCK_SITE_URL=http://127.0.0.1:8800 \
+#   -s 'DOWNLOAD_HANDLERS={"http": "TabnakNews.mock_handler.MockSiteDownloadHandler",
+#                          "https": "TabnakNews.mock_handler.MockSiteDownloadHandler"}'
+#
+# (python -m benchmarks.load_test همین تنظیمات را خودش می‌دهد.)
+# شبیه‌ساز مثل یک proxy HTTP صدا زده می‌شود، پس آدرس درخواست و پاسخ همان آدرس واقعی سایت
+# می‌ماند: slotهای دانلود، offsite، robots.txt، آمار هر سایت و لینک خبرها دست نمی‌خورند.
+# Scrapy درخواست https را از proxy با CONNECT و TLS رد می‌کند و شبیه‌ساز فقط HTTP ساده دارد؛
+# برای همین همه درخواست‌ها (http و https) با agent پراکسی forwarding و آدرس کامل فرستاده می‌شوند.
+# این کلاس به API داخلی http11 وابسته است و فقط برای آزمون بار است.
+
+from scrapy.core.downloader.handlers.http11 import (
+    HTTP11DownloadHandler,
+    _ScrapyAgent,
+    _ScrapyProxyAgent,
+)
+from scrapy.utils._download_handlers import wrap_twisted_exceptions
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.python import to_bytes
+
+
+class _MockSiteAgent(_ScrapyAgent):
+    def __init__(self, *, proxy, **kwargs):
+        super().__init__(**kwargs)
+        self._proxy = to_bytes(proxy, encoding="ascii")
+
+    def _get_agent(self, request, timeout):
+        from twisted.internet import reactor
+
+        return _ScrapyProxyAgent(
+            reactor=reactor,
+            proxyURI=self._proxy,
+            contextFactory=self._contextFactory,
+            connectTimeout=timeout,
+            bindAddress=self._bindAddress,
+            pool=self._pool,
+        )
+
+
+class MockSiteDownloadHandler(HTTP11DownloadHandler):
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        self.proxy = crawler.settings.get("MOCK_SITE_URL")
+        if not self.proxy:
+            raise ValueError("MockSiteDownloadHandler requires the MOCK_SITE_URL setting")
+        # همه سایت‌ها یک مقصد (شبیه‌ساز) دارند؛ سقف اتصال‌های نگه‌داشته‌شده کل کراول است نه هر دامنه
+        self._pool.maxPersistentPerHost = max(
+            self._pool.maxPersistentPerHost, crawler.settings.getint("CONCURRENT_REQUESTS")
+        )
+
+    async def download_request(self, request):
+        agent = _MockSiteAgent(
+            proxy=self.proxy,
+            contextFactory=self._contextFactory,
+            bindAddress=self._bind_address,
+            pool=self._pool,
+            maxsize=self._default_maxsize,
+            warnsize=self._default_warnsize,
+            fail_on_dataloss=self._fail_on_dataloss,
+            crawler=self._crawler,
+            tls_verbose_logging=self._tls_verbose_logging,
+        )
+        with wrap_twisted_exceptions():
+            return await maybe_deferred_to_future(agent.download_request(request))
@@ -0,0 +1,309 @@
+# اجرای هم‌زمان چند اسپایدر در یک پروسه (یک reactor) با بودجه مشترک
+#
+#   cd crawlers/scrapy/TabnakNews
+#   python -m TabnakNews.orchestrator tabnak_daily_crawler entekhab_archive_crawler_parametric \
+#       --concurrency 48 --bandwidth 2M --max-bytes 5G -a tabnak_daily_crawler:from_date=1402/01/01 \
+#       --weight tabnak_daily_crawler=2 --summary-json crawl_summary.json
+#
+# - بودجه کل هم‌روندی (CONCURRENT_REQUESTS) و پهنای باند (بایت بر ثانیه) به نسبت وزن
+#   بین اسپایدرهای در حال اجرا تقسیم می‌شود و با تمام شدن هر اسپایدر سهمش به بقیه می‌رسد.
+# - با تمام شدن بودجه کل دانلود (--max-bytes) همه اسپایدرها با دلیل closespider_budget بسته می‌شوند.
+# - کش DNS در Scrapy سراسری (در سطح پروسه) است، پس همه اسپایدرها از یک کش استفاده می‌کنند؛
+#   اتصال‌های HTTP هم از یک HTTPConnectionPool مشترک (SharedPoolDownloadHandler) می‌آیند.
+# - در پایان خلاصه ترکیبی همه اسپایدرها چاپ (و در صورت نیاز در JSON ذخیره) می‌شود.
+
+import argparse
+import json
+import logging
+import sys
+
+from scrapy import signals
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.crawler import CrawlerProcess
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.project import get_project_settings
+from twisted.internet import task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPIDERS = (
+    "tabnak_daily_crawler",
+    "entekhab_archive_crawler_parametric",
+    "irna_archive_crawler_parametric",
+)
+BUDGET_TICK = 0.25  # ثانیه
+
+_shared_pool = None
+_pool_users = 0
+
+
+def parse_size(value):
+    """`2M`، `512K` یا عدد خام -> بایت."""
+    value = str(value).strip().upper()
+    multiplier = {"K": 1024, "M": 1024**2, "G": 1024**3}.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+
+class SharedPoolDownloadHandler(HTTP11DownloadHandler):
+    """HTTP11DownloadHandler با یک HTTPConnectionPool مشترک بین همه crawlerهای پروسه."""
+
+    def __init__(self, crawler):
+        global _shared_pool, _pool_users
+        super().__init__(crawler)
+        if _shared_pool is None:
+            _shared_pool = self._pool
+        else:
+            _shared_pool.maxPersistentPerHost = max(
+                _shared_pool.maxPersistentPerHost, self._pool.maxPersistentPerHost
+            )
+            self._pool = _shared_pool
+        _pool_users += 1
+
+    async def close(self):
+        global _shared_pool, _pool_users
+        _pool_users -= 1
+        if _pool_users <= 0:
+            await super().close()
+            _shared_pool = None
+
+
+class CrawlBudget:
+    """تقسیم بودجه هم‌روندی و پهنای باند بین crawlerهای فعال به نسبت وزن."""
+
+    def __init__(self, concurrency=0, bandwidth=0, max_bytes=0):
+        self.concurrency = concurrency
+        self.bandwidth = bandwidth
+        self.max_bytes = max_bytes
+        self.spent = 0  # بایت دریافتی همه crawlerها
+        self.weights = {}  # crawler -> وزن
+        self.active = []
+
+    def register(self, crawler, weight=1.0):
+        self.weights[crawler] = max(float(weight), 0.01)
+
+    def activate(self, crawler):
+        if crawler not in self.active:
+            self.active.append(crawler)
+        self.rebalance()
+
+    def release(self, crawler):
+        if crawler in self.active:
+            self.active.remove(crawler)
+        self.rebalance()
+
+    def share(self, crawler, total):
+        if not total or crawler not in self.active:
+            return 0
+        weights = sum(self.weights.get(c, 1.0) for c in self.active)
+        return total * self.weights.get(crawler, 1.0) / weights
+
+    def spend(self, nbytes):
+        """True فقط بار اولی که بایت‌های دریافتی از max_bytes بگذرد."""
+        before = self.spent
+        self.spent += nbytes
+        return bool(self.max_bytes) and before < self.max_bytes <= self.spent
+
+    def close_all(self, reason):
+        for crawler in list(self.active):
+            if crawler.engine is not None:
+                deferred_from_coro(crawler.engine.close_spider_async(reason=reason))
+
+    def rebalance(self):
+        if not self.concurrency:
+            return
+        for crawler in self.active:
+            concurrency = max(1, int(self.share(crawler, self.concurrency)))
+            engine = crawler.engine
+            if engine is not None and engine.downloader is not None:
+                engine.downloader.total_concurrency = concurrency
+            crawler.stats.set_value("budget/concurrency", concurrency)
+
+
+class BudgetExtension:
+    """
+    سهم پهنای باند هر crawler را با سطل توکن اعمال می‌کند: وقتی بایت‌های دریافتی از سهم
+    جلو بزند، engine همان crawler موقتاً pause می‌شود (درخواست‌های در حال اجرا ادامه می‌یابند).
+    با گذشتن بایت‌های دریافتی همه crawlerها از بودجه کل (max_bytes) همه بسته می‌شوند.
+    فقط وقتی فعال است که اسپایدرها از طریق orchestrator اجرا شوند (crawler.budget).
+    """
+
+    def __init__(self, crawler, budget):
+        self.crawler = crawler
+        self.budget = budget
+        self.tokens = 0.0
+        self.paused = False
+        self.loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        budget = getattr(crawler, "budget", None)
+        if budget is None:
+            raise NotConfigured
+        ext = cls(crawler, budget)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        if budget.bandwidth or budget.max_bytes:
+            crawler.signals.connect(ext.bytes_received, signal=signals.bytes_received)
+        return ext
+
+    def spider_opened(self, spider):
+        self.budget.activate(self.crawler)
+        if self.budget.bandwidth:
+            self.loop = task.LoopingCall(self.refill)
+            self.loop.start(BUDGET_TICK, now=False)
+
+    def spider_closed(self, spider):
+        if self.loop and self.loop.running:
+            self.loop.stop()
+        self.budget.release(self.crawler)
+
+    def bytes_received(self, data, request, spider):
+        self.tokens -= len(data)
+        if self.budget.spend(len(data)):
+            logger.info("Download budget of %d bytes exhausted; closing all spiders", self.budget.max_bytes)
+            self.budget.close_all("closespider_budget")
+
+    def refill(self):
+        rate = self.budget.share(self.crawler, self.budget.bandwidth)
+        # حداکثر یک ثانیه انباشت برای جلوگیری از انفجار ترافیک بعد از بیکاری
+        self.tokens = min(self.tokens + rate * BUDGET_TICK, rate)
+        engine = self.crawler.engine
+        if engine is None:
+            return
+        if self.tokens < 0 and not self.paused:
+            engine.pause()
+            self.paused = True
+            self.crawler.stats.inc_value("budget/bandwidth_pauses")
+        elif self.tokens >= 0 and self.paused:
+            engine.unpause()
+            self.paused = False
+            # بدون این، engine تا heartbeat بعدی (چند ثانیه) درخواست جدیدی برنمی‌دارد
+            slot = getattr(engine, "_slot", None)
+            if slot is not None:
+                slot.nextcall.schedule()
+
+
+# -------------------------------------------------------------
+# خلاصه ترکیبی
+# -------------------------------------------------------------
+SUMMARY_STATS = (
+    ("requests", "downloader/request_count"),
+    ("responses", "downloader/response_count"),
+    ("items", "item_scraped_count"),
+    ("dropped", "item_dropped_count"),
+    ("errors", "log_count/ERROR"),
+    ("bytes", "downloader/response_bytes"),
+    ("elapsed_s", "elapsed_time_seconds"),
+)
+
+
+def crawl_summary(crawlers):
+    rows = []
+    for crawler in crawlers:
+        stats = crawler.stats.get_stats()
+        row = {"spider": crawler.spidercls.name, "finish_reason": stats.get("finish_reason")}
+        for name, key in SUMMARY_STATS:
+            row[name] = stats.get(key, 0) or 0
+        rows.append(row)
+    totals = {"spider": "TOTAL", "finish_reason": ""}
+    for name, _ in SUMMARY_STATS:
+        totals[name] = sum(row[name] for row in rows)
+    # اسپایدرها هم‌زمان اجرا شده‌اند؛ زمان کل = طولانی‌ترین اجرا
+    totals["elapsed_s"] = max((row["elapsed_s"] for row in rows), default=0)
+    return rows, totals
+
+
+def print_summary(rows, totals, out=sys.stdout):
+    out.write(
+        f"\n{'spider':<40}{'reason':>10}{'requests':>10}{'items':>9}{'dropped':>9}"
+        f"{'errors':>8}{'MB':>9}{'elapsed':>9}{'items/min':>11}\n"
+    )
+    for row in rows + [totals]:
+        minutes = row["elapsed_s"] / 60 if row["elapsed_s"] else 0
+        rate = row["items"] / minutes if minutes else 0
+        out.write(
+            f"{row['spider']:<40}{str(row['finish_reason'] or ''):>10}{row['requests']:>10}"
+            f"{row['items']:>9}{row['dropped']:>9}{row['errors']:>8}"
+            f"{row['bytes'] / 1024**2:>9.1f}{row['elapsed_s']:>9.0f}{rate:>11.1f}\n"
+        )
+
+
+def _key_value(value):
+    key, _, val = value.partition("=")
+    return key, val
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run several spiders in one process with a shared budget."
+    )
+    parser.add_argument("spiders", nargs="*", default=list(DEFAULT_SPIDERS))
+    parser.add_argument("--concurrency", type=int, default=48,
+                        help="global CONCURRENT_REQUESTS budget (0 = no limit)")
+    parser.add_argument("--bandwidth", default="0",
+                        help="global download budget in bytes/sec, e.g. 2M (0 = no limit)")
+    parser.add_argument("--max-bytes", default="0",
+                        help="total download budget, e.g. 5G; all spiders close when it is spent (0 = no limit)")
+    parser.add_argument("--weight", action="append", default=[], metavar="SPIDER=W",
+                        help="relative share of a spider (default 1)")
+    parser.add_argument("-a", dest="spider_args", action="append", default=[],
+                        metavar="SPIDER:NAME=VALUE", help="spider argument")
+    parser.add_argument("-s", dest="settings", action="append", default=[],
+                        metavar="NAME=VALUE", help="setting for all spiders")
+    parser.add_argument("--summary-json", help="write the combined summary to this file")
+    args = parser.parse_args(argv)
+
+    settings = get_project_settings()
+    for name, value in map(_key_value, args.settings):
+        settings.set(name, value, priority="cmdline")
+    settings.set("DNSCACHE_ENABLED", True, priority="cmdline")
+    process = CrawlerProcess(settings)
+
+    budget = CrawlBudget(args.concurrency, parse_size(args.bandwidth), parse_size(args.max_bytes))
+    weights = {name: float(value) for name, value in map(_key_value, args.weight)}
+    spider_args = {}
+    for entry in args.spider_args:
+        spider, _, pair = entry.partition(":")
+        name, value = _key_value(pair)
+        spider_args.setdefault(spider, {})[name] = value
+
+    crawlers = []
+    for spider_name in args.spiders:
+        crawler = process.create_crawler(spider_name)
+        crawler_settings = crawler.settings
+        extensions = dict(crawler_settings.getdict("EXTENSIONS"))
+        extensions["TabnakNews.orchestrator.BudgetExtension"] = 100
+        crawler_settings.set("EXTENSIONS", extensions, priority="cmdline")
+        handlers = crawler_settings.getdict("DOWNLOAD_HANDLERS")
+        # اسپایدرهایی با handler اختصاصی (مثلاً Playwright در IRNA) دست‌نخورده می‌مانند
+        if "http" not in handlers and "https" not in handlers:
+            crawler_settings.set(
+                "DOWNLOAD_HANDLERS",
+                {
+                    "http": "TabnakNews.orchestrator.SharedPoolDownloadHandler",
+                    "https": "TabnakNews.orchestrator.SharedPoolDownloadHandler",
+                },
+                priority="cmdline",
+            )
+        # از طریق خود crawler؛ با `python -m` این ماژول دو بار (__main__ و TabnakNews.orchestrator)
+        # import می‌شود و متغیر سراسری ماژول بین آن دو مشترک نیست
+        crawler.budget = budget
+        budget.register(crawler, weights.get(spider_name, 1.0))
+        process.crawl(crawler, **spider_args.get(spider_name, {}))
+        crawlers.append(crawler)
+
+    process.start()
+
+    rows, totals = crawl_summary(crawlers)
+    print_summary(rows, totals)
+    if args.summary_json:
+        with open(args.summary_json, "w", encoding="utf-8") as f:
+            json.dump({"spiders": rows, "total": totals}, f, ensure_ascii=False,
+                      indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,144 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import os
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+
+from utils.crawl_metrics import site_of
+from utils.near_dup import SimHashIndex, fingerprint
+from utils.partitioned_output import PartitionedCsvWriter
 
 
 class TabnaknewsPipeline:
     def process_item(self, item, spider):
         return item
+
+
+class PartitionedOutputPipeline:
+    """
+    نوشتن آیتم‌ها در CSVهای پارتیشن‌بندی‌شده (site/سال/ماه شمسی/part-NNNN) با
+    نهایی‌سازی اتمیک و manifest؛ جایگزین فایل CSV واحدی که بی‌انتها بزرگ می‌شود.
+    با PARTITIONED_OUTPUT_ENABLED فعال می‌شود. آیتم‌هایی که فیلد `site` دارند
+    (اسپایدر چندسایتی) در پوشه سایت خودشان نوشته می‌شوند.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.settings = crawler.settings
+        self.writers = {}  # site -> PartitionedCsvWriter
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("PARTITIONED_OUTPUT_ENABLED"):
+            raise NotConfigured
+        pipeline = cls(crawler)
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    @staticmethod
+    def site_name(spider):
+        site = getattr(spider, "output_site", None)
+        if site:
+            return site
+        domains = getattr(spider, "allowed_domains", None)
+        return site_of(f"http://{domains[0]}").split(".")[0] if domains else spider.name
+
+    def _open_writer(self, site, item):
+        settings = self.settings
+        fields = settings.getlist("PARTITIONED_OUTPUT_FIELDS") or list(
+            ItemAdapter(item).field_names()
+        )
+        if (
+            settings.getbool("NEAR_DUP_ENABLED")
+            and settings.get("NEAR_DUP_ACTION") == "tag"
+            and "duplicate_of" not in fields
+        ):
+            fields = [*fields, "duplicate_of"]
+        return PartitionedCsvWriter(
+            settings.get("PARTITIONED_OUTPUT_DIR", "output"),
+            site,
+            fields,
+            date_field=settings.get("PARTITIONED_OUTPUT_DATE_FIELD", "date_georgian_iso"),
+            max_bytes=settings.getint("PARTITIONED_OUTPUT_MAX_BYTES", 128 * 1024 * 1024),
+            by_month=settings.getbool("PARTITIONED_OUTPUT_BY_MONTH", True),
+            max_open=settings.getint("PARTITIONED_OUTPUT_MAX_OPEN", 16),
+        )
+
+    def process_item(self, item, spider=None):
+        adapter = ItemAdapter(item)
+        site = adapter.get("site") or self.site_name(spider or self.crawler.spider)
+        writer = self.writers.get(site)
+        if writer is None:
+            # فیلدها از اولین آیتم (یا تنظیمات) تعیین می‌شوند
+            writer = self.writers[site] = self._open_writer(site, item)
+        writer.write(adapter)
+        return item
+
+    def spider_closed(self, spider):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+
+class NearDuplicatePipeline:
+    """
+    تشخیص خبرهای تقریباً تکراری با SimHash و ایندکس LSH (utils.near_dup) پیش از نوشتن خروجی.
+    NEAR_DUP_ACTION = "tag": فیلد duplicate_of با کلید نسخه اصلی («tabnak:1041860») پر می‌شود؛
+    "drop": آیتم تکراری حذف می‌شود. با NEAR_DUP_INDEX_PATH ایندکس بین اجراها نگه داشته می‌شود.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.action = settings.get("NEAR_DUP_ACTION", "tag")
+        if self.action not in ("tag", "drop"):
+            raise ValueError(f"Unknown NEAR_DUP_ACTION: {self.action!r}")
+        self.field = settings.get("NEAR_DUP_FIELD", "body")
+        self.min_tokens = settings.getint("NEAR_DUP_MIN_TOKENS", 20)
+        self.index_path = settings.get("NEAR_DUP_INDEX_PATH")
+        capacity = settings.getint("NEAR_DUP_CAPACITY", 2_000_000)
+        if self.index_path and os.path.exists(self.index_path):
+            self.index = SimHashIndex.load(self.index_path, capacity)
+        else:
+            self.index = SimHashIndex(settings.getint("NEAR_DUP_MAX_DISTANCE", 3), capacity)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("NEAR_DUP_ENABLED"):
+            raise NotConfigured
+        pipeline = cls(crawler)
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def process_item(self, item, spider=None):
+        adapter = ItemAdapter(item)
+        value = fingerprint(adapter.get(self.field), self.min_tokens)
+        if value is None:
+            self.stats.inc_value("near_dup/skipped_short")
+            return item
+        site = adapter.get("site") or PartitionedOutputPipeline.site_name(
+            spider or self.crawler.spider
+        )
+        match = self.index.check(value, self.index.record_key(site, adapter))
+        if match is None:
+            return item
+        original, distance = self.index.label(match[0]), match[1]
+        self.stats.inc_value(f"near_dup/duplicates/{site}")
+        if self.action == "drop":
+            drop = DropItem(f"Near-duplicate of {original} (distance {distance})")
+            drop.reason = "near_duplicate"  # برچسب crawl_dropped_total (metrics.drop_reason)
+            raise drop
+        if isinstance(item, dict) or "duplicate_of" in adapter.field_names():
+            adapter["duplicate_of"] = original
+        return item
+
+    def spider_closed(self, spider):
+        self.stats.set_value("near_dup/checked", self.index.checked)
+        self.stats.set_value("near_dup/index_size", len(self.index))
+        if self.index_path:
+            self.index.save(self.index_path)
@@ -0,0 +1,304 @@
+# پروفایل نمونه‌برداری‌شده callbackها، pipelineها و زمان هر selector
+#
+# scrapy crawl entekhab_archive_crawler_parametric -a profile=1
+# scrapy crawl tabnak_daily_crawler -s PROFILE_ENABLED=1 -s PROFILE_SAMPLE_RATE=0.2
+#
+# pipelineها از طریق ITEM_PROCESSOR = "TabnakNews.profiling.ProfiledItemPipelineManager"
+# پروفایل می‌شوند (در settings.py فعال است؛ بدون نشست فعال فقط یک فراخوانی اضافه).
+#
+# در پایان کراول در PROFILE_DIR نوشته می‌شود:
+#   <spider>_<callback>.prof   خروجی pstats (قابل باز کردن با snakeviz یا pstats)
+#   <spider>_profile.txt       گزارش ادغام‌شده: توابع پرهزینه و جدول زمان هر XPath/CSS/regex
+
+import cProfile
+import functools
+import inspect
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+
+from parsel import Selector
+from scrapy import signals
+from scrapy.pipelines import ItemPipelineManager
+
+logger = logging.getLogger(__name__)
+
+# نشست فعال پروفایل در این پروسه (None یعنی غیرفعال و بدون هزینه)
+_active = None
+_local = threading.local()
+
+
+def _truthy(value):
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+class SelectorTimings:
+    def __init__(self):
+        self.entries = {}  # label -> [تعداد، مجموع، بیشینه]
+
+    def add(self, label, seconds):
+        entry = self.entries.get(label)
+        if entry is None:
+            self.entries[label] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def report(self, limit=40):
+        lines = [f"{'count':>8}{'total(ms)':>12}{'mean(us)':>11}{'max(ms)':>10}  expression"]
+        ranked = sorted(self.entries.items(), key=lambda kv: kv[1][1], reverse=True)
+        for label, (count, total, peak) in ranked[:limit]:
+            lines.append(
+                f"{count:>8}{1000 * total:>12.2f}{1e6 * total / count:>11.1f}"
+                f"{1000 * peak:>10.2f}  {label}"
+            )
+        return "\n".join(lines)
+
+
+def _timed_selector_method(name, original):
+    def method(self, query, *args, **kwargs):
+        session = _active
+        # css داخلاً xpath را صدا می‌زند؛ فقط بیرونی‌ترین فراخوانی شمرده می‌شود
+        if session is None or getattr(_local, "depth", 0):
+            return original(self, query, *args, **kwargs)
+        _local.depth = 1
+        started = time.perf_counter()
+        try:
+            return original(self, query, *args, **kwargs)
+        finally:
+            _local.depth = 0
+            label = query if isinstance(query, str) else getattr(query, "pattern", query)
+            session.selectors.add(f"{name}: {label}", time.perf_counter() - started)
+
+    method.__wrapped__ = original
+    return method
+
+
+class ProfileSession:
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.profiles = {}  # callback/pipeline -> cProfile.Profile
+        self.samples = {}
+        self.selectors = SelectorTimings()
+        self._originals = {}
+
+    def sampled(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def profile_for(self, label):
+        profile = self.profiles.get(label)
+        if profile is None:
+            profile = self.profiles[label] = cProfile.Profile()
+        self.samples[label] = self.samples.get(label, 0) + 1
+        return profile
+
+    def install_selector_timing(self):
+        for name in ("xpath", "css", "re"):
+            original = getattr(Selector, name)
+            self._originals[name] = original
+            setattr(Selector, name, _timed_selector_method(name, original))
+
+    def uninstall_selector_timing(self):
+        for name, original in self._originals.items():
+            setattr(Selector, name, original)
+        self._originals.clear()
+
+    def dump(self, directory, spider_name, top=25):
+        os.makedirs(directory, exist_ok=True)
+        report = io.StringIO()
+        report.write(f"Profile report for {spider_name}\n")
+        merged = None
+        for label, profile in sorted(self.profiles.items()):
+            profile.dump_stats(os.path.join(directory, f"{spider_name}_{label}.prof"))
+            stats = pstats.Stats(profile, stream=report)
+            report.write(f"\n==== {label} ({self.samples.get(label, 0)} samples) ====\n")
+            stats.sort_stats("cumulative").print_stats(top)
+            if merged is None:
+                merged = pstats.Stats(profile, stream=report)
+            else:
+                merged.add(profile)
+        if merged is not None:
+            report.write("\n==== all callbacks and pipelines (merged, by own time) ====\n")
+            merged.sort_stats("tottime").print_stats(top)
+        report.write("\n==== selector / expression timings ====\n")
+        report.write(self.selectors.report() + "\n")
+        path = os.path.join(directory, f"{spider_name}_profile.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+        return path
+
+
+def _profiled_pipeline(method):
+    label = "pipeline_" + type(method.__self__).__name__
+
+    # wraps: امضای اصلی (مثلاً آرگومان spider) برای ItemPipelineManager دیده می‌شود
+    @functools.wraps(method)
+    def process_item(item, *args, **kwargs):
+        session = _active
+        if session is None or not session.sampled():
+            return method(item, *args, **kwargs)
+        profile = session.profile_for(label)
+        try:
+            profile.enable()
+        except ValueError:
+            # پروفایلر دیگری فعال است
+            return method(item, *args, **kwargs)
+        try:
+            return method(item, *args, **kwargs)
+        finally:
+            profile.disable()
+
+    return process_item
+
+
+class ProfiledItemPipelineManager(ItemPipelineManager):
+    """
+    ITEM_PROCESSOR که process_item هر نمونه pipeline را پیش از ثبت در manager می‌پوشاند؛
+    pipelineهای async (coroutine) پوشانده نمی‌شوند چون بدنه آن‌ها بعد از await اجرا می‌شود.
+    """
+
+    def __init__(self, *middlewares, crawler=None):
+        for pipeline in middlewares:
+            method = getattr(pipeline, "process_item", None)
+            if method is not None and not inspect.iscoroutinefunction(method):
+                pipeline.process_item = _profiled_pipeline(method)
+        super().__init__(*middlewares, crawler=crawler)
+
+
+class _Suspend:
+    """مقداری که coroutine درونی به event loop می‌دهد را بالا می‌برد و پاسخ را برمی‌گرداند."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __await__(self):
+        return (yield self.value)
+
+
+async def _profiled_await(awaitable, profile):
+    """
+    await با پروفایل فقط گام‌های همگام: coroutine دستی پیش برده می‌شود و پروفایلر هنگام هر
+    suspend (وقتی event loop کد دیگری اجرا می‌کند) خاموش است.
+    """
+    steps = awaitable.__await__()
+    value = error = None
+    while True:
+        try:
+            profile.enable()
+            enabled = True
+        except ValueError:
+            enabled = False
+        try:
+            if error is not None:
+                suspended = steps.throw(error)
+            else:
+                suspended = steps.send(value)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            if enabled:
+                profile.disable()
+        try:
+            value, error = await _Suspend(suspended), None
+        except BaseException as exc:  # لغو یا خطای future به خود coroutine برمی‌گردد
+            value, error = None, exc
+
+
+class CallbackProfilerMiddleware:
+    """
+    Spider middleware که با PROFILE_ENABLED یا آرگومان `-a profile=1` فعال می‌شود.
+    callbackها (و با ProfiledItemPipelineManager، process_item هر pipeline) با نرخ
+    PROFILE_SAMPLE_RATE زیر cProfile اجرا می‌شوند و همه XPath/CSS/regexهای parsel زمان‌گیری می‌شوند.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.session = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mw = cls(crawler)
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def spider_opened(self, spider):
+        global _active
+        settings = self.crawler.settings
+        enabled = settings.getbool("PROFILE_ENABLED") or _truthy(
+            getattr(spider, "profile", "")
+        )
+        if not enabled:
+            return
+        if _active is not None:
+            logger.warning("Another spider is already being profiled in this process")
+            return
+        self.session = _active = ProfileSession(
+            settings.getfloat("PROFILE_SAMPLE_RATE", 0.1)
+        )
+        self.session.install_selector_timing()
+        logger.info(
+            f"Profiling callbacks and pipelines (sample rate {self.session.sample_rate})"
+        )
+
+    def spider_closed(self, spider):
+        global _active
+        if self.session is None:
+            return
+        self.session.uninstall_selector_timing()
+        path = self.session.dump(
+            self.crawler.settings.get("PROFILE_DIR", "profiles"), spider.name
+        )
+        logger.info(f"Profile report written to {path}")
+        if _active is self.session:
+            _active = None
+        self.session = None
+
+    @staticmethod
+    def callback_name(response):
+        callback = getattr(response.request, "callback", None)
+        return getattr(callback, "__name__", None) or "parse"
+
+    def process_spider_output(self, response, result, spider=None):
+        session = self.session
+        if session is None or not session.sampled():
+            yield from result
+            return
+        profile = session.profile_for(self.callback_name(response))
+        iterator = iter(result)
+        while True:
+            try:
+                profile.enable()
+            except ValueError:
+                yield from iterator
+                return
+            try:
+                obj = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                profile.disable()
+            yield obj
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        session = self.session
+        if session is None or not session.sampled():
+            async for obj in result:
+                yield obj
+            return
+        profile = session.profile_for(self.callback_name(response))
+        iterator = result.__aiter__()
+        while True:
+            # بین await ها ممکن است کد دیگری اجرا شود؛ فقط گام‌های همگام callback پروفایل می‌شوند
+            try:
+                obj = await _profiled_await(iterator.__anext__(), profile)
+            except StopAsyncIteration:
+                return
+            yield obj
@@ -0,0 +1,247 @@
+# حالت سهمیه دسته‌ها برای ساخت دیتاست متوازن
+#
+#   scrapy crawl tabnak_daily_crawler -a from_date=1395/01/01 -a to_date=1402/12/29 \
+#       -s CATEGORY_QUOTA=200 -s CATEGORY_QUOTA_BUCKET=month
+#
+# - هدف: CATEGORY_QUOTA خبر برای هر دسته در هر بازه زمانی (روز/ماه/سال شمسی یا all)؛
+#   سهمیه جدا برای یک دسته با CATEGORY_QUOTAS = {"ورزشی": 100}.
+# - درخواست‌های شروع (آرشیو هر روز × دسته) به‌جای ترتیب تاریخی، به ترتیب پخش‌شده در هر بازه
+#   صادر می‌شوند (روزهای یک ماه با فاصله تقریباً یکسان، دسته‌ها چرخشی) تا سهمیه هر بازه
+#   از کل آن بازه پر شود نه فقط از روزهای اولش.
+# - وقتی سهمیه (دسته، بازه) پر شد، درخواست آرشیو و خبر آن دیگر دانلود نمی‌شود.
+#   خبرهای در حال دانلود تا پایان callback از سهمیه رزرو می‌کنند تا بیش از سهمیه دانلود نشود.
+#   IgnoreRequest از process_response یک downloader middleware به process_exception نمی‌رسد؛
+#   آن middleware باید خودش CategoryQuota.release_dropped را صدا بزند (مثل BandwidthSaverMiddleware).
+# - کلید هر درخواست از meta (site، category_name، archive_date) خوانده می‌شود و به درخواست‌های
+#   فرزند (صفحه بعد و خبرها) منتقل می‌شود.
+
+import logging
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from scrapy import Request, signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+
+logger = logging.getLogger(__name__)
+
+QUOTA_META_KEYS = ("site", "category_name", "archive_date")
+# ضریب نسبت طلایی: دنباله کم‌اختلاف برای پخش یکنواخت روزهای یک بازه
+GOLDEN_RATIO = 0.6180339887498949
+
+
+def bucket_of(archive_date, bucket):
+    """کلید بازه زمانی تاریخ شمسی «1402/01/05» برای day/month/year/all."""
+    if bucket == "all":
+        return "*"
+    parts = str(archive_date).split("/")
+    length = {"day": 3, "month": 2, "year": 1}[bucket]
+    return "/".join(parts[:length])
+
+
+def spread_order(count):
+    """رتبه هر اندیس 0..count-1 در ترتیبی که اولین‌ها کل بازه را پوشش می‌دهند."""
+    order = sorted(range(count), key=lambda i: (i * GOLDEN_RATIO) % 1.0)
+    ranks = [0] * count
+    for rank, index in enumerate(order):
+        ranks[index] = rank
+    return ranks
+
+
+def is_archive_request(request):
+    return "archive" in urlsplit(request.url).path
+
+
+class CategoryQuota:
+    """شمارش خبرهای ذخیره‌شده و رزروشده به ازای (سایت، دسته، بازه)."""
+
+    def __init__(self, settings):
+        self.default = settings.getint("CATEGORY_QUOTA")
+        self.overrides = settings.getdict("CATEGORY_QUOTAS")
+        self.bucket = settings.get("CATEGORY_QUOTA_BUCKET", "month")
+        if self.bucket not in ("day", "month", "year", "all"):
+            raise ValueError(f"Unknown CATEGORY_QUOTA_BUCKET: {self.bucket!r}")
+        self.scraped = defaultdict(int)
+        self.reserved = defaultdict(int)
+        self.full = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # یک نمونه مشترک بین middleware اسپایدر و دانلودر همان crawler
+        quota = getattr(crawler, "category_quota", None)
+        if quota is None:
+            quota = crawler.category_quota = cls(crawler.settings)
+        return quota
+
+    def key(self, meta):
+        category, archive_date = meta.get("category_name"), meta.get("archive_date")
+        if not category or not archive_date:
+            return None
+        return meta.get("site") or "", category, bucket_of(archive_date, self.bucket)
+
+    def limit(self, key):
+        return int(self.overrides.get(key[1], self.default))
+
+    def is_full(self, key, reserve=False):
+        used = self.scraped[key] + (self.reserved[key] if reserve else 0)
+        return used >= self.limit(key)
+
+    def reserve(self, request):
+        if "quota_reserved" not in request.meta:
+            request.meta["quota_reserved"] = True
+            self.reserved[self.key(request.meta)] += 1
+
+    def release(self, request):
+        if request.meta.pop("quota_reserved", False):
+            self.reserved[self.key(request.meta)] -= 1
+
+    @staticmethod
+    def release_dropped(crawler, request):
+        """آزادسازی رزرو درخواستی که در process_response یک downloader middleware کنار گذاشته شد."""
+        quota = getattr(crawler, "category_quota", None)
+        if quota is not None:
+            quota.release(request)
+
+    def observe_item(self, key, amount=1):
+        self.scraped[key] += amount
+        if key not in self.full and self.is_full(key):
+            self.full.add(key)
+            logger.info("Category quota met for %s (%d items)", "/".join(key), self.scraped[key])
+
+
+class CategoryQuotaMiddleware:
+    """middleware اسپایدر: ترتیب پخش‌شده درخواست‌های شروع، انتقال کلید سهمیه و حذف درخواست‌های اضافی."""
+
+    def __init__(self, crawler, quota):
+        self.stats = crawler.stats
+        self.quota = quota
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getint("CATEGORY_QUOTA"):
+            raise NotConfigured
+        mw = cls(crawler, CategoryQuota.from_crawler(crawler))
+        crawler.signals.connect(mw.item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    async def process_start(self, start):
+        # درخواست‌های شروع به‌تدریج خوانده می‌شوند و فقط درخواست‌های بازه جاری (مثلاً یک ماه)
+        # نگه داشته می‌شوند؛ با رسیدن درخواستی از بازه دیگر، بازه جاری به ترتیب پخش‌شده صادر می‌شود.
+        # (برای CATEGORY_QUOTA_BUCKET=all کل درخواست‌ها یک بازه‌اند)
+        period, pending = None, []
+        async for obj in start:
+            key = self.quota.key(obj.meta) if isinstance(obj, Request) else None
+            if key is None:
+                yield obj
+                continue
+            if key[2] != period:
+                for request in self.spread(pending):
+                    yield request
+                period, pending = key[2], []
+            pending.append(obj)
+        for request in self.spread(pending):
+            yield request
+
+    def spread(self, requests):
+        """درخواست‌های شروع یک بازه به ترتیب پخش‌شده روزها؛ سهمیه هنگام صدور هر درخواست بررسی می‌شود."""
+        days = defaultdict(set)
+        for request in requests:
+            days[self.quota.key(request.meta)].add(request.meta["archive_date"])
+        ranks = {}
+        for key, dates in days.items():
+            dates = sorted(dates)
+            for date, rank in zip(dates, spread_order(len(dates)), strict=True):
+                ranks[key, date] = rank
+        order = sorted(
+            range(len(requests)),
+            key=lambda i: (ranks[self.quota.key(requests[i].meta), requests[i].meta["archive_date"]], i),
+        )
+        for i in order:
+            request = requests[i]
+            key = self.quota.key(request.meta)
+            if self.quota.is_full(key):
+                self.stats.inc_value("quota/dropped")
+                continue
+            # صفحه‌های بعد و خبرهای هر روز (اولویت +1) قبل از روز بعدی پردازش می‌شوند
+            request.priority = -ranks[key, request.meta["archive_date"]]
+            yield request
+
+    def filter(self, response, obj):
+        if not isinstance(obj, Request):
+            # item همان لحظه شمرده می‌شود (نه بعد از pipelineها) تا درخواست‌های بعدی فوراً کنترل شوند
+            key = self.quota.key(response.meta)
+            if key is not None:
+                self.quota.release(response.request)  # رزرو این خبر به شمارش تبدیل می‌شود
+                self.quota.observe_item(key)
+            return True
+        for name in QUOTA_META_KEYS:
+            if name in response.meta and name not in obj.meta:
+                obj.meta[name] = response.meta[name]
+        if obj.priority == 0:
+            obj.priority = response.request.priority + 1
+        key = self.quota.key(obj.meta)
+        if key is not None and self.quota.is_full(key):
+            self.stats.inc_value("quota/dropped")
+            return False
+        return True
+
+    def process_spider_output(self, response, result, spider=None):
+        try:
+            for obj in result:
+                if self.filter(response, obj):
+                    yield obj
+        finally:
+            self.quota.release(response.request)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        try:
+            async for obj in result:
+                if self.filter(response, obj):
+                    yield obj
+        finally:
+            self.quota.release(response.request)
+
+    def process_spider_exception(self, response, exception, spider=None):
+        self.quota.release(response.request)
+
+    def item_dropped(self, item, response, exception, spider):
+        key = self.quota.key(response.meta) if response is not None else None
+        if key is not None:
+            self.quota.observe_item(key, -1)
+
+    def spider_closed(self, spider):
+        for key, count in sorted(self.quota.scraped.items()):
+            self.stats.set_value(f"quota/items/{'/'.join(key)}", count)
+        self.stats.set_value("quota/full_buckets", len(self.quota.full))
+
+
+class CategoryQuotaDownloaderMiddleware:
+    """
+    آخرین کنترل پیش از دانلود: درخواست‌های صف‌شده سهمیه پر حذف می‌شوند و خبرهای در حال
+    دانلود سهمیه را رزرو می‌کنند (آزادسازی در پایان callback، در CategoryQuotaMiddleware).
+    """
+
+    def __init__(self, crawler, quota):
+        self.stats = crawler.stats
+        self.quota = quota
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getint("CATEGORY_QUOTA"):
+            raise NotConfigured
+        return cls(crawler, CategoryQuota.from_crawler(crawler))
+
+    def process_request(self, request, spider=None):
+        key = self.quota.key(request.meta)
+        if key is None:
+            return None
+        article = not is_archive_request(request)
+        if self.quota.is_full(key, reserve=article):
+            self.stats.inc_value("quota/skipped")
+            raise IgnoreRequest(f"Category quota met for {'/'.join(key)}")
+        if article:
+            self.quota.reserve(request)
+        return None
+
+    def process_exception(self, request, exception, spider=None):
+        self.quota.release(request)
@@ -62,24 +62,109 @@ ROBOTSTXT_OBEY = True
 # SPIDER_MIDDLEWARES = {
 #    "TabnakNews.middlewares.TabnaknewsSpiderMiddleware": 543,
 # }
+SPIDER_MIDDLEWARES = {
+    # نزدیک‌ترین به spider تا فقط زمان خود callback اندازه‌گیری شود
+    "TabnakNews.metrics.ParseTimingMiddleware": 990,
+    "TabnakNews.tracing.RequestTracingMiddleware": 980,
+    "TabnakNews.profiling.CallbackProfilerMiddleware": 995,
+    "TabnakNews.middlewares.MediaRequestFilterMiddleware": 100,
+    "TabnakNews.quota.CategoryQuotaMiddleware": 110,
+    "TabnakNews.longrun.LongRunSpiderMiddleware": 120,
+    # بیرونی‌ترین: ack درخواست frontier پس از مصرف کامل خروجی callback (بدون FrontierScheduler غیرفعال)
+    "TabnakNews.frontier.FrontierAckMiddleware": 10,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 # DOWNLOADER_MIDDLEWARES = {
 #    "TabnakNews.middlewares.TabnaknewsDownloaderMiddleware": 543,
 # }
+DOWNLOADER_MIDDLEWARES = {
+    # نزدیک به دانلودر تا پاسخ‌های 429/5xx قبل از RetryMiddleware دیده شوند
+    "TabnakNews.concurrency.AdaptiveConcurrencyMiddleware": 950,
+    # قبل از HttpCompressionMiddleware (590) تا بدنه و هدرهای فشرده روی سیم دیده شوند
+    "TabnakNews.middlewares.BandwidthSaverMiddleware": 960,
+    "TabnakNews.quota.CategoryQuotaDownloaderMiddleware": 50,
+}
+
+# صرفه‌جویی پهنای باند: قطع پاسخ‌های غیر HTML/بزرگ، حذف لینک‌های رسانه، بایت به ازای هر item
+# scrapy crawl tabnak_daily_crawler -s BANDWIDTH_SAVER_ENABLED=1
+BANDWIDTH_SAVER_ENABLED = False
+BANDWIDTH_MAX_RESPONSE_BYTES = 2 * 1024 * 1024
+BANDWIDTH_HTML_ONLY = True  # meta["allow_non_html"] برای استثنا
+
+# کنترل تطبیقی هم‌روندی هر دامنه (با AutoThrottle همزمان فعال نکنید):
+# scrapy crawl tabnak_daily_crawler -s ADAPTIVE_CONCURRENCY_ENABLED=1 -s AUTOTHROTTLE_ENABLED=0
+ADAPTIVE_CONCURRENCY_ENABLED = False
+ADAPTIVE_CONCURRENCY_INTERVAL = 5.0  # ثانیه بین هر تصمیم
+ADAPTIVE_CONCURRENCY_MIN = 1
+ADAPTIVE_CONCURRENCY_MAX = 32
+ADAPTIVE_CONCURRENCY_TARGET_P95 = 2.0  # ثانیه
+ADAPTIVE_CONCURRENCY_TARGET_RPS = 0  # 0 یعنی بدون سقف توان عملیاتی
+ADAPTIVE_CONCURRENCY_ERROR_BUDGET = 0.05  # سهم مجاز timeout/429/5xx
+# ADAPTIVE_CONCURRENCY_DECISION_LOG = "concurrency_decisions.jsonl"
+
+# حالت سهمیه دسته‌ها (TabnakNews.quota): CATEGORY_QUOTA خبر برای هر دسته در هر بازه؛ 0 = غیرفعال
+CATEGORY_QUOTA = 0
+CATEGORY_QUOTA_BUCKET = "month"  # day / month / year / all (تقویم شمسی)
+CATEGORY_QUOTAS = {}  # سهمیه جدا برای بعضی دسته‌ها، مثلاً {"ورزشی": 100}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 # EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
 # }
+EXTENSIONS = {
+    "TabnakNews.metrics.CrawlMetricsExtension": 500,
+    "TabnakNews.tracing.RequestTracingExtension": 510,
+    "TabnakNews.longrun.MemoryReportExtension": 520,
+}
+
+# معیارهای کراول (utils.crawl_metrics): Prometheus روی پورت محلی و snapshot دوره‌ای JSON
+METRICS_ENABLED = True
+METRICS_PORT = 0  # مثلاً 9410؛ 0 یعنی بدون endpoint
+METRICS_HOST = "127.0.0.1"
+METRICS_JSON_PATH = None  # مثلاً "metrics.json"
+METRICS_JSON_INTERVAL = 30.0
+METRICS_QUEUE_INTERVAL = 5.0
+
+# ردیابی مراحل هر درخواست (utils.crawl_trace)؛ تحلیل: python -m utils.crawl_trace crawl_trace.jsonl
+TRACE_ENABLED = False
+TRACE_PATH = "crawl_trace.jsonl"  # با پسوند .gz فشرده نوشته می‌شود
+TRACE_SAMPLE_RATE = 0.1
+
+# پروفایل callbackها و pipelineها (یا با آرگومان اسپایدر: -a profile=1)
+PROFILE_ENABLED = False
+PROFILE_SAMPLE_RATE = 0.1
+PROFILE_DIR = "profiles"
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 # ITEM_PIPELINES = {
 #    "TabnakNews.pipelines.TabnaknewsPipeline": 300,
 # }
+ITEM_PIPELINES = {
+    "TabnakNews.pipelines.NearDuplicatePipeline": 300,
+    "TabnakNews.pipelines.PartitionedOutputPipeline": 800,
+}
+# process_item هر pipeline را برای پروفایل (-a profile=1) می‌پوشاند؛ بدون پروفایل بی‌اثر
+ITEM_PROCESSOR = "TabnakNews.profiling.ProfiledItemPipelineManager"
+
+# تشخیص خبرهای تقریباً تکراری (utils.near_dup)؛ اجرای دسته‌ای: python -m utils.near_dup scan ...
+NEAR_DUP_ENABLED = False
+NEAR_DUP_ACTION = "tag"  # tag: پر کردن duplicate_of / drop: حذف آیتم
+NEAR_DUP_FIELD = "body"
+NEAR_DUP_MAX_DISTANCE = 3  # حداکثر فاصله همینگ دو اثرانگشت ۶۴ بیتی
+NEAR_DUP_MIN_TOKENS = 20  # متن‌های کوتاه‌تر بررسی نمی‌شوند
+NEAR_DUP_CAPACITY = 2_000_000  # حداکثر اثرانگشت در حافظه (16 + 4×(MAX_DISTANCE+1) بایت برای هر خبر، یعنی حدود ۳۲ بایت)
+NEAR_DUP_INDEX_PATH = None  # مثلاً ".crawl_state/near_dup.idx" برای نگه داشتن ایندکس بین اجراها
+
+# خروجی پارتیشن‌بندی‌شده: <DIR>/site=<site>/year=1399/month=07/part-0001.csv + _manifest.json
+PARTITIONED_OUTPUT_ENABLED = False
+PARTITIONED_OUTPUT_DIR = "output"
+PARTITIONED_OUTPUT_MAX_BYTES = 128 * 1024 * 1024  # سقف اندازه هر part
+PARTITIONED_OUTPUT_BY_MONTH = True  # False: فقط چرخش بر اساس اندازه
+PARTITIONED_OUTPUT_MAX_OPEN = 16  # حداکثر part باز هم‌زمان (قدیمی‌ترین نهایی می‌شود)
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -101,10 +186,49 @@ ROBOTSTXT_OBEY = True
 # HTTPCACHE_DIR = "httpcache"
 # HTTPCACHE_IGNORE_HTTP_CODES = []
 # HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# کش آگاه از تاریخ (TabnakNews.httpcache)؛ فعال‌سازی: -s HTTPCACHE_ENABLED=1
+HTTPCACHE_POLICY = "TabnakNews.httpcache.ArchiveDatePolicy"
+HTTPCACHE_STORAGE = "TabnakNews.httpcache.CompressedShardedCacheStorage"
+HTTPCACHE_TODAY_TTL = 600  # ثانیه؛ آرشیو امروز و روزهای اخیر
+HTTPCACHE_IMMUTABLE_AFTER_DAYS = 2  # آرشیو روزهای قدیمی‌تر از این همیشه از کش خوانده می‌شود
+HTTPCACHE_OTHER_TTL = 3600  # صفحه‌هایی که نه آرشیو هستند نه خبر
+HTTPCACHE_COMPRESS_LEVEL = 6
+
+# وضعیت کراول افزایشی (-a incremental=1): آخرین روز کامل و بزرگ‌ترین ID هر دسته
+CRAWL_STATE_DIR = ".crawl_state"
+
+# صف و dupefilter مشترک بین چند worker (TabnakNews.frontier)؛ برای فعال‌سازی:
+# SCHEDULER = "TabnakNews.frontier.FrontierScheduler"
+# DUPEFILTER_CLASS = "TabnakNews.frontier.FrontierDupeFilter"
+FRONTIER_URL = "sqlite:///.frontier/frontier.sqlite3"  # یا redis://host:6379/0 برای چند ماشین
+FRONTIER_NAME = None  # پیش‌فرض: نام اسپایدر
+FRONTIER_SEED = True  # False برای workerهای اضافه: درخواست‌های شروع وارد صف نمی‌شوند
+FRONTIER_FLUSH = False  # خالی کردن صف و اثرانگشت‌ها در شروع
+FRONTIER_HEARTBEAT = 5.0  # ثانیه
+FRONTIER_WORKER_TIMEOUT = 60.0  # worker بدون heartbeat در این مدت مرده حساب می‌شود
+
+# آزمون بار روی شبیه‌ساز محلی (benchmarks/mock_site.py)؛ همراه با DOWNLOAD_HANDLERS برای
+# http/https = "TabnakNews.mock_handler.MockSiteDownloadHandler" (python -m benchmarks.load_test)
+MOCK_SITE_URL = None  # مثلاً "http://127.0.0.1:8800"
+
+# حالت اجرای طولانی با حافظه محدود (TabnakNews.longrun)؛ صف دیسکی در JOBDIR:
+# scrapy crawl tabnak_daily_crawler -s LONG_RUN_ENABLED=1 -s JOBDIR=.crawl_state/jobs/tabnak-10y
+ADDONS = {
+    "TabnakNews.longrun.LongRunAddon": 0,
+}
+LONG_RUN_ENABLED = False
+LONG_RUN_MAX_PENDING_PER_DOMAIN = 2000  # درخواست منتظر هر دامنه پیش از خواندن درخواست شروع بعدی
+LONG_RUN_MEMORY_INTERVAL = 60.0  # ثانیه بین گزارش‌های حافظه
+LONG_RUN_MEMORY_LOG = None  # مثلاً "memory.jsonl"
+LONG_RUN_RSS_WARNING_MB = 0  # هشدار MemoryUsage وقتی بیشینه RSS از این بیشتر شود؛ 0 = بدون هشدار
 
 # Set settings whose default value is deprecated to a future-proof value
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FEED_EXPORT_ENCODING = "utf-8-sig"
+# خروجی Parquet فشرده (نیازمند pyarrow):  scrapy crawl tabnak_daily_crawler -o tabnak.parquet
+FEED_EXPORTERS = {
+    "parquet": "TabnakNews.exporters.ParquetItemExporter",
+}
 # LOG_LEVEL = "ERROR"
 LOG_FILE = "errors.log"  # لاگ‌ها رو در فایل errors.log ذخیره می‌کنه
 LOG_FILE_APPEND = False  # هر بار اجرای جدید، فایل رو overwrite می‌کنه
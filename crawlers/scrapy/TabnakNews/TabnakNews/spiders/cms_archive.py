@@ -0,0 +1,288 @@
+import re
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+import jdatetime
+import scrapy
+
+from TabnakNews.archive_sites import load_sites
+from TabnakNews.crawl_state import IncrementalCrawlMixin
+from TabnakNews.items import NewsRecord
+from utils.article_body import BodyRules, extract_body
+from utils.news_ids import news_id_from_url
+from utils.news_record import PERSIAN_DIGITS, jalali_date
+
+NEWS_PATH = re.compile(r"^(.*?/news/\d+)")
+# نام ماه‌های انگلیسی برای %B/%b؛ strptime آن‌ها را با LC_TIME پروسه می‌خواند
+ENGLISH_MONTHS = {
+    name: number
+    for number, month in enumerate(
+        ("january", "february", "march", "april", "may", "june", "july",
+         "august", "september", "october", "november", "december"),
+        start=1,
+    )
+    for name in (month, month[:3])
+}
+ENGLISH_MONTHS["sept"] = 9
+LATIN_WORD = re.compile(r"[A-Za-z]+")
+
+
+def clean_text(text):
+    if not text:
+        return ""
+    text = re.sub(r"[\u200d\u200e\u200f\u061c\u202a-\u202f\u2066-\u2069]", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def parse_news_date(raw, date_format):
+    """تاریخ خام صفحه خبر -> تاریخ میلادی ISO (یا None)."""
+    if not raw:
+        return None
+    raw = clean_text(raw).translate(PERSIAN_DIGITS)
+    if date_format != "jalali":
+        if "%B" in date_format or "%b" in date_format:
+            # ماه با نگاشت صریح به عدد تبدیل می‌شود تا نتیجه به locale وابسته نباشد
+            raw = LATIN_WORD.sub(
+                lambda match: str(ENGLISH_MONTHS.get(match.group(0).lower(), match.group(0))), raw
+            )
+            date_format = date_format.replace("%B", "%m").replace("%b", "%m")
+        try:
+            return datetime.strptime(raw, date_format).date().isoformat()
+        except ValueError:
+            return None
+    day = jalali_date(raw)
+    return day.togregorian().isoformat() if day else None
+
+
+class CmsArchiveSpider(IncrementalCrawlMixin, scrapy.Spider):
+    """
+    اسپایدر عمومی برای همه سایت‌های CMS مشترک (/fa/archive) بر اساس archive_sites.py.
+    همه سایت‌ها در یک پروسه و یک reactor کراول می‌شوند؛ هر دامنه slot دانلود جداگانه
+    با concurrency/delay خودش دارد.
+
+    scrapy crawl cms_archive_crawler -a sites=tabnak,entekhab -a from_date=1402/01/01 -a to_date=1402/01/05
+    scrapy crawl cms_archive_crawler -a config=my_sites.json -a incremental=1
+    """
+
+    name = "cms_archive_crawler"
+
+    DEFAULT_FROM_DATE = "1402/01/01"
+    DEFAULT_TO_DATE = "1402/01/01"
+    MAX_PAGES_PER_DAY_DEFAULT = 5
+    # در حالت افزایشی، توقف صفحه‌بندی با رسیدن به IDهای شناخته‌شده انجام می‌شود
+    INCREMENTAL_MAX_PAGES_PER_DAY = 100
+
+    custom_settings = {
+        "PARTITIONED_OUTPUT_ENABLED": True,
+        "PARTITIONED_OUTPUT_FIELDS": [
+            "news_id",
+            "title",
+            "abstract",
+            "body",
+            "date_georgian_iso",
+            "category",
+            "link",
+        ],
+        "CONCURRENT_REQUESTS": 32,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 4,
+        "AUTOTHROTTLE_ENABLED": True,
+        "AUTOTHROTTLE_START_DELAY": 1.0,
+        "AUTOTHROTTLE_MAX_DELAY": 10.0,
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 4.0,
+        "ROBOTSTXT_OBEY": False,
+        "RETRY_TIMES": 3,
+        "DOWNLOAD_TIMEOUT": 20,
+    }
+
+    def __init__(self, sites=None, config=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        names = [s.strip() for s in sites.split(",") if s.strip()] if sites else None
+        self.sites = load_sites(names, config)
+        # قواعد استخراج بدنه یک بار کامپایل می‌شوند
+        self.body_rules = {
+            name: BodyRules.of(site["body_extractor"])
+            for name, site in self.sites.items()
+            if site.get("body_extractor") is not None
+        }
+        self.allowed_domains = [
+            urlsplit(site["base_url"]).hostname.removeprefix("www.")
+            for site in self.sites.values()
+        ]
+        to_default = (
+            jdatetime.date.today().strftime("%Y/%m/%d")
+            if self.incremental
+            else self.DEFAULT_TO_DATE
+        )
+        self.from_date = self._parse_jalali_arg(kwargs.get("from_date", self.DEFAULT_FROM_DATE))
+        self.to_date = self._parse_jalali_arg(kwargs.get("to_date", to_default))
+        default_max_pages = (
+            self.INCREMENTAL_MAX_PAGES_PER_DAY
+            if self.incremental
+            else self.MAX_PAGES_PER_DAY_DEFAULT
+        )
+        self.max_pages_per_day = int(kwargs.get("max_pages_per_day", default_max_pages))
+        self.logger.info(
+            f"CMS ARCHIVE: sites={list(self.sites)} from {self.from_date} to {self.to_date}, "
+            f"pages/day={self.max_pages_per_day}"
+        )
+
+    @staticmethod
+    def _parse_jalali_arg(value):
+        try:
+            return jdatetime.datetime.strptime(value.replace("-", "/"), "%Y/%m/%d").date()
+        except ValueError:
+            raise ValueError(
+                "فرمت تاریخ اشتباه است. لطفاً از فرمت شمسی YYYY/MM/DD استفاده کنید."
+            ) from None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # ادب کراول به ازای هر دامنه (تنظیمات هنوز freeze نشده‌اند)
+        slots = dict(crawler.settings.getdict("DOWNLOAD_SLOTS"))
+        for site in spider.sites.values():
+            host = urlsplit(site["base_url"]).hostname
+            slot = {}
+            if "concurrency" in site:
+                slot["concurrency"] = int(site["concurrency"])
+            if "delay" in site:
+                slot["delay"] = float(site["delay"])
+            if slot:
+                slots.setdefault(host, slot)
+        crawler.settings.set("DOWNLOAD_SLOTS", slots, priority="spider")
+        if spider.incremental:
+            spider.load_crawl_state(
+                crawler.settings,
+                {name: list(site["categories"]) for name, site in spider.sites.items()},
+                spider.from_date,
+            )
+            if spider.category_start_dates:
+                spider.from_date = min(spider.category_start_dates.values())
+        return spider
+
+    def last_archive_day(self):
+        return self.to_date
+
+    def archive_url(self, site, category_id, archive_date, page):
+        params = dict(site.get("archive_params", {}))
+        params[site.get("category_param", "service_id")] = category_id
+        params.update(from_date=archive_date, to_date=archive_date, p=page)
+        return f"{site['base_url'].rstrip('/')}/fa/archive?{urlencode(params, safe='/')}"
+
+    async def start(self):
+        # روز-محور: در هر روز همه سایت‌ها و دسته‌ها درخواست دارند تا همه slotها مشغول بمانند
+        day = self.from_date
+        while day <= self.to_date:
+            archive_date = day.strftime("%Y/%m/%d")
+            for site_name, site in self.sites.items():
+                for category, category_id in site["categories"].items():
+                    start = self.category_start(category, site_name)
+                    if start and day < start:
+                        continue
+                    yield scrapy.Request(
+                        self.archive_url(site, category_id, archive_date, 1),
+                        callback=self.parse_archive,
+                        meta={
+                            "site": site_name,
+                            "category_name": category,
+                            "category_id": category_id,
+                            "archive_date": archive_date,
+                            "page": 1,
+                        },
+                    )
+            day += timedelta(days=1)
+
+    def parse_archive(self, response):
+        meta = response.meta
+        site_name, category = meta["site"], meta["category_name"]
+        site = self.sites[site_name]
+
+        links = response.css(site["selectors"]["links"]).getall()
+        if not links:
+            self.mark_archive_day_complete(meta)
+            return
+
+        reached_known_ids = False
+        for link in links:
+            url = response.urljoin(link.strip())
+            match = NEWS_PATH.match(url)
+            if match:
+                url = match.group(1)
+            news_id = news_id_from_url(url)
+            if self.is_known_article(meta, news_id):
+                # آرشیو از جدید به قدیم مرتب است؛ بقیه قبلاً کراول شده‌اند
+                reached_known_ids = True
+                continue
+            yield scrapy.Request(
+                url,
+                callback=self.parse_news,
+                errback=self.article_failed,
+                meta={
+                    "site": site_name,
+                    "category_name": category,
+                    "archive_date": meta["archive_date"],
+                    "news_id": news_id,
+                },
+            )
+
+        if meta["page"] < self.max_pages_per_day and not reached_known_ids:
+            page = meta["page"] + 1
+            yield scrapy.Request(
+                self.archive_url(site, meta["category_id"], meta["archive_date"], page),
+                callback=self.parse_archive,
+                meta={**{k: meta[k] for k in ("site", "category_name", "category_id", "archive_date")},
+                      "page": page},
+            )
+        elif reached_known_ids:
+            self.mark_archive_day_complete(meta)
+        else:
+            self.page_cap_reached(meta)
+
+    def parse_news(self, response):
+        self.observe_article(response)
+        meta = response.meta
+        site = self.sites[meta["site"]]
+        selectors = site["selectors"]
+
+        title = clean_text(" ".join(response.css(selectors["title"]).getall()))
+        if not title:
+            self.logger.debug(f"Skipping news item - Title not found for URL: {response.url}")
+            return
+        body_rules = self.body_rules.get(meta["site"])
+        if body_rules is not None:
+            body = "\n".join(
+                text
+                for text in (clean_text(t) for t in extract_body(response.selector.root, body_rules).split("\n"))
+                if text
+            )
+        else:
+            body = site.get("body_separator", "\n").join(
+                text for text in (clean_text(t) for t in response.css(selectors["body"]).getall()) if text
+            )
+        for pattern in site.get("strip_patterns", ()):
+            body = re.sub(pattern, "", body).strip()
+        if not body:
+            self.logger.debug(f"Skipping news item - Body not found for URL: {response.url}")
+            return
+
+        date_iso = parse_news_date(
+            response.css(selectors["date"]).get(), site.get("date_format", "jalali")
+        )
+        if date_iso is None:
+            # صفحه آرشیو برای یک روز مشخص بود؛ تاریخ همان روز جایگزین می‌شود
+            date_iso = parse_news_date(meta["archive_date"], "jalali")
+
+        category = meta["category_name"]
+        if selectors.get("category"):
+            category = clean_text(response.css(selectors["category"]).get()) or category
+
+        yield NewsRecord(
+            site=meta["site"],
+            news_id=meta.get("news_id") or news_id_from_url(response.url),
+            title=title,
+            abstract=clean_text(" ".join(response.css(selectors["abstract"]).getall())),
+            body=body,
+            date_georgian_iso=date_iso,
+            category=category,
+            link=response.url,
+        )
@@ -4,34 +4,25 @@ import re
 # توجه: jdatetime باید نصب شود تا تبدیل تاریخ شمسی به میلادی انجام شود.
 import jdatetime
 from datetime import datetime
-from scrapy.item import Item, Field
 import calendar
 
-
-# -------------------------------------------------------------
-# 1. تعریف ساختار داده (Item)
-# -------------------------------------------------------------
-class EntekhabItem(Item):
-    """مدل داده خروجی برای ذخیره‌سازی در CSV."""
-
-    title = Field()
-    abstract = Field()
-    body = Field()
-    date_georgian_iso = Field()
-    category = Field()
-    link = Field()
+from TabnakNews.crawl_state import IncrementalCrawlMixin
+from TabnakNews.items import NewsRecord
+from utils.article_body import BodyRules, extract_body
+from utils.news_ids import news_id_from_url
 
 
 # -------------------------------------------------------------
-# 2. تعریف Spider
+# تعریف Spider (خروجی: NewsRecord مشترک از TabnakNews.items)
 # -------------------------------------------------------------
-class EntekhabSpider(scrapy.Spider):
+class EntekhabSpider(IncrementalCrawlMixin, scrapy.Spider):
     """
     Scrapy Spider برای کراول کردن Entekhab از طریق URL آرشیو پارامتری.
     """
 
     name = "entekhab_archive_crawler_parametric"
     allowed_domains = ["entekhab.ir"]
+    STATE_SITE = "entekhab"
 
     # URL پایه آرشیو
     URL_BASE = "http://www.entekhab.ir/fa/archive?"
@@ -54,28 +45,26 @@ class EntekhabSpider(scrapy.Spider):
     MAX_MONTH_TEST_DEFAULT = 1
     MAX_DAY_TEST_DEFAULT = 5
     MAX_PAGES_PER_DAY_DEFAULT = 1
+    # در حالت افزایشی، توقف صفحه‌بندی با رسیدن به IDهای شناخته‌شده انجام می‌شود
+    INCREMENTAL_MAX_PAGES_PER_DAY = 100
 
     # 3. پارامترهای ثابت
     RPP = 50  # Rows Per Page (افزایش از 10 به 50 برای بهره‌وری بهتر)
+    BODY_RULES = BodyRules(root="div.khabar-matn")
 
     # تنظیمات داخلی و هوشمند Scrapy
     custom_settings = {
-        "FEEDS": {
-            "Entekhab_Parametric_Dataset.csv": {
-                "format": "csv",
-                "encoding": "utf8",
-                "store_empty": False,
-                "overwrite": False,
-                "fields": [
-                    "title",
-                    "abstract",
-                    "body",
-                    "date_georgian_iso",
-                    "category",
-                    "link",
-                ],
-            }
-        },
+        # به جای یک فایل CSV که بی‌انتها بزرگ می‌شود، خروجی در پارتیشن‌های ماه شمسی
+        # (output/site=<site>/year=.../month=.../part-NNNN.csv) نوشته می‌شود
+        "PARTITIONED_OUTPUT_ENABLED": True,
+        "PARTITIONED_OUTPUT_FIELDS": [
+            "title",
+            "abstract",
+            "body",
+            "date_georgian_iso",
+            "category",
+            "link",
+        ],
         "FEED_EXPORT_ENCODING": "utf8",
         "AUTOTHROTTLE_ENABLED": True,
         "AUTOTHROTTLE_START_DELAY": 1.0,
@@ -94,8 +83,13 @@ class EntekhabSpider(scrapy.Spider):
             kwargs.get("max_month_test", self.MAX_MONTH_TEST_DEFAULT)
         )
         self.max_day_test = int(kwargs.get("max_day_test", self.MAX_DAY_TEST_DEFAULT))
+        default_max_pages = (
+            self.INCREMENTAL_MAX_PAGES_PER_DAY
+            if self.incremental
+            else self.MAX_PAGES_PER_DAY_DEFAULT
+        )
         self.max_pages_per_day = int(
-            kwargs.get("max_pages_per_day", self.MAX_PAGES_PER_DAY_DEFAULT)
+            kwargs.get("max_pages_per_day", default_max_pages)
         )
 
         self.logger.info(
@@ -128,8 +122,23 @@ class EntekhabSpider(scrapy.Spider):
             self.logger.error(f"Failed to convert date '{shamsi_date_str}': {e}")
             return None
 
-    def start_requests(self):
-        """ایجاد درخواست‌های اولیه با حلقه زدن روی سال، ماه و روز (Date-Major)."""
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        if spider.incremental:
+            spider.load_crawl_state(
+                crawler.settings,
+                {spider.STATE_SITE: [category["name"] for category in spider.CATEGORY_IDS]},
+                jdatetime.date(spider.START_YEAR, 1, 1),
+            )
+        return spider
+
+    def iter_archive_days(self):
+        """روزهای آرشیو را به صورت (سال، ماه، روز) شمسی تولید می‌کند."""
+        if self.crawl_states:
+            for day in self.iter_incremental_days():
+                yield day.year, day.month, day.day
+            return
 
         for yr in range(self.START_YEAR, self.END_YEAR + 1):
             for mn in range(1, self.max_month_test + 1):
@@ -137,26 +146,43 @@ class EntekhabSpider(scrapy.Spider):
                 days_in_month = 31 if mn <= 6 else 30
 
                 for dy in range(1, min(days_in_month, self.max_day_test) + 1):
-                    for category in self.CATEGORY_IDS:
-                        cat_id = category["id"]
-                        cat_name = category["name"]
-
-                        # ساخت URL آرشیو (p=1)
-                        # استفاده از service_id=5 و sec_id=-1 از لینک جدید
-                        url = (
-                            f"{self.URL_BASE}service_id=5&sec_id=-1&cat_id={cat_id}&rpp={self.RPP}"
-                            f"&from_date={yr}/{mn}/{dy}&to_date={yr}/{mn}/{dy}&p=1"
-                        )
-
-                        yield scrapy.Request(
-                            url=url,
-                            callback=self.parse_archive,
-                            meta={
-                                "category_name": cat_name,
-                                "category_id": cat_id,
-                                "page": 1,
-                            },
-                        )
+                    yield yr, mn, dy
+
+    async def start(self):
+        # Scrapy 2.13 به بعد start_requests را خودش صدا نمی‌زند
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        """ایجاد درخواست‌های اولیه با حلقه زدن روی سال، ماه و روز (Date-Major)."""
+
+        for yr, mn, dy in self.iter_archive_days():
+            archive_date = f"{yr:04d}/{mn:02d}/{dy:02d}"
+            for category in self.CATEGORY_IDS:
+                cat_id = category["id"]
+                cat_name = category["name"]
+
+                category_start = self.category_start(cat_name)
+                if category_start and jdatetime.date(yr, mn, dy) < category_start:
+                    continue
+
+                # ساخت URL آرشیو (p=1)
+                # استفاده از service_id=5 و sec_id=-1 از لینک جدید
+                url = (
+                    f"{self.URL_BASE}service_id=5&sec_id=-1&cat_id={cat_id}&rpp={self.RPP}"
+                    f"&from_date={yr}/{mn}/{dy}&to_date={yr}/{mn}/{dy}&p=1"
+                )
+
+                yield scrapy.Request(
+                    url=url,
+                    callback=self.parse_archive,
+                    meta={
+                        "category_name": cat_name,
+                        "category_id": cat_id,
+                        "archive_date": archive_date,
+                        "page": 1,
+                    },
+                )
 
     def parse_archive(self, response):
         """تجزیه و تحلیل صفحه آرشیو (استخراج لینک‌ها و Pagination)."""
@@ -173,8 +199,10 @@ class EntekhabSpider(scrapy.Spider):
             self.logger.debug(
                 f"No news links found for {cat_name} on page {current_page} - {response.url}. Stopping pagination for this day."
             )
+            self.mark_archive_day_complete(response.meta)
             return
 
+        reached_known_ids = False
         for link in news_links:
             # لینک‌ها در انتخاب دارای پارامترهای اضافی هستند.
             # کراولر اصلی از regex برای حذف این پارامترها و نگه داشتن فقط ID استفاده می‌کرد.
@@ -184,16 +212,22 @@ class EntekhabSpider(scrapy.Spider):
                 clean_link = (
                     self.URL_BASE.split("/fa/archive?")[0] + link[: match.end()]
                 )
+                news_id = news_id_from_url(clean_link)
+                if self.is_known_article(response.meta, news_id):
+                    # آرشیو از جدید به قدیم مرتب است؛ بقیه قبلاً کراول شده‌اند
+                    reached_known_ids = True
+                    continue
 
                 # ارسال لینک به تابع parse_news برای استخراج جزییات
                 yield scrapy.Request(
                     clean_link,
                     callback=self.parse_news,
-                    meta={"category_name": cat_name},
+                    errback=self.article_failed,
+                    meta={"category_name": cat_name, "news_id": news_id},
                 )
 
         # 2. مدیریت Pagination (صفحه‌بندی)
-        if current_page < self.max_pages_per_day:
+        if current_page < self.max_pages_per_day and not reached_known_ids:
             next_page = current_page + 1
 
             # ساخت URL صفحه بعدی (جایگزین کردن پارامتر p)
@@ -206,21 +240,23 @@ class EntekhabSpider(scrapy.Spider):
                 meta={
                     "category_name": cat_name,
                     "category_id": response.meta["category_id"],
+                    "archive_date": response.meta.get("archive_date"),
                     "page": next_page,
                 },
             )
+        elif reached_known_ids:
+            self.mark_archive_day_complete(response.meta)
+        else:
+            self.page_cap_reached(response.meta)
 
     def parse_news(self, response):
         """تابع اصلی تجزیه و تحلیل صفحه خبر."""
-
-        item = EntekhabItem()
-        item["category"] = response.meta.get("category_name", "نامشخص")
+        self.observe_article(response)
 
         # 1. استخراج ID به عنوان لینک (همانند کراولر تابناک)
         link_id = response.url.split("/")[
             -2
         ]  # ID در بخش قبل از اسلش نهایی قرار دارد (مثلاً 123456/)
-        item["link"] = link_id
 
         # 2. استخراج تیتر
         title = response.css("h1::text").get()
@@ -229,21 +265,17 @@ class EntekhabSpider(scrapy.Spider):
                 f"Skipping news item - Title not found for URL: {response.url}"
             )
             return
-        item["title"] = self.clean_rtl_chars(title)
+        title = self.clean_rtl_chars(title)
 
         # 3. استخراج خلاصه/لید
         abstract = response.css("div.subtitle::text").get() or ""
-        item["abstract"] = self.clean_rtl_chars(abstract)
+        abstract = self.clean_rtl_chars(abstract)
 
         # 4. استخراج بدنه خبر (بر اساس تأیید کاربر: div.khabar-matn)
-        # از آنجایی که بدنه خبر حاوی کدهای جاوا اسکریپت بود، باید فقط متن را بدون تگ‌ها بگیریم.
-        body_parts = response.css("div.khabar-matn *::text").getall()
-        body = " ".join(p.strip() for p in body_parts if p.strip())
-
-        # حذف کدهای جاوا اسکریپت که ممکن است در متن باقی مانده باشند (مانند var... error...)
-        body = str(re.sub(r"(var.*?error.*}\);)", "", body))
-        item["body"] = self.clean_rtl_chars(body)
-        if not item["body"]:
+        # بدنه حاوی اسکریپت پخش‌کننده ویدئو است؛ استخراج‌کننده مشترک script را در همان پیمایش
+        # کنار می‌گذارد (به‌جای regex پاک‌سازی روی کل متن)
+        body = self.clean_rtl_chars(extract_body(response.selector.root, self.BODY_RULES))
+        if not body:
             self.logger.debug(
                 f"Skipping news item - Body not found for URL: {response.url}"
             )
@@ -287,12 +319,18 @@ class EntekhabSpider(scrapy.Spider):
                     date_for_conversion = f"{year}/{month}/{day}"
                     date_iso = self.convert_shamsi_to_georgian(date_for_conversion)
 
-        item["date_georgian_iso"] = date_iso
-
-        if not item["date_georgian_iso"]:
+        if not date_iso:
             self.logger.debug(
                 f"Skipping news item - Date conversion failed for URL: {response.url}. Raw date: {date_time_raw}"
             )
             return
 
-        yield item
+        yield NewsRecord(
+            site="entekhab",
+            title=title,
+            abstract=abstract,
+            body=body,
+            date_georgian_iso=date_iso,
+            category=response.meta.get("category_name", "نامشخص"),
+            link=link_id,
+        )
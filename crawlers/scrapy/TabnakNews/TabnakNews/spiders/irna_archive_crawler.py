@@ -4,33 +4,23 @@ import re
 # توجه: jdatetime باید نصب شود تا تبدیل تاریخ شمسی به میلادی انجام شود.
 import jdatetime
 from datetime import datetime
-from scrapy.item import Item, Field
 import calendar
 
-
-# -------------------------------------------------------------
-# 1. تعریف ساختار داده (Item)
-# -------------------------------------------------------------
-class IrnaItem(Item):
-    """مدل داده خروجی برای ذخیره‌سازی در CSV."""
-
-    title = Field()
-    abstract = Field()
-    body = Field()
-    date_georgian_iso = Field()
-    category = Field()  # فیلد جدید برای ذخیره دسته‌بندی
-    link = Field()
+from TabnakNews.crawl_state import IncrementalCrawlMixin
+from TabnakNews.items import NewsRecord
+from utils.news_ids import news_id_from_url
 
 
 # -------------------------------------------------------------
-# 2. تعریف Spider
+# تعریف Spider (خروجی: NewsRecord مشترک از TabnakNews.items)
 # -------------------------------------------------------------
-class IrnaSpider(scrapy.Spider):
+class IrnaSpider(IncrementalCrawlMixin, scrapy.Spider):
     """
     Scrapy Spider برای کراول کردن IRNA از طریق URL آرشیو پارامتری (تاریخ محور) با استفاده از Playwright.
     """
 
     name = "irna_archive_crawler_parametric"
+    STATE_SITE = "irna"
     allowed_domains = ["irna.ir"]
 
     # URL پایه آرشیو
@@ -53,28 +43,25 @@ class IrnaSpider(scrapy.Spider):
     MAX_MONTH_TEST_DEFAULT = 10
     MAX_DAY_TEST_DEFAULT = 5
     MAX_PAGES_PER_DAY_DEFAULT = 1
+    # در حالت افزایشی، توقف صفحه‌بندی با رسیدن به IDهای شناخته‌شده انجام می‌شود
+    INCREMENTAL_MAX_PAGES_PER_DAY = 100
 
     # 3. پارامترهای ثابت
     TP = 20  # فرض بر ثابت بودن
 
     # تنظیمات داخلی و هوشمند Scrapy
     custom_settings = {
-        "FEEDS": {
-            "Irna_Parametric_Dataset.csv": {
-                "format": "csv",
-                "encoding": "utf8",
-                "store_empty": False,
-                "overwrite": False,
-                "fields": [
-                    "title",
-                    "abstract",
-                    "body",
-                    "date_georgian_iso",
-                    "category",
-                    "link",
-                ],
-            }
-        },
+        # به جای یک فایل CSV که بی‌انتها بزرگ می‌شود، خروجی در پارتیشن‌های ماه شمسی
+        # (output/site=<site>/year=.../month=.../part-NNNN.csv) نوشته می‌شود
+        "PARTITIONED_OUTPUT_ENABLED": True,
+        "PARTITIONED_OUTPUT_FIELDS": [
+            "title",
+            "abstract",
+            "body",
+            "date_georgian_iso",
+            "category",
+            "link",
+        ],
         "FEED_EXPORT_ENCODING": "utf8",
         "AUTOTHROTTLE_ENABLED": True,
         "AUTOTHROTTLE_START_DELAY": 1.0,
@@ -103,8 +90,13 @@ class IrnaSpider(scrapy.Spider):
             kwargs.get("max_month_test", self.MAX_MONTH_TEST_DEFAULT)
         )
         self.max_day_test = int(kwargs.get("max_day_test", self.MAX_DAY_TEST_DEFAULT))
+        default_max_pages = (
+            self.INCREMENTAL_MAX_PAGES_PER_DAY
+            if self.incremental
+            else self.MAX_PAGES_PER_DAY_DEFAULT
+        )
         self.max_pages_per_day = int(
-            kwargs.get("max_pages_per_day", self.MAX_PAGES_PER_DAY_DEFAULT)
+            kwargs.get("max_pages_per_day", default_max_pages)
         )
 
         # لاگ برای تأیید تنظیمات فعلی
@@ -137,37 +129,67 @@ class IrnaSpider(scrapy.Spider):
             self.logger.error(f"Failed to convert date '{shamsi_date_str}': {e}")
             return None
 
-    def start_requests(self):
-        """ایجاد درخواست‌های اولیه با حلقه زدن روی سال، ماه و روز (Date-Major)."""
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        if spider.incremental:
+            spider.load_crawl_state(
+                crawler.settings,
+                {spider.STATE_SITE: [category["name"] for category in spider.CATEGORY_IDS]},
+                jdatetime.date(spider.START_YEAR, 1, 1),
+            )
+        return spider
+
+    def iter_archive_days(self):
+        """روزهای آرشیو را به صورت (سال، ماه، روز) شمسی تولید می‌کند."""
+        if self.crawl_states:
+            for day in self.iter_incremental_days():
+                yield day.year, day.month, day.day
+            return
 
-        # از متغیرهای تست (self.max_month_test) استفاده می‌کند.
         for yr in range(self.START_YEAR, self.END_YEAR + 1):
-            # محدود کردن ماه برای تست
             for mn in range(1, self.max_month_test + 1):
-                # محدود کردن روز برای تست
                 for dy in range(1, self.max_day_test + 1):
-                    # حلقه دسته‌بندی‌ها (این حلقه اکنون درونی‌ترین است)
-                    for category in self.CATEGORY_IDS:
-                        cat_id = category["id"]
-                        cat_name = category["name"]
-
-                        # pi=1 به معنای صفحه اول است
-                        url = f"{self.URL_BASE}pi=1&tp={self.TP}&ms={cat_id}&dy={dy}&mn={mn}&yr={yr}"
-
-                        # ارسال درخواست به تابع parse_archive
-                        yield scrapy.Request(
-                            url=url,
-                            callback=self.parse_archive,
-                            meta={
-                                "playwright": True,  # <--- فعال‌سازی Playwright برای رندر آرشیو
-                                "category_name": cat_name,
-                                "category_id": cat_id,
-                                "day": dy,
-                                "month": mn,
-                                "year": yr,
-                                "page": 1,
-                            },
-                        )
+                    yield yr, mn, dy
+
+    async def start(self):
+        # Scrapy 2.13 به بعد start_requests را خودش صدا نمی‌زند
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        """ایجاد درخواست‌های اولیه با حلقه زدن روی سال، ماه و روز (Date-Major)."""
+
+        # از متغیرهای تست (self.max_month_test) استفاده می‌کند.
+        for yr, mn, dy in self.iter_archive_days():
+            archive_date = f"{yr:04d}/{mn:02d}/{dy:02d}"
+            # حلقه دسته‌بندی‌ها (این حلقه اکنون درونی‌ترین است)
+            for category in self.CATEGORY_IDS:
+                cat_id = category["id"]
+                cat_name = category["name"]
+
+                category_start = self.category_start(cat_name)
+                if category_start and jdatetime.date(yr, mn, dy) < category_start:
+                    continue
+
+                # pi=1 به معنای صفحه اول است
+                url = f"{self.URL_BASE}pi=1&tp={self.TP}&ms={cat_id}&dy={dy}&mn={mn}&yr={yr}"
+
+                # ارسال درخواست به تابع parse_archive
+                yield scrapy.Request(
+                    url=url,
+                    callback=self.parse_archive,
+                    meta={
+                        "playwright": True,  # <--- فعال‌سازی Playwright برای رندر آرشیو
+                        "category_name": cat_name,
+                        "category_id": cat_id,
+                        "archive_date": archive_date,
+                        "day": dy,
+                        "month": mn,
+                        "year": yr,
+                        "page": 1,
+                    },
+                )
 
     def parse_archive(self, response):
         """تجزیه و تحلیل صفحه آرشیو (استخراج لینک‌ها و Pagination)."""
@@ -186,19 +208,29 @@ class IrnaSpider(scrapy.Spider):
             self.logger.debug(
                 f"No news links found for {cat_name} on page {current_page} - {response.meta['year']}/{response.meta['month']}/{response.meta['day']}. Stopping pagination for this day."
             )
+            self.mark_archive_day_complete(response.meta)
             return
 
+        reached_known_ids = False
         for link in news_links:
             full_url = response.urljoin(link)
+            news_id = news_id_from_url(full_url)
+            if self.is_known_article(response.meta, news_id):
+                # آرشیو از جدید به قدیم مرتب است؛ بقیه قبلاً کراول شده‌اند
+                reached_known_ids = True
+                continue
 
             # ارسال لینک به تابع parse_news برای استخراج جزییات (بدون Playwright برای سرعت بیشتر)
             yield scrapy.Request(
-                full_url, callback=self.parse_news, meta={"category_name": cat_name}
+                full_url,
+                callback=self.parse_news,
+                errback=self.article_failed,
+                meta={"category_name": cat_name, "news_id": news_id},
             )
 
         # 2. مدیریت Pagination (صفحه‌بندی)
         # فقط در صورتی که به حد تعیین شده نرسیده‌ایم، به صفحه بعدی می‌رویم
-        if current_page < self.max_pages_per_day:
+        if current_page < self.max_pages_per_day and not reached_known_ids:
             next_page = current_page + 1
 
             # ساخت URL صفحه بعدی (جایگزین کردن پارامتر pi)
@@ -212,19 +244,21 @@ class IrnaSpider(scrapy.Spider):
                     "playwright": True,  # <--- فعال‌سازی Playwright برای رندر صفحه بعدی آرشیو
                     "category_name": cat_name,
                     "category_id": response.meta["category_id"],
+                    "archive_date": response.meta.get("archive_date"),
                     "day": response.meta["day"],
                     "month": response.meta["month"],
                     "year": response.meta["year"],
                     "page": next_page,
                 },
             )
+        elif reached_known_ids:
+            self.mark_archive_day_complete(response.meta)
+        else:
+            self.page_cap_reached(response.meta)
 
     def parse_news(self, response):
         """تابع اصلی تجزیه و تحلیل صفحه خبر."""
-
-        item = IrnaItem()
-        item["category"] = response.meta.get("category_name", "نامشخص")
-        item["link"] = response.url
+        self.observe_article(response)
 
         # 1. استخراج تیتر
         title = response.css("h1.title::text").get()
@@ -233,17 +267,17 @@ class IrnaSpider(scrapy.Spider):
                 f"Skipping news item - Title not found for URL: {response.url}"
             )
             return
-        item["title"] = self.clean_rtl_chars(title.strip())
+        title = self.clean_rtl_chars(title.strip())
 
         # 2. استخراج خلاصه/لید (حدس بر اساس ساختار رایج)
         abstract = response.css("h3::text, div.lead::text").get() or ""
-        item["abstract"] = self.clean_rtl_chars(abstract.strip())
+        abstract = self.clean_rtl_chars(abstract.strip())
 
         # 3. استخراج بدنه خبر (با توجه به تأیید کاربر: item-body -> item-text -> p)
         body_parts = response.css("div.item-body div.item-text p::text").getall()
         body = "\n".join(p.strip() for p in body_parts if p.strip())
-        item["body"] = self.clean_rtl_chars(body)
-        if not item["body"]:
+        body = self.clean_rtl_chars(body)
+        if not body:
             self.logger.debug(
                 f"Skipping news item - Body not found for URL: {response.url}"
             )
@@ -261,12 +295,18 @@ class IrnaSpider(scrapy.Spider):
             # تاریخ شمسی را برای تبدیل به تابع ارسال می‌کنیم (مثلاً 1404/07/13)
             date_iso = self.convert_shamsi_to_georgian(date_time_shamsi.split(" ")[0])
 
-        item["date_georgian_iso"] = date_iso
-
-        if not item["date_georgian_iso"]:
+        if not date_iso:
             self.logger.debug(
                 f"Skipping news item - Date conversion failed for URL: {response.url}"
             )
             return
 
-        yield item
+        yield NewsRecord(
+            site="irna",
+            title=title,
+            abstract=abstract,
+            body=body,
+            date_georgian_iso=date_iso,
+            category=response.meta.get("category_name", "نامشخص"),
+            link=response.url,
+        )
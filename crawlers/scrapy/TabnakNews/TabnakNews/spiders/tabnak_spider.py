@@ -8,22 +8,20 @@ import scrapy
 from jdatetime import date as jdate, datetime as jdatetime  # , timedelta
 
 # from scrapy import signals
-from scrapy.item import Field, Item
+
+from TabnakNews.crawl_state import IncrementalCrawlMixin
+from TabnakNews.items import NewsRecord
+from utils.news_ids import news_id_from_url
 
 crawl_start_date = "1384/01/01"
 crawl_end_date = "1384/02/01"
 
 
-class NewsItem(Item):
-    body = Field()
-    date_georgian_iso = Field()
-    news_id = Field()
-    category = Field()
-
-
-class TabnakDailyCrawler(scrapy.Spider):
+class TabnakDailyCrawler(IncrementalCrawlMixin, scrapy.Spider):
     name = "tabnak_daily_crawler"
     allowed_domains = ["tabnak.ir"]
+    STATE_SITE = "tabnak"
+    MAX_ARCHIVE_DEPTH = 5
 
     CATEGORY_MAP = {
         "سیاسی": "24",
@@ -53,6 +51,8 @@ class TabnakDailyCrawler(scrapy.Spider):
                 "format": "csv",
                 "encoding": "utf-8-sig",
                 "overwrite": True,
+                # ستون‌های قبلی این خروجی از میان فیلدهای NewsRecord
+                "fields": ["body", "date_georgian_iso", "news_id", "category", "duplicate_of"],
             }
         },
         "FEED_EXPORT_ENCODING": "utf8",
@@ -68,7 +68,7 @@ class TabnakDailyCrawler(scrapy.Spider):
         "DUPEFILTER_CLASS": "scrapy.dupefilters.RFPDupeFilter",  # فقط در حافظه، هیچ فایلی ذخیره نمی‌کنه
         # "HTTPCACHE_ENABLED": True,  # بهبود: caching برای سرعت
         "HTTPCACHE_ENABLED": False,
-        "HTTPCACHE_STORAGE": "scrapy.extensions.httpcache.FilesystemCacheStorage",
+        # سیاست و storage کش از settings پروژه (TabnakNews.httpcache): -s HTTPCACHE_ENABLED=1
         # "DUPEFILTER_CLASS": "scrapy.dupefilters.RFPDupeFilter",  # بهبود: deduplication
         # "JOBDIR": "/tmp/scrapy_job",  # برای dedup
         "LOG_FILE": None,
@@ -77,8 +77,11 @@ class TabnakDailyCrawler(scrapy.Spider):
     def __init__(self, *args, **kwargs):
         super(TabnakDailyCrawler, self).__init__(*args, **kwargs)
         self.start_time = time.time()  # زمان شروع
+        default_to_date = crawl_end_date
+        if self.incremental:
+            default_to_date = jdate.today().strftime("%Y/%m/%d")
         self.from_date_str = kwargs.get("from_date", crawl_start_date).replace("/", "-")
-        self.to_date_str = kwargs.get("to_date", crawl_end_date).replace("/", "-")
+        self.to_date_str = kwargs.get("to_date", default_to_date).replace("/", "-")
 
         # categories_str = "_".join(self.TARGET_CATEGORIES)
         # dynamic_filename = (
@@ -120,11 +123,34 @@ class TabnakDailyCrawler(scrapy.Spider):
             f"CRAWLING DAILY from {self.from_date_str} to {self.to_date_str} for categories: {self.TARGET_CATEGORIES}"
         )
 
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        if spider.incremental:
+            spider.load_crawl_state(
+                crawler.settings,
+                {spider.STATE_SITE: spider.TARGET_CATEGORIES},
+                jdatetime.strptime(spider.from_date_str, "%Y-%m-%d").date(),
+            )
+            if spider.category_start_dates:
+                earliest = min(spider.category_start_dates.values())
+                spider.from_date_str = earliest.strftime("%Y-%m-%d")
+        return spider
+
+    def last_archive_day(self):
+        return jdatetime.strptime(self.to_date_str, "%Y-%m-%d").date()
+
+    async def start(self):
+        # Scrapy 2.13 به بعد start_requests را خودش صدا نمی‌زند
+        for request in self.start_requests():
+            yield request
+
     def start_requests(self):
         base_url = "https://www.tabnak.ir/fa/archive?"
         start_date = jdatetime.strptime(self.from_date_str, "%Y-%m-%d").date()
         end_date = jdatetime.strptime(self.to_date_str, "%Y-%m-%d").date()
-        urls = []
+        # درخواست‌ها یکی‌یکی ساخته می‌شوند (نه لیست همه روزها)؛ در کراول چندساله engine فقط به
+        # اندازه جای خالی صف‌ها از این generator می‌خواند
         current_date = start_date
         while current_date <= end_date:
             date_str = current_date.strftime("%Y/%m/%d")
@@ -136,19 +162,26 @@ class TabnakDailyCrawler(scrapy.Spider):
                         f"Category '{category_name}' not found. Skipping."
                     )
                     continue
+                category_start = self.category_start(category_name)
+                if category_start and current_date < category_start:
+                    continue
                 params = {
                     "service_id": service_id,
                     "rpp": 100,
                     "from_date": date_str,
                     "to_date": date_str,
                 }
-                start_url = base_url + urlencode(params)
-                urls.append(start_url)
+                yield scrapy.Request(
+                    url=base_url + urlencode(params),
+                    callback=self.parse,
+                    meta={
+                        "depth": 0,
+                        "category_name": category_name,
+                        "archive_date": date_str,
+                    },
+                )
             current_date += timedelta(days=1)
 
-        for url in urls:
-            yield scrapy.Request(url=url, callback=self.parse, meta={"depth": 0})
-
     def parse(self, response):
         """
         پردازشگر صفحات آرشیو با انتخابگرهای بهینه
@@ -162,14 +195,26 @@ class TabnakDailyCrawler(scrapy.Spider):
         if not news_links:
             self.logger.warning(f"No news links found on archive page: {response.url}")
 
+        category_name = response.meta.get("category_name")
+        reached_known_ids = False
         for link in news_links:
-            if response.meta.get("depth", 0) > 5:
+            if response.meta.get("depth", 0) > self.MAX_ARCHIVE_DEPTH:
                 self.logger.warning("Max depth reached, skipping pagination.")
                 break
+            news_id = news_id_from_url(link)
+            if self.is_known_article(response.meta, news_id):
+                # آرشیو از جدید به قدیم مرتب است؛ بقیه صفحات قبلاً کراول شده‌اند
+                reached_known_ids = True
+                continue
             yield response.follow(
                 link,
                 callback=self.parse_news,
-                meta={"depth": response.meta.get("depth", 0) + 1},
+                errback=self.article_failed,
+                meta={
+                    "depth": response.meta.get("depth", 0) + 1,
+                    "category_name": category_name,
+                    "news_id": news_id,
+                },
             )
 
         next_page_link = response.xpath(
@@ -177,25 +222,35 @@ class TabnakDailyCrawler(scrapy.Spider):
             # '//div[contains(@class, "pagination")]//a[contains(text(), "»")]/@href'
         ).get()
 
-        if next_page_link and response.meta.get("depth", 0) < 5:
+        if (
+            next_page_link
+            and response.meta.get("depth", 0) < self.MAX_ARCHIVE_DEPTH
+            and not reached_known_ids
+        ):
             self.logger.info(f"Found next page link: {next_page_link}")
             yield response.follow(
                 next_page_link,
                 callback=self.parse,
-                meta={"depth": response.meta.get("depth", 0) + 1},
+                meta={
+                    "depth": response.meta.get("depth", 0) + 1,
+                    "category_name": category_name,
+                    "archive_date": response.meta.get("archive_date"),
+                },
             )
+        elif next_page_link and not reached_known_ids:
+            self.page_cap_reached(response.meta)
+        else:
+            # صفحه‌بندی این روز برای این دسته تمام شد
+            self.mark_archive_day_complete(response.meta)
 
     def parse_news(self, response):
-        item = NewsItem()
+        self.observe_article(response)
         try:
-            item["category"] = clean_persian_text(
+            category = clean_persian_text(
                 response.css("a.newsbody_servicename::text").get(default="")
             )
             id_match = re.search(r"/news/(\d+)", response.url)
-            if id_match:
-                item["news_id"] = id_match.group(1)
-            else:
-                item["news_id"] = None
+            if not id_match:
                 self.logger.warning(
                     f"Could not extract news ID from URL: {response.url}"
                 )
@@ -205,13 +260,17 @@ class TabnakDailyCrawler(scrapy.Spider):
             cleaned_body = "\n".join(
                 clean_persian_text(p) for p in body_texts if clean_persian_text(p)
             )
-            item["body"] = cleaned_body
-
-            item["date_georgian_iso"] = self.extract_and_convert_date(response)
-
-            if not item["body"]:
+            if not cleaned_body:
                 self.logger.warning(f"Incomplete item skipped: {response.url}")
                 return
+
+            item = NewsRecord(
+                site="tabnak",
+                news_id=id_match.group(1) if id_match else None,
+                body=cleaned_body,
+                date_georgian_iso=self.extract_and_convert_date(response),
+                category=category,
+            )
             count = self.crawler.stats.get_value("item_scraped_count", 0)
             if count and count % 10 == 0:
                 elapsed = time.time() - self.start_time
@@ -243,6 +302,7 @@ class TabnakDailyCrawler(scrapy.Spider):
         self.logger.info(
             f"Spider closed: {reason}. Processed items: {self.crawler.stats.get_value('item_scraped_count', 0)}"
         )
+        super().closed(reason)
 
     # @classmethod
     # def from_crawler(cls, crawler, *args, **kwargs):
@@ -0,0 +1,166 @@
+# ردیابی مراحل هر درخواست Scrapy در فایل محلی (utils.crawl_trace)
+#
+# scrapy crawl tabnak_daily_crawler -s TRACE_ENABLED=1 -s TRACE_SAMPLE_RATE=0.05
+# python -m utils.crawl_trace crawl_trace.jsonl
+#
+# Scrapy زمان DNS/اتصال را جدا گزارش نمی‌کند؛ مرحله ttfb از شروع واقعی دانلود (sent) تا
+# دریافت هدرهاست و انتظار برای delay/هم‌روندی slot در مرحله slot_wait می‌آید.
+
+import weakref
+
+from itemadapter import is_item
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from utils.crawl_trace import Tracer
+
+TRACE_META_KEY = "_crawl_trace"
+
+_tracers = weakref.WeakKeyDictionary()
+
+
+def tracer_for(crawler):
+    """یک Tracer برای هر crawler (مشترک بین extension و spider middleware)."""
+    tracer = _tracers.get(crawler)
+    if tracer is None:
+        settings = crawler.settings
+        tracer = _tracers[crawler] = Tracer(
+            settings.get("TRACE_PATH", "crawl_trace.jsonl"),
+            settings.getfloat("TRACE_SAMPLE_RATE", 0.1),
+        )
+        tracer.pending = {}
+    return tracer
+
+
+def _record(request):
+    return request.meta.get(TRACE_META_KEY) if request is not None else None
+
+
+class RequestTracingExtension:
+    """مراحل صف، دانلود و خروجی آیتم‌ها را از روی سیگنال‌ها علامت می‌زند."""
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("TRACE_ENABLED"):
+            raise NotConfigured
+        ext = cls(tracer_for(crawler))
+        crawler.signals.connect(ext.request_scheduled, signal=signals.request_scheduled)
+        crawler.signals.connect(ext.request_dropped, signal=signals.request_dropped)
+        crawler.signals.connect(
+            ext.request_reached_downloader, signal=signals.request_reached_downloader
+        )
+        crawler.signals.connect(ext.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(ext.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(ext.item_done, signal=signals.item_scraped)
+        crawler.signals.connect(ext.item_done, signal=signals.item_dropped)
+        crawler.signals.connect(ext.item_done, signal=signals.item_error)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def request_scheduled(self, request, spider):
+        if TRACE_META_KEY in request.meta:
+            # retry یا redirect: همان رکورد ادامه پیدا می‌کند
+            return
+        record = self.tracer.start(request.url)
+        if record is None:
+            return
+        record.mark("queued")
+        request.meta[TRACE_META_KEY] = record
+        self.tracer.pending[id(record)] = record
+
+    def request_dropped(self, request, spider):
+        record = _record(request)
+        if record is not None:
+            self.tracer.pending.pop(id(record), None)
+
+    def request_reached_downloader(self, request, spider):
+        record = _record(request)
+        if record is not None:
+            record.mark("dequeued")
+
+    def headers_received(self, headers, body_length, request, spider):
+        record = _record(request)
+        if record is not None:
+            record.mark("ttfb")
+
+    def response_downloaded(self, response, request, spider):
+        record = _record(request)
+        if record is not None:
+            record.mark("downloaded")
+            record.status = response.status
+            # download_latency در http11 تا رسیدن هدرهاست، نه پایان بدنه
+            latency = request.meta.get("download_latency")
+            ttfb = record.stages.get("ttfb")
+            if latency is not None and ttfb is not None:
+                record.stages["sent"] = round(ttfb - latency, 6)
+
+    def item_done(self, item, response, spider, **kwargs):
+        record = _record(getattr(response, "request", None))
+        if record is None:
+            return
+        record.mark("exported")
+        record.pending_items -= 1
+        if record.pending_items <= 0 and "parse_end" in record.stages:
+            self._finish(record)
+
+    def _finish(self, record):
+        if self.tracer.pending.pop(id(record), None) is not None:
+            self.tracer.finish(record)
+
+    def spider_closed(self, spider):
+        for record in list(self.tracer.pending.values()):
+            self.tracer.finish(record, incomplete=True)
+        self.tracer.pending.clear()
+        self.tracer.close()
+
+
+class RequestTracingMiddleware:
+    """
+    مرحله parse/extract (باید نزدیک‌ترین spider middleware به spider باشد).
+    اگر callback آیتمی تولید نکند رکورد همین‌جا نوشته می‌شود؛ در غیر این صورت
+    بعد از خروج آخرین آیتم از pipelineها.
+    """
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("TRACE_ENABLED"):
+            raise NotConfigured
+        return cls(tracer_for(crawler))
+
+    def process_spider_input(self, response, spider=None):
+        record = _record(response.request)
+        if record is not None:
+            record.mark("parse_start")
+        return None
+
+    def _parse_finished(self, record, items):
+        record.mark("parse_end")
+        record.pending_items += items
+        if record.pending_items <= 0 and self.tracer.pending.pop(id(record), None):
+            self.tracer.finish(record)
+
+    def process_spider_output(self, response, result, spider=None):
+        record = _record(response.request)
+        if record is None:
+            yield from result
+            return
+        items = 0
+        for obj in result:
+            items += is_item(obj)
+            yield obj
+        self._parse_finished(record, items)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        record = _record(response.request)
+        items = 0
+        async for obj in result:
+            items += is_item(obj)
+            yield obj
+        if record is not None:
+            self._parse_finished(record, items)
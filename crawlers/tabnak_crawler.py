@@ -1,24 +1,44 @@
 import requests
 import re
-from bs4 import BeautifulSoup
-import csv
 import sys
 from datetime import datetime
 import os
 import time
 import locale 
 
+# ریشه مخزن برای دسترسی به ماژول‌های مشترک utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from utils.article_body import BodyRules, extract_body
+from utils.crawl_metrics import CrawlMetrics, site_of
+from utils.crawl_trace import Tracer, traced_get
+from utils.http_session import ResponseSkipped, shared_session
+from utils.news_record import NewsRecord
+from utils.page_stream import incremental_enabled, parse_page, read_page
+from utils.partitioned_output import PartitionedCsvWriter
+
 # ---- تنظیمات و مسیرها ----
 SERVER_URL = "https://www.tabnak.ir/fa/news/"
 PATH_LOG = "./log/tabnak_id.log"
-OUTPUT_CSV = "Tabnak_ID_Dataset.csv"
+# خروجی پارتیشن‌بندی‌شده: output/site=tabnak/year=1399/month=07/part-0001.csv
+OUTPUT_DIR = os.environ.get("TABNAK_OUTPUT_DIR", "output")
+OUTPUT_FIELDS = ["title", "abstract", "body", "date_georgian_iso", "link"]
+# سقف اندازه هر part (بایت)
+PART_MAX_BYTES = int(os.environ.get("TABNAK_PART_MAX_BYTES", 128 * 1024 * 1024))
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+# مکث بین خبرها (ثانیه)؛ در آزمون بار روی شبیه‌ساز محلی 0
+CRAWL_DELAY = float(os.environ.get("TABNAK_CRAWL_DELAY", 1))
+# عنصرهای لازم صفحه خبر؛ خواندن و تجزیه پاسخ بعد از بسته شدن همه آن‌ها متوقف می شود
+# (CRAWL_INCREMENTAL_PARSE=0: خواندن کامل، CRAWL_EARLY_CLOSE=1: بستن اتصال به جای خواندن بقیه)
+PAGE_FIELDS = {
+    "title": "h1.Htag, h1.title",
+    "abstract": "div.subtitle, div.lead",
+    "body": "div.body",
+    "date": "span.en_date",
+}
+BODY_RULES = BodyRules(root="div.body")
 # **اندازه بچ برای نوشتن روی دیسک**
 BATCH_SIZE = 10 
 
-# اطمینان از وجود پوشه log
-os.makedirs("log", exist_ok=True)
-
 # **تابع کمکی برای حذف کاراکترهای نامرئی جهت دهی**
 def clean_rtl_chars(text):
     """کاراکترهای Left-to-Right Mark (U+200E) و Right-to-Left Mark (U+200F) را حذف می کند."""
@@ -51,28 +71,21 @@ def initialize_crawl_range():
 
     return int(start_id), int(end_id)
 
-def ensure_csv_header():
-    """اطمینان حاصل می کند که فایل CSV وجود دارد و هدر آن نوشته شده است."""
-    
-    # **بررسی می کند که آیا فایل وجود ندارد یا وجود دارد اما خالی است (اندازه 0).**
-    write_header = not os.path.exists(OUTPUT_CSV) or (os.path.exists(OUTPUT_CSV) and os.path.getsize(OUTPUT_CSV) == 0)
+def open_output():
+    """نویسنده CSV پارتیشن‌بندی‌شده (بر اساس ماه شمسی و اندازه) را می سازد."""
+    # partهای نیمه‌کاره اجرای قطع‌شده قبلی همین‌جا بازیابی و نهایی می شوند
+    return PartitionedCsvWriter(OUTPUT_DIR, "tabnak", OUTPUT_FIELDS, max_bytes=PART_MAX_BYTES)
 
-    if write_header:
-        with open(OUTPUT_CSV, "w", newline='', encoding="utf-8") as f:
-            # **CSV Writer را با Quote All تنظیم می کنیم تا از مشکل نقل قول گذاری متن جلوگیری شود.**
-            writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-            writer.writerow(["title", "abstract", "body", "date_georgian_iso", "link"])
-
-def write_batch_and_update_log(data_buffer, last_successful_id, end_id):
+def write_batch_and_update_log(output, data_buffer, last_successful_id, end_id):
     """داده های جمع آوری شده را در CSV می نویسد و فایل لاگ را به روز می کند."""
     if not data_buffer:
         return
 
     try:
-        # 1. نوشتن داده ها در CSV
-        with open(OUTPUT_CSV, "a", newline='', encoding="utf-8") as f:
-            writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-            writer.writerows(data_buffer)
+        # 1. نوشتن داده ها در part جاری هر ماه و انتقال آن به دیسک
+        for record in data_buffer:
+            output.write(record)
+        output.flush()
 
         # 2. به روزرسانی لاگ (فقط در صورت موفقیت آمیز بودن نوشتن)
         # لاگ را به ID بعدی که باید شروع شود، تنظیم می کنیم.
@@ -89,102 +102,174 @@ def write_batch_and_update_log(data_buffer, last_successful_id, end_id):
         print(f"FATAL WRITE ERROR: Could not write batch to disk. Error: {e}")
 
 
+def parse_news(html, link=""):
+    """
+    استخراج NewsRecord (عنوان، لید، متن، تاریخ میلادی ISO) از HTML صفحه خبر.
+    خروجی: (record, None) یا (None, دلیل رد شدن) مثل missing_title / missing_body / bad_date.
+    """
+    # تجزیه جریانی: بعد از بسته شدن عنصرهای PAGE_FIELDS بقیه صفحه تجزیه نمی شود
+    return record_from_page(parse_page(html, PAGE_FIELDS), link)
+
+
+def record_from_page(page, link=""):
+    """NewsRecord از عنصرهای PageStream (utils/page_stream.py)؛ خروجی مثل parse_news."""
+    # ---- استخراج داده ها و تمیزسازی (Cleanup) ----
+
+    # 1. عنوان (تیتر)
+    if page.elements["title"] is None:
+        return None, "missing_title"
+    title = clean_rtl_chars(page.text("title")) # **حذف کاراکترهای نامرئی**
+
+    # 2. خلاصه (لید)
+    subtitle = clean_rtl_chars(page.text("abstract")) # **حذف کاراکترهای نامرئی**
+
+    # 3. متن اصلی (بدنه)؛ پاراگراف‌ها با \n، تبلیغ و پانویس داخل بدنه کنار گذاشته می شوند
+    body_tag = page.elements["body"]
+    body = extract_body(body_tag, BODY_RULES) if body_tag is not None else ""
+    body = clean_rtl_chars(body) # **حذف کاراکترهای نامرئی از متن نهایی**
+    if not body:
+        return None, "missing_body"
+
+    # 4. تاریخ میلادی (Gregorian) - تمرکز بر روی en_date
+    raw_date = page.text("date")
+    date_iso = ""
+
+    if raw_date:
+        try:
+            current_locale = locale.getlocale(locale.LC_TIME)
+            locale.setlocale(locale.LC_TIME, 'C') 
+            
+            cleaned_date = re.sub(r'\s+', ' ', raw_date).strip()
+
+            # فرمت: DD Month YYYY (مثلاً 02 September 2020)
+            date_obj = datetime.strptime(cleaned_date, "%d %B %Y")
+            date_iso = date_obj.date().isoformat() # تبدیل به فرمت استاندارد YYYY-MM-DD
+
+        except ValueError:
+            print(f"Warning: Date format error for raw date: '{raw_date}'")
+            date_iso = raw_date
+        finally:
+            locale.setlocale(locale.LC_TIME, current_locale)
+
+    if not date_iso or date_iso == raw_date:
+        return None, "bad_date"
+    return NewsRecord(
+        site="tabnak", title=title, abstract=subtitle, body=body, date_georgian_iso=date_iso, link=link
+    ), None
+
+
 def crawl():
     """حلقه اصلی کراولر را اجرا می کند."""
+    # اطمینان از وجود پوشه log
+    os.makedirs("log", exist_ok=True)
     start_id, end_id = initialize_crawl_range()
-    ensure_csv_header()
+    output = open_output()
     
     headers = {'User-Agent': USER_AGENT}
+    # نشست مشترک: فشرده‌سازی، رد پاسخ‌های غیر HTML/بزرگ و رسانه، گزارش بایت به ازای هر خبر
+    session = shared_session()
     data_buffer = [] # **بافر برای جمع آوری داده ها**
+    # معیارها: CRAWL_METRICS_PORT / CRAWL_METRICS_JSON (متغیر محیطی)
+    metrics = CrawlMetrics.from_env()
+    site = site_of(SERVER_URL)
+    # ردیابی مراحل: CRAWL_TRACE_PATH / CRAWL_TRACE_SAMPLE (متغیر محیطی)
+    tracer = Tracer.from_env()
+    incremental = incremental_enabled()
 
-    for current_id in range(start_id, end_id):
-        link = SERVER_URL + str(current_id)
-        print(f"[{current_id}/{end_id}] Fetching: {link}")
+    done_id = start_id - 1
+    try:
+        for current_id in range(start_id, end_id):
+            # همه IDهای قبلی تمام شده‌اند (ذخیره در بافر یا رد شده)
+            done_id = current_id - 1
+            link = SERVER_URL + str(current_id)
+            print(f"[{current_id}/{end_id}] Fetching: {link}")
+            trace = tracer.start(link, site) if tracer else None
+            if trace:
+                trace.mark("queued")
 
-        try:
-            response = requests.get(link, timeout=15, headers=headers)
+            try:
+                metrics.observe_request(site)
+                response = traced_get(
+                    trace, session.get, link, stream=incremental, timeout=15, headers=headers
+                )
+                page = None
+                if incremental and response.status_code == 200:
+                    # خواندن و تجزیه هم‌زمان؛ زمان تجزیه جریانی جزو download حساب می شود
+                    page = read_page(response, PAGE_FIELDS, session=session)
+                    if trace:
+                        trace.mark("downloaded")
+                metrics.observe_response(
+                    site, response.status_code,
+                    page.bytes_read if page is not None else len(response.content),
+                    response.elapsed.total_seconds(),
+                )
             
-            # اگر 404 یا کد دیگری بود، ادامه بده
-            if response.status_code != 200:
-                continue
+                # اگر 404 یا کد دیگری بود، ادامه بده
+                if response.status_code != 200:
+                    metrics.observe_drop(f"http_{response.status_code}")
+                    continue
 
-            soup = BeautifulSoup(response.text, "html.parser")
+                parse_started = time.perf_counter()
+                if trace:
+                    trace.mark("parse_start")
+                if page is not None:
+                    record, drop_reason = record_from_page(page, link)
+                else:
+                    record, drop_reason = parse_news(response.text, link)
+                metrics.observe_parse("parse_news", time.perf_counter() - parse_started)
+                if trace:
+                    trace.mark("parse_end")
+                if record is None:
+                    metrics.observe_drop(drop_reason)
+                    continue
 
-            # ---- استخراج داده ها و تمیزسازی (Cleanup) ----
-            
-            # 1. عنوان (تیتر)
-            title_tag = soup.select_one('h1.Htag, h1.title') 
-            if not title_tag: continue
-            title = clean_rtl_chars(title_tag.get_text(strip=True)) # **حذف کاراکترهای نامرئی**
-
-            # 2. خلاصه (لید)
-            subtitle_tag = soup.select_one('div.subtitle, div.lead')
-            subtitle = clean_rtl_chars(subtitle_tag.get_text(strip=True)) if subtitle_tag else "" # **حذف کاراکترهای نامرئی**
-
-            # 3. متن اصلی (بدنه)
-            body_tag = soup.select_one('div.body, div.body div.rte')
-            body_parts = []
-            if body_tag:
-                for tag in body_tag.find_all(['p', 'div', 'li']):
-                    text = tag.get_text(strip=True)
-                    if text:
-                        body_parts.append(text)
-            
-            body = '\n'.join(body_parts) if body_parts else body_tag.get_text(strip=True) if body_tag else ""
-            body = clean_rtl_chars(body) # **حذف کاراکترهای نامرئی از متن نهایی**
-            if not body: continue
-
-            # 4. تاریخ میلادی (Gregorian) - تمرکز بر روی en_date
-            date_en_tag = soup.select_one('span.en_date') 
-            date_iso = ""
-
-            if date_en_tag:
-                raw_date = date_en_tag.get_text(strip=True)
-                
-                try:
-                    current_locale = locale.getlocale(locale.LC_TIME)
-                    locale.setlocale(locale.LC_TIME, 'C') 
-                    
-                    cleaned_date = re.sub(r'\s+', ' ', raw_date).strip()
-
-                    # فرمت: DD Month YYYY (مثلاً 02 September 2020)
-                    date_obj = datetime.strptime(cleaned_date, "%d %B %Y")
-                    date_iso = date_obj.date().isoformat() # تبدیل به فرمت استاندارد YYYY-MM-DD
-
-                except ValueError:
-                    print(f"Warning: Date format error for raw date: '{raw_date}'")
-                    date_iso = raw_date
-                finally:
-                    locale.setlocale(locale.LC_TIME, current_locale)
-            
-            if not date_iso or date_iso == raw_date:
+                # ---- ذخیره داده ها در بافر ----
+                data_buffer.append(record)
+                done_id = current_id
+                metrics.observe_item(site)
+                session.bandwidth.observe_item(link)
+
+                # **بررسی بچ برای نوشتن روی دیسک**
+                if len(data_buffer) >= BATCH_SIZE:
+                    write_batch_and_update_log(output, data_buffer, current_id, end_id)
+                metrics.set_queue_depth("write_buffer", len(data_buffer))
+                if trace:
+                    trace.mark("exported")
+
+                # اعمال تأخیر برای جلوگیری از مسدود شدن IP (Fair Play)
+                time.sleep(CRAWL_DELAY)
+
+            except ResponseSkipped as e:
+                metrics.observe_drop(e.reason)
+                print(f"Skipped ID {current_id}: {e}")
+                continue
+            except requests.exceptions.Timeout:
+                metrics.observe_drop("timeout")
+                print(f"Timeout occurred for ID {current_id}. Skipping.")
+                time.sleep(5) 
+                continue
+            except Exception as e:
+                metrics.observe_drop(type(e).__name__)
+                print(f"An unexpected error occurred at ID {current_id}: {e}")
+                time.sleep(3)
                 continue
+            finally:
+                if trace:
+                    tracer.finish(trace)
+        done_id = end_id - 1
+    finally:
+        # پایان حلقه، Ctrl-C یا خطا: بچ باقی‌مانده نوشته و لاگ تا آخرین ID تمام‌شده جلو می‌رود
+        try:
+            if data_buffer:
+                print(f"Writing final batch of {len(data_buffer)} items.")
+                write_batch_and_update_log(output, data_buffer, done_id, end_id)
+            # نهایی‌سازی اتمیک partهای باز و به‌روزرسانی manifest
+            output.close()
+        finally:
+            metrics.close()
+            if tracer:
+                tracer.close()
+
 
-            # ---- ذخیره داده ها در بافر ----
-            # توجه: متغیر link در ابتدای حلقه به عنوان آدرس کامل خبر تعریف شده است
-            data_buffer.append([title, subtitle, body, date_iso, link])
-
-            # **بررسی بچ برای نوشتن روی دیسک**
-            if len(data_buffer) >= BATCH_SIZE:
-                write_batch_and_update_log(data_buffer, current_id, end_id)
-
-            # اعمال تأخیر برای جلوگیری از مسدود شدن IP (Fair Play)
-            time.sleep(1) 
-
-        except requests.exceptions.Timeout:
-            print(f"Timeout occurred for ID {current_id}. Skipping.")
-            time.sleep(5) 
-            continue
-        except Exception as e:
-            print(f"An unexpected error occurred at ID {current_id}: {e}")
-            time.sleep(3)
-            continue
-    
-    # ---- نوشتن بچ نهایی پس از اتمام حلقه ----
-    if data_buffer:
-        print(f"Writing final batch of {len(data_buffer)} items.")
-        # چون حلقه تمام شده است، ID لاگ را به end_id تنظیم می کنیم.
-        write_batch_and_update_log(data_buffer, end_id - 1, end_id) 
-        
 if __name__ == "__main__":
     crawl()
@@ -0,0 +1,10 @@
+# مسیرهای import تست‌ها: utils از ریشه مخزن و پکیج TabnakNews پروژه Scrapy
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRAPY_PROJECT = os.path.join(REPO_ROOT, "crawlers", "scrapy", "TabnakNews")
+
+for path in (REPO_ROOT, SCRAPY_PROJECT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
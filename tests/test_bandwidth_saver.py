@@ -0,0 +1,80 @@
+import pytest
+from scrapy import Request, Spider
+from scrapy.exceptions import IgnoreRequest, NotConfigured, StopDownload
+from scrapy.http import Headers, HtmlResponse
+from scrapy.utils.test import get_crawler
+from TabnakNews.middlewares import BandwidthSaverMiddleware
+
+URL = "https://www.tabnak.ir/fa/news/1"
+HTML = Headers({"Content-Type": "text/html; charset=utf-8"})
+
+
+class _Spider(Spider):
+    name = "bandwidth_test"
+
+
+def _middleware(**settings):
+    crawler = get_crawler(_Spider, {
+        "BANDWIDTH_SAVER_ENABLED": True,
+        "BANDWIDTH_MAX_RESPONSE_BYTES": 1000,
+        **settings,
+    })
+    crawler.stats.open_spider()
+    return BandwidthSaverMiddleware.from_crawler(crawler)
+
+
+def test_disabled_by_default():
+    with pytest.raises(NotConfigured):
+        BandwidthSaverMiddleware.from_crawler(get_crawler(_Spider))
+
+
+def test_requires_compression():
+    with pytest.raises(ValueError):
+        _middleware(COMPRESSION_ENABLED=False)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, b"gzip, deflate, br"),
+    (b"gzip, deflate", b"gzip, deflate, br"),
+    (b"gzip, BR", b"gzip, BR"),
+])
+def test_br_is_always_offered(header, expected):
+    request = Request(URL, headers={"Accept-Encoding": header} if header else None)
+    _middleware().process_request(request)
+    assert request.headers[b"Accept-Encoding"] == expected
+
+
+def test_declared_length_over_the_limit_stops_at_headers():
+    middleware, request = _middleware(), Request(URL)
+    middleware.headers_received(HTML, 1000, request, None)
+    with pytest.raises(StopDownload) as stopped:
+        middleware.headers_received(HTML, 1001, request, None)
+    assert stopped.value.fail is False
+    assert request.meta["bandwidth_skipped"] == "too_large"
+
+
+def test_chunked_body_is_stopped_once_the_limit_is_crossed():
+    middleware, request = _middleware(), Request(URL)
+    # طول نامشخص (chunked) در Twisted رشته است
+    middleware.headers_received(HTML, "UNKNOWN_LENGTH", request, None)
+    middleware.bytes_received(b"x" * 600, request, None)
+    with pytest.raises(StopDownload):
+        middleware.bytes_received(b"x" * 401, request, None)
+    assert request.meta["bandwidth_skipped"] == "too_large"
+    assert middleware.bytes["tabnak.ir"] == 1001
+
+    response = HtmlResponse(URL, body=b"x" * 1001, request=request, flags=["download_stopped"])
+    with pytest.raises(IgnoreRequest):
+        middleware.process_response(request, response)
+    assert middleware.stats.get_value("bandwidth/skipped/too_large") == 1
+    assert request not in middleware.received
+
+
+def test_exempt_requests_are_not_cut():
+    middleware = _middleware()
+    request = Request(URL, meta={"allow_non_html": True})
+    middleware.headers_received(Headers({"Content-Type": "application/pdf"}), 5000, request, None)
+    middleware.bytes_received(b"x" * 5000, request, None)
+    assert "bandwidth_skipped" not in request.meta
+    response = HtmlResponse(URL, body=b"x" * 5000, request=request)
+    assert middleware.process_response(request, response) is response
@@ -0,0 +1,74 @@
+import json
+
+import jdatetime
+import pytest
+from scrapy import Request
+from scrapy.crawler import Crawler
+from scrapy.http import HtmlResponse
+from TabnakNews.httpcache import archive_date_of
+from TabnakNews.spiders.cms_archive import CmsArchiveSpider, parse_news_date
+
+ARCHIVE = "https://www.tabnak.ir/fa/archive?rpp=100&service_id=24&from_date=1402/01/05&to_date=1402/01/05&p=1"
+
+
+@pytest.mark.parametrize("raw, date_format, expected", [
+    ("21 October 2023", "%d %B %Y", "2023-10-21"),
+    ("‏۳ MAY ۲۰۲۳ ", "%d %B %Y", "2023-05-03"),
+    ("3 Sep 2023", "%d %b %Y", "2023-09-03"),
+    ("3 Sept 2023", "%d %b %Y", "2023-09-03"),
+    ("31 February 2023", "%d %B %Y", None),
+    ("21 Octember 2023", "%d %B %Y", None),
+    ("۱۸ مهر ۱۳۹۷ - ۰۹:۰۰", "jalali", "2018-10-10"),
+    ("", "%d %B %Y", None),
+])
+def test_parse_news_date(raw, date_format, expected):
+    assert parse_news_date(raw, date_format) == expected
+
+
+@pytest.mark.parametrize("url, meta, expected", [
+    (ARCHIVE, {"archive_date": "1402/01/05"}, jdatetime.date(1402, 1, 5)),
+    (ARCHIVE, {}, jdatetime.date(1402, 1, 5)),
+    ("https://www.irna.ir/archive?yr=1401&mn=12&dy=29", {}, jdatetime.date(1401, 12, 29)),
+    ("https://www.tabnak.ir/fa/archive", {}, jdatetime.date.today()),
+    ("https://www.tabnak.ir/fa/news/1041860", {"archive_date": "1402/01/05"}, None),
+])
+def test_archive_date_of(url, meta, expected):
+    assert archive_date_of(Request(url, meta=meta)) == expected
+
+
+def _spider(settings=None, **kwargs):
+    # from_crawler هنوز DOWNLOAD_SLOTS را تنظیم می‌کند؛ get_crawler تنظیمات را freeze کرده است
+    crawler = Crawler(CmsArchiveSpider, settings)
+    return CmsArchiveSpider.from_crawler(crawler, sites="tabnak", **kwargs)
+
+
+def _listing(spider, news_ids, page=1):
+    meta = {"site": "tabnak", "category_name": "سیاسی", "category_id": 24,
+            "archive_date": "1402/01/05", "page": page}
+    links = "".join(f'<a class="title5" href="/fa/news/{n}/slug">خبر</a>' for n in news_ids)
+    request = Request(ARCHIVE, meta=meta)
+    body = f'<div class="linear_news">{links}</div>'.encode()
+    return list(spider.parse_archive(HtmlResponse(ARCHIVE, body=body, request=request)))
+
+
+def test_listing_follows_the_next_page():
+    spider = _spider(from_date="1402/01/05", to_date="1402/01/05", max_pages_per_day="2")
+    *articles, next_page = _listing(spider, [103, 102])
+    assert [r.url for r in articles] == ["https://www.tabnak.ir/fa/news/103", "https://www.tabnak.ir/fa/news/102"]
+    assert [r.meta["news_id"] for r in articles] == [103, 102]
+    assert all(r.errback == spider.article_failed for r in articles)
+    assert next_page.meta["page"] == 2 and "p=2" in next_page.url
+    assert "from_date=1402/01/05" in next_page.url
+    # سقف صفحه‌ها و صفحه خالی
+    assert [r.meta.get("page") for r in _listing(spider, [101], page=2)] == [None]
+    assert _listing(spider, []) == []
+
+
+def test_incremental_listing_stops_at_known_ids(tmp_path):
+    (tmp_path / "tabnak.json").write_text(json.dumps({"سیاسی": {"max_news_id": 101}}), encoding="utf-8")
+    spider = _spider({"CRAWL_STATE_DIR": str(tmp_path)}, incremental="1", from_date="1402/01/05")
+    requests = _listing(spider, [103, 102, 101, 100])
+    # خبرهای شناخته‌شده درخواست نمی‌شوند و صفحه بعد هم خواسته نمی‌شود
+    assert [r.meta.get("news_id") for r in requests] == [103, 102]
+    state = spider.crawl_states["tabnak"]
+    assert state._completed["سیاسی"] == {jdatetime.date(1402, 1, 5)}
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+from TabnakNews.concurrency import AdaptiveConcurrencyMiddleware, parse_retry_after
+from twisted.internet.error import TimeoutError as TxTimeoutError
+
+SLOT = "www.tabnak.ir"
+
+
+class _Spider(Spider):
+    name = "concurrency_test"
+
+
+@pytest.fixture
+def middleware():
+    crawler = get_crawler(_Spider, {
+        "ADAPTIVE_CONCURRENCY_ENABLED": True,
+        "ADAPTIVE_CONCURRENCY_MIN": 2,
+        "ADAPTIVE_CONCURRENCY_MAX": 8,
+        "ADAPTIVE_CONCURRENCY_TARGET_P95": 2.0,
+        "ADAPTIVE_CONCURRENCY_MIN_SAMPLES": 5,
+        "DOWNLOAD_DELAY": 0.5,
+        "AUTOTHROTTLE_ENABLED": False,
+    })
+    crawler.stats.open_spider()
+    return AdaptiveConcurrencyMiddleware.from_crawler(crawler)
+
+
+def _observe(middleware, count, status=200, latency=0.2, headers=None):
+    for _ in range(count):
+        request = Request(f"https://{SLOT}/fa/news/1",
+                          meta={"download_slot": SLOT, "download_latency": latency})
+        middleware.process_response(request, Response(request.url, status=status, headers=headers))
+
+
+def _adjust(middleware, concurrency=4, delay=0.5):
+    slot = SimpleNamespace(concurrency=concurrency, delay=delay)
+    middleware._adjust_slot(SLOT, slot, middleware.windows.pop(SLOT))
+    return slot
+
+
+def test_healthy_slot_probes_up_to_the_max(middleware):
+    _observe(middleware, 10)
+    slot = _adjust(middleware, concurrency=4, delay=3.0)
+    assert (slot.concurrency, slot.delay) == (5, 1.5)
+    _observe(middleware, 10)
+    # سقف ADAPTIVE_CONCURRENCY_MAX و delay پایه DOWNLOAD_DELAY
+    slot = _adjust(middleware, concurrency=8, delay=0.6)
+    assert (slot.concurrency, slot.delay) == (8, 0.5)
+    assert middleware.decisions[-1]["reason"] == "healthy, probing for more throughput"
+
+
+def test_high_p95_latency_steps_down(middleware):
+    _observe(middleware, 19, latency=0.2)
+    _observe(middleware, 1, latency=5.0)
+    assert _adjust(middleware).concurrency == 5  # یک نمونه کند از ۲۰ در p95 نیست
+    _observe(middleware, 18, latency=0.2)
+    _observe(middleware, 2, latency=5.0)
+    slot = _adjust(middleware)
+    assert slot.concurrency == 3
+    assert middleware.decisions[-1]["reason"].startswith("p95 5.00s over target")
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_errors_over_budget_halve_concurrency(middleware, status):
+    _observe(middleware, 9)
+    _observe(middleware, 1, status=status)
+    slot = _adjust(middleware, concurrency=6)
+    assert slot.concurrency == 3
+    assert "over budget" in middleware.decisions[-1]["reason"]
+
+
+def test_decrease_is_clamped_to_the_min(middleware):
+    _observe(middleware, 10, status=429)
+    assert _adjust(middleware, concurrency=3).concurrency == 2
+
+
+def test_errors_with_few_samples_still_decrease(middleware):
+    request = Request(f"https://{SLOT}/fa/news/1", meta={"download_slot": SLOT})
+    middleware.process_exception(request, TxTimeoutError())
+    _observe(middleware, 1)
+    assert _adjust(middleware, concurrency=8).concurrency == 4
+    _observe(middleware, 2)
+    assert _adjust(middleware, concurrency=8).concurrency == 8
+    assert middleware.decisions[-1]["reason"] == "not enough samples"
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retry_after_sets_the_delay(middleware, status):
+    _observe(middleware, 10)
+    _observe(middleware, 1, status=status, headers={"Retry-After": "7"})
+    _observe(middleware, 1, status=status, headers={"Retry-After": "3"})
+    slot = _adjust(middleware, concurrency=8, delay=0.5)
+    assert (slot.concurrency, slot.delay) == (4, 7.0)
+    assert middleware.decisions[-1]["reason"] == "Retry-After 7.0s"
+    assert middleware.stats.get_value(f"adaptive_concurrency/{SLOT}/changes") == 1
+
+
+def test_retry_after_is_ignored_on_other_statuses(middleware):
+    _observe(middleware, 10, status=200, headers={"Retry-After": "60"})
+    assert _adjust(middleware).delay == 0.5
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(b"120") == 120.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0  # تاریخ گذشته
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,94 @@
+import csv
+import json
+import os
+import random
+
+import pytest
+
+from utils.corpus_stats import (
+    STATS_NAME,
+    CorpusStats,
+    LengthSketch,
+    collect,
+    file_stats,
+)
+
+
+def _exact(values, q):
+    return sorted(values)[int(q * (len(values) - 1))]
+
+
+def test_sketch_quantiles_are_within_relative_accuracy():
+    rng = random.Random(1)
+    values = [int(rng.lognormvariate(7, 1.2)) for _ in range(20000)] + [0] * 50
+    sketch = LengthSketch()
+    for value in values:
+        sketch.add(value)
+    for q in (0.5, 0.9, 0.99):
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact + 1
+    assert sketch.quantile(0.0) == 0
+    assert LengthSketch().quantile(0.5) is None
+
+
+def test_sketch_merge_and_round_trip():
+    rng = random.Random(2)
+    values = [rng.randint(1, 50000) for _ in range(1000)]
+    whole, left, right = LengthSketch(), LengthSketch(), LengthSketch()
+    for number, value in enumerate(values):
+        whole.add(value)
+        (left if number % 2 else right).add(value)
+    merged = LengthSketch.from_dict(json.loads(json.dumps(left.merge(right).to_dict())))
+    assert merged.count == whole.count
+    assert merged.quantile(0.9) == whole.quantile(0.9)
+    with pytest.raises(ValueError):
+        LengthSketch.from_dict({**whole.to_dict(), "gamma": 1.5})
+
+
+def test_counts_by_site_category_and_month():
+    stats = CorpusStats()
+    stats.add({"site": "tabnak", "category": "ورزشی", "date_georgian_iso": "2021-03-21", "body": "x" * 10})
+    stats.add({"category": "ورزشی", "date_shamsi": "1400/01/15", "title": "t"}, site="tabnak")
+    stats.add({"site": "entekhab", "category": "سیاسی", "date_georgian_iso": "2021-03-20"})
+    assert len(stats) == 3
+    assert stats.grouped(("site", "month")) == {
+        ("tabnak", "1400/01"): 2, ("entekhab", "1399/12"): 1,
+    }
+    assert stats.missing_rates("tabnak")["title"] == 0.5
+    summary = stats.summary(by=("category",))
+    assert summary["site"] == {"entekhab": 1, "tabnak": 2}
+    assert summary["by"] == [["سیاسی", 1], ["ورزشی", 2]]
+    restored = CorpusStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+    assert restored.summary() == stats.summary()
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, ["news_id", "category", "body", "date_georgian_iso"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_file_stats_are_cached_next_to_the_file(tmp_path):
+    directory = tmp_path / "site=tabnak"
+    directory.mkdir()
+    first, second = directory / "part-0001.csv", directory / "part-0002.csv"
+    _write_csv(first, [{"news_id": 1, "category": "ورزشی", "body": "متن", "date_georgian_iso": "2021-03-21"}])
+    _write_csv(second, [{"news_id": 2, "category": "سیاسی", "body": "", "date_georgian_iso": "2021-04-21"}])
+
+    total, cached = collect([str(first), str(second)])
+    assert (len(total), cached) == (2, 0)
+    assert set(total.rows) == {"tabnak"}
+    with open(directory / STATS_NAME, encoding="utf-8") as f:
+        assert sorted(json.load(f)["files"]) == ["part-0001.csv", "part-0002.csv"]
+
+    total, cached = collect([str(first), str(second)])
+    assert (len(total), cached) == (2, 2)
+
+    # فایل تغییرکرده دوباره خوانده می‌شود و ورودی فایل حذف‌شده از کش پاک می‌شود
+    _write_csv(first, [{"news_id": 1, "category": "ورزشی", "body": "", "date_georgian_iso": ""}] * 3)
+    os.remove(second)
+    stats, hit = file_stats(str(first))
+    assert (len(stats), hit) == (3, False)
+    with open(directory / STATS_NAME, encoding="utf-8") as f:
+        assert sorted(json.load(f)["files"]) == ["part-0001.csv"]
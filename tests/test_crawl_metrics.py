@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+from scrapy.exceptions import DropItem
+from TabnakNews.metrics import drop_reason
+
+from utils import crawl_metrics
+from utils.crawl_metrics import CrawlMetrics, MetricsRegistry
+
+
+def test_prometheus_exposition():
+    metrics = CrawlMetrics()
+    metrics.observe_request("tabnak.ir")
+    metrics.observe_response("tabnak.ir", 200, nbytes=1000, latency=0.3)
+    metrics.observe_response("tabnak.ir", 200, latency=12.0)
+    metrics.observe_drop('bad"reason')
+    text = metrics.registry.render_prometheus()
+    lines = text.splitlines()
+    assert "# TYPE crawl_requests_total counter" in lines
+    assert 'crawl_requests_total{site="tabnak.ir"} 1' in lines
+    assert 'crawl_responses_total{site="tabnak.ir",status="200"} 2' in lines
+    assert 'crawl_bytes_downloaded_total{site="tabnak.ir"} 1000' in lines
+    assert 'crawl_dropped_total{reason="bad\\"reason"} 1' in lines
+    # bucketها تجمعی‌اند و +Inf برابر count است
+    assert 'crawl_download_latency_seconds_bucket{site="tabnak.ir",le="0.25"} 0' in lines
+    assert 'crawl_download_latency_seconds_bucket{site="tabnak.ir",le="0.5"} 1' in lines
+    assert 'crawl_download_latency_seconds_bucket{site="tabnak.ir",le="10.0"} 1' in lines
+    assert 'crawl_download_latency_seconds_bucket{site="tabnak.ir",le="+Inf"} 2' in lines
+    assert 'crawl_download_latency_seconds_count{site="tabnak.ir"} 2' in lines
+    assert 'crawl_download_latency_seconds_sum{site="tabnak.ir"} 12.3' in lines
+    assert text.endswith("\n")
+
+
+def test_rates_between_calls(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(crawl_metrics.time, "time", lambda: now[0])
+    metrics = CrawlMetrics()
+    for _ in range(10):
+        metrics.observe_request("tabnak.ir")
+    metrics.observe_item("tabnak.ir")
+    metrics.observe_bytes("tabnak.ir", 5000)
+    now[0] += 2
+    assert metrics.rates() == {"requests_per_sec": 5.0, "items_per_sec": 0.5, "bytes_per_sec": 2500.0}
+    now[0] += 4
+    metrics.observe_request("tabnak.ir")
+    assert metrics.rates() == {"requests_per_sec": 0.25, "items_per_sec": 0.0, "bytes_per_sec": 0.0}
+
+
+def test_counter_total_is_consistent_under_threads():
+    counter = MetricsRegistry().counter("c", "test", ["site"])
+
+    def work(site):
+        for _ in range(2000):
+            counter.inc(site=site)
+            counter.total()
+
+    threads = [threading.Thread(target=work, args=(f"s{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.total() == 8000
+
+
+@pytest.mark.parametrize("exception, label", [
+    (DropItem("Near-duplicate of tabnak:1041860 (distance 2)"), "DropItem"),
+    (ValueError("https://www.tabnak.ir/fa/news/1"), "ValueError"),
+])
+def test_drop_reason_never_uses_the_message(exception, label):
+    assert drop_reason(exception) == label
+
+
+def test_drop_reason_attribute():
+    exception = DropItem("Near-duplicate of tabnak:1 (distance 0)")
+    exception.reason = "near_duplicate"
+    assert drop_reason(exception) == "near_duplicate"
+    exception.reason = "Near-duplicate of tabnak:1"
+    assert drop_reason(exception) == "DropItem"
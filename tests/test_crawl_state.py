@@ -0,0 +1,113 @@
+import json
+
+import jdatetime
+import pytest
+from scrapy import Request, Spider, signals
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.test import get_crawler
+from TabnakNews.crawl_state import CrawlState, IncrementalCrawlMixin
+from twisted.python.failure import Failure
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "tabnak.json")
+
+
+def _run(state, requested, fetched, category="سیاسی"):
+    for news_id in requested:
+        state.request_news_id(category, news_id)
+    for news_id in fetched:
+        state.observe_news_id(category, news_id)
+
+
+def test_watermark_stops_below_the_first_gap(path):
+    state = CrawlState(path)
+    _run(state, range(1, 6), [1, 2, 4, 5])
+    state.commit_news_ids()
+    assert state._data["سیاسی"]["max_news_id"] == 2
+
+
+def test_discarded_ids_do_not_hold_the_watermark(path):
+    state = CrawlState(path)
+    _run(state, range(1, 6), [1, 2, 4, 5])
+    # مثلاً dupefilter یا شکست نهایی
+    state.discard_news_id("سیاسی", 3)
+    state.commit_news_ids()
+    assert state._data["سیاسی"]["max_news_id"] == 5
+
+
+def test_partially_fetched_range(path):
+    state = CrawlState(path)
+    _run(state, range(10, 21), [*range(10, 15), *range(16, 21)])
+    _run(state, [7], [], category="ورزشی")
+    state.commit_news_ids()
+    assert state._data["سیاسی"]["max_news_id"] == 14
+    # دسته‌ای که هیچ خبری از آن نرسید ثبت نمی‌شود
+    assert "ورزشی" not in state._data
+
+
+def test_restart_resumes_from_the_saved_watermark(path):
+    state = CrawlState(path)
+    _run(state, [100, 101, 102], [100, 102])
+    state.save()
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"سیاسی": {"max_news_id": 100}}
+
+    restarted = CrawlState(path)
+    assert restarted.known_news_id("سیاسی") == 100
+    assert restarted.is_known("سیاسی", 100) and not restarted.is_known("سیاسی", 101)
+    # خبر جامانده در اجرای بعد دریافت می‌شود؛ مرز اجرای قبلی در طول اجرا ثابت می‌ماند
+    _run(restarted, [101, 103], [101, 103])
+    restarted.commit_news_ids()
+    assert restarted.known_news_id("سیاسی") == 100
+    restarted.save()
+    assert CrawlState(path).known_news_id("سیاسی") == 103
+
+
+def test_watermark_never_moves_back(path):
+    state = CrawlState(path)
+    _run(state, [50], [50])
+    state.save()
+    state = CrawlState(path)
+    _run(state, [10], [10])
+    state.commit_news_ids()
+    assert state.known_news_id("سیاسی") == 50
+    assert state._data["سیاسی"]["max_news_id"] == 50
+
+
+class _Spider(IncrementalCrawlMixin, Spider):
+    name = "state_test"
+    STATE_SITE = "tabnak"
+
+
+@pytest.fixture
+def spider(tmp_path):
+    crawler = get_crawler(_Spider, {"CRAWL_STATE_DIR": str(tmp_path)})
+    spider = _Spider.from_crawler(crawler, incremental="1")
+    spider.load_crawl_state(crawler.settings, {"tabnak": ["سیاسی"]}, jdatetime.date(1402, 1, 1))
+    return spider
+
+
+def _article(news_id):
+    return Request(f"https://www.tabnak.ir/fa/news/{news_id}",
+                   meta={"category_name": "سیاسی", "news_id": news_id})
+
+
+def test_spider_tracks_scheduled_dropped_and_failed_articles(spider):
+    send = spider.crawler.signals.send_catch_log
+    for news_id in (1, 2, 3, 4):
+        send(signals.request_scheduled, request=_article(news_id), spider=spider)
+    # درخواست غیرخبری (صفحه آرشیو) ثبت نمی‌شود
+    send(signals.request_scheduled, request=Request("https://www.tabnak.ir/fa/archive"), spider=spider)
+    state = spider.crawl_states["tabnak"]
+    assert state._requested == {"سیاسی": {1, 2, 3, 4}}
+
+    send(signals.request_dropped, request=_article(2), spider=spider)
+    failure = Failure(IgnoreRequest("offsite"))
+    failure.request = _article(3)
+    spider.article_failed(failure)
+    state.observe_news_id("سیاسی", 1)
+    state.observe_news_id("سیاسی", 4)
+    state.commit_news_ids()
+    assert state._data["سیاسی"]["max_news_id"] == 4
@@ -0,0 +1,142 @@
+import json
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+from TabnakNews.tracing import (
+    TRACE_META_KEY,
+    RequestTracingExtension,
+    RequestTracingMiddleware,
+)
+
+from utils.crawl_trace import Tracer, analyze, stage_durations, traced_get
+
+
+class _Spider(Spider):
+    name = "trace_test"
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_stage_durations_pick_the_first_available_start():
+    stages = {"queued": 0.0, "dequeued": 1.0, "sent": 1.5, "ttfb": 2.0, "downloaded": 2.5,
+              "parse_start": 2.75, "parse_end": 3.0, "exported": 3.5}
+    assert stage_durations(stages) == {
+        "queue": 1.0, "slot_wait": 0.5, "ttfb": 0.5, "download": 0.5,
+        "handoff": 0.25, "parse": 0.25, "export": 0.5,
+    }
+    # requests: اتصال تازه جدا از ttfb؛ بدون connected، ttfb از dequeued
+    assert stage_durations({"dequeued": 0.0, "connected": 0.25, "ttfb": 1.0}) == {
+        "connect": 0.25, "ttfb": 0.75,
+    }
+    assert stage_durations({"dequeued": 0.0, "ttfb": 1.0}) == {"ttfb": 1.0}
+
+
+def test_tracer_sampling_and_output(tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    sampled_out = Tracer(path, sample_rate=0.0)
+    assert sampled_out.start("https://www.tabnak.ir/") is None
+    sampled_out.close()
+    tracer = Tracer(path)
+    record = tracer.start("https://www.tabnak.ir/fa/news/1")
+    record.mark("dequeued")
+    record.mark("ttfb")
+    tracer.finish(record)
+    tracer.finish(tracer.start("https://www.entekhab.ir/fa/news/2"), incomplete=True)
+    tracer.close()
+    first, second = _lines(path)
+    assert first["site"] == "tabnak.ir" and set(first["stages"]) == {"dequeued", "ttfb"}
+    assert second["incomplete"] is True
+    per_site = analyze([path])
+    assert per_site["tabnak.ir"]["records"] == 1
+    assert per_site["entekhab.ir"]["incomplete"] == 1
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, record):
+        self.record = record
+
+    @property
+    def content(self):
+        # بدنه پس از علامت ttfb خوانده می‌شود
+        assert "ttfb" in self.record.stages
+        return b"<html></html>"
+
+
+def test_traced_get_marks_ttfb_before_reading_the_body(tmp_path):
+    tracer = Tracer(str(tmp_path / "trace.jsonl"))
+    record = tracer.start("https://www.tabnak.ir/fa/news/1")
+    calls = []
+
+    def get(url, stream=False, **kwargs):
+        calls.append(stream)
+        return _Response(record)
+
+    traced_get(record, get, record.url, timeout=5)
+    assert calls == [True]
+    assert list(record.stages) == ["dequeued", "ttfb", "downloaded"]
+    assert record.status == 200
+    # بدون رکورد همان get اصلی
+    traced_get(None, get, record.url)
+    assert calls == [True, False]
+    tracer.close()
+
+
+@pytest.fixture
+def crawler(tmp_path):
+    return get_crawler(_Spider, {
+        "TRACE_ENABLED": True,
+        "TRACE_SAMPLE_RATE": 1.0,
+        "TRACE_PATH": str(tmp_path / "trace.jsonl"),
+    })
+
+
+def test_scrapy_request_is_traced_through_every_stage(crawler, tmp_path):
+    extension = RequestTracingExtension.from_crawler(crawler)
+    middleware = RequestTracingMiddleware.from_crawler(crawler)
+    spider = _Spider()
+    request = Request("https://www.tabnak.ir/fa/news/1")
+    extension.request_scheduled(request, spider)
+    record = request.meta[TRACE_META_KEY]
+    extension.request_reached_downloader(request, spider)
+    extension.headers_received({}, 100, request, spider)
+    request.meta["download_latency"] = 0.25
+    response = HtmlResponse(request.url, status=200, body=b"<html></html>", request=request)
+    extension.response_downloaded(response, request, spider)
+    middleware.process_spider_input(response)
+    items = list(middleware.process_spider_output(response, iter([{"title": "a"}])))
+    # رکورد تا خروج آخرین آیتم از pipelineها باز می‌ماند
+    assert record.pending_items == 1
+    extension.item_done(items[0], response, spider)
+    extension.spider_closed(spider)
+
+    (line,) = _lines(str(tmp_path / "trace.jsonl"))
+    assert line["status"] == 200 and "incomplete" not in line
+    stages = line["stages"]
+    assert set(stages) == {"queued", "dequeued", "sent", "ttfb", "downloaded",
+                           "parse_start", "parse_end", "exported"}
+    # download_latency تا رسیدن هدرهاست: sent = ttfb - latency
+    assert stages["sent"] == round(stages["ttfb"] - 0.25, 6)
+
+
+def test_unfinished_requests_are_written_as_incomplete(crawler, tmp_path):
+    extension = RequestTracingExtension.from_crawler(crawler)
+    spider = _Spider()
+    queued = Request("https://www.tabnak.ir/fa/news/1")
+    dropped = Request("https://www.tabnak.ir/fa/news/2")
+    extension.request_scheduled(queued, spider)
+    extension.request_scheduled(dropped, spider)
+    extension.request_dropped(dropped, spider)
+    # retry همان رکورد را ادامه می‌دهد
+    record = queued.meta[TRACE_META_KEY]
+    extension.request_scheduled(queued.replace(dont_filter=True), spider)
+    assert extension.tracer.pending == {id(record): record}
+    extension.spider_closed(spider)
+    (line,) = _lines(str(tmp_path / "trace.jsonl"))
+    assert line["url"] == queued.url and line["incomplete"] is True
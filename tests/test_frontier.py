@@ -0,0 +1,202 @@
+import os
+import pickle
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+from TabnakNews.frontier import (
+    FrontierAckMiddleware,
+    FrontierScheduler,
+    SqliteFrontier,
+    dumps_request,
+    loads_request,
+)
+from TabnakNews.tracing import TRACE_META_KEY
+
+
+class _Spider(Spider):
+    name = "frontier_test"
+
+
+class _Opaque:
+    pass
+
+
+class _Evil:
+    def __reduce__(self):
+        return os.system, ("true",)
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = SqliteFrontier(str(tmp_path / "frontier.db"), "test")
+    yield frontier
+    frontier.close()
+
+
+def test_pop_leases_until_ack(frontier):
+    first = frontier.push(b"a", priority=0)
+    second = frontier.push(b"b", priority=5)
+    # اولویت بیشتر اول
+    assert frontier.pop("w1") == (second, b"b")
+    assert frontier.pop("w2") == (first, b"a")
+    assert frontier.pop("w1") is None
+    assert frontier.pending() == 0
+    assert frontier.in_flight() == 2
+    assert frontier.in_flight(exclude="w1") == 1
+    frontier.ack([second])
+    assert frontier.in_flight() == 1
+
+
+def test_release_requeues_or_drops(frontier):
+    frontier.push(b"a")
+    frontier.push(b"b")
+    frontier.pop("w1")
+    frontier.pop("w1")
+    assert frontier.release("w1") == 2
+    assert frontier.pending() == 2
+    frontier.pop("w1")
+    assert frontier.release("w1", drop=True) == 1
+    assert (frontier.pending(), frontier.in_flight()) == (1, 0)
+
+
+def test_reap_requeues_dead_workers_only(frontier):
+    frontier.push(b"a")
+    frontier.push(b"b")
+    frontier.heartbeat("alive")
+    frontier.pop("alive")
+    frontier.pop("dead")  # بدون heartbeat
+    assert frontier.reap(timeout=60) == 1
+    assert frontier.pending() == 1
+    assert frontier.in_flight() == 1
+
+
+def test_seen_is_shared(frontier, tmp_path):
+    assert frontier.seen(b"fp") is False
+    other = SqliteFrontier(str(tmp_path / "frontier.db"), "test")
+    try:
+        assert other.seen(b"fp") is True
+    finally:
+        other.close()
+
+
+def test_dumps_request_drops_trace_record():
+    request = Request("https://www.tabnak.ir/fa/news/1", meta={"page": 2, TRACE_META_KEY: object()})
+    data = loads_request(dumps_request(request, None))
+    assert data["url"] == request.url
+    assert data["meta"] == {"page": 2}
+    assert TRACE_META_KEY in request.meta
+
+
+def test_dumps_request_rejects_unsafe_meta():
+    request = Request("https://www.tabnak.ir/", meta={"value": _Opaque()})
+    with pytest.raises(ValueError):
+        dumps_request(request, None)
+
+
+def test_loads_request_refuses_arbitrary_globals():
+    with pytest.raises(pickle.UnpicklingError):
+        loads_request(pickle.dumps({"url": "x", "meta": {"evil": _Evil()}}))
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    crawler = get_crawler(_Spider, {
+        "FRONTIER_URL": f"sqlite:///{tmp_path / 'frontier.db'}",
+        "DUPEFILTER_CLASS": "TabnakNews.frontier.FrontierDupeFilter",
+        "SCHEDULER": "TabnakNews.frontier.FrontierScheduler",
+    })
+    scheduler = FrontierScheduler.from_crawler(crawler)
+    scheduler.open(_Spider())
+    return scheduler
+
+
+def _frontier_counts(tmp_path):
+    frontier = SqliteFrontier(str(tmp_path / "frontier.db"), "frontier_test")
+    try:
+        return frontier.pending(), frontier.in_flight()
+    finally:
+        frontier.close()
+
+
+def _answer(scheduler, request):
+    response = HtmlResponse(request.url, body=b"<html></html>", request=request)
+    scheduler.request_reached_downloader(request, scheduler.spider)
+    scheduler.request_left_downloader(request, scheduler.spider)
+    scheduler.response_received(response, request, scheduler.spider)
+    return response
+
+
+def test_scheduler_acks_after_the_callback_and_its_items(scheduler, tmp_path):
+    for page in range(2):
+        assert scheduler.enqueue_request(Request(f"https://www.tabnak.ir/fa/archive?page={page}"))
+    # تکراری از dupefilter مشترک رد می‌شود
+    assert not scheduler.enqueue_request(Request("https://www.tabnak.ir/fa/archive?page=0"))
+    first = scheduler.next_request()
+    second = scheduler.next_request()
+    response = _answer(scheduler, first)
+    _answer(scheduler, second)
+
+    # خروجی callback با دو item مصرف شد؛ ack تا پایان pipeline هر دو صبر می‌کند
+    output = list(FrontierAckMiddleware(scheduler.crawler).process_spider_output(
+        response, [{"news_id": 1}, Request("https://www.tabnak.ir/fa/news/1"), {"news_id": 2}],
+    ))
+    assert len(output) == 3
+    scheduler.item_done({"news_id": 1}, response, scheduler.spider)
+    assert scheduler.next_request() is None
+    assert scheduler.stats.get_value("frontier/acked") is None
+    scheduler.item_done({"news_id": 2}, response, scheduler.spider, exception=None)
+    scheduler.next_request()  # ackهای معوق پیش از برداشتن بعدی فرستاده می‌شوند
+    assert scheduler.stats.get_value("frontier/acked") == 1
+    assert second in scheduler.leased
+    scheduler.close("shutdown")
+    # callback دوم تمام نشده بود و به صف برمی‌گردد
+    assert _frontier_counts(tmp_path) == (1, 0)
+
+
+def test_scheduler_requeues_unfinished_requests_when_finished(scheduler, tmp_path):
+    scheduler.enqueue_request(Request("https://www.tabnak.ir/fa/news/1"))
+    _answer(scheduler, scheduler.next_request())
+    # پاسخ رسید ولی پایان callback خبر داده نشد
+    scheduler.close("finished")
+    assert _frontier_counts(tmp_path) == (1, 0)
+    assert scheduler.stats.get_value("frontier/requeued") == 1
+
+
+def test_scheduler_acks_requests_that_ended_without_a_response(scheduler, tmp_path):
+    scheduler.enqueue_request(Request("https://www.tabnak.ir/fa/news/1"))
+    request = scheduler.next_request()
+    scheduler.request_reached_downloader(request, scheduler.spider)
+    scheduler.request_left_downloader(request, scheduler.spider)
+    scheduler.close("finished")
+    assert _frontier_counts(tmp_path) == (0, 0)
+    assert scheduler.stats.get_value("frontier/acked") == 1
+
+
+def test_interrupted_callback_is_not_acked(scheduler):
+    scheduler.enqueue_request(Request("https://www.tabnak.ir/fa/news/1"))
+    request = scheduler.next_request()
+    response = _answer(scheduler, request)
+    output = FrontierAckMiddleware(scheduler.crawler).process_spider_output(response, iter([{}, {}]))
+    next(output)
+    output.close()
+    assert request in scheduler.leased
+    assert not scheduler.finished
+    scheduler.close("shutdown")
+
+
+def test_scheduler_drops_unserializable_requests(scheduler):
+    assert not scheduler.enqueue_request(Request("https://www.tabnak.ir/", meta={"value": _Opaque()}))
+    assert scheduler.stats.get_value("frontier/unserializable") == 1
+    assert len(scheduler) == 0
+    scheduler.close("finished")
+
+
+def test_scheduler_skips_rejected_entries(scheduler):
+    scheduler.frontier.push(pickle.dumps({"evil": _Evil()}), priority=10)
+    scheduler.enqueue_request(Request("https://www.tabnak.ir/fa/news/2"))
+    request = scheduler.next_request()
+    assert request.url == "https://www.tabnak.ir/fa/news/2"
+    assert scheduler.stats.get_value("frontier/rejected") == 1
+    scheduler.close("finished")
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from urllib3.util.retry import RequestHistory
+
+from utils.http_session import (
+    RETRY_BACKOFF_MAX,
+    BandwidthStats,
+    ResponseSkipped,
+    make_retry,
+    make_session,
+)
+
+PAGE = "<html><body>" + "خبر " * 200 + "</body></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    hits = Counter()
+
+    def do_GET(self):
+        self.hits[self.path] += 1
+        if self.path == "/flaky" and self.hits[self.path] == 1:
+            return self._send(503, "unavailable")
+        if self.path == "/slow":
+            time.sleep(1)
+        if self.path == "/pdf":
+            return self._send(200, "%PDF", "application/pdf")
+        self._send(200, PAGE)
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # کلاینت با timeout رفته است
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def _clean_environment(monkeypatch):
+    # مثلاً CRAWL_MOCK_SITE_URL همه درخواست‌ها را به شبیه‌ساز می‌فرستد
+    for name in ("CRAWL_MOCK_SITE_URL", "CRAWL_MAX_RESPONSE_BYTES", "CRAWL_CONNECT_TIMEOUT",
+                 "CRAWL_READ_TIMEOUT", "CRAWL_RETRIES", "CRAWL_RETRY_BACKOFF"):
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _counts(stats):
+    return stats.sites["127.0.0.1"]
+
+
+def _history(count):
+    return tuple(RequestHistory("GET", "/", None, 503, None) for _ in range(count))
+
+
+def test_backoff_is_exponential_with_jitter():
+    retry = make_retry(retries=10, backoff=1.0)
+    assert retry.get_backoff_time() == 0
+    for count, high in ((1, 1.0), (3, 4.0), (10, RETRY_BACKOFF_MAX)):
+        values = {retry.new(history=_history(count)).get_backoff_time() for _ in range(50)}
+        assert all(high / 2 <= value <= high for value in values)
+        assert len(values) > 1
+    redirect = RequestHistory("GET", "/", None, 301, "/other")
+    assert retry.new(history=(*_history(3), redirect)).get_backoff_time() == 0
+
+
+def test_default_timeout_and_retries_from_environment(monkeypatch):
+    monkeypatch.setenv("CRAWL_CONNECT_TIMEOUT", "2")
+    monkeypatch.setenv("CRAWL_READ_TIMEOUT", "7")
+    monkeypatch.setenv("CRAWL_RETRIES", "5")
+    adapter = make_session().get_adapter("https://www.tabnak.ir/")
+    assert adapter.timeout == (2.0, 7.0)
+    assert adapter.max_retries.total == 5
+    assert adapter.max_retries.stats is adapter.stats
+
+
+def test_retry_on_5xx_is_counted(server):
+    session = make_session(retries=2)
+    session.get_adapter(server).max_retries.backoff_factor = 0
+    response = session.get(f"{server}/flaky")
+    assert response.status_code == 200
+    assert response.text == PAGE
+    assert _counts(session.bandwidth)["retry_http_503"] == 1
+
+
+def test_connections_are_reused(server):
+    session = make_session(retries=0)
+    for _ in range(3):
+        session.get(f"{server}/page")
+    counts = _counts(session.bandwidth)
+    assert (counts["connections"], counts["reused"]) == (1, 2)
+    assert counts["responses"] == 3 and counts["bytes"] > 0
+
+
+def test_read_timeout_applies_without_explicit_timeout(server):
+    session = make_session(timeout=(1.0, 0.2), retries=0)
+    with pytest.raises(requests.ReadTimeout):
+        session.get(f"{server}/slow")
+    assert _counts(session.bandwidth)["failed_ReadTimeout"] == 1
+
+
+def test_skipped_responses(server):
+    stats = BandwidthStats()
+    session = make_session(stats, max_bytes=100, retries=0)
+    with pytest.raises(ResponseSkipped) as media:
+        session.get(f"{server}/photo.JPG")
+    assert media.value.reason == "media"
+    with pytest.raises(ResponseSkipped) as non_html:
+        session.get(f"{server}/pdf")
+    assert non_html.value.reason == "non_html"
+    with pytest.raises(ResponseSkipped) as too_large:
+        session.get(f"{server}/page")
+    assert too_large.value.reason == "too_large"
+    assert _Handler.hits["/photo.JPG"] == 0
+    counts = _counts(stats)
+    assert (counts["skipped_media"], counts["skipped_non_html"], counts["skipped_too_large"]) == (1, 1, 1)
@@ -0,0 +1,116 @@
+import gzip
+import os
+import pickle
+from datetime import timedelta
+from time import time
+
+import jdatetime
+import pytest
+from scrapy import Request, Spider
+from scrapy.http import HtmlResponse, Response
+from scrapy.settings import Settings
+from scrapy.utils.test import get_crawler
+from TabnakNews import httpcache
+from TabnakNews.httpcache import ArchiveDatePolicy, CompressedShardedCacheStorage
+
+NEWS = "https://www.tabnak.ir/fa/news/1041860/slug"
+
+
+class _Spider(Spider):
+    name = "cache_test"
+
+
+@pytest.fixture
+def policy():
+    return ArchiveDatePolicy(Settings({
+        "HTTPCACHE_TODAY_TTL": 600,
+        "HTTPCACHE_IMMUTABLE_AFTER_DAYS": 2,
+        "HTTPCACHE_OTHER_TTL": 3600,
+    }))
+
+
+def _archive(days_ago):
+    day = (jdatetime.date.today() - timedelta(days=days_ago)).strftime("%Y/%m/%d")
+    return Request(f"https://www.tabnak.ir/fa/archive?from_date={day}&to_date={day}&p=1")
+
+
+def _is_fresh(policy, request, age):
+    request.meta["cache_timestamp"] = time() - age
+    return policy.is_cached_response_fresh(None, request)
+
+
+@pytest.mark.parametrize("days_ago, ttl", [(0, 600), (1, 600), (2, None), (400, None)])
+def test_archive_ttl_depends_on_the_archive_date(policy, days_ago, ttl):
+    assert policy.ttl(_archive(days_ago)) == ttl
+
+
+def test_fresh_and_archived_pages(policy):
+    # آرشیو امروز بعد از TTL کهنه است؛ آرشیو قدیمی و صفحه خبر هیچ‌وقت
+    assert _is_fresh(policy, _archive(0), 599)
+    assert not _is_fresh(policy, _archive(0), 601)
+    assert _is_fresh(policy, _archive(30), 10**8)
+    assert policy.ttl(Request(NEWS)) is None
+    assert _is_fresh(policy, Request(NEWS), 10**8)
+    # صفحه‌ای که نه آرشیو است نه خبر
+    other = Request("https://www.tabnak.ir/fa/service/24")
+    assert policy.ttl(other) == 3600
+    assert not _is_fresh(policy, other, 3601)
+
+
+def test_only_ok_get_responses_are_cached(policy):
+    request = Request(NEWS)
+    assert policy.should_cache_request(request)
+    assert not policy.should_cache_request(Request(NEWS, method="POST"))
+    assert policy.should_cache_response(Response(NEWS, status=200), request)
+    assert not policy.should_cache_response(Response(NEWS, status=404), request)
+    assert policy.is_cached_response_valid(None, Response(NEWS, status=304), request)
+    assert not policy.is_cached_response_valid(None, Response(NEWS, status=200), request)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    crawler = get_crawler(_Spider)
+    spider = _Spider.from_crawler(crawler)
+    storage = CompressedShardedCacheStorage(Settings({"HTTPCACHE_DIR": str(tmp_path)}))
+    storage.open_spider(spider)
+    return storage, spider
+
+
+def test_round_trip_through_a_sharded_gzip_file(storage, tmp_path):
+    storage, spider = storage
+    request = Request(NEWS)
+    assert storage.retrieve_response(spider, request) is None
+    body = "<html><body>خبر</body></html>".encode()
+    response = HtmlResponse(NEWS, status=200, body=body, flags=["cached", "x"],
+                            headers={"Content-Type": "text/html; charset=utf-8"})
+    storage.store_response(spider, request, response)
+
+    key = spider.crawler.request_fingerprinter.fingerprint(request).hex()
+    path = tmp_path / spider.name / key[:2] / key[2:4] / f"{key}.gz"
+    assert os.listdir(path.parent) == [path.name]  # بدون فایل موقت باقی‌مانده
+    with gzip.open(path) as f:
+        assert pickle.load(f)["url"] == NEWS
+
+    cached = storage.retrieve_response(spider, Request(NEWS))
+    assert isinstance(cached, HtmlResponse)
+    assert (cached.url, cached.status, cached.body) == (NEWS, 200, body)
+    assert cached.headers[b"Content-Type"] == b"text/html; charset=utf-8"
+    assert cached.flags == ["x"]
+    assert cached.text == "<html><body>خبر</body></html>"
+
+
+def test_corrupt_and_expired_entries_are_misses(storage, tmp_path, monkeypatch):
+    storage, spider = storage
+    request = Request(NEWS)
+    storage.store_response(spider, request, HtmlResponse(NEWS, body=b"<html></html>"))
+    storage.expiration_secs = 60
+    assert storage.retrieve_response(spider, request) is not None
+    now = time()
+    monkeypatch.setattr(httpcache, "time", lambda: now + 61)
+    assert storage.retrieve_response(spider, request) is None
+
+    key = spider.crawler.request_fingerprinter.fingerprint(request).hex()
+    path = tmp_path / spider.name / key[:2] / key[2:4] / f"{key}.gz"
+    path.write_bytes(b"not gzip")
+    storage.expiration_secs = 0
+    assert storage.retrieve_response(spider, request) is None
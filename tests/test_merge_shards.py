@@ -0,0 +1,82 @@
+import csv
+import json
+import os
+
+import pytest
+
+from utils.merge_shards import ShardMerger, merge_runs
+
+COLUMNS = ("news_id", "title", "body", "date_georgian_iso", "link")
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _read(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.fixture
+def shards(tmp_path):
+    first = tmp_path / "Tabnak_1.csv"
+    second = tmp_path / "site=entekhab" / "part-0001.csv"
+    third = tmp_path / "Tabnak_2.json"
+    _write_csv(first, [
+        {"news_id": "3", "title": "سه", "body": "", "date_georgian_iso": "2021-03-03"},
+        {"news_id": "1", "title": "یک", "body": "کوتاه", "date_georgian_iso": "2021-03-05"},
+        {"news_id": "", "title": "بدون کلید", "body": "", "date_georgian_iso": ""},
+    ])
+    second.parent.mkdir()
+    _write_csv(second, [
+        # همان news_id در سایت دیگر تکراری نیست
+        {"news_id": "1", "title": "انتخاب", "body": "خط\nدوم\tستون", "date_georgian_iso": ""},
+    ])
+    third.write_text(json.dumps([
+        {"news_id": 1, "title": "یک", "body": "متن کامل‌تر خبر", "date": "2021-03-05"},
+        {"link": "https://www.tabnak.ir/fa/news/3", "title": "سه", "body": "متن",
+         "date_georgian_iso": "2021-03-03"},
+        {"news_id": 2, "title": "دو", "date_georgian_iso": "2021-03-04"},
+    ], ensure_ascii=False), encoding="utf-8")
+    return [str(first), str(second), str(third)]
+
+
+@pytest.mark.parametrize("memory_mb, fan_in", [(64, 64), (0, 2)])
+def test_merge_keeps_the_most_complete_record_sorted_by_date(shards, tmp_path, memory_mb, fan_in):
+    # memory_mb=0: هر سطر یک run و ادغام چندمرحله‌ای با fan_in=2
+    output = str(tmp_path / "merged.csv")
+    stats = ShardMerger(memory_mb=memory_mb, tmp_dir=str(tmp_path), fan_in=fan_in).merge(shards, output)
+    rows = _read(output)
+    assert [(row["site"], row["news_id"]) for row in rows] == [
+        ("tabnak", "3"), ("tabnak", "2"), ("tabnak", "1"), ("entekhab", "1"),
+    ]
+    assert rows[0]["body"] == "متن"
+    assert rows[2]["body"] == "متن کامل‌تر خبر"
+    assert rows[3]["body"] == "خط\nدوم\tستون"
+    assert stats["read"] == 7
+    assert stats["skipped"] == 1
+    assert (stats["unique"], stats["duplicates"]) == (4, 2)
+    if memory_mb == 0:
+        assert stats["key_runs"] == 6
+    # پوشه کار موقت پاک شده
+    assert sorted(os.listdir(tmp_path)) == ["Tabnak_1.csv", "Tabnak_2.json", "merged.csv", "site=entekhab"]
+
+
+def test_merge_can_select_output_fields(shards, tmp_path):
+    output = str(tmp_path / "merged.csv")
+    ShardMerger(tmp_dir=str(tmp_path), fields=("site", "news_id", "title")).merge(shards, output)
+    rows = _read(output)
+    assert list(rows[0]) == ["site", "news_id", "title"]
+
+
+def test_merge_runs_is_a_sorted_k_way_merge(tmp_path):
+    runs = []
+    for number, values in enumerate((["a\n", "d\n"], ["b\n", "e\n"], ["c\n"], ["f\n"])):
+        path = tmp_path / f"run-{number}.run"
+        path.write_text("".join(values), encoding="utf-8")
+        runs.append(str(path))
+    assert list(merge_runs(runs, str(tmp_path), fan_in=2)) == [f"{c}\n" for c in "abcdef"]
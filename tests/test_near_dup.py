@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from utils.near_dup import SimHashIndex, fingerprint
+from utils.news_ids import site_of_path
+
+WORDS = [f"واژه{i}" for i in range(400)]
+
+
+def _text(seed, length=300):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def _flip(value, bits, rng):
+    for bit in rng.sample(range(64), bits):
+        value ^= 1 << bit
+    return value
+
+
+def test_short_texts_have_no_fingerprint():
+    assert fingerprint("خبر کوتاه") is None
+    assert fingerprint(_text(1)) is not None
+
+
+def test_near_duplicate_text_is_found():
+    index = SimHashIndex()
+    original = _text(1)
+    assert index.check(fingerprint(original), index.key("tabnak", 1)) is None
+    # یک واژه از ۳۰۰ عوض شده
+    words = original.split()
+    words[150] = "دیگر"
+    match = index.check(fingerprint(" ".join(words)), index.key("entekhab", 7))
+    assert match is not None
+    assert index.label(match[0]) == "tabnak:1"
+    assert match[1] <= index.max_distance
+    assert index.check(fingerprint(_text(2)), index.key("tabnak", 2)) is None
+    assert (index.checked, index.duplicates, len(index)) == (3, 1, 2)
+
+
+def test_rechecking_the_same_article_is_not_a_duplicate():
+    index = SimHashIndex()
+    value = fingerprint(_text(1))
+    key = index.key("tabnak", 1)
+    index.check(value, key)
+    assert index.check(value, key) is None
+    assert index.duplicates == 0
+
+
+@pytest.mark.parametrize("capacity", [64, 1_000_000])
+def test_every_fingerprint_within_max_distance_is_found(capacity):
+    # باندها (max_distance + 1) تضمین می‌کنند دست کم یک باند بدون تغییر بماند، حتی با جدول کوچک
+    rng = random.Random(3)
+    index = SimHashIndex(max_distance=3, capacity=capacity)
+    values = [rng.getrandbits(64) for _ in range(30)]
+    for number, value in enumerate(values):
+        index.add(value, index.key("tabnak", number))
+    for number, value in enumerate(values):
+        key, distance = index.query(_flip(value, 3, rng))
+        assert key == index.key("tabnak", number)
+        assert distance == 3
+    assert index.query(_flip(values[0], 12, rng)) is None
+
+
+def test_capacity_evicts_the_oldest_generation():
+    index = SimHashIndex(capacity=4)
+    rng = random.Random(5)
+    values = [rng.getrandbits(64) for _ in range(6)]
+    for number, value in enumerate(values):
+        index.add(value, index.key("tabnak", number))
+    assert len(index) == 4
+    assert index.evicted == 2
+    assert index.query(values[0]) is None
+    assert index.query(values[5])[1] == 0
+
+
+def test_save_and_load_keep_keys_and_sites(tmp_path):
+    index = SimHashIndex(capacity=8)
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(6)]
+    for number, value in enumerate(values):
+        index.add(value, index.key("tabnak" if number % 2 else "entekhab", number))
+    path = str(tmp_path / "near_dup.idx")
+    index.save(path)
+    loaded = SimHashIndex.load(path)
+    assert loaded.sites == index.sites
+    assert len(loaded) == len(index)
+    for value in values:
+        assert loaded.query(value) == index.query(value)
+    (tmp_path / "bad.idx").write_bytes(b"nope")
+    with pytest.raises(ValueError):
+        SimHashIndex.load(str(tmp_path / "bad.idx"))
+
+
+def test_site_of_path():
+    assert site_of_path("output/site=tabnak/year=1400/month=01/part-0001.csv") == "tabnak"
+    assert site_of_path("Tabnak_1400-01-01_to_1400-01-10.csv") == "Tabnak"
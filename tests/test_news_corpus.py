@@ -0,0 +1,147 @@
+import json
+import os
+from datetime import date, timedelta
+
+import pytest
+
+from utils.news_corpus import CorpusWriter, NewsCorpus
+
+
+def _record(news_id, day, site="tabnak", **fields):
+    return {
+        "news_id": news_id,
+        "site": site,
+        "date_georgian_iso": (date(2021, 3, 1) + timedelta(days=day)).isoformat(),
+        "title": f"{site} {news_id}",
+        **fields,
+    }
+
+
+@pytest.fixture
+def corpus_dir(tmp_path):
+    directory = str(tmp_path / "corpus")
+    # رکوردها به ترتیب تاریخ نیستند؛ بلوک‌ها سه‌تایی
+    with CorpusWriter(directory, block_records=3) as writer:
+        for news_id in range(30):
+            writer.write(_record(1000 + news_id, (news_id * 7) % 30))
+    return directory
+
+
+def test_get_reads_a_single_block(corpus_dir):
+    with NewsCorpus(corpus_dir) as corpus:
+        assert len(corpus) == 30
+        assert corpus.get(1017)["title"] == "tabnak 1017"
+        assert corpus.blocks_read == 1
+        assert corpus.get(999) is None
+        assert corpus.get(5000) is None
+        assert corpus.get(1017, site="entekhab") is None
+
+
+def test_range_is_inclusive_and_skips_other_blocks(corpus_dir):
+    with NewsCorpus(corpus_dir) as corpus:
+        records = list(corpus.range("2021-03-05", "2021-03-07"))
+        days = sorted(record["date_georgian_iso"] for record in records)
+        assert days == ["2021-03-05", "2021-03-06", "2021-03-07"]
+        # فقط بلوک‌هایی که تاریخی در بازه دارند باز می‌شوند
+        assert corpus.blocks_read == len(corpus.block_range("2021-03-05", "2021-03-07")) == 3
+        assert list(corpus.range("2022-01-01", "2022-12-31")) == []
+
+
+def test_block_range_lists_each_block_once(tmp_path):
+    directory = str(tmp_path / "corpus")
+    with CorpusWriter(directory, block_records=4) as writer:
+        for news_id in range(8):
+            writer.write(_record(news_id + 1, news_id % 2))
+    with NewsCorpus(directory) as corpus:
+        assert corpus.block_range("2021-03-01", "2021-03-02") == [0, 1]
+
+
+def test_appending_keeps_the_latest_record(corpus_dir):
+    with CorpusWriter(corpus_dir, block_records=3) as writer:
+        writer.write(_record(1005, 0, title="updated"))
+        writer.write(_record(2000, 1))
+    with NewsCorpus(corpus_dir) as corpus:
+        assert len(corpus.meta["files"]) == 2
+        assert corpus.get(1005)["title"] == "updated"
+        assert corpus.get(2000) is not None
+        assert corpus.get(1006)["title"] == "tabnak 1006"
+
+
+def _read(directory, name):
+    with open(os.path.join(directory, name), "rb") as f:
+        return f.read()
+
+
+def test_appending_adds_a_segment_without_rewriting_the_index(corpus_dir):
+    before = {name: _read(corpus_dir, name) for name in ("index.blocks", "index.ids", "index.dates")}
+    with CorpusWriter(corpus_dir, block_records=3) as writer:
+        for news_id in range(4):
+            writer.write(_record(3000 + news_id, 40 + news_id))
+    assert _read(corpus_dir, "index.ids") == before["index.ids"]
+    assert _read(corpus_dir, "index.dates") == before["index.dates"]
+    # بلوک‌های جدید فقط به انتهای index.blocks اضافه شده‌اند
+    assert _read(corpus_dir, "index.blocks").startswith(before["index.blocks"])
+    with NewsCorpus(corpus_dir) as corpus:
+        assert corpus.segment_names == ["index", "index-0002"]
+        assert (len(corpus), corpus.block_count) == (34, 12)
+        assert corpus.get(3003)["title"] == "tabnak 3003"
+        # بازه‌ای که هر دو segment را می‌پوشاند، به ترتیب تاریخ
+        records = list(corpus.range("2021-03-30", "2021-04-11"))
+        assert [r["news_id"] for r in records] == [1017, 3000, 3001]
+
+
+def test_unfinished_append_is_ignored(corpus_dir):
+    writer = CorpusWriter(corpus_dir, block_records=1)
+    writer.write(_record(4000, 0))
+    writer.file.flush()
+    with open(os.path.join(corpus_dir, "index.blocks"), "ab") as f:
+        f.write(b"\0" * 28)  # بلوک نوشته‌شده قبل از قطع شدن پروسه، بدون index.json تازه
+    with NewsCorpus(corpus_dir) as corpus:
+        assert corpus.block_count == 10 and corpus.get(4000) is None
+    with CorpusWriter(corpus_dir, block_records=3) as writer:
+        writer.write(_record(4001, 0))
+    with NewsCorpus(corpus_dir) as corpus:
+        assert corpus.block_count == 11
+        assert corpus.get(4001)["title"] == "tabnak 4001"
+
+
+def test_version_2_corpus_is_read_and_appended(corpus_dir):
+    meta_path = os.path.join(corpus_dir, "index.json")
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    del meta["segments"]
+    meta["version"] = 2
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    with NewsCorpus(corpus_dir) as corpus:
+        assert corpus.get(1017)["title"] == "tabnak 1017"
+    with CorpusWriter(corpus_dir) as writer:
+        writer.write(_record(1017, 0, title="updated"))
+    with NewsCorpus(corpus_dir) as corpus:
+        assert corpus.meta["version"] == 3
+        assert corpus.get(1017)["title"] == "updated"
+
+
+def test_multi_site_ids_need_a_site(tmp_path):
+    directory = str(tmp_path / "corpus")
+    with CorpusWriter(directory) as writer:
+        writer.write(_record(7, 0, site="Tabnak"))
+        # رکورد بدون ستون site: سایت از ورودی (مثلاً مسیر فایل)
+        writer.write({**_record(7, 1), "site": None}, site="entekhab")
+    with NewsCorpus(directory) as corpus:
+        assert corpus.sites == ["tabnak", "entekhab"]
+        assert corpus.get(7, site="TABNAK")["date_georgian_iso"] == "2021-03-01"
+        assert corpus.get(7, site="entekhab")["date_georgian_iso"] == "2021-03-02"
+        with pytest.raises(ValueError):
+            corpus.get(7)
+
+
+def test_old_format_is_rejected(corpus_dir):
+    meta_path = os.path.join(corpus_dir, "index.json")
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["version"] = 1
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    with pytest.raises(ValueError):
+        NewsCorpus(corpus_dir)
@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from scrapy import Spider
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.test import get_crawler
+from TabnakNews.orchestrator import BudgetExtension, CrawlBudget, parse_size
+
+
+class _Spider(Spider):
+    name = "budget_test"
+
+
+class _Engine:
+    def __init__(self):
+        self.closed = []
+        self.downloader = SimpleNamespace(total_concurrency=16)
+
+    async def close_spider_async(self, *, reason="cancelled"):
+        self.closed.append(reason)
+
+
+def _crawler(budget, weight=1.0):
+    crawler = get_crawler(_Spider)
+    crawler.stats.open_spider()
+    crawler.engine = _Engine()
+    crawler.budget = budget
+    budget.register(crawler, weight)
+    return crawler
+
+
+def test_parse_size():
+    assert parse_size("2M") == 2 * 1024**2
+    assert parse_size("1.5k") == 1536
+    assert parse_size("5G") == 5 * 1024**3
+    assert parse_size("300") == 300
+
+
+def test_share_is_weighted_and_moves_to_the_rest():
+    budget = CrawlBudget(concurrency=48)
+    heavy, light, idle = _crawler(budget, 2), _crawler(budget), _crawler(budget)
+    budget.activate(heavy)
+    budget.activate(light)
+    assert (budget.share(heavy, 30), budget.share(light, 30)) == (20, 10)
+    assert budget.share(idle, 30) == 0  # ثبت‌شده ولی هنوز باز نشده
+    assert (heavy.engine.downloader.total_concurrency, light.engine.downloader.total_concurrency) == (32, 16)
+    assert light.stats.get_value("budget/concurrency") == 16
+    budget.release(heavy)
+    assert budget.share(light, 30) == 30
+    assert light.engine.downloader.total_concurrency == 48
+    assert budget.share(heavy, 30) == 0
+
+
+def test_every_active_crawler_keeps_one_slot():
+    budget = CrawlBudget(concurrency=2)
+    crawlers = [_crawler(budget) for _ in range(3)]
+    for crawler in crawlers:
+        budget.activate(crawler)
+    assert [c.engine.downloader.total_concurrency for c in crawlers] == [1, 1, 1]
+    assert budget.share(crawlers[0], 0) == 0
+
+
+def test_extension_needs_the_orchestrator():
+    with pytest.raises(NotConfigured):
+        BudgetExtension.from_crawler(get_crawler(_Spider))
+
+
+def test_spent_budget_closes_every_spider():
+    budget = CrawlBudget(max_bytes=1000)
+    first, second = _crawler(budget), _crawler(budget)
+    extensions = [BudgetExtension.from_crawler(crawler) for crawler in (first, second)]
+    for crawler in (first, second):
+        budget.activate(crawler)
+
+    async def receive(extension, nbytes):
+        # بستن engine مثل closespider زمان‌بندی می‌شود، نه اجرای هم‌زمان
+        extension.bytes_received(b"x" * nbytes, None, None)
+        await asyncio.sleep(0)
+
+    asyncio.run(receive(extensions[0], 600))
+    assert first.engine.closed == [] and second.engine.closed == []
+    asyncio.run(receive(extensions[1], 400))
+    assert first.engine.closed == ["closespider_budget"]
+    assert second.engine.closed == ["closespider_budget"]
+    # فقط یک بار بسته می‌شوند
+    asyncio.run(receive(extensions[0], 10))
+    assert first.engine.closed == ["closespider_budget"]
+    assert budget.spent == 1010
+
+
+def test_no_byte_limit_never_closes():
+    budget = CrawlBudget(bandwidth=100)
+    crawler = _crawler(budget)
+    budget.activate(crawler)
+    BudgetExtension.from_crawler(crawler).bytes_received(b"x" * 10**6, None, None)
+    assert crawler.engine.closed == []
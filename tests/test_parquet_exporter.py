@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from TabnakNews.exporters import ParquetItemExporter  # noqa: E402
+
+from utils.news_record import FIELDS, NewsRecord  # noqa: E402
+
+
+def _item(news_id, body="متن خبر"):
+    return {
+        "site": "tabnak",
+        "news_id": str(news_id),
+        "title": f"عنوان {news_id}",
+        "body": body,
+        "category": "سیاسی",
+        "date_shamsi": "1400/01/15",
+        "comment_count": "۸",
+        "link": f"https://www.tabnak.ir/fa/news/{news_id}",
+    }
+
+
+def _export(path, items, **kwargs):
+    with open(path, "wb") as f:
+        exporter = ParquetItemExporter(f, **kwargs)
+        exporter.start_exporting()
+        for item in items:
+            exporter.export_item(item)
+        exporter.finish_exporting()
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "tabnak.parquet"
+    items = [_item(1), _item(2, body=""), {"title": "بدون تاریخ"}]
+    _export(path, items)
+    table = pq.read_table(path)
+    assert table.column_names == list(FIELDS)
+    rows = table.to_pylist()
+    expected = [NewsRecord.of(item).to_dict() for item in items]
+    for row, record in zip(rows, expected, strict=True):
+        day = record["date_georgian_iso"]
+        assert row == {**record, "date_georgian_iso": date.fromisoformat(day) if day else None}
+    assert rows[0]["news_id"] == 1 and rows[0]["comment_count"] == 8
+    assert rows[0]["date_georgian_iso"] == date(2021, 4, 4)
+
+
+def test_buffer_counts_encoded_bytes(tmp_path):
+    with open(tmp_path / "tabnak.parquet", "wb") as f:
+        exporter = ParquetItemExporter(f)
+        exporter.start_exporting()
+        exporter.export_item(_item(1, body="خبر"))
+        record = NewsRecord.of(_item(1, body="خبر"))
+        assert exporter.buffered_bytes == sum(
+            len(record.get(name).encode("utf-8"))
+            for name in ("site", "title", "abstract", "body", "category", "link")
+        )
+        exporter.finish_exporting()
+
+
+def test_row_groups_are_cut_by_encoded_size(tmp_path):
+    path = tmp_path / "tabnak.parquet"
+    # ۳۰۰ نویسه فارسی = ۶۰۰ بایت؛ با شمارش نویسه سه سطر در یک row group جا می‌شد
+    _export(path, [_item(n, body="خ" * 300) for n in range(4)], buffer_bytes=1000)
+    metadata = pq.ParquetFile(path).metadata
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [2, 2]
+    _export(path, [_item(n) for n in range(5)], row_group_size=2)
+    metadata = pq.ParquetFile(path).metadata
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [2, 2, 1]
+    assert pq.read_table(path).column("news_id").to_pylist() == [0, 1, 2, 3, 4]
@@ -0,0 +1,101 @@
+import csv
+import json
+import os
+
+from utils.partitioned_output import PartitionedCsvWriter, jalali_partition
+
+FIELDS = ("news_id", "title", "body", "date_georgian_iso")
+
+
+def _row(news_id, day="2021-03-25", body="متن خبر"):
+    return {"news_id": news_id, "title": f"خبر {news_id}", "body": body, "date_georgian_iso": day}
+
+
+def _read(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def _manifest(root):
+    with open(os.path.join(root, "site=tabnak", "_manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _crash(writer):
+    """قطع ناگهانی: partهای باز بدون نهایی شدن رها می‌شوند (flock با بسته شدن آزاد می‌شود)."""
+    paths = []
+    for part in writer.open_parts.values():
+        part.file.flush()
+        part.file.close()
+        paths.append(part.tmp_path)
+    writer.open_parts.clear()
+    return paths
+
+
+def test_rows_go_to_jalali_month_partitions(tmp_path):
+    root = str(tmp_path)
+    writer = PartitionedCsvWriter(root, "tabnak", FIELDS)
+    writer.write(_row(1, "2021-03-20"))
+    writer.write(_row(2, "2021-03-21"))
+    writer.write(_row(3, ""))
+    writer.close()
+    assert jalali_partition("2021-03-21") == "year=1400/month=01"
+    partitions = _manifest(root)["partitions"]
+    assert sorted(partitions) == [
+        "year=1399/month=12", "year=1400/month=01", "year=unknown/month=unknown",
+    ]
+    entry = partitions["year=1400/month=01"]["parts"][0]
+    assert entry["rows"] == 1 and entry["min_date"] == entry["max_date"] == "2021-03-21"
+    assert _read(os.path.join(root, "site=tabnak", entry["file"]))[0]["news_id"] == "2"
+
+
+def test_recover_truncates_a_torn_row(tmp_path):
+    root = str(tmp_path)
+    writer = PartitionedCsvWriter(root, "tabnak", FIELDS)
+    writer.write(_row(1, body="خط اول\r\nخط دوم"))
+    writer.write(_row(2, "2021-03-28"))
+    (tmp_part,) = _crash(writer)
+    with open(tmp_part, "ab") as f:
+        f.write('"3","خبر 3","نیمه'.encode())
+
+    PartitionedCsvWriter(root, "tabnak", FIELDS)
+    assert not os.path.exists(tmp_part)
+    (entry,) = _manifest(root)["partitions"]["year=1400/month=01"]["parts"]
+    assert (entry["rows"], entry["min_date"], entry["max_date"]) == (2, "2021-03-25", "2021-03-28")
+    rows = _read(os.path.join(root, "site=tabnak", entry["file"]))
+    assert [row["news_id"] for row in rows] == ["1", "2"]
+    assert rows[0]["body"] == "خط اول\r\nخط دوم"
+
+
+def test_recover_keeps_a_part_without_rows(tmp_path):
+    root = str(tmp_path)
+    writer = PartitionedCsvWriter(root, "tabnak", FIELDS)
+    writer.write(_row(1))
+    (tmp_part,) = _crash(writer)
+    with open(tmp_part, "r+b") as f:
+        f.truncate(10)  # حتی سرستون ناقص است
+
+    PartitionedCsvWriter(root, "tabnak", FIELDS)
+    (entry,) = _manifest(root)["partitions"]["year=1400/month=01"]["parts"]
+    assert entry["rows"] == 0
+    with open(os.path.join(root, "site=tabnak", entry["file"]), newline="", encoding="utf-8") as f:
+        assert next(csv.reader(f)) == list(FIELDS)
+
+
+def test_recover_leaves_parts_of_live_writers(tmp_path):
+    root = str(tmp_path)
+    first = PartitionedCsvWriter(root, "tabnak", FIELDS)
+    first.write(_row(1))
+    first.flush()
+    second = PartitionedCsvWriter(root, "tabnak", FIELDS)
+    second.write(_row(2))
+    # part باز نویسنده زنده دست نخورده؛ نویسنده دوم شماره بعدی را می‌گیرد
+    assert not os.path.exists(os.path.join(root, "site=tabnak", "_manifest.json"))
+    first.close()
+    second.close()
+    parts = _manifest(root)["partitions"]["year=1400/month=01"]["parts"]
+    assert sorted(part["file"] for part in parts) == [
+        "year=1400/month=01/part-0001.csv",
+        "year=1400/month=01/part-0002.csv",
+    ]
+    assert sum(part["rows"] for part in parts) == 2
@@ -0,0 +1,132 @@
+import asyncio
+import inspect
+import io
+import os
+import pstats
+
+import pytest
+from parsel import Selector
+from scrapy import Request, Spider
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+from TabnakNews import profiling
+from TabnakNews.profiling import (
+    CallbackProfilerMiddleware,
+    ProfiledItemPipelineManager,
+    ProfileSession,
+)
+
+
+class _Spider(Spider):
+    name = "profile_test"
+
+
+class _Pipeline:
+    def process_item(self, item, spider=None):
+        item["seen"] = spider.name
+        return item
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = ProfileSession(sample_rate=1.0)
+    monkeypatch.setattr(profiling, "_active", session)
+    return session
+
+
+def _functions(profile):
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).print_stats()
+    return stream.getvalue()
+
+
+def _response():
+    return HtmlResponse("https://www.tabnak.ir/fa/news/1", body=b"<html></html>",
+                        request=Request("https://www.tabnak.ir/fa/news/1"))
+
+
+def test_pipeline_instances_are_wrapped():
+    crawler = get_crawler(_Spider)
+    crawler.spider = _Spider()
+    pipeline = _Pipeline()
+    manager = ProfiledItemPipelineManager(pipeline, crawler=crawler)
+    assert manager.middlewares == (pipeline,)
+    # امضای اصلی برای manager حفظ شده است
+    assert list(inspect.signature(pipeline.process_item).parameters) == ["item", "spider"]
+    # بدون نشست فعال همان pipeline اجرا می‌شود
+    assert pipeline.process_item({}, crawler.spider) == {"seen": "profile_test"}
+
+
+def test_pipeline_is_profiled_while_a_session_is_active(session):
+    pipeline = _Pipeline()
+    ProfiledItemPipelineManager(pipeline, crawler=get_crawler(_Spider))
+    assert pipeline.process_item({}, _Spider()) == {"seen": "profile_test"}
+    assert session.samples == {"pipeline__Pipeline": 1}
+    assert "process_item" in _functions(session.profiles["pipeline__Pipeline"])
+
+
+def test_selector_timing_counts_the_outer_call_only(session):
+    session.install_selector_timing()
+    try:
+        Selector(text="<p>خبر</p>").css("p::text").getall()
+    finally:
+        session.uninstall_selector_timing()
+    assert list(session.selectors.entries) == ["css: p::text"]
+    assert not hasattr(Selector.css, "__wrapped__")
+
+
+def test_sync_callback_is_profiled(session):
+    middleware = CallbackProfilerMiddleware(get_crawler(_Spider))
+    middleware.session = session
+
+    def parse():
+        yield {"n": sum(range(1000))}
+        yield {"n": 2}
+
+    assert len(list(middleware.process_spider_output(_response(), parse()))) == 2
+    assert session.samples == {"parse": 1}
+    assert "parse" in _functions(session.profiles["parse"])
+
+
+def test_async_callback_profile_excludes_other_tasks(session):
+    middleware = CallbackProfilerMiddleware(get_crawler(_Spider))
+    middleware.session = session
+
+    def other_task_work():
+        return sum(range(1000))
+
+    async def other_task():
+        await asyncio.sleep(0)
+        other_task_work()
+
+    def callback_work():
+        return sum(range(1000))
+
+    async def parse():
+        callback_work()
+        await asyncio.sleep(0)  # در این فاصله other_task اجرا می‌شود
+        yield {"n": 1}
+        await asyncio.sleep(0)
+        yield {"n": 2}
+
+    async def run():
+        task = asyncio.ensure_future(other_task())
+        items = [obj async for obj in middleware.process_spider_output_async(_response(), parse())]
+        await task
+        return items
+
+    assert asyncio.run(run()) == [{"n": 1}, {"n": 2}]
+    functions = _functions(session.profiles["parse"])
+    assert "callback_work" in functions
+    assert "other_task_work" not in functions
+
+
+def test_dump_writes_stats_and_report(session, tmp_path):
+    session.profile_for("parse").runcall(sum, range(10))
+    session.selectors.add("xpath: //p", 0.002)
+    path = session.dump(str(tmp_path), "tabnak")
+    assert os.path.exists(tmp_path / "tabnak_parse.prof")
+    with open(path, encoding="utf-8") as f:
+        report = f.read()
+    assert "==== parse (1 samples) ====" in report
+    assert "xpath: //p" in report
@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+from TabnakNews.middlewares import BandwidthSaverMiddleware
+from TabnakNews.quota import (
+    CategoryQuota,
+    CategoryQuotaDownloaderMiddleware,
+    CategoryQuotaMiddleware,
+    bucket_of,
+    spread_order,
+)
+
+META = {"site": "tabnak", "category_name": "ورزشی", "archive_date": "1402/01/05"}
+KEY = ("tabnak", "ورزشی", "1402/01")
+
+
+class _Spider(Spider):
+    name = "quota_test"
+
+
+@pytest.fixture
+def crawler():
+    return get_crawler(_Spider, {
+        "CATEGORY_QUOTA": 2,
+        "CATEGORY_QUOTA_BUCKET": "month",
+        "BANDWIDTH_SAVER_ENABLED": True,
+    })
+
+
+def _article(news_id):
+    return Request(f"https://www.tabnak.ir/fa/news/{news_id}", meta=dict(META))
+
+
+def _parse(spider_mw, request, outputs):
+    response = HtmlResponse(request.url, body=b"<html></html>", request=request)
+    return list(spider_mw.process_spider_output(response, iter(outputs)))
+
+
+def test_bucket_and_spread():
+    assert bucket_of("1402/01/05", "day") == "1402/01/05"
+    assert bucket_of("1402/01/05", "month") == "1402/01"
+    assert bucket_of("1402/01/05", "year") == "1402"
+    assert bucket_of("1402/01/05", "all") == "*"
+    ranks = spread_order(10)
+    assert sorted(ranks) == list(range(10))
+    # دو روز اول ترتیب پخش‌شده از دو نیمه بازه‌اند
+    first, second = ranks.index(0), ranks.index(1)
+    assert abs(first - second) >= 3
+
+
+def _start(pulled, months):
+    async def start():
+        for month in months:
+            for day in (1, 2, 3, 4):
+                date = f"1402/{month:02d}/{day:02d}"
+                pulled.append(date)
+                yield Request(f"https://www.tabnak.ir/fa/archive?date={date}",
+                              meta={**META, "archive_date": date})
+    return start()
+
+
+def test_start_requests_are_spread_lazily_per_period(crawler):
+    spider_mw = CategoryQuotaMiddleware.from_crawler(crawler)
+    pulled = []
+
+    async def run():
+        dates = []
+        async for request in spider_mw.process_start(_start(pulled, (1, 2))):
+            if not dates:
+                # ماه اول با دیدن اولین درخواست ماه دوم صادر شد، نه بعد از خواندن همه
+                assert pulled == ["1402/01/01", "1402/01/02", "1402/01/03", "1402/01/04", "1402/02/01"]
+            dates.append(request.meta["archive_date"])
+        return dates
+
+    dates = asyncio.run(run())
+    assert sorted(dates[:4]) == [f"1402/01/{day:02d}" for day in (1, 2, 3, 4)]
+    assert dates[:2] != ["1402/01/01", "1402/01/02"]
+    assert sorted(dates[4:]) == [f"1402/02/{day:02d}" for day in (1, 2, 3, 4)]
+
+
+def test_start_requests_of_a_full_bucket_are_dropped(crawler):
+    spider_mw = CategoryQuotaMiddleware.from_crawler(crawler)
+
+    async def run():
+        dates = []
+        async for request in spider_mw.process_start(_start([], (1, 2))):
+            dates.append(request.meta["archive_date"])
+            # سهمیه هر ماه بعد از دو روز آن پر می‌شود
+            crawler.category_quota.observe_item(crawler.category_quota.key(request.meta))
+        return dates
+
+    dates = asyncio.run(run())
+    assert [date[:7] for date in dates] == ["1402/01", "1402/01", "1402/02", "1402/02"]
+    assert crawler.stats.get_value("quota/dropped") == 4
+
+
+def test_in_flight_articles_reserve_the_quota(crawler):
+    downloader = CategoryQuotaDownloaderMiddleware.from_crawler(crawler)
+    quota = crawler.category_quota
+    requests = [_article(i) for i in range(3)]
+    downloader.process_request(requests[0])
+    downloader.process_request(requests[1])
+    assert quota.reserved[KEY] == 2
+    # سهمیه ۲ با دو دانلود در جریان پر است
+    with pytest.raises(IgnoreRequest):
+        downloader.process_request(requests[2])
+    assert quota.reserved[KEY] == 2
+    # درخواست آرشیو رزرو نمی‌کند و فقط با سهمیه ذخیره‌شده رد می‌شود
+    assert downloader.process_request(
+        Request("https://www.tabnak.ir/fa/archive?page=2", meta=dict(META))
+    ) is None
+
+
+def test_reservation_turns_into_a_count(crawler):
+    downloader = CategoryQuotaDownloaderMiddleware.from_crawler(crawler)
+    spider_mw = CategoryQuotaMiddleware.from_crawler(crawler)
+    quota = crawler.category_quota
+    first, second = _article(1), _article(2)
+    downloader.process_request(first)
+    downloader.process_request(second)
+    assert _parse(spider_mw, first, [{"title": "a"}]) == [{"title": "a"}]
+    assert (quota.scraped[KEY], quota.reserved[KEY]) == (1, 1)
+    # callback بدون item: رزرو آزاد می‌شود
+    assert _parse(spider_mw, second, []) == []
+    assert (quota.scraped[KEY], quota.reserved[KEY]) == (1, 0)
+    assert "quota_reserved" not in second.meta
+
+
+def test_requests_of_a_full_bucket_are_dropped(crawler):
+    spider_mw = CategoryQuotaMiddleware.from_crawler(crawler)
+    crawler.category_quota.observe_item(KEY, 2)
+    archive = Request("https://www.tabnak.ir/fa/archive?page=1", meta=dict(META))
+    follow = Request("https://www.tabnak.ir/fa/news/9")
+    assert _parse(spider_mw, archive, [follow]) == []
+    assert crawler.stats.get_value("quota/dropped") == 1
+    assert KEY in crawler.category_quota.full
+
+
+def test_failed_download_releases_the_reservation(crawler):
+    downloader = CategoryQuotaDownloaderMiddleware.from_crawler(crawler)
+    request = _article(1)
+    downloader.process_request(request)
+    downloader.process_exception(request, TimeoutError())
+    assert crawler.category_quota.reserved[KEY] == 0
+
+
+def test_bandwidth_skip_releases_the_reservation(crawler):
+    downloader = CategoryQuotaDownloaderMiddleware.from_crawler(crawler)
+    bandwidth = BandwidthSaverMiddleware.from_crawler(crawler)
+    request = _article(1)
+    downloader.process_request(request)
+    request.meta["bandwidth_skipped"] = "too_large"
+    response = HtmlResponse(request.url, body=b"", request=request, flags=["download_stopped"])
+    with pytest.raises(IgnoreRequest):
+        bandwidth.process_response(request, response)
+    assert crawler.category_quota.reserved[KEY] == 0
+
+
+def test_release_dropped_without_quota_is_a_no_op():
+    crawler = get_crawler(_Spider)
+    request = _article(1)
+    request.meta["quota_reserved"] = True
+    CategoryQuota.release_dropped(crawler, request)
+    assert request.meta["quota_reserved"] is True
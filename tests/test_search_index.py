@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from utils.search_index import SearchIndex, filter_date, match_expression
+
+RECORDS = [
+    {"site": "tabnak", "news_id": 1, "title": "واکسن کرونا در تهران",
+     "body": "خط اول خبر\nتزریق واكسن در مراكز درمانی", "category": "اجتماعی",
+     "date_georgian_iso": "2021-02-01"},
+    {"site": "tabnak", "news_id": 2, "title": "جلسه شورای شهر",
+     "body": "شورای شهر تهران درباره کتاب‌ها تصمیم گرفت", "category": "سیاسی",
+     "date_georgian_iso": "2021-03-01"},
+    {"site": "entekhab", "news_id": 1, "title": "بازار سهام",
+     "body": "شاخص بورس و واکسن", "category": "اقتصادی", "date_georgian_iso": "2020-12-01"},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    with SearchIndex(str(tmp_path / "news.db")) as index:
+        index.add_many(RECORDS)
+        yield index
+
+
+def _ids(hits):
+    return [(hit["site"], hit["news_id"]) for hit in hits]
+
+
+def test_query_is_normalized_like_the_text(index):
+    # ی/ک عربی و نیم‌فاصله در متن و عبارت جستجو یکسان می‌شوند
+    assert _ids(index.search("واكسن")) == [("tabnak", 1), ("entekhab", 1)]
+    assert _ids(index.search("کتاب ها")) == [("tabnak", 2)]
+    assert _ids(index.search('"شورای شهر" تهران')) == [("tabnak", 2)]
+    assert _ids(index.search("شور*")) == [("tabnak", 2)]
+    assert index.search("ناموجود") == []
+
+
+def test_title_ranks_above_body(index):
+    hits = index.search("واکسن")
+    assert hits[0]["title"] == "واکسن کرونا در تهران"
+    assert hits[0]["score"] > hits[1]["score"]
+    assert "واكسن" in hits[0]["snippet"] or "واکسن" in hits[0]["snippet"]
+
+
+def test_filters_and_date_order(index):
+    assert _ids(index.search(from_date="1399/12/01")) == [("tabnak", 2)]
+    assert _ids(index.search(to_date="2021-02-01", order="date")) == [("tabnak", 1), ("entekhab", 1)]
+    assert _ids(index.search("واکسن", category="اقتصادي")) == [("entekhab", 1)]
+    assert _ids(index.search("واکسن", site="tabnak")) == [("tabnak", 1)]
+    assert _ids(index.search(limit=1, offset=1)) == [("tabnak", 1)]
+
+
+def test_re_adding_replaces_the_old_text(index):
+    index.add({**RECORDS[0], "title": "خبر ویرایش‌شده", "body": "بدون آن واژه"})
+    assert len(index) == 3
+    assert _ids(index.search("واکسن")) == [("entekhab", 1)]
+    assert _ids(index.search("ویرایش شده")) == [("tabnak", 1)]
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    path = tmp_path / "site=tabnak" / "news.jsonl"
+    path.parent.mkdir()
+    path.write_text("\n".join(json.dumps({**r, "site": None}, ensure_ascii=False)
+                              for r in RECORDS[:2]), encoding="utf-8")
+    with SearchIndex(str(tmp_path / "news.db")) as index:
+        assert index.add_file(str(path)) == 2
+        assert index.add_file(str(path)) == 0
+        # سایت رکوردهای بدون site از مسیر پارتیشن
+        assert {hit["site"] for hit in index.search()} == {"tabnak"}
+
+
+def test_query_syntax_does_not_leak_into_fts():
+    assert match_expression('AND OR "NEAR(') == '"and" "or" "near"'
+    assert match_expression("") == ""
+    assert filter_date("1399/12/01") == "2021-02-19"
+    with pytest.raises(ValueError):
+        filter_date("دیروز")
@@ -0,0 +1 @@
+# ماژول‌های مشترک بین کراولرهای قدیمی (crawlers/*.py) و پروژه Scrapy
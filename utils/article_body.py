@@ -0,0 +1,463 @@
+# استخراج متن بدنه خبر با یک بار پیمایش DOM، مشترک بین اسپایدرها و crawlerهای قدیمی
+#
+#   extract_body(response.selector.root, rules)      # درخت lxml اسپایدرهای Scrapy
+#   extract_body(soup, rules)                         # BeautifulSoup کراولرهای قدیمی
+#   extract_body(html, rules)                         # رشته HTML (html.parser، بدون ساختن درخت)
+#
+# هر سه ورودی به یک دنباله رویداد start / text / end تبدیل می‌شوند و BodyExtractor در همان
+# یک گذر:
+#   - زیردرخت‌های script، style، iframe، nav، footer، ...، عنصرهایی با class/id حاشیه (comment،
+#     sidebar، related، tags، ad، ...) و انتخابگرهای drop قواعد سایت را کنار می‌گذارد؛ کد
+#     جاوااسکریپت پخش‌کننده ویدئو دیگر به متن نمی‌رسد و regex پاک‌سازی لازم نیست،
+#   - اگر قواعد سایت root داشته باشد اولین عنصر منطبق را برمی‌گرداند و پیمایش همان‌جا تمام می‌شود
+#     (زیردرخت class حاشیه بیرون root فقط وقتی پیمایش می‌شود که root درون آن باشد، مثلاً wrapper
+#     با class share/related؛ در درخت lxml/soup این با یک جستجوی سریع انتخابگرهای root روی
+#     نوادگان بررسی می‌شود و بقیه زیردرخت‌ها مثل قبل یکجا رد می‌شوند)،
+#   - وگرنه (یا اگر root پیدا نشد یا خالی بود) عنصری را انتخاب می‌کند که بیشترین امتیاز چگالی متن
+#     را دارد: پاراگراف‌های بلند به پدر (کامل) و پدربزرگ (نصف) امتیاز می‌دهند، class/id شبیه
+#     بدنه (body، content، matn، ...) امتیاز اضافه دارد و نسبت متن لینک‌ها امتیاز را کم می‌کند.
+#
+# زمان خطی: هر گره یک بار دیده می‌شود، کار هر رویداد مستقل از عمق و اندازه صفحه است (متن فقط
+# به یک لیست سراسری اضافه می‌شود و هر عنصر بازه خود را با دو اندیس نگه می‌دارد) و متن عنصر
+# انتخاب‌شده یک بار در پایان ساخته می‌شود. هیچ regexی روی متن کامل صفحه اجرا نمی‌شود.
+#
+# قواعد هر سایت (dict، مثلاً body_extractor در archive_sites.py):
+#   root           انتخابگر ساده عنصر بدنه: tag، .class، #id، [attr=value] و ترکیب آن‌ها، با «,» جدا
+#   drop           انتخابگرهای زیردرخت‌هایی که از متن حذف می‌شوند (علاوه بر پیش‌فرض‌ها)
+#   min_paragraph  حداقل طول پاراگرافی که در امتیاز چگالی شمرده می‌شود (پیش‌فرض 25 نویسه)
+#
+# خروجی: پاراگراف‌ها با «\n» جدا، فاصله‌های هر پاراگراف یکی‌شده.
+
+import re
+from html.parser import HTMLParser
+
+try:
+    from bs4 import NavigableString, Tag
+except ImportError:  # فقط crawlerهای قدیمی BeautifulSoup دارند
+    NavigableString = Tag = None
+
+# زیردرخت‌هایی که هرگز جزو متن خبر نیستند
+PRUNED_TAGS = frozenset(
+    (
+        "script", "style", "noscript", "iframe", "template", "svg", "canvas", "object",
+        "form", "button", "select", "textarea", "head", "nav", "footer", "aside",
+    )
+)
+# عنصرهایی که تگ بستن ندارند
+VOID_TAGS = frozenset(
+    (
+        "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+        "param", "source", "track", "wbr",
+    )
+)
+# عنصرهای درون‌خطی؛ متن آن‌ها جزو متن مستقیم نزدیک‌ترین عنصر بلوکی حساب می‌شود
+INLINE_TAGS = frozenset(
+    (
+        "a", "abbr", "b", "bdi", "bdo", "cite", "code", "em", "font", "i", "kbd", "label",
+        "mark", "q", "s", "small", "span", "strong", "sub", "sup", "time", "u",
+    )
+)
+# عنصرهایی که متن کامل‌شان یک پاراگراف است
+PARAGRAPH_TAGS = frozenset(("p", "pre", "blockquote", "li", "h2", "h3", "h4", "h5", "h6"))
+# عنصرهایی که تگ بستن اختیاری دارند (<p> تازه، <p> باز قبلی را می‌بندد)
+AUTO_CLOSE_TAGS = frozenset(("p", "li", "option"))
+
+# class/id حاشیه صفحه؛ زیردرخت حذف می‌شود مگر class/id شبیه بدنه هم باشد (comment-body)
+BOILERPLATE = re.compile(
+    r"comment|footer|sidebar|related|most_|share|social|tags?\b|menu|nav|banner|breadcrumb"
+    r"|popup|sponsor|(?:^|[\s_-])ads?(?:[\s_-]|$)",
+    re.IGNORECASE,
+)
+BODY_LIKE = re.compile(r"article|body|content|main|matn", re.IGNORECASE)
+# class/id محتمل برای ظرف متن خبر (امتیاز مثبت)
+POSITIVE = re.compile(r"body|content|article|matn|text|news|story|entry|main|post", re.IGNORECASE)
+CLASS_WEIGHT = 25
+DEFAULT_MIN_PARAGRAPH = 25
+
+SELECTOR = re.compile(
+    r"^\s*([\w-]+|\*)?((?:[.#][\w-]+)*)((?:\[[\w-]+(?:=(?:\"[^\"]*\"|'[^']*'|[^\]]*))?\])*)\s*$"
+)
+SELECTOR_PART = re.compile(r"([.#])([\w-]+)")
+SELECTOR_ATTR = re.compile(r"\[([\w-]+)(=(?:\"([^\"]*)\"|'([^']*)'|([^\]]*)))?\]")
+
+
+class Matcher:
+    """یک انتخابگر ساده (tag.class#id[attr=value])؛ بدون ترکیب‌کننده‌های نسل و فرزند."""
+
+    __slots__ = ("tag", "classes", "id", "attrs")
+
+    def __init__(self, selector):
+        match = SELECTOR.match(selector)
+        if not match or not selector.strip():
+            raise ValueError(f"Unsupported body selector: {selector!r}")
+        tag, parts, attrs = match.groups()
+        self.tag = tag if tag and tag != "*" else None
+        self.classes = tuple(name for kind, name in SELECTOR_PART.findall(parts) if kind == ".")
+        ids = [name for kind, name in SELECTOR_PART.findall(parts) if kind == "#"]
+        self.id = ids[0] if ids else None
+        self.attrs = tuple(
+            (m.group(1), None if m.group(2) is None else next(v for v in m.groups()[2:] if v is not None))
+            for m in SELECTOR_ATTR.finditer(attrs)
+        )
+
+    def matches(self, tag, attrs):
+        if self.tag is not None and tag != self.tag:
+            return False
+        if self.id is not None and attrs.get("id") != self.id:
+            return False
+        if self.classes:
+            classes = (attrs.get("class") or "").split()
+            if not all(name in classes for name in self.classes):
+                return False
+        for name, value in self.attrs:
+            actual = attrs.get(name)
+            if actual is None or (value is not None and actual.strip() != value):
+                return False
+        return True
+
+
+def compile_selectors(selectors):
+    if not selectors:
+        return ()
+    if isinstance(selectors, str):
+        selectors = [selectors]
+    return tuple(Matcher(part) for selector in selectors for part in selector.split(",") if part.strip())
+
+
+class BodyRules:
+    """قواعد استخراج یک سایت؛ از dict پیکربندی با BodyRules.of ساخته می‌شود."""
+
+    __slots__ = ("root", "drop", "min_paragraph")
+
+    def __init__(self, root=None, drop=(), min_paragraph=DEFAULT_MIN_PARAGRAPH):
+        self.root = compile_selectors(root)
+        self.drop = compile_selectors(drop)
+        self.min_paragraph = int(min_paragraph)
+
+    @classmethod
+    def of(cls, rules):
+        if rules is None:
+            return DEFAULT_RULES
+        if isinstance(rules, cls):
+            return rules
+        return cls(**rules)
+
+
+DEFAULT_RULES = BodyRules()
+
+
+class Frame:
+    """یک عنصر باز در پشته پیمایش؛ متن آن بازه parts[start:] است."""
+
+    __slots__ = ("tag", "parent", "block", "start", "chars", "links", "own", "score", "weight",
+                 "pruned", "soft", "root", "suspended")
+
+    def __init__(self, tag, parent, start, chars, links):
+        self.tag = tag
+        self.parent = parent
+        self.block = self if tag not in INLINE_TAGS or parent is None else parent.block
+        self.start = start
+        self.chars = chars  # شمار نویسه‌های متن تا پیش از این عنصر
+        self.links = links
+        self.own = 0  # متن مستقیم (و درون‌خطی) این عنصر
+        self.score = 0.0
+        self.weight = 0
+        self.pruned = False
+        self.soft = False  # حذف نرم: فرزندان فقط برای یافتن root پیمایش می‌شوند
+        self.root = False
+        self.suspended = None  # (pruned، soft) بیرون root که تا بسته شدن root کنار گذاشته شده
+
+
+class BodyExtractor:
+    """
+    مصرف‌کننده رویدادهای start / text / end. پس از پایان پیمایش body() متن بدنه را برمی‌گرداند؛
+    done یعنی عنصر root بسته شده و ادامه پیمایش لازم نیست.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = BodyRules.of(rules)
+        self.parts = []
+        self.stack = []
+        self.open_tags = {}  # نام تگ -> تعداد عنصرهای باز (برای نادیده گرفتن تگ بستن بی‌جفت در O(1))
+        self.chars = 0
+        self.link_chars = 0
+        self.in_link = 0
+        self.pruned = 0
+        self.soft = 0  # تعداد عنصرهای باز با حذف نرم (جزئی از pruned)
+        self.capturing = False
+        self.holds_root = None  # node -> آیا root درون زیردرخت آن هست (walkerهای درخت تنظیم می‌کنند)
+        self.best = None  # (امتیاز، start، end)
+        self.found = None  # بازه عنصر root
+        self.done = False
+
+    def start(self, tag, attrs, node=None):
+        """
+        attrs: dict نام -> مقدار (class به صورت رشته)؛ node: خود عنصر در پیمایش درخت.
+        خروجی: آیا فرزندان لازم‌اند.
+        """
+        if self.done:
+            return False
+        if tag in VOID_TAGS:
+            if tag == "br" and not self.pruned:
+                self.parts.append("\n")
+            return False
+        stack = self.stack
+        if tag in AUTO_CLOSE_TAGS and stack and stack[-1].tag == tag:
+            self.end(tag)
+        parent = stack[-1] if stack else None
+        frame = Frame(tag, parent, len(self.parts), self.chars, self.link_chars)
+        stack.append(frame)
+        self.open_tags[tag] = self.open_tags.get(tag, 0) + 1
+        rules = self.rules
+        if self.pruned > self.soft or tag in PRUNED_TAGS or (
+            rules.drop and any(m.matches(tag, attrs) for m in rules.drop)
+        ):
+            frame.pruned = True
+            self.pruned += 1
+            return False
+        is_root = bool(rules.root) and not self.capturing and any(
+            m.matches(tag, attrs) for m in rules.root
+        )
+        if self.soft and not is_root:
+            return self._prune_outside_root(frame, node)
+        names = attrs.get("class") or ""
+        if attrs.get("id"):
+            names = f"{names} {attrs['id']}"
+        if names and not is_root:
+            if BOILERPLATE.search(names) and not BODY_LIKE.search(names):
+                # حذف بر اساس class فقط زیر root است؛ بیرون آن ممکن است پدر root باشد
+                if rules.root and not self.capturing:
+                    return self._prune_outside_root(frame, node)
+                frame.pruned = True
+                self.pruned += 1
+                return False
+            if POSITIVE.search(names):
+                frame.weight = CLASS_WEIGHT
+        if tag == "a":
+            self.in_link += 1
+        frame.root = is_root
+        if is_root:
+            self.capturing = True
+            if self.soft:
+                # root درون حذف نرم: متن root حساب می‌شود و پس از بسته شدن آن حالت قبلی برمی‌گردد
+                frame.suspended = (self.pruned, self.soft)
+                self.pruned = self.soft = 0
+        if tag not in INLINE_TAGS:
+            self.parts.append("\n")
+        return True
+
+    def _prune_outside_root(self, frame, node):
+        frame.pruned = True
+        self.pruned += 1
+        # فقط زیردرختی که ممکن است root را داشته باشد پیمایش می‌شود (رشته HTML پیش‌نگری ندارد)
+        if node is not None and self.holds_root is not None and not self.holds_root(node):
+            return False
+        frame.soft = True
+        self.soft += 1
+        return True
+
+    def text(self, data):
+        if self.pruned or self.done or not self.stack or not data:
+            return
+        self.parts.append(data)
+        size = len(data)
+        self.chars += size
+        if self.in_link:
+            self.link_chars += size
+        self.stack[-1].block.own += size
+
+    def end(self, tag):
+        if self.done or not self.open_tags.get(tag):
+            return
+        stack = self.stack
+        while stack:
+            frame = stack.pop()
+            self.open_tags[frame.tag] -= 1
+            self._close(frame)
+            if frame.tag == tag or self.done:
+                return
+
+    def _close(self, frame):
+        if frame.pruned:
+            self.pruned -= 1
+            if frame.soft:
+                self.soft -= 1
+            return
+        if frame.tag == "a":
+            self.in_link -= 1
+        if frame.tag not in INLINE_TAGS:
+            self.parts.append("\n")
+        chars = self.chars - frame.chars
+        if frame.root:
+            self.capturing = False
+            if frame.suspended is not None:
+                self.pruned, self.soft = frame.suspended
+            if chars:
+                self.found = (frame.start, len(self.parts))
+                self.done = True
+                return
+        minimum = self.rules.min_paragraph
+        parent = frame.parent
+        if frame.tag in PARAGRAPH_TAGS:
+            if chars >= minimum and parent is not None:
+                unit = 1 + min(chars // 100, 3)
+                parent.score += unit
+                if parent.parent is not None:
+                    parent.parent.score += unit / 2
+        elif frame.own >= minimum:
+            # متن مستقیم عنصر (بدنه‌های قدیمی بدون <p> که با <br> جدا شده‌اند)
+            unit = 1 + min(frame.own // 100, 3)
+            frame.score += unit
+            if parent is not None:
+                parent.score += unit / 2
+        if frame.score > 0 and chars:
+            density = (self.link_chars - frame.links) / chars
+            score = (frame.score + frame.weight) * (1 - density)
+            if self.best is None or score > self.best[0]:
+                self.best = (score, frame.start, len(self.parts))
+
+    def close(self):
+        while self.stack and not self.done:
+            self.end(self.stack[-1].tag)
+
+    def body(self):
+        self.close()
+        span = self.found or (self.best[1:] if self.best and self.best[0] > 0 else None)
+        if span is None:
+            return ""
+        text = "".join(self.parts[span[0] : span[1]])
+        lines = (" ".join(line.split()) for line in text.split("\n"))
+        return "\n".join(line for line in lines if line)
+
+
+class BodyParser(HTMLParser):
+    """تجزیه جریانی رشته HTML (feed تکه‌تکه) مستقیماً به رویدادهای BodyExtractor، بدون درخت."""
+
+    def __init__(self, rules=None):
+        super().__init__(convert_charrefs=True)
+        self.extractor = BodyExtractor(rules)
+
+    def handle_starttag(self, tag, attrs):
+        self.extractor.start(tag, {name: value or "" for name, value in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.extractor.end(tag)
+
+    def handle_endtag(self, tag):
+        self.extractor.end(tag)
+
+    def handle_data(self, data):
+        self.extractor.text(data)
+
+    def body(self):
+        self.close()
+        return self.extractor.body()
+
+
+def walk_lxml(root, extractor):
+    from lxml import etree
+
+    matchers = extractor.rules.root
+    if matchers:
+        tags = {m.tag for m in matchers}
+        tags = () if None in tags else tuple(tags)  # فیلتر تگ در خود lxml
+
+        def holds_root(element):
+            for child in element.iterdescendants(*tags):
+                tag = child.tag
+                if isinstance(tag, str) and any(m.matches(tag.lower(), child.attrib) for m in matchers):
+                    return True
+            return False
+
+        extractor.holds_root = holds_root
+    walker = etree.iterwalk(root, events=("start", "end", "comment", "pi"))
+    for event, element in walker:
+        if event == "start":
+            tag = element.tag
+            if not isinstance(tag, str):  # عنصرهای ویژه lxml (Entity و ...)
+                walker.skip_subtree()
+                continue
+            if extractor.start(tag.lower(), element.attrib, element):
+                extractor.text(element.text)
+            else:
+                walker.skip_subtree()
+            continue
+        if event == "end":
+            if isinstance(element.tag, str):
+                extractor.end(element.tag.lower())
+        if extractor.done:
+            break
+        if element is not root:
+            extractor.text(element.tail)
+
+
+def soup_attrs(tag):
+    attrs = tag.attrs
+    if isinstance(attrs.get("class"), list):  # bs4 کلاس‌ها را لیست می‌کند
+        attrs = {**attrs, "class": " ".join(attrs["class"])}
+    return attrs
+
+
+def walk_soup(root, extractor):
+    def start(tag):
+        return extractor.start(tag.name, soup_attrs(tag), tag)
+
+    matchers = extractor.rules.root
+    if matchers:
+
+        tags = {m.tag for m in matchers}
+        tags = None if None in tags else tags
+
+        def holds_root(tag):
+            for child in tag.descendants:
+                if isinstance(child, Tag) and (tags is None or child.name in tags):
+                    attrs = soup_attrs(child)
+                    if any(m.matches(child.name, attrs) for m in matchers):
+                        return True
+            return False
+
+        extractor.holds_root = holds_root
+
+    # خود BeautifulSoup («[document]») عنصر HTML نیست
+    document = root.name == "[document]"
+    if not document and not start(root):
+        extractor.end(root.name)
+        return
+    stack = [(root, iter(root.contents))]
+    while stack and not extractor.done:
+        tag, children = stack[-1]
+        node = next(children, None)
+        if node is None:
+            stack.pop()
+            if tag is not root or not document:
+                extractor.end(tag.name)
+        elif isinstance(node, Tag):
+            if start(node):
+                stack.append((node, iter(node.contents)))
+            else:
+                extractor.end(node.name)
+        elif type(node) is NavigableString:  # نه Comment، Doctype، ...
+            extractor.text(node)
+
+
+def extract_body(node, rules=None):
+    """
+    متن بدنه خبر از رشته HTML، پاسخ/Selector اسکرپی، عنصر lxml یا BeautifulSoup (یا هر Tag آن).
+    rules: dict قواعد سایت، BodyRules یا None (فقط امتیاز چگالی).
+    """
+    if isinstance(node, (str, bytes)):
+        parser = BodyParser(rules)
+        parser.feed(node.decode("utf-8", "replace") if isinstance(node, bytes) else node)
+        return parser.body()
+    extractor = BodyExtractor(rules)
+    if Tag is not None and isinstance(node, Tag):
+        walk_soup(node, extractor)
+        return extractor.body()
+    if hasattr(node, "selector"):  # scrapy Response
+        node = node.selector
+    if hasattr(node, "root") and not hasattr(node, "tag"):  # scrapy Selector
+        node = node.root
+    walk_lxml(node, extractor)
+    return extractor.body()
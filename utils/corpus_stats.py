@@ -0,0 +1,353 @@
+# آمار جریانی پیکره خبری بدون بارگذاری کل دیتاست (به‌جای pandas در test_csv.ipynb)
+#
+#   python -m utils.corpus_stats "output/site=*/**/*.csv"
+#   python -m utils.corpus_stats Tabnak_*.csv "output/**/*.csv" --by site,month --json
+#
+# در یک گذر سطر به سطر روی CSV/JSON/JSONL:
+#   - تعداد خبر به تفکیک سایت، دسته و ماه شمسی (جدول ترکیبی، هر تفکیکی از آن جمع زده می‌شود)
+#   - صدک‌های طول بدنه (نویسه) برای هر سایت با sketch لگاریتمی (DDSketch، خطای نسبی ۱٪)
+#   - نرخ خالی بودن هر فیلد NewsRecord برای هر سایت
+#
+# همه این‌ها با جمع زدن ادغام می‌شوند. وضعیت هر فایل در _stats.json همان پوشه (کنار partهای
+# پارتیشن، مثل _manifest.json) ذخیره می‌شود و تا اندازه و زمان تغییر فایل عوض نشده دوباره
+# خوانده نمی‌شود؛ اجرای بعدی فقط partهای تازه را می‌خواند و بقیه را فوراً ادغام می‌کند.
+
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import sys
+from collections import Counter, defaultdict
+
+from utils.news_corpus import iter_input
+from utils.news_ids import site_of_path
+from utils.news_record import FIELDS, NewsRecord
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+STATS_NAME = "_stats.json"
+RELATIVE_ACCURACY = 0.01
+PERCENTILES = (0.5, 0.9, 0.99)
+NO_VALUE = "-"
+GROUPS = ("site", "category", "month")
+# فیلدهایی که نرخ خالی بودنشان معنا ندارد
+MISSING_IGNORED = ("site", "duplicate_of")
+
+
+class LengthSketch:
+    """
+    DDSketch: هر مقدار در سطل لگاریتمی ceil(log_gamma(x)) شمرده می‌شود؛ صدک با خطای نسبی
+    حداکثر relative_accuracy و حافظه چند صد سطل برای بازه ۱ تا میلیون‌ها. ادغام = جمع سطل‌ها.
+    """
+
+    __slots__ = ("gamma", "log_gamma", "buckets", "zeros", "count")
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = Counter()
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        self.count += count
+        if value <= 0:
+            self.zeros += count
+        else:
+            self.buckets[math.ceil(math.log(value) / self.log_gamma)] += count
+
+    def merge(self, other):
+        self.buckets.update(other.buckets)
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # میانه سطل (gamma^(i-1), gamma^i]
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            "gamma": self.gamma,
+            "zeros": self.zeros,
+            "count": self.count,
+            "buckets": {str(index): count for index, count in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls()
+        if abs(data["gamma"] - sketch.gamma) > 1e-12:
+            raise ValueError(f"Incompatible sketch accuracy (gamma={data['gamma']})")
+        sketch.zeros = data["zeros"]
+        sketch.count = data["count"]
+        sketch.buckets = Counter({int(index): count for index, count in data["buckets"].items()})
+        return sketch
+
+
+class CorpusStats:
+    """وضعیت قابل ادغام آمار؛ add(record) برای هر خبر، merge برای ترکیب دو وضعیت."""
+
+    __slots__ = ("counts", "lengths", "missing", "rows", "_months")
+
+    def __init__(self):
+        self.counts = Counter()  # (site، دسته، ماه شمسی) -> تعداد
+        self.lengths = defaultdict(LengthSketch)  # site -> طول بدنه
+        self.missing = defaultdict(Counter)  # site -> فیلد -> تعداد خالی
+        self.rows = Counter()  # site -> تعداد
+        self._months = {}  # کش تاریخ میلادی -> ماه شمسی
+
+    def month_of(self, record):
+        if record.date_shamsi:
+            return record.date_shamsi[:7]
+        day = record.date_georgian_iso
+        month = self._months.get(day)
+        if month is None:
+            shamsi = record.shamsi()
+            month = self._months[day] = shamsi[:7] if shamsi else NO_VALUE
+        return month
+
+    def add(self, item, site=""):
+        record = NewsRecord.of(item)
+        site = record.site or site or NO_VALUE
+        self.counts[(site, record.category or NO_VALUE, self.month_of(record))] += 1
+        self.lengths[site].add(len(record.body))
+        self.rows[site] += 1
+        missing = self.missing[site]
+        for name in FIELDS:
+            if name not in MISSING_IGNORED and getattr(record, name) in (None, ""):
+                missing[name] += 1
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        for site, sketch in other.lengths.items():
+            self.lengths[site].merge(sketch)
+        for site, missing in other.missing.items():
+            self.missing[site].update(missing)
+        self.rows.update(other.rows)
+        return self
+
+    def __len__(self):
+        return sum(self.rows.values())
+
+    def to_dict(self):
+        return {
+            "counts": [[*key, count] for key, count in sorted(self.counts.items())],
+            "lengths": {site: sketch.to_dict() for site, sketch in sorted(self.lengths.items())},
+            "missing": {site: dict(sorted(missing.items())) for site, missing in sorted(self.missing.items())},
+            "rows": dict(sorted(self.rows.items())),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.counts = Counter({(site, category, month): count
+                                for site, category, month, count in data["counts"]})
+        for site, sketch in data["lengths"].items():
+            stats.lengths[site] = LengthSketch.from_dict(sketch)
+        for site, missing in data["missing"].items():
+            stats.missing[site] = Counter(missing)
+        stats.rows = Counter(data["rows"])
+        return stats
+
+    # ---------------------------------------------------------
+    # خلاصه
+    # ---------------------------------------------------------
+    def grouped(self, by=GROUPS):
+        """تعداد به تفکیک زیرمجموعه‌ای از GROUPS (به ترتیب by)."""
+        positions = [GROUPS.index(name) for name in by]
+        totals = Counter()
+        for key, count in self.counts.items():
+            totals[tuple(key[i] for i in positions)] += count
+        return totals
+
+    def length_percentiles(self, site=None):
+        if site is None:
+            sketch = LengthSketch()
+            for site_sketch in self.lengths.values():
+                sketch.merge(site_sketch)
+        else:
+            sketch = self.lengths[site]
+        return {f"p{round(q * 100)}": _round(sketch.quantile(q)) for q in PERCENTILES}
+
+    def missing_rates(self, site=None):
+        sites = [site] if site is not None else list(self.rows)
+        rows = sum(self.rows[s] for s in sites)
+        missing = Counter()
+        for s in sites:
+            missing.update(self.missing[s])
+        return {name: round(missing[name] / rows, 4) if rows else None
+                for name in FIELDS if name not in MISSING_IGNORED}
+
+    def summary(self, by=None):
+        summary = {
+            "rows": len(self),
+            "body_length": self.length_percentiles(),
+            "missing": self.missing_rates(),
+            "sites": {
+                site: {
+                    "rows": rows,
+                    "body_length": self.length_percentiles(site),
+                    "missing": self.missing_rates(site),
+                }
+                for site, rows in sorted(self.rows.items())
+            },
+        }
+        for name in GROUPS:
+            summary[name] = {key[0]: count for key, count in sorted(self.grouped((name,)).items())}
+        if by:
+            summary["by"] = [[*key, count] for key, count in sorted(self.grouped(by).items())]
+        return summary
+
+
+def _round(value):
+    return None if value is None else round(value)
+
+
+# -------------------------------------------------------------
+# وضعیت ذخیره‌شده کنار هر پارتیشن
+# -------------------------------------------------------------
+def _load_cache(directory):
+    try:
+        with open(os.path.join(directory, STATS_NAME), encoding="utf-8") as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"version": FORMAT_VERSION, "files": {}}
+    if cache.get("version") != FORMAT_VERSION:
+        return {"version": FORMAT_VERSION, "files": {}}
+    return cache
+
+
+def _save_cache(directory, cache):
+    path = os.path.join(directory, STATS_NAME)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not save {path}: {e}")
+
+
+def file_stats(path):
+    """CorpusStats یک فایل و اینکه از _stats.json خوانده شد یا نه."""
+    directory, name = os.path.split(os.path.abspath(path))
+    stat = os.stat(path)
+    cache = _load_cache(directory)
+    entry = cache["files"].get(name)
+    if entry and entry["bytes"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return CorpusStats.from_dict(entry["stats"]), True
+    stats = CorpusStats()
+    site = site_of_path(path).lower()
+    for item in iter_input(path):
+        stats.add(item, site)
+    # دوباره خوانده می‌شود تا وضعیت فایل‌های دیگر همین پوشه که هم‌زمان ذخیره شده از دست نرود
+    cache = _load_cache(directory)
+    cache["files"][name] = {"bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns, "stats": stats.to_dict()}
+    for cached in list(cache["files"]):
+        if not os.path.exists(os.path.join(directory, cached)):
+            del cache["files"][cached]
+    _save_cache(directory, cache)
+    return stats, False
+
+
+def collect(paths, use_cache=True):
+    total = CorpusStats()
+    cached = 0
+    for path in paths:
+        if use_cache:
+            stats, hit = file_stats(path)
+            cached += hit
+        else:
+            stats = CorpusStats()
+            site = site_of_path(path).lower()
+            for item in iter_input(path):
+                stats.add(item, site)
+        total.merge(stats)
+    return total, cached
+
+
+# -------------------------------------------------------------
+# خط فرمان
+# -------------------------------------------------------------
+def _percent(value):
+    return "-" if value is None else f"{value * 100:.1f}%"
+
+
+def print_report(summary, out=sys.stdout, top=20):
+    out.write(f"rows: {summary['rows']}\n")
+    lengths = summary["body_length"]
+    out.write(f"body length: p50={lengths['p50']} p90={lengths['p90']} p99={lengths['p99']}\n")
+
+    out.write(f"\n{'site':<16}{'rows':>10}{'p50':>8}{'p90':>8}{'p99':>8}  missing\n")
+    for site, info in summary["sites"].items():
+        lengths = info["body_length"]
+        missing = ", ".join(
+            f"{name}={_percent(rate)}" for name, rate in info["missing"].items() if rate
+        )
+        out.write(
+            f"{site:<16}{info['rows']:>10}{lengths['p50'] or 0:>8}{lengths['p90'] or 0:>8}"
+            f"{lengths['p99'] or 0:>8}  {missing}\n"
+        )
+
+    categories = sorted(summary["category"].items(), key=lambda item: -item[1])
+    out.write(f"\n{'category':<24}{'rows':>10}\n")
+    for category, count in categories[:top]:
+        out.write(f"{category:<24}{count:>10}\n")
+    if len(categories) > top:
+        out.write(f"... {len(categories) - top} more\n")
+
+    out.write(f"\n{'month':<10}{'rows':>10}\n")
+    for month, count in summary["month"].items():
+        out.write(f"{month:<10}{count:>10}\n")
+
+    if "by" in summary:
+        out.write("\n")
+        for *key, count in summary["by"]:
+            out.write("  ".join(key) + f"  {count}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Streaming per-site/category/Jalali-month statistics of crawled news files."
+    )
+    parser.add_argument("inputs", nargs="+", help="CSV/JSON/JSONL files or glob patterns")
+    parser.add_argument("--by", help=f"also count by a combination of {','.join(GROUPS)}")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"neither read nor write {STATS_NAME} next to the inputs")
+    parser.add_argument("--top", type=int, default=20, help="categories to list")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    by = [name.strip() for name in args.by.split(",")] if args.by else None
+    if by and any(name not in GROUPS for name in by):
+        parser.error(f"--by accepts {', '.join(GROUPS)}")
+    paths = []
+    for pattern in args.inputs:
+        paths.extend(sorted(glob.glob(pattern, recursive=True)) or [pattern])
+    paths = [path for path in dict.fromkeys(paths) if os.path.basename(path) != STATS_NAME]
+
+    stats, cached = collect(paths, use_cache=not args.no_cache)
+    summary = stats.summary(by)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print_report(summary, top=args.top)
+    print(f"{len(paths)} files ({cached} from {STATS_NAME})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
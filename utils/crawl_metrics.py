@@ -0,0 +1,362 @@
+# معیارهای کراول مشترک بین پروژه Scrapy و کراولرهای قدیمی (requests)
+#
+# خروجی به دو شکل:
+#   - متن Prometheus روی یک پورت محلی:  curl http://127.0.0.1:9410/metrics
+#   - snapshot دوره‌ای JSON (با نرخ‌های requests/items/bytes در ثانیه)
+#
+# Example Usage:
+#
+#  >>> metrics = CrawlMetrics()
+#  >>> metrics.serve(9410)
+#  >>> metrics.start_snapshots("metrics.json", interval=30)
+#  >>> metrics.observe_request("tabnak.ir")
+#  >>> metrics.observe_response("tabnak.ir", 200, 48213, 0.42)
+
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PARSE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def site_of(url):
+    """نام سایت (بدون www.) برای برچسب معیارها."""
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key, strict=True)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + body + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def total(self):
+        with self.registry.lock:
+            return sum(self.values.values())
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.registry.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=()):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.registry.lock:
+            state = self.values.get(key)
+            if state is None:
+                # [شمارش هر bucket (+Inf در انتها), جمع, تعداد]
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def quantile(self, key, fraction):
+        """برآورد quantile از روی bucketها (مرز بالای bucket)."""
+        counts, _, count = self.values[key]
+        if not count:
+            return 0.0
+        target, seen = fraction * count, 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts, strict=True):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        # RLock: rates() چند total() را زیر همین قفل می‌خواند
+        self.lock = threading.RLock()
+        self.metrics = {}
+
+    def _register(self, metric):
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(
+            Histogram(self, name, documentation, labelnames, buckets)
+        )
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            for metric in self.metrics.values():
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                for key, value in sorted(metric.values.items()):
+                    if metric.kind != "histogram":
+                        labels = _format_labels(metric.labelnames, key)
+                        lines.append(f"{metric.name}{labels} {value}")
+                        continue
+                    counts, total, count = value
+                    cumulative = 0
+                    for bound, bucket_count in zip(
+                        metric.buckets + (float("inf"),), counts, strict=True
+                    ):
+                        cumulative += bucket_count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        labels = _format_labels(metric.labelnames, key, [("le", le)])
+                        lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f"{metric.name}_sum{labels} {total}")
+                    lines.append(f"{metric.name}_count{labels} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        result = {}
+        with self.lock:
+            for metric in self.metrics.values():
+                samples = []
+                for key, value in sorted(metric.values.items()):
+                    labels = dict(zip(metric.labelnames, key, strict=True))
+                    if metric.kind == "histogram":
+                        counts, total, count = value
+                        samples.append(
+                            {
+                                "labels": labels,
+                                "count": count,
+                                "sum": round(total, 6),
+                                "mean": round(total / count, 6) if count else 0.0,
+                                "p50": metric.quantile(key, 0.50),
+                                "p95": metric.quantile(key, 0.95),
+                                "p99": metric.quantile(key, 0.99),
+                                "buckets": dict(
+                                    zip(
+                                        [str(b) for b in metric.buckets] + ["+Inf"],
+                                        counts,
+                                        strict=True,
+                                    )
+                                ),
+                            }
+                        )
+                    else:
+                        samples.append({"labels": labels, "value": value})
+                result[metric.name] = {"type": metric.kind, "samples": samples}
+        return result
+
+
+class CrawlMetrics:
+    """
+    مجموعه استاندارد معیارهای کراول (نام‌ها در Scrapy و کراولرهای قدیمی یکسان است).
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self.started_at = time.time()
+        r = self.registry
+        self.requests = r.counter(
+            "crawl_requests_total", "Requests sent to the downloader", ["site"]
+        )
+        self.responses = r.counter(
+            "crawl_responses_total", "Responses received", ["site", "status"]
+        )
+        self.items = r.counter("crawl_items_total", "Items scraped", ["site"])
+        self.bytes = r.counter(
+            "crawl_bytes_downloaded_total", "Response bytes downloaded", ["site"]
+        )
+        self.latency = r.histogram(
+            "crawl_download_latency_seconds",
+            "Download latency per domain",
+            ["site"],
+            LATENCY_BUCKETS,
+        )
+        self.parse_time = r.histogram(
+            "crawl_parse_seconds",
+            "Time spent in parse callbacks",
+            ["callback"],
+            PARSE_BUCKETS,
+        )
+        self.drops = r.counter(
+            "crawl_dropped_total", "Dropped requests and items", ["reason"]
+        )
+        self.queue_depth = r.gauge(
+            "crawl_queue_depth", "Pending work per queue", ["queue"]
+        )
+        self._server = None
+        self._snapshot_thread = None
+        self._stop = threading.Event()
+        self._last_rates = (self.started_at, 0, 0, 0)
+
+    @classmethod
+    def from_env(cls):
+        """
+        برای کراولرهای قدیمی: CRAWL_METRICS_PORT و CRAWL_METRICS_JSON
+        (و CRAWL_METRICS_JSON_INTERVAL) از متغیرهای محیطی خوانده می‌شوند.
+        """
+        metrics = cls()
+        port = os.environ.get("CRAWL_METRICS_PORT")
+        if port:
+            metrics.serve(int(port))
+        json_path = os.environ.get("CRAWL_METRICS_JSON")
+        if json_path:
+            interval = float(os.environ.get("CRAWL_METRICS_JSON_INTERVAL", 30))
+            metrics.start_snapshots(json_path, interval)
+        return metrics
+
+    # -------------------------------------------------------------
+    # ثبت رویدادها
+    # -------------------------------------------------------------
+    def observe_request(self, site):
+        self.requests.inc(site=site)
+
+    def observe_response(self, site, status, nbytes=None, latency=None):
+        self.responses.inc(site=site, status=status)
+        if nbytes:
+            self.bytes.inc(nbytes, site=site)
+        if latency is not None:
+            self.latency.observe(latency, site=site)
+
+    def observe_bytes(self, site, nbytes):
+        self.bytes.inc(nbytes, site=site)
+
+    def observe_parse(self, callback, seconds):
+        self.parse_time.observe(seconds, callback=callback)
+
+    def observe_item(self, site):
+        self.items.inc(site=site)
+
+    def observe_drop(self, reason, amount=1):
+        self.drops.inc(amount, reason=reason)
+
+    def set_queue_depth(self, queue, depth):
+        self.queue_depth.set(depth, queue=queue)
+
+    # -------------------------------------------------------------
+    # خروجی‌ها
+    # -------------------------------------------------------------
+    def rates(self):
+        """نرخ‌ها در بازه بین دو فراخوانی متوالی."""
+        with self.registry.lock:
+            now = time.time()
+            requests, items, nbytes = (
+                self.requests.total(),
+                self.items.total(),
+                self.bytes.total(),
+            )
+            last_time, last_requests, last_items, last_bytes = self._last_rates
+            self._last_rates = (now, requests, items, nbytes)
+        elapsed = max(now - last_time, 1e-9)
+        return {
+            "requests_per_sec": round((requests - last_requests) / elapsed, 3),
+            "items_per_sec": round((items - last_items) / elapsed, 3),
+            "bytes_per_sec": round((nbytes - last_bytes) / elapsed, 1),
+        }
+
+    def snapshot(self):
+        return {
+            "time": time.time(),
+            "uptime": round(time.time() - self.started_at, 3),
+            "rates": self.rates(),
+            "metrics": self.registry.snapshot(),
+        }
+
+    def write_snapshot(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+    def start_snapshots(self, path, interval=30.0):
+        def loop():
+            while not self._stop.wait(interval):
+                self.write_snapshot(path)
+
+        self._snapshot_path = path
+        self._snapshot_thread = threading.Thread(
+            target=loop, name="crawl-metrics-json", daemon=True
+        )
+        self._snapshot_thread.start()
+
+    def serve(self, port, host="127.0.0.1"):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        thread = threading.Thread(
+            target=self._server.serve_forever, name="crawl-metrics-http", daemon=True
+        )
+        thread.start()
+        return self._server.server_address[1]
+
+    def close(self):
+        self._stop.set()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join(timeout=5)
+            # snapshot نهایی بعد از پایان کراول
+            self.write_snapshot(self._snapshot_path)
+            self._snapshot_thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
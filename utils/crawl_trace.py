@@ -0,0 +1,231 @@
+# ردیابی مراحل هر درخواست (trace) در یک فایل محلی JSONL
+#
+# هر رکورد زمان رسیدن درخواست به هر مرحله را نسبت به شروع آن نگه می‌دارد:
+#   queued -> dequeued -> [sent | connected] -> ttfb -> downloaded -> parse_start -> parse_end -> exported
+# (sent: شروع واقعی دانلود بعد از delay/هم‌روندی slot در Scrapy؛ connected: اتصال جدید در requests)
+# و تحلیل‌گر همین ماژول نشان می‌دهد زمان واقعی (wall time) هر سایت کجا صرف می‌شود:
+#
+#   python -m utils.crawl_trace crawl_trace.jsonl
+#
+# کراولرهای قدیمی با متغیرهای محیطی CRAWL_TRACE_PATH و CRAWL_TRACE_SAMPLE فعال می‌شوند.
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from utils.crawl_metrics import site_of
+
+# (نام مرحله، علامت شروع، علامت پایان). علامت شروع می‌تواند چند گزینه داشته باشد.
+STAGES = (
+    ("queue", ("queued",), "dequeued"),
+    ("slot_wait", ("dequeued",), "sent"),
+    ("connect", ("dequeued",), "connected"),
+    ("ttfb", ("connected", "sent", "dequeued"), "ttfb"),
+    ("download", ("ttfb",), "downloaded"),
+    ("handoff", ("downloaded",), "parse_start"),
+    ("parse", ("parse_start",), "parse_end"),
+    ("export", ("parse_end",), "exported"),
+)
+
+_current = threading.local()
+
+
+class TraceRecord:
+    __slots__ = ("site", "url", "status", "start", "stages", "_t0", "pending_items")
+
+    def __init__(self, url, site=None):
+        self.site = site or site_of(url)
+        self.url = url
+        self.status = None
+        self.start = time.time()
+        self.stages = {}
+        self._t0 = time.perf_counter()
+        self.pending_items = 0
+
+    def mark(self, stage):
+        self.stages[stage] = round(time.perf_counter() - self._t0, 6)
+
+    def to_dict(self, incomplete=False):
+        record = {
+            "site": self.site,
+            "url": self.url,
+            "status": self.status,
+            "start": round(self.start, 6),
+            "stages": self.stages,
+        }
+        if incomplete:
+            record["incomplete"] = True
+        return record
+
+
+class Tracer:
+    """نمونه‌برداری با نرخ `sample_rate` و نوشتن رکوردها در JSONL (یا .jsonl.gz)."""
+
+    def __init__(self, path, sample_rate=1.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.lock = threading.Lock()
+        if path.endswith(".gz"):
+            self.file = gzip.open(path, "at", encoding="utf-8")
+        else:
+            self.file = open(path, "a", encoding="utf-8")
+
+    @classmethod
+    def from_env(cls):
+        path = os.environ.get("CRAWL_TRACE_PATH")
+        if not path:
+            return None
+        install_connect_timer()
+        return cls(path, float(os.environ.get("CRAWL_TRACE_SAMPLE", 1.0)))
+
+    def start(self, url, site=None):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return None
+        return TraceRecord(url, site)
+
+    def finish(self, record, incomplete=False):
+        line = json.dumps(record.to_dict(incomplete), ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def install_connect_timer():
+    """
+    زمان DNS/اتصال (و TLS) اتصال‌های جدید urllib3 را در رکورد جاری ثبت می‌کند.
+    فقط یک بار نصب می‌شود و بدون رکورد فعال هیچ هزینه‌ای جز یک lookup ندارد.
+    """
+    from urllib3.connection import HTTPConnection
+
+    if getattr(HTTPConnection.connect, "_crawl_trace", False):
+        return
+    original_connect = HTTPConnection.connect
+
+    def connect(self):
+        result = original_connect(self)
+        record = getattr(_current, "record", None)
+        if record is not None:
+            record.mark("connected")
+        return result
+
+    connect._crawl_trace = True
+    HTTPConnection.connect = connect
+
+
+def traced_get(record, get, url, stream=False, **kwargs):
+    """
+    نسخه trace شده `requests.get` (یا session.get): TTFB بعد از دریافت هدرها
+    و download بعد از خواندن کامل بدنه علامت می‌خورد. با stream=True بدنه خوانده نمی‌شود و
+    علامت downloaded با خود caller است (تجزیه جریانی utils/page_stream.py).
+    """
+    if record is None:
+        return get(url, stream=stream, **kwargs)
+    record.mark("dequeued")
+    _current.record = record
+    try:
+        response = get(url, stream=True, **kwargs)
+        record.mark("ttfb")
+        if not stream:
+            _ = response.content  # خواندن کامل بدنه
+            record.mark("downloaded")
+    finally:
+        _current.record = None
+    record.status = response.status_code
+    return response
+
+
+# -------------------------------------------------------------
+# تحلیل‌گر
+# -------------------------------------------------------------
+def stage_durations(stages):
+    durations = {}
+    for name, starts, end in STAGES:
+        if end not in stages:
+            continue
+        for start in starts:
+            if start in stages:
+                durations[name] = max(0.0, stages[end] - stages[start])
+                break
+    return durations
+
+
+def _open_trace(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def analyze(paths):
+    """مجموع و توزیع زمان هر مرحله به تفکیک سایت."""
+    per_site = defaultdict(lambda: {"records": 0, "incomplete": 0, "stages": defaultdict(list)})
+    for path in paths:
+        with _open_trace(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                site = per_site[record["site"]]
+                site["records"] += 1
+                site["incomplete"] += bool(record.get("incomplete"))
+                for name, value in stage_durations(record["stages"]).items():
+                    site["stages"][name].append(value)
+    return per_site
+
+
+def _pct(values, fraction):
+    return values[min(len(values) - 1, int(fraction * (len(values) - 1) + 0.5))]
+
+
+def print_report(per_site, out=sys.stdout):
+    for site_name, site in sorted(per_site.items()):
+        totals = {name: sum(values) for name, values in site["stages"].items()}
+        wall = sum(totals.values()) or 1e-9
+        out.write(
+            f"\n== {site_name}: {site['records']} traced requests"
+            f" ({site['incomplete']} incomplete)\n"
+        )
+        out.write(
+            f"{'stage':<10}{'share':>8}{'total(s)':>11}{'mean(ms)':>10}"
+            f"{'p50(ms)':>10}{'p95(ms)':>10}\n"
+        )
+        for name, _, _ in STAGES:
+            values = sorted(site["stages"].get(name, ()))
+            if not values:
+                continue
+            out.write(
+                f"{name:<10}{totals[name] / wall:>8.1%}{totals[name]:>11.2f}"
+                f"{1000 * totals[name] / len(values):>10.1f}"
+                f"{1000 * _pct(values, 0.5):>10.1f}{1000 * _pct(values, 0.95):>10.1f}\n"
+            )
+        fetch = sum(
+            totals.get(n, 0)
+            for n in ("queue", "slot_wait", "connect", "ttfb", "download")
+        )
+        process = sum(totals.get(n, 0) for n in ("handoff", "parse", "export"))
+        if fetch >= process:
+            hint = "fetch-bound: more fetch concurrency (or fewer handshakes) helps most"
+        else:
+            hint = "processing-bound: more parse/export workers help most"
+        out.write(f"-> {hint}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Summarize where wall time goes per site in crawl trace files."
+    )
+    parser.add_argument("paths", nargs="+", help="trace files (.jsonl or .jsonl.gz)")
+    args = parser.parse_args(argv)
+    print_report(analyze(args.paths))
+
+
+if __name__ == "__main__":
+    main()
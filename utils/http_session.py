@@ -0,0 +1,373 @@
+# نشست مشترک requests برای crawlerهای قدیمی (crawlers/*.py) با همان رفتار صرفه‌جویی پهنای باند
+# middleware اسکرپی (TabnakNews.middlewares.BandwidthSaverMiddleware):
+#   - مذاکره فشرده‌سازی (gzip/deflate و br در صورت نصب brotli)
+#   - قطع زودهنگام پاسخ‌های غیر HTML یا بزرگ‌تر از سقف، پیش از دانلود بدنه
+#   - رد کردن URLهای رسانه (تصویر، ویدیو، PDF، ...) بدون ارسال درخواست
+#   - آمار بایت دریافتی (روی سیم) به ازای هر خبر برای هر سایت
+#   - اتصال‌های keep-alive در pool هر میزبان (به‌جای TCP+TLS تازه برای هر خبر) و آمار استفاده دوباره
+#   - timeout پیش‌فرض اتصال/خواندن برای درخواست‌های بدون timeout
+#   - تلاش دوباره با backoff نمایی و jitter برای 5xx/429، خطای اتصال و timeout (با رعایت Retry-After)
+#
+#   from utils.http_session import shared_session
+#   session = shared_session()
+#   response = session.get(link, timeout=15)
+#   session.bandwidth.observe_item(link)
+#
+# سقف اندازه پاسخ: متغیر محیطی CRAWL_MAX_RESPONSE_BYTES (پیش‌فرض 2MB)
+# timeout: CRAWL_CONNECT_TIMEOUT (پیش‌فرض 5 ثانیه) و CRAWL_READ_TIMEOUT (پیش‌فرض 30 ثانیه)
+# تلاش دوباره: CRAWL_RETRIES (پیش‌فرض 3، صفر = خاموش) و CRAWL_RETRY_BACKOFF (پیش‌فرض 0.5 ثانیه، دو برابر
+# در هر تلاش تا سقف RETRY_BACKOFF_MAX، با jitter بین نصف و کل آن)
+# pool: CRAWL_POOL_HOSTS (میزبان‌هایی که pool اتصالشان نگه داشته می‌شود، پیش‌فرض 16) و
+# CRAWL_POOL_MAXSIZE (اتصال باز هر میزبان، پیش‌فرض 8؛ به اندازه هم‌روندی هر سایت)
+# آزمون بار: CRAWL_MOCK_SITE_URL=http://127.0.0.1:8800 همه درخواست‌ها را به شبیه‌ساز محلی
+# (benchmarks/mock_site.py) می‌فرستد؛ آدرس درخواست و پاسخ همان آدرس واقعی سایت می‌ماند.
+
+import atexit
+import os
+import random
+import sys
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from utils.crawl_metrics import site_of
+
+MEDIA_EXTENSIONS = frozenset(
+    (
+        ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".bmp", ".ico",
+        ".mp4", ".webm", ".mkv", ".avi", ".mov", ".flv", ".m3u8",
+        ".mp3", ".ogg", ".wav", ".m4a", ".aac",
+        ".pdf", ".zip", ".rar", ".apk", ".exe",
+    )
+)
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 30.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_POOL_HOSTS = 16
+DEFAULT_POOL_MAXSIZE = 8
+
+_session = None
+_lock = threading.Lock()
+
+
+def accept_encoding():
+    """کدگذاری‌هایی که واقعاً می‌توانیم باز کنیم؛ br فقط وقتی brotli نصب است."""
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+        except ImportError:
+            return "gzip, deflate"
+    return "gzip, deflate, br"
+
+
+def is_media_url(url):
+    path = urlsplit(url).path.lower()
+    return os.path.splitext(path)[1] in MEDIA_EXTENSIONS
+
+
+def is_html_type(content_type):
+    """Content-Type خالی (نامشخص) هم قبول می‌شود."""
+    if isinstance(content_type, bytes):
+        content_type = content_type.decode("latin-1")
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    return not content_type or content_type in HTML_CONTENT_TYPES
+
+
+class ResponseSkipped(requests.RequestException):
+    """پاسخ عمداً دانلود نشد (media، non_html، too_large)."""
+
+    def __init__(self, reason, *args, **kwargs):
+        super().__init__(f"Response skipped ({reason})", *args, **kwargs)
+        self.reason = reason
+
+
+class BandwidthStats:
+    """بایت روی سیم، تعداد پاسخ، خبرهای استخراج‌شده و پاسخ‌های ردشده به تفکیک سایت."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sites = defaultdict(lambda: defaultdict(int))
+
+    def observe_response(self, url, nbytes):
+        with self.lock:
+            site = self.sites[site_of(url)]
+            site["responses"] += 1
+            site["bytes"] += nbytes
+
+    def observe_skip(self, url, reason):
+        with self.lock:
+            self.sites[site_of(url)][f"skipped_{reason}"] += 1
+
+    def observe_early_close(self, url, unread):
+        """اتصال پس از استخراج فیلدها بسته شد (utils/page_stream.py)؛ unread بایت دانلودنشده است."""
+        with self.lock:
+            site = self.sites[site_of(url)]
+            site["closed_early"] += 1
+            # observe_response برای stream=True کل Content-Length را شمرده است
+            site["bytes"] -= unread
+            site["bytes_saved"] += unread
+
+    def observe_connection(self, url, reused):
+        with self.lock:
+            self.sites[site_of(url)]["reused" if reused else "connections"] += 1
+
+    def observe_retry(self, url, reason):
+        with self.lock:
+            self.sites[site_of(url)][f"retry_{reason}"] += 1
+
+    def observe_failure(self, url, reason):
+        """درخواست پس از همه تلاش‌ها شکست خورد."""
+        with self.lock:
+            self.sites[site_of(url)][f"failed_{reason}"] += 1
+
+    def reuse_ratio(self, site):
+        counts = self.sites.get(site, {})
+        total = counts.get("connections", 0) + counts.get("reused", 0)
+        return counts.get("reused", 0) / total if total else None
+
+    def observe_item(self, url):
+        with self.lock:
+            self.sites[site_of(url)]["items"] += 1
+
+    def bytes_per_item(self, site):
+        counts = self.sites.get(site, {})
+        return counts.get("bytes", 0) / counts["items"] if counts.get("items") else None
+
+    def report(self, out=sys.stdout):
+        if not self.sites:
+            return
+        out.write(
+            f"\n{'site':<20}{'responses':>10}{'conns':>7}{'reused':>8}{'MB':>9}{'items':>8}"
+            f"{'KB/item':>9}  skipped / retries\n"
+        )
+        for site, counts in sorted(self.sites.items()):
+            per_item = self.bytes_per_item(site)
+            reuse = self.reuse_ratio(site)
+            reuse = "-" if reuse is None else f"{reuse:.0%}"
+            skipped = ", ".join(
+                f"{name[len('skipped_'):]}={value}"
+                for name, value in sorted(counts.items())
+                if name.startswith("skipped_")
+            )
+            retried = ", ".join(
+                f"{name}={value}"
+                for name, value in sorted(counts.items())
+                if name.startswith(("retry_", "failed_"))
+            )
+            if retried:
+                skipped += (", " if skipped else "") + retried
+            if counts.get("closed_early"):
+                skipped += (", " if skipped else "") + (
+                    f"closed_early={counts['closed_early']} ({counts['bytes_saved'] / 1024**2:.1f}MB saved)"
+                )
+            out.write(
+                f"{site:<20}{counts['responses']:>10}{counts['connections']:>7}"
+                f"{reuse:>8}{counts['bytes'] / 1024**2:>9.1f}"
+                f"{counts['items']:>8}{(per_item or 0) / 1024:>9.1f}  {skipped}\n"
+            )
+
+
+class JitteredRetry(Retry):
+    """
+    Retry با backoff نمایی از همان تلاش دوباره اول و jitter بین نصف و کل آن، تا کراولرهای
+    هم‌زمان بعد از قطعی سایت با هم برنگردند؛ هر تلاش دوباره در stats شمرده می‌شود.
+    """
+
+    def __init__(self, *args, stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.stats = self.stats
+        return retry
+
+    def get_backoff_time(self):
+        consecutive = 0
+        for entry in reversed(self.history):
+            if entry.redirect_location is not None:
+                break
+            consecutive += 1
+        if not consecutive:
+            return 0
+        backoff = min(RETRY_BACKOFF_MAX, self.backoff_factor * 2 ** (consecutive - 1))
+        return random.uniform(backoff / 2, backoff)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if self.stats is not None:
+            if url and "://" not in url and _pool is not None:
+                # آدرس نسبی؛ با proxy (شبیه‌ساز) url کامل است
+                url = f"{_pool.scheme}://{_pool.host}{url}"
+            reason = f"http_{response.status}" if error is None and response is not None else (
+                type(error).__name__
+            )
+            self.stats.observe_retry(url or "", reason)
+        return retry
+
+
+def make_retry(stats=None, retries=None, backoff=None):
+    if retries is None:
+        retries = int(os.environ.get("CRAWL_RETRIES", DEFAULT_RETRIES))
+    if backoff is None:
+        backoff = float(os.environ.get("CRAWL_RETRY_BACKOFF", DEFAULT_RETRY_BACKOFF))
+    return JitteredRetry(
+        total=retries, connect=retries, read=retries, status=retries, redirect=False,
+        status_forcelist=RETRY_STATUSES, backoff_factor=backoff,
+        # پاسخ 5xx آخر مثل قبل به کراولر برمی‌گردد، نه RetryError
+        raise_on_status=False, stats=stats,
+    )
+
+
+class BandwidthSavingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter که بدنه را فقط وقتی HTML و کوچک‌تر از سقف است دانلود می‌کند.
+    با stream=True (مثلاً traced_get) فقط بررسی هدرها انجام می‌شود و خواندن بدنه با خود caller است.
+    timeout: (اتصال، خواندن) برای درخواست‌هایی که timeout ندارند.
+    """
+
+    def __init__(self, stats, max_bytes=DEFAULT_MAX_BYTES, html_only=True, mock_url=None,
+                 timeout=None, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+        self.max_bytes = max_bytes
+        self.html_only = html_only
+        self.mock_url = mock_url
+        self.timeout = timeout
+
+    def skip_reason(self, response):
+        if self.html_only and not is_html_type(response.headers.get("Content-Type")):
+            return "non_html"
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            return "too_large"
+        return None
+
+    def send(self, request, stream=False, **kwargs):
+        if is_media_url(request.url):
+            self.stats.observe_skip(request.url, "media")
+            raise ResponseSkipped("media", request=request)
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        try:
+            response = self._send(request, **kwargs)
+        except requests.RequestException as e:
+            self.stats.observe_failure(request.url, type(e).__name__)
+            raise
+        self._observe_connection(request.url, response)
+        reason = self.skip_reason(response)
+        if reason is None and not stream:
+            reason = self._read_capped(response)
+        if reason is not None:
+            response.close()
+            self.stats.observe_skip(request.url, reason)
+            raise ResponseSkipped(reason, request=request, response=response)
+        # raw.tell(): بایت‌های فشرده روی سیم، نه طول بدنه بازشده
+        nbytes = response.raw.tell() if not stream else int(
+            response.headers.get("Content-Length") or 0
+        )
+        self.stats.observe_response(request.url, nbytes)
+        return response
+
+    def _observe_connection(self, url, response):
+        connection = getattr(response.raw, "connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is None:
+            return
+        # urllib3 بعد از بسته شدن، همان شیء اتصال را دوباره وصل می‌کند؛ socket تازه یعنی TCP (و TLS) تازه
+        reused = getattr(connection, "crawl_sock", None) is sock
+        connection.crawl_sock = sock
+        self.stats.observe_connection(url, reused)
+
+    def _send(self, request, **kwargs):
+        try:
+            return self._send_once(request, **kwargs)
+        except requests.ConnectionError as e:
+            # timeout خواندن پس از آخرین تلاش دوباره را requests به ConnectionError تبدیل می‌کند
+            reason = e.args[0].reason if e.args and isinstance(e.args[0], MaxRetryError) else None
+            if isinstance(reason, ReadTimeoutError):
+                raise requests.ReadTimeout(e, request=request) from e
+            raise
+
+    def _send_once(self, request, **kwargs):
+        if not self.mock_url:
+            return super().send(request, stream=True, **kwargs)
+        # شبیه‌ساز به‌عنوان proxy؛ https با proxy به CONNECT و TLS می‌رسد، پس موقتاً http
+        url = request.url
+        if url.startswith("https://"):
+            request.url = "http://" + url[len("https://"):]
+        kwargs["proxies"] = {"http": self.mock_url}
+        try:
+            response = super().send(request, stream=True, **kwargs)
+        finally:
+            request.url = url
+        response.url = url
+        return response
+
+    def _read_capped(self, response):
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            size += len(chunk)
+            if size > self.max_bytes:
+                return "too_large"
+            chunks.append(chunk)
+        # همان کاری که response.content انجام می‌دهد، ولی با سقف اندازه
+        response._content = b"".join(chunks)
+        response._content_consumed = True
+        return None
+
+
+def default_timeout():
+    return (
+        float(os.environ.get("CRAWL_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+        float(os.environ.get("CRAWL_READ_TIMEOUT", DEFAULT_READ_TIMEOUT)),
+    )
+
+
+def make_session(stats=None, max_bytes=None, html_only=True, timeout=None, retries=None):
+    """
+    نشست requests با یک adapter برای http و https؛ pool اتصال‌ها در آن به تفکیک میزبان است
+    و اتصال هر میزبان بین درخواست‌ها باز می‌ماند.
+    """
+    stats = stats or BandwidthStats()
+    if max_bytes is None:
+        max_bytes = int(os.environ.get("CRAWL_MAX_RESPONSE_BYTES", DEFAULT_MAX_BYTES))
+    session = requests.Session()
+    session.headers["Accept-Encoding"] = accept_encoding()
+    session.headers["Accept"] = "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5"
+    adapter = BandwidthSavingAdapter(
+        stats, max_bytes=max_bytes, html_only=html_only,
+        mock_url=os.environ.get("CRAWL_MOCK_SITE_URL") or None,
+        timeout=timeout or default_timeout(),
+        max_retries=make_retry(stats, retries),
+        pool_connections=int(os.environ.get("CRAWL_POOL_HOSTS", DEFAULT_POOL_HOSTS)),
+        pool_maxsize=int(os.environ.get("CRAWL_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE)),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.bandwidth = stats
+    return session
+
+
+def shared_session():
+    """نشست مشترک پروسه؛ گزارش بایت به ازای هر خبر هنگام خروج چاپ می‌شود."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = make_session()
+            atexit.register(_session.bandwidth.report)
+        return _session
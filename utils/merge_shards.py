@@ -0,0 +1,239 @@
+# ادغام و حذف تکراری shardهای CSV/JSON دیتاست با مرتب‌سازی خارجی و حافظه محدود
+#
+#   python -m utils.merge_shards merged.csv "Tabnak_*_to_*.csv" Tabnak_ID_Dataset.csv "output/**/*.csv"
+#   python -m utils.merge_shards merged.csv shards/*.csv --memory-mb 256 --tmp-dir /mnt/scratch
+#
+# هر رکورد با NewsRecord یکسان می‌شود (نام ستون‌های قدیمی، news_id از link، تاریخ میلادی از شمسی)؛
+# سایت رکوردهای بدون ستون site از مسیر (site=tabnak) یا پیشوند نام فایل (Tabnak_...) برداشته می‌شود.
+#
+# دو مرحله مرتب‌سازی خارجی، هر کدام با runهای مرتب روی دیسک به اندازه --memory-mb و ادغام k-تایی:
+#   1. بر اساس کلید خبر (site:news_id، در نبود آن link) و کامل بودن رکورد؛ از هر کلید فقط کامل‌ترین
+#      رکورد (بیشترین فیلد پر، بعد طولانی‌ترین متن، بعد اولین ورودی) می‌ماند
+#   2. بر اساس تاریخ میلادی (رکوردهای بدون تاریخ در انتها)، سایت و news_id
+# هر سطر run با کلید مرتب‌سازی متنی شروع می‌شود، پس ادغام سطرها را بدون باز کردن JSON مقایسه می‌کند.
+# حافظه به بافر run و فقط --fan-in فایل باز در ادغام محدود است، نه به حجم ورودی.
+
+import argparse
+import csv
+import glob
+import heapq
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from utils.news_corpus import iter_input
+from utils.news_ids import site_of_path
+from utils.news_record import FIELDS, NewsRecord
+
+DEFAULT_MEMORY_MB = 512
+DEFAULT_FAN_IN = 64
+# سربار تقریبی هر سطر در لیست پایتون (شیء str + اشاره‌گر لیست) علاوه بر sys.getsizeof
+LINE_OVERHEAD = 16
+# رکورد بدون تاریخ بعد از همه تاریخ‌ها ("~" > ارقام)
+NO_DATE = "~"
+TEXT_LENGTH_FIELDS = ("title", "abstract", "body")
+
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+def record_key(record):
+    if record.news_id is not None:
+        return f"{record.site}:{record.news_id}"
+    return record.link
+
+
+def completeness(record):
+    """(تعداد فیلدهای پر، طول متن)؛ بزرگ‌تر = کامل‌تر."""
+    filled = sum(1 for name in FIELDS if getattr(record, name) not in (None, ""))
+    return filled, sum(len(getattr(record, name)) for name in TEXT_LENGTH_FIELDS)
+
+
+def _clean_key(value):
+    # جداکننده کلید و payload در سطر run
+    return value.replace("\t", " ").replace("\n", " ")
+
+
+class RunWriter:
+    """سطرها را تا سقف حافظه نگه می‌دارد، مرتب می‌کند و به صورت run روی دیسک می‌نویسد."""
+
+    def __init__(self, directory, prefix, memory_bytes):
+        self.directory = directory
+        self.prefix = prefix
+        self.memory_bytes = memory_bytes
+        self.lines = []
+        self.size = 0
+        self.runs = []
+
+    def add(self, line):
+        self.lines.append(line)
+        self.size += sys.getsizeof(line) + LINE_OVERHEAD
+        if self.size >= self.memory_bytes:
+            self.flush()
+
+    def flush(self):
+        if not self.lines:
+            return
+        self.lines.sort()
+        path = os.path.join(self.directory, f"{self.prefix}-{len(self.runs):05d}.run")
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.writelines(self.lines)
+        self.runs.append(path)
+        self.lines = []
+        self.size = 0
+
+    def finish(self):
+        """مسیر runها (بعد از نوشتن بافر باقی‌مانده)."""
+        self.flush()
+        return self.runs
+
+
+def _read_run(path):
+    with open(path, encoding="utf-8", newline="\n") as f:
+        yield from f
+
+
+def merge_runs(runs, directory, fan_in=DEFAULT_FAN_IN):
+    """
+    سطرهای مرتب همه runها؛ اگر بیش از fan_in run باشد، ابتدا گروه‌های fan_in تایی در runهای
+    بزرگ‌تر ادغام می‌شوند تا تعداد فایل‌های باز محدود بماند.
+    """
+    level = 0
+    while len(runs) > fan_in:
+        merged = []
+        for start in range(0, len(runs), fan_in):
+            group = runs[start:start + fan_in]
+            path = os.path.join(directory, f"merge-{level}-{len(merged):05d}.run")
+            with open(path, "w", encoding="utf-8", newline="\n") as f:
+                f.writelines(heapq.merge(*(_read_run(run) for run in group)))
+            for run in group:
+                os.remove(run)
+            merged.append(path)
+        runs = merged
+        level += 1
+    return heapq.merge(*(_read_run(run) for run in runs))
+
+
+class ShardMerger:
+    """
+    merge(paths, output) همه رکوردهای ورودی را حذف تکراری و بر اساس تاریخ مرتب در output می‌نویسد.
+    stats: رکوردهای خوانده‌شده، یکتا، تکراری‌های حذف‌شده و تعداد runهای هر مرحله.
+    """
+
+    def __init__(self, memory_mb=DEFAULT_MEMORY_MB, tmp_dir=None, fan_in=DEFAULT_FAN_IN,
+                 fields=FIELDS, encoding="utf-8-sig"):
+        # بافر مرحله ۱ پیش از پر شدن بافر مرحله ۲ خالی شده است؛ هر لحظه فقط یکی
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.tmp_dir = tmp_dir
+        self.fan_in = fan_in
+        self.fields = tuple(fields)
+        self.encoding = encoding
+        self.stats = {"read": 0, "skipped": 0, "unique": 0, "duplicates": 0,
+                      "key_runs": 0, "date_runs": 0}
+
+    def records(self, paths):
+        for path in paths:
+            site = site_of_path(path).lower()
+            for item in iter_input(path):
+                record = NewsRecord.of(item)
+                if not record.site:
+                    record.site = site
+                yield record
+
+    def merge(self, paths, output):
+        work = tempfile.mkdtemp(prefix="merge_shards-", dir=self.tmp_dir)
+        try:
+            by_key = RunWriter(work, "key", self.memory_bytes)
+            for sequence, record in enumerate(self.records(paths)):
+                self.stats["read"] += 1
+                key = record_key(record)
+                if not key:
+                    self.stats["skipped"] += 1
+                    continue
+                filled, length = completeness(record)
+                # کلید، سپس کامل‌ترین اول (مقدارهای معکوس با عرض ثابت)، سپس ترتیب ورودی
+                by_key.add(
+                    f"{_clean_key(key)}\t{999 - filled:03d}{10**12 - length:012d}{sequence:012d}\t"
+                    + json.dumps([getattr(record, name) for name in FIELDS], ensure_ascii=False)
+                    + "\n"
+                )
+            key_runs = by_key.finish()
+            self.stats["key_runs"] = len(key_runs)
+
+            by_date = RunWriter(work, "date", self.memory_bytes)
+            previous = None
+            for line in merge_runs(key_runs, work, self.fan_in):
+                key, _, payload = line.split("\t", 2)
+                if key == previous:
+                    self.stats["duplicates"] += 1
+                    continue
+                previous = key
+                self.stats["unique"] += 1
+                values = json.loads(payload)
+                record = dict(zip(FIELDS, values, strict=True))
+                news_id = record["news_id"]
+                by_date.add(
+                    f"{record['date_georgian_iso'] or NO_DATE}\t{_clean_key(record['site'])}\t"
+                    f"{news_id if news_id is not None else 0:020d}\t{_clean_key(key)}\t{payload}"
+                )
+            date_runs = by_date.finish()
+            self.stats["date_runs"] = len(date_runs)
+
+            tmp_output = output + ".tmp"
+            with open(tmp_output, "w", newline="", encoding=self.encoding) as f:
+                writer = csv.writer(f)
+                writer.writerow(self.fields)
+                columns = [FIELDS.index(name) for name in self.fields]
+                for line in merge_runs(date_runs, work, self.fan_in):
+                    values = json.loads(line.rsplit("\t", 1)[1])
+                    writer.writerow(["" if values[i] is None else values[i] for i in columns])
+            os.replace(tmp_output, output)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+        return self.stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Merge CSV/JSON dataset shards into one deduplicated, date-sorted CSV "
+        "with an external sort in bounded memory."
+    )
+    parser.add_argument("output", help="merged CSV path")
+    parser.add_argument("inputs", nargs="+", help="shard files or glob patterns")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB,
+                        help="in-memory sort buffer before spilling a run to disk")
+    parser.add_argument("--tmp-dir", help="directory for sorted runs (needs ~2x the input size)")
+    parser.add_argument("--fan-in", type=int, default=DEFAULT_FAN_IN,
+                        help="runs merged at once (open files)")
+    parser.add_argument("--fields", help="comma-separated output columns (default: all NewsRecord fields)")
+    parser.add_argument("--encoding", default="utf-8-sig")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for pattern in args.inputs:
+        paths.extend(sorted(glob.glob(pattern, recursive=True)) or [pattern])
+    output = os.path.abspath(args.output)
+    paths = [path for path in dict.fromkeys(paths) if os.path.abspath(path) != output]
+    fields = [name.strip() for name in args.fields.split(",")] if args.fields else FIELDS
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown:
+        parser.error(f"unknown fields: {', '.join(unknown)}")
+
+    started = time.perf_counter()
+    merger = ShardMerger(args.memory_mb, args.tmp_dir, args.fan_in, fields, args.encoding)
+    stats = merger.merge(paths, args.output)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"{len(paths)} shards, {stats['read']} records -> {stats['unique']} unique "
+        f"({stats['duplicates']} duplicates, {stats['skipped']} without news_id/link) "
+        f"in {time.perf_counter() - started:.1f}s; runs {stats['key_runs']}+{stats['date_runs']}, "
+        f"peak RSS {peak_mb:.0f} MB",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
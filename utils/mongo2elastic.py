@@ -1,11 +1,31 @@
-import sys, os, operator, datetime
-from time import gmtime, strftime, localtime
-import jalali
-from pymongo import MongoClient
-from elasticsearch import Elasticsearch
-es = Elasticsearch(timeout=100)
-
-def index_creator(index_name):
+# انتقال سندهای Mongo (news_sites) به Elasticsearch؛ هر collection یک index
+#
+#   python -m utils.mongo2elastic
+#
+# سندهای هر سایت با NewsRecord (utils/news_record.py) یکسان می‌شوند، پس نام‌های قدیمی
+# (comments_count، raters) و تاریخ‌های شمسی با ارقام فارسی هم به همان mapping می‌رسند.
+# جستجوی محلی بدون Elasticsearch: utils/search_index.py (SQLite FTS5).
+import sys
+from time import localtime, strftime
+
+from utils import jalali
+from utils.news_record import NewsRecord
+
+BULK_SIZE = 500
+
+
+def connect():
+    try:
+        from elasticsearch import Elasticsearch
+        from pymongo import MongoClient
+    except ImportError:
+        raise ImportError(
+            "mongo2elastic requires pymongo and elasticsearch (pip install pymongo elasticsearch)"
+        ) from None
+    return Elasticsearch(timeout=100), MongoClient("localhost", 27017)
+
+
+def index_creator(es, index_name):
     if es.indices.exists(index=index_name):
         es.indices.delete(index=index_name)
 
@@ -17,15 +37,18 @@ def index_creator(index_name):
         "mappings": {
             "doc": {
                 "properties": {
+                    "site": {"type": "keyword"},
+                    "news_id": {"type": "long"},
                     "title": {"type": "text", "term_vector": "yes", "analyzer": "parsi"},
                     "abstract": {"type": "text", "term_vector": "yes", "analyzer": "parsi"},
                     "body": {"type": "text", "term_vector": "yes", "analyzer": "parsi"},
+                    "category": {"type": "keyword"},
                     "view_count": {"type": "integer"},
                     "like_count": {"type": "integer"},
                     "comment_count": {"type": "integer"},
-                    "link": {"type": "text", "type": "keyword"},
+                    "link": {"type": "keyword"},
                     "publication_time": {"type": "date", "format": "HH:mm"}, #default: "strict_date_optional_time||epoch_millis"
-                    "publication_date_shamsi": {"type": "text", "type": "keyword"},
+                    "publication_date_shamsi": {"type": "keyword"},
                     "publication_date_gregorian": {"type": "date", "format": "yyyy-MM-dd"},
                     "crawl_datetime_gregorian": {"type": "date", "format": "yyyy-MM-dd HH:mm:ss"},
                 }
@@ -35,16 +58,23 @@ def index_creator(index_name):
 
     es.indices.create(index=index_name, body=conf)
     print("Index Created")
-def add_docs(index_name, docs):
-    cnt = 0
-    for doc in docs:
-        cnt += 1
-        res = es.index(index=index_name, doc_type='doc', body=doc, id = cnt)
-    # print("Index '" + str(index_name) + "' status = " + res['result'])
-
-def _test():
+
+
+def add_docs(es, index_name, docs):
+    from elasticsearch.helpers import bulk
+
+    # شناسه سند همان _id سند Mongo است تا اجرای دوباره سند تکراری نسازد
+    actions = (
+        {"_index": index_name, "_type": "doc", "_id": doc_id, "_source": doc}
+        for doc_id, doc in docs
+    )
+    indexed, _ = bulk(es, actions, chunk_size=BULK_SIZE)
+    return indexed
+
+
+def _test(es):
     index_name = "test_structure"
-    index_creator(index_name)
+    index_creator(es, index_name)
     doc1 = {
         'title': ' 540 دستگاه دیالیز تولید داخل توزیع می شود',
         'abstract': 'تهران- ایرنا- رئیس مرکز مدیریت پیوند و بیماریهای وزارت بهداشت، درمان و آموزش پزشکی گفت: کشورمان در زمینه تولید دستگاه دیالیز داخلی به خودکفایی رسیده و در 6 ماه آینده 540 دستگاه دیالیز در بیمارستانها توزیع می شود.',
@@ -59,45 +89,66 @@ def _test():
         'crawl_datetime_gregorian': str(strftime("%Y-%m-%d %H:%M:%S", localtime())),
 
     }
-    res = es.index(index=index_name, doc_type='doc', body=doc1, id=1)
-
-def get_json(document):
-    i = 0
-    #bayad ye sakhtar koli dar biaram ke hjson ro chek kone va bebine agar field haye morede
-    # niaz ro dasht fill kone, agar nadasht hame bejashun meghdar pishfarz bezare
-    # dar nahayad yejson object ke kamelan sazegar bashe ba elastic tolid kone
-    # in marhale ro daghigh anjam bedam rooye collection ha o site ha mokhtalef kar kone
-    #nokte mohem ine ke bayad az asami vahed baraye field hashun dar mongo estefade kardee bashan
-    # faghat mitonnan baziashun hala nadashte bashan un field haro k ma pish farz bezarim
-    # na inke dar har collection field haye khase collection ba esme khas tarif shode bashan ! kar sakht mishe untro!
+    es.index(index=index_name, doc_type='doc', body=doc1, id=1)
+
+
+def get_json(document, site=None):
+    """
+    سند Mongo هر سایت -> سند سازگار با mapping بالا. فیلدهای نبودِ هر سایت مقدار پیش‌فرض
+    می‌گیرند (شمارنده‌ها 0، متن ""، تاریخ و ساعت null). site برای سندهای قدیمی بدون فیلد site
+    (معمولاً نام collection).
+    """
+    record = NewsRecord.of(document)
+    # زمان درج در Mongo از ObjectId (در نبود آن، زمان انتقال)
+    object_id = document.get("_id")
+    crawled = getattr(object_id, "generation_time", None)
+    return {
+        "site": record.site or site,
+        "news_id": record.news_id,
+        "title": record.title,
+        "abstract": record.abstract,
+        "body": record.body,
+        "category": record.category or None,
+        "view_count": record.view_count or 0,
+        "like_count": record.like_count or 0,
+        "comment_count": record.comment_count or 0,
+        "link": record.link,
+        "publication_time": record.time,
+        "publication_date_shamsi": record.shamsi(),
+        "publication_date_gregorian": record.date_georgian_iso,
+        "crawl_datetime_gregorian": (
+            crawled.astimezone().strftime("%Y-%m-%d %H:%M:%S")
+            if crawled
+            else strftime("%Y-%m-%d %H:%M:%S", localtime())
+        ),
+    }
+
 
 irna_index_name = "irna"
-others_index_names = []
-'''
-    steps:
-        1- itteration on all collection in db
-        2- creat index for each collection add 
-        3- add collection name to others_index_names
-        4- index all docs of collection in it's index_name
-'''
-client = MongoClient("localhost", 27017)
-db = client['news_sites']
-collection_names = db.collection_names()
-if irna_index_name in collection_names: collection_names.remove(irna_index_name)
-
-for collection_name in collection_names:
-    index_creator(collection_name)
-    collection  = db[collection_name]
-    for document in collection.find():
-        print(document)  # iterate the cursor
-        doc_json = get_json(document)
-        add_docs(collection_name, doc_json)
-        sys.exit(1)
-    #create index with collection name
-    #itteration on docs of collection and insert them in their index
-    i = 0
-
-print(collection_names)
-
-# d = dict((db, [collection for collection in client[db].collection_names()])
-#          for db in client.database_names())
\ No newline at end of file
+
+
+def main():
+    '''
+        steps:
+            1- itteration on all collection in db (به‌جز irna)
+            2- creat index for each collection
+            3- index all docs of collection in it's index_name
+    '''
+    es, client = connect()
+    db = client['news_sites']
+    collection_names = db.list_collection_names()
+    if irna_index_name in collection_names:
+        collection_names.remove(irna_index_name)
+
+    for collection_name in collection_names:
+        index_creator(es, collection_name)
+        collection = db[collection_name]
+        docs = ((str(document["_id"]), get_json(document, collection_name)) for document in collection.find())
+        indexed = add_docs(es, collection_name, docs)
+        print(f"{collection_name}: {indexed} documents indexed")
+
+    print(collection_names)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
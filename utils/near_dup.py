@@ -0,0 +1,385 @@
+# تشخیص خبرهای تقریباً تکراری (بازنشر یک خبر در چند سایت یا با تغییر جزئی) به صورت جریانی
+#
+# - اثرانگشت: SimHash ۶۴ بیتی روی سه‌کلمه‌ای‌های (shingle) متن یکسان‌شده (utils.persian_text)
+# - ایندکس LSH: اثرانگشت به max_distance+1 باند تقسیم می‌شود؛ دو اثرانگشت با فاصله همینگ
+#   حداکثر max_distance دست‌کم در یک باند برابرند (اصل لانه کبوتری)، پس فقط همان سطل‌ها بررسی
+#   می‌شوند. سطل‌ها زنجیره‌های درون array هستند (نه dict و array جدا برای هر سطل): هر خبر ۸ بایت
+#   اثرانگشت + ۸ بایت کلید + ۴ بایت در هر باند، یعنی با ۴ باند پیش‌فرض حدود ۳۲ بایت.
+# - حافظه محدود: حداکثر capacity اثرانگشت در دو نسل؛ وقتی نسل جاری پر شد نسل قبلی دور ریخته
+#   می‌شود (خبرهای بازنشرشده معمولاً نزدیک هم منتشر می‌شوند).
+# - کلید هر خبر (سایت، news_id) در یک عدد ۶۴ بیتی بسته‌بندی می‌شود؛ برچسب: «tabnak:1041860».
+#
+# خط فرمان روی CSVهای موجود یا مجموعه‌های Mongo (کراولرهای قدیمی):
+#   python -m utils.near_dup scan "output/site=*/**/*.csv" --action report
+#   python -m utils.near_dup scan "output/**/*.csv" --action tag --output deduped/
+#   python -m utils.near_dup scan mongodb://localhost:27017/news_sites/irna --action tag
+#   python -m utils.near_dup scan "output/**/*.csv" --index near_dup.idx   # ادامه ایندکس قبلی
+#
+# در Scrapy: TabnakNews.pipelines.NearDuplicatePipeline (NEAR_DUP_ENABLED)
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+
+from utils.news_ids import news_id_of, site_of_path
+from utils.persian_text import tokens as text_tokens
+
+FORMAT_VERSION = 1
+MAGIC = b"NDUP"
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+MIN_TOKENS = 20
+DEFAULT_MAX_DISTANCE = 3
+DEFAULT_CAPACITY = 2_000_000
+SITE_SHIFT = 48  # کلید: 16 بیت شماره سایت + 48 بیت news_id
+NEWS_ID_MASK = (1 << SITE_SHIFT) - 1
+MONGO_BATCH = 1000
+
+# BIT_TABLES[b][v] = بیت b مقدار v؛ شمارش بیت‌ها با bytes.translate/count در C انجام می‌شود
+BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+def shingles(words, size=SHINGLE_SIZE):
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def simhash(words, size=SHINGLE_SIZE):
+    """SimHash ۶۴ بیتی مجموعه shingleهای یک لیست کلمه."""
+    features = shingles(words, size)
+    digests = b"".join(
+        hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest() for feature in features
+    )
+    fingerprint = 0
+    for byte in range(8):
+        column = digests[byte::8]
+        for bit in range(8):
+            if column.translate(BIT_TABLES[bit]).count(1) * 2 > len(features):
+                fingerprint |= 1 << (byte * 8 + bit)
+    return fingerprint
+
+
+def fingerprint(text, min_tokens=MIN_TOKENS):
+    """اثرانگشت متن، یا None برای متن‌های کوتاه‌تر از min_tokens کلمه (تکراری حساب نمی‌شوند)."""
+    words = text_tokens(text)
+    if len(words) < min_tokens:
+        return None
+    return simhash(words)
+
+
+def band_layout(bands):
+    """(shift، mask) هر باند؛ ۶۴ بیت تا حد ممکن مساوی تقسیم می‌شود."""
+    layout, shift = [], 0
+    for band in range(bands):
+        width = FINGERPRINT_BITS // bands + (1 if band < FINGERPRINT_BITS % bands else 0)
+        layout.append((shift, (1 << width) - 1))
+        shift += width
+    return layout
+
+
+class _Generation:
+    """
+    برای هر باند: heads[سطل] = آخرین موقعیت آن سطل و chain[موقعیت] = موقعیت قبلی همان سطل (-1 پایان).
+    سطل = بیت‌های باند، حداکثر به اندازه توان ۲ ظرفیت نسل؛ خبرهای یک سطل با مقدار باند متفاوت
+    فقط با محاسبه فاصله کنار گذاشته می‌شوند.
+    """
+
+    __slots__ = ("fingerprints", "keys", "slots", "heads", "chains")
+
+    def __init__(self, layout, capacity):
+        self.fingerprints = array("Q")
+        self.keys = array("q")
+        table_mask = (1 << max(1, capacity - 1).bit_length()) - 1
+        self.slots = [(shift, mask & table_mask) for shift, mask in layout]
+        self.heads = [array("i", (-1,)) * (mask + 1) for _, mask in self.slots]
+        self.chains = [array("i") for _ in layout]
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def add(self, fingerprint, key):
+        position = len(self.fingerprints)
+        self.fingerprints.append(fingerprint)
+        self.keys.append(key)
+        for heads, chain, (shift, mask) in zip(self.heads, self.chains, self.slots, strict=True):
+            slot = (fingerprint >> shift) & mask
+            chain.append(heads[slot])
+            heads[slot] = position
+
+    def candidates(self, fingerprint):
+        """موقعیت‌های هم‌سطل در هر باند (یک موقعیت ممکن است در چند باند تکرار شود)."""
+        for heads, chain, (shift, mask) in zip(self.heads, self.chains, self.slots, strict=True):
+            position = heads[(fingerprint >> shift) & mask]
+            while position >= 0:
+                yield position
+                position = chain[position]
+
+
+class SimHashIndex:
+    """
+    ایندکس LSH اثرانگشت‌های SimHash با حافظه محدود.
+
+        index = SimHashIndex()
+        match = index.check(fingerprint("..."), index.key("tabnak", 1041860))
+        if match: print(index.label(match[0]), match[1])   # کلید نسخه اصلی و فاصله همینگ
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, capacity=DEFAULT_CAPACITY):
+        self.max_distance = max_distance
+        self.capacity = capacity
+        self.layout = band_layout(max_distance + 1)
+        self.sites = []
+        self._site_numbers = {}
+        self.current = self._generation()
+        self.previous = None
+        self.checked = 0
+        self.duplicates = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.current) + (len(self.previous) if self.previous else 0)
+
+    def _generation(self):
+        return _Generation(self.layout, max(1, self.capacity // 2))
+
+    # ---------- کلیدها ----------
+    def key(self, site, news_id=None, link=None):
+        """کلید ۶۴ بیتی (سایت، news_id)؛ بدون news_id از hash لینک استفاده می‌شود."""
+        number = self._site_numbers.get(site)
+        if number is None:
+            number = self._site_numbers[site] = len(self.sites)
+            self.sites.append(site)
+        if news_id is None:
+            digest = hashlib.blake2b(str(link).encode("utf-8"), digest_size=8).digest()
+            news_id = int.from_bytes(digest, "big") & NEWS_ID_MASK
+        return (number << SITE_SHIFT) | (int(news_id) & NEWS_ID_MASK)
+
+    def record_key(self, site, record):
+        return self.key(site, news_id_of(record), record.get("link"))
+
+    def label(self, key):
+        return f"{self.sites[key >> SITE_SHIFT]}:{key & NEWS_ID_MASK}"
+
+    # ---------- جستجو و افزودن ----------
+    def query(self, fingerprint):
+        """(کلید، فاصله) نزدیک‌ترین اثرانگشت با فاصله حداکثر max_distance، یا None."""
+        best = None
+        for generation in (self.current, self.previous):
+            if generation is None:
+                continue
+            fingerprints = generation.fingerprints
+            for position in generation.candidates(fingerprint):
+                distance = (fingerprint ^ fingerprints[position]).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (generation.keys[position], distance)
+                    if distance == 0:
+                        return best
+        return best
+
+    def add(self, fingerprint, key):
+        if len(self.current) >= self.capacity // 2:
+            self.evicted += len(self.previous) if self.previous else 0
+            self.previous = self.current
+            self.current = self._generation()
+        self.current.add(fingerprint, key)
+
+    def check(self, fingerprint, key):
+        """
+        جستجو و سپس افزودن: (کلید نسخه اصلی، فاصله) برای خبر تکراری، وگرنه None.
+        خبرهای تکراری به ایندکس اضافه نمی‌شوند؛ خبری که با کلید خودش پیدا شود (کراول دوباره
+        همان خبر با ایندکس ذخیره‌شده) تکراری نیست.
+        """
+        self.checked += 1
+        match = self.query(fingerprint)
+        if match is None:
+            self.add(fingerprint, key)
+        elif match[0] == key:
+            return None
+        else:
+            self.duplicates += 1
+        return match
+
+    # ---------- ذخیره و بازیابی ----------
+    def save(self, path):
+        generations = [g for g in (self.previous, self.current) if g is not None]
+        header = json.dumps(
+            {
+                "version": FORMAT_VERSION,
+                "byteorder": sys.byteorder,
+                "max_distance": self.max_distance,
+                "capacity": self.capacity,
+                "sites": self.sites,
+                "generations": [len(g) for g in generations],
+            }
+        ).encode("utf-8")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(header)) + header)
+            for generation in generations:
+                generation.fingerprints.tofile(f)
+                generation.keys.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, capacity=None):
+        """ایندکس ذخیره‌شده؛ سطل‌های LSH از روی اثرانگشت‌ها دوباره ساخته می‌شوند."""
+        with open(path, "rb") as f:
+            if f.read(4) != MAGIC:
+                raise ValueError(f"{path} is not a near-duplicate index")
+            (length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(length))
+            if header["version"] != FORMAT_VERSION or header["byteorder"] != sys.byteorder:
+                raise ValueError(f"Unsupported near-duplicate index format in {path}")
+            index = cls(header["max_distance"], capacity or header["capacity"])
+            index.sites = header["sites"]
+            index._site_numbers = {site: number for number, site in enumerate(index.sites)}
+            for count in header["generations"]:
+                fingerprints, keys = array("Q"), array("q")
+                fingerprints.fromfile(f, count)
+                keys.fromfile(f, count)
+                for value, key in zip(fingerprints, keys, strict=True):
+                    index.add(value, key)
+        return index
+
+
+# -------------------------------------------------------------
+# خط فرمان
+# -------------------------------------------------------------
+def _mongo_collection(url):
+    try:
+        from pymongo import MongoClient
+    except ImportError:
+        raise ImportError("Scanning MongoDB requires pymongo: pip install pymongo") from None
+    # mongodb://host:port/<db>/<collection>
+    server, _, path = url[len("mongodb://") :].partition("/")
+    database, _, collection = path.partition("/")
+    if not collection:
+        raise ValueError(f"Expected mongodb://host:port/<db>/<collection>, got {url}")
+    return MongoClient(f"mongodb://{server}")[database][collection]
+
+
+def scan_mongo(index, url, args, report):
+    collection = _mongo_collection(url)
+    from pymongo import DeleteOne, UpdateOne
+
+    site = collection.name
+    operations = []
+    for document in collection.find({}, {args.field: 1, "link": 1, "news_id": 1}):
+        match = _check(index, site, document, args)
+        if match is None:
+            continue
+        report(site, document, match)
+        if args.action == "tag":
+            operations.append(
+                UpdateOne({"_id": document["_id"]}, {"$set": {"duplicate_of": index.label(match[0])}})
+            )
+        elif args.action == "drop":
+            operations.append(DeleteOne({"_id": document["_id"]}))
+        if len(operations) >= MONGO_BATCH:
+            collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+
+
+def scan_csv(index, path, args, report, root):
+    site = site_of_path(path)
+    writer = out = None
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        if args.action in ("tag", "drop"):
+            out_path = os.path.join(args.output, os.path.relpath(path, root))
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            out = open(out_path, "w", newline="", encoding="utf-8-sig")
+            fields = list(reader.fieldnames or [])
+            if args.action == "tag" and "duplicate_of" not in fields:
+                fields.append("duplicate_of")
+            writer = csv.DictWriter(out, fieldnames=fields)
+            writer.writeheader()
+        try:
+            for row in reader:
+                match = _check(index, row.get("site") or site, row, args)
+                if match is not None:
+                    report(row.get("site") or site, row, match)
+                    if args.action == "drop":
+                        continue
+                    if args.action == "tag":
+                        row["duplicate_of"] = index.label(match[0])
+                if writer is not None:
+                    writer.writerow(row)
+        finally:
+            if out is not None:
+                out.close()
+
+
+def _check(index, site, record, args):
+    value = fingerprint(record.get(args.field), args.min_tokens)
+    if value is None:
+        return None
+    return index.check(value, index.record_key(site, record))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find near-duplicate articles in CSV files or MongoDB collections."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan = commands.add_parser("scan", help="fingerprint articles in order and flag duplicates")
+    scan.add_argument("inputs", nargs="+", help="CSV files, glob patterns or mongodb://host/db/coll")
+    scan.add_argument("--action", choices=("report", "tag", "drop"), default="report")
+    scan.add_argument("--output", help="output directory for tagged/deduplicated CSV files")
+    scan.add_argument("--index", help="load the index from (and save it back to) this file")
+    scan.add_argument("--field", default="body")
+    scan.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE)
+    scan.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY)
+    scan.add_argument("--min-tokens", type=int, default=MIN_TOKENS)
+    args = parser.parse_args(argv)
+
+    if args.index and os.path.exists(args.index):
+        index = SimHashIndex.load(args.index, args.capacity)
+    else:
+        index = SimHashIndex(args.max_distance, args.capacity)
+
+    paths, mongo_urls = [], []
+    for pattern in args.inputs:
+        if pattern.startswith("mongodb://"):
+            mongo_urls.append(pattern)
+        else:
+            paths.extend(sorted(glob.glob(pattern, recursive=True)) or [pattern])
+    if paths and args.action != "report" and not args.output:
+        parser.error("--output is required to tag or drop rows of CSV files")
+
+    out = csv.writer(sys.stdout)
+    out.writerow(["site", "news_id", "link", "duplicate_of", "distance"])
+
+    def report(site, record, match):
+        out.writerow(
+            [site, news_id_of(record), record.get("link", ""), index.label(match[0]), match[1]]
+        )
+
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths]) if paths else ""
+    for url in mongo_urls:
+        scan_mongo(index, url, args, report)
+    for path in paths:
+        scan_csv(index, os.path.abspath(path), args, report, root)
+    if args.index:
+        index.save(args.index)
+    print(
+        f"{index.checked} articles checked, {index.duplicates} near-duplicates, "
+        f"{len(index)} fingerprints in index",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
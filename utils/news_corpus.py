@@ -0,0 +1,453 @@
+# پیکره خبری JSONL فشرده بلوکی با ایندکس کناری برای دسترسی تصادفی
+#
+# ساختار پوشه:
+#   corpus-0001.jsonl.gz   بلوک‌ها = gzip memberهای مستقل (کل فایل با zcat هم خوانده می‌شود)
+#   index.blocks           هر بلوک: شماره فایل، offset، طول، تعداد رکورد، کمینه/بیشینه تاریخ
+#   index.ids              مرتب بر اساس (سایت، news_id): (شماره سایت، news_id، شماره بلوک، شماره سطر)
+#   index.dates            مرتب بر اساس تاریخ: (تاریخ، شماره بلوک)
+#   index-0002.ids/.dates  segment هر افزودن بعدی (فقط رکوردهای همان افزودن)
+#   index.json             فهرست فایل‌ها، سایت‌ها، segmentها و قالب رکوردها (نقطه commit)
+#
+# خواندن از طریق mmap انجام می‌شود: یافتن یک خبر = جستجوی دودویی در ids هر segment
+# (جدیدترین اول) و باز کردن فقط همان بلوک؛ بازه تاریخ = جستجوی دودویی در dates و باز کردن
+# فقط بلوک‌های آن بازه. افزودن به پیکره موجود بلوک‌ها را به انتهای index.blocks اضافه و یک
+# segment تازه می‌نویسد؛ ایندکس‌های قبلی دوباره خوانده یا نوشته نمی‌شوند.
+#
+#   python -m utils.news_corpus build corpus/ tabnak_news_test.json output/site=tabnak/**/*.csv
+#   python -m utils.news_corpus get corpus/ 1041860
+#   python -m utils.news_corpus get corpus/ 1041860 --site tabnak   (پیکره چندسایته)
+#   python -m utils.news_corpus range corpus/ 2021-03-21 2021-03-31
+
+import argparse
+import csv
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from collections import OrderedDict
+from datetime import date
+
+from utils.news_ids import news_id_of, site_of_path
+
+FORMAT_VERSION = 3
+READABLE_VERSIONS = (2, FORMAT_VERSION)  # نسخه 2 = یک segment به نام index
+BLOCK = struct.Struct("<IQIIii")  # file_no, offset, length, records, min_date, max_date
+ID_ENTRY = struct.Struct("<HqII")  # site_no, news_id, block_no, line
+DATE_ENTRY = struct.Struct("<iI")  # date ordinal, block_no
+NO_DATE = 0
+
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+def date_ordinal(value):
+    if not value:
+        return NO_DATE
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return NO_DATE
+
+
+def record_date(record):
+    return record.get("date_georgian_iso") or record.get("date")
+
+
+def record_site(record, default=None):
+    """سایت رکورد (کوچک)؛ news_id فقط درون یک سایت یکتاست."""
+    return str(record.get("site") or default or "").lower()
+
+
+def _data_name(file_no):
+    return f"corpus-{file_no + 1:04d}.jsonl.gz"
+
+
+def _segment_name(segment_no):
+    return "index" if segment_no == 0 else f"index-{segment_no + 1:04d}"
+
+
+def _write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CorpusWriter:
+    """
+    رکوردها را در بلوک‌های `block_records` تایی (یا حداکثر `block_bytes` بایت
+    فشرده‌نشده) فشرده و به پیکره اضافه می‌کند. اگر پوشه از قبل پیکره داشته باشد،
+    رکوردهای جدید در فایل داده تازه‌ای و ایندکس آن‌ها در segment تازه‌ای نوشته می‌شود.
+    کلید ایندکس (سایت، news_id) است؛ برای کلید تکراری، آخرین رکورد نوشته‌شده می‌ماند.
+    """
+
+    def __init__(
+        self,
+        directory,
+        block_records=256,
+        block_bytes=1024 * 1024,
+        file_max_bytes=1024 * 1024 * 1024,
+        compression_level=6,
+    ):
+        self.directory = directory
+        self.block_records = block_records
+        self.block_bytes = block_bytes
+        self.file_max_bytes = file_max_bytes
+        self.compression_level = compression_level
+        os.makedirs(directory, exist_ok=True)
+        self.blocks = []  # فقط بلوک‌های این افزودن
+        self.ids = []
+        self.dates = set()
+        self.files = []
+        self.sites = []
+        self._site_numbers = {}
+        self.segments = []
+        self.base_blocks = 0
+        self.base_records = 0
+        self.id_entries = 0
+        self._load_existing()
+        self.file_no = len(self.files)
+        self.file = None
+        self._lines = []
+        self._line_bytes = 0
+        self._line_meta = []  # (شماره سایت، news_id، تاریخ) هر سطر بلوک جاری
+
+    def _load_existing(self):
+        meta_path = os.path.join(self.directory, "index.json")
+        if not os.path.exists(meta_path):
+            return
+        # فقط فهرست؛ ایندکس‌های موجود خوانده نمی‌شوند
+        with NewsCorpus(self.directory) as corpus:
+            self.files = list(corpus.meta["files"])
+            self.sites = list(corpus.sites)
+            self.segments = list(corpus.segment_names)
+            self.base_blocks = corpus.block_count
+            self.base_records = len(corpus)
+            self.id_entries = corpus.id_entries
+        self._site_numbers = {site: no for no, site in enumerate(self.sites)}
+
+    def _open_data_file(self):
+        name = _data_name(self.file_no)
+        self.files.append(name)
+        self.file = open(os.path.join(self.directory, name), "ab")
+
+    def _site_no(self, site):
+        site_no = self._site_numbers.get(site)
+        if site_no is None:
+            site_no = self._site_numbers[site] = len(self.sites)
+            self.sites.append(site)
+        return site_no
+
+    def write(self, record, site=None):
+        """site: سایت رکوردهای بدون ستون site (مثلاً از مسیر فایل ورودی)."""
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        self._lines.append(line)
+        self._line_bytes += len(line)
+        self._line_meta.append((
+            self._site_no(record_site(record, site)),
+            news_id_of(record),
+            date_ordinal(record_date(record)),
+        ))
+        if len(self._lines) >= self.block_records or self._line_bytes >= self.block_bytes:
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self._lines:
+            return
+        if self.file is None:
+            self._open_data_file()
+        elif self.file.tell() >= self.file_max_bytes:
+            self.file.close()
+            self.file_no += 1
+            self._open_data_file()
+        compressor = zlib.compressobj(self.compression_level, zlib.DEFLATED, 31)
+        data = compressor.compress(b"".join(self._lines)) + compressor.flush()
+        offset = self.file.tell()
+        self.file.write(data)
+
+        block_no = self.base_blocks + len(self.blocks)
+        dated = [d for _, _, d in self._line_meta if d != NO_DATE]
+        self.blocks.append((
+            self.file_no, offset, len(data), len(self._lines),
+            min(dated) if dated else NO_DATE, max(dated) if dated else NO_DATE,
+        ))
+        for line_no, (site_no, news_id, day) in enumerate(self._line_meta):
+            if news_id is not None:
+                self.ids.append((site_no, news_id, block_no, line_no))
+            self.dates.add((day, block_no))
+        self._lines = []
+        self._line_bytes = 0
+        self._line_meta = []
+
+    def close(self):
+        self._flush_block()
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+        self._write_indexes()
+
+    def _write_indexes(self):
+        # مرتب‌سازی پایدار: برای (سایت، news_id) تکراری آخرین رکورد نگه داشته می‌شود
+        latest = {}
+        for entry in self.ids:
+            latest[entry[:2]] = entry
+        ids = sorted(latest.values())
+        join = b"".join
+        # بلوک‌های یک افزودن نیمه‌کاره قبلی (بعد از آخرین index.json) دور ریخته می‌شوند
+        with open(os.path.join(self.directory, "index.blocks"), "ab") as f:
+            f.truncate(self.base_blocks * BLOCK.size)
+            f.write(join(BLOCK.pack(*b) for b in self.blocks))
+            f.flush()
+            os.fsync(f.fileno())
+        if ids or self.dates or not self.segments:
+            name = _segment_name(len(self.segments))
+            _write_atomic(os.path.join(self.directory, f"{name}.ids"),
+                          join(ID_ENTRY.pack(*e) for e in ids))
+            _write_atomic(os.path.join(self.directory, f"{name}.dates"),
+                          join(DATE_ENTRY.pack(*e) for e in sorted(self.dates)))
+            self.segments.append(name)
+        meta = {
+            "version": FORMAT_VERSION,
+            "files": self.files,
+            "sites": self.sites,
+            "segments": self.segments,
+            "blocks": self.base_blocks + len(self.blocks),
+            "records": self.base_records + sum(b[3] for b in self.blocks),
+            # ورودی‌های همه segmentها (خبر به‌روزشده در چند segment شمرده می‌شود)
+            "id_entries": self.id_entries + len(ids),
+            "block_format": BLOCK.format,
+            "id_format": ID_ENTRY.format,
+            "date_format": DATE_ENTRY.format,
+        }
+        _write_atomic(os.path.join(self.directory, "index.json"),
+                      json.dumps(meta, indent=2).encode("utf-8"))
+        self.ids = ids
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _mmap(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class NewsCorpus:
+    """خواندن تصادفی پیکره با mmap؛ چند بلوک آخر از حالت فشرده خارج‌شده کش می‌شوند."""
+
+    def __init__(self, directory, cache_blocks=8):
+        self.directory = directory
+        with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") not in READABLE_VERSIONS:
+            raise ValueError(
+                f"{directory}: corpus format version {self.meta.get('version')} is not "
+                f"supported (expected {FORMAT_VERSION}); rebuild it"
+            )
+        self.sites = self.meta["sites"]
+        self.blocks = _mmap(os.path.join(directory, "index.blocks"))
+        # index.blocks ممکن است بلوک‌های یک افزودن نیمه‌کاره را هم داشته باشد
+        self.block_count = min(self.meta["blocks"], len(self.blocks) // BLOCK.size)
+        self.segment_names = self.meta.get("segments", ["index"])
+        self.segments = []  # (ids، تعداد، dates، تعداد) به ترتیب نوشتن
+        for name in self.segment_names:
+            ids = _mmap(os.path.join(directory, f"{name}.ids"))
+            dates = _mmap(os.path.join(directory, f"{name}.dates"))
+            self.segments.append(
+                (ids, len(ids) // ID_ENTRY.size, dates, len(dates) // DATE_ENTRY.size)
+            )
+        self.id_entries = sum(segment[1] for segment in self.segments)
+        self._data = {}
+        self._cache = OrderedDict()
+        self.cache_blocks = cache_blocks
+        self.blocks_read = 0
+
+    def close(self):
+        mapped_segments = [m for ids, _, dates, _ in self.segments for m in (ids, dates)]
+        for mapped in (self.blocks, *mapped_segments, *self._data.values()):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._data.clear()
+        self._cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.meta["records"]
+
+    def block(self, block_no):
+        return BLOCK.unpack_from(self.blocks, block_no * BLOCK.size)
+
+    def _block_lines(self, block_no):
+        lines = self._cache.get(block_no)
+        if lines is not None:
+            self._cache.move_to_end(block_no)
+            return lines
+        file_no, offset, length, _, _, _ = self.block(block_no)
+        data = self._data.get(file_no)
+        if data is None:
+            data = self._data[file_no] = _mmap(
+                os.path.join(self.directory, self.meta["files"][file_no])
+            )
+        lines = zlib.decompress(data[offset:offset + length], 31).splitlines()
+        self.blocks_read += 1
+        self._cache[block_no] = lines
+        if len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return lines
+
+    def _bisect(self, buffer, entry, count, key):
+        """اولین اندیسی که کلید آن (len(key) فیلد اول) >= key باشد."""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if entry.unpack_from(buffer, middle * entry.size)[: len(key)] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get(self, news_id, site=None):
+        """
+        رکورد یک خبر یا None؛ فقط یک بلوک از حالت فشرده خارج می‌شود. در پیکره
+        چندسایته site لازم است (news_id سایت‌ها هم‌پوشانی دارد).
+        """
+        if site is None:
+            if len(self.sites) > 1:
+                raise ValueError(
+                    f"corpus has several sites ({', '.join(self.sites)}); pass site"
+                )
+            site_no = 0
+        else:
+            site = site.lower()
+            if site not in self.sites:
+                return None
+            site_no = self.sites.index(site)
+        key = (site_no, int(news_id))
+        # segment جدیدتر رکورد جدیدتر دارد
+        for ids, id_count, _, _ in reversed(self.segments):
+            index = self._bisect(ids, ID_ENTRY, id_count, key)
+            if index >= id_count:
+                continue
+            found_site, found_id, block_no, line = ID_ENTRY.unpack_from(
+                ids, index * ID_ENTRY.size
+            )
+            if (found_site, found_id) == key:
+                return json.loads(self._block_lines(block_no)[line])
+        return None
+
+    def block_range(self, from_date, to_date):
+        """شماره بلوک‌هایی که رکوردی در بازه [from_date, to_date] دارند (به ترتیب تاریخ)."""
+        start, end = date_ordinal(from_date), date_ordinal(to_date)
+        entries = []
+        for _, _, dates, date_count in self.segments:
+            index = self._bisect(dates, DATE_ENTRY, date_count, (start,))
+            while index < date_count:
+                entry = DATE_ENTRY.unpack_from(dates, index * DATE_ENTRY.size)
+                if entry[0] > end:
+                    break
+                entries.append(entry)
+                index += 1
+        if len(self.segments) > 1:
+            entries.sort()
+        # dict: یکتا و به ترتیب اولین تاریخ
+        return list(dict.fromkeys(block_no for _, block_no in entries))
+
+    def range(self, from_date, to_date):
+        """همه رکوردهای بازه تاریخ (میلادی ISO، شامل دو سر بازه)."""
+        start, end = date_ordinal(from_date), date_ordinal(to_date)
+        for block_no in self.block_range(from_date, to_date):
+            for line in self._block_lines(block_no):
+                record = json.loads(line)
+                if start <= date_ordinal(record_date(record)) <= end:
+                    yield record
+
+    def __iter__(self):
+        for block_no in range(self.block_count):
+            for line in self._block_lines(block_no):
+                yield json.loads(line)
+
+
+# -------------------------------------------------------------
+# ورودی‌ها و خط فرمان
+# -------------------------------------------------------------
+def iter_input(path):
+    """رکوردهای یک فایل JSON (آرایه)، JSONL یا CSV."""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+        return
+    with open(path, encoding="utf-8-sig") as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build and query a block-compressed JSONL news corpus."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="append JSON/JSONL/CSV files to a corpus")
+    build.add_argument("directory")
+    build.add_argument("inputs", nargs="+", help="files or glob patterns")
+    build.add_argument("--block-records", type=int, default=256)
+    get = commands.add_parser("get", help="print one article by news_id")
+    get.add_argument("directory")
+    get.add_argument("news_ids", nargs="+", type=int)
+    get.add_argument("--site", help="required when the corpus has several sites")
+    date_range = commands.add_parser("range", help="print articles between two dates")
+    date_range.add_argument("directory")
+    date_range.add_argument("from_date", help="YYYY-MM-DD")
+    date_range.add_argument("to_date", help="YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = 0
+        with CorpusWriter(args.directory, block_records=args.block_records) as writer:
+            for pattern in args.inputs:
+                for path in sorted(glob.glob(pattern, recursive=True)) or [pattern]:
+                    site = site_of_path(path)
+                    for record in iter_input(path):
+                        writer.write(record, site)
+                        count += 1
+        print(f"Added {count} records to {args.directory}", file=sys.stderr)
+        return
+
+    with NewsCorpus(args.directory) as corpus:
+        if args.command == "get":
+            if args.site is None and len(corpus.sites) > 1:
+                parser.error(f"corpus has several sites ({', '.join(corpus.sites)}); pass --site")
+            records = (corpus.get(news_id, args.site) for news_id in args.news_ids)
+        else:
+            records = corpus.range(args.from_date, args.to_date)
+        for record in records:
+            if record is not None:
+                print(json.dumps(record, ensure_ascii=False))
+        print(f"{corpus.blocks_read} of {corpus.block_count} blocks read", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
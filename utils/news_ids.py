@@ -0,0 +1,39 @@
+# استخراج شناسه عددی خبر از URL یا رکورد و نام سایت از مسیر فایل خروجی
+# (مشترک بین spiderها، خروجی‌ها و corpus)
+
+import os
+import re
+
+NEWS_ID_PATTERNS = (re.compile(r"/news/(\d+)"), re.compile(r"/(\d{4,})(?:/|$)"))
+
+
+def news_id_from_url(url):
+    """شناسه عددی خبر را از URL استخراج می‌کند (یا None)."""
+    for pattern in NEWS_ID_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def news_id_of(record):
+    """
+    شناسه خبر یک رکورد (dict یا ItemAdapter): فیلد news_id، یا link عددی
+    (Entekhab فقط ID را در link نگه می‌دارد)، یا ID داخل URL خبر.
+    """
+    news_id = record.get("news_id")
+    if news_id in (None, ""):
+        link = str(record.get("link") or "")
+        news_id = link if link.isdigit() else news_id_from_url(link)
+    try:
+        return int(news_id) if news_id not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def site_of_path(path):
+    """نام سایت از مسیر پارتیشن (site=tabnak) یا نام فایل."""
+    for part in reversed(os.path.normpath(path).split(os.sep)):
+        if part.startswith("site="):
+            return part[len("site=") :]
+    return os.path.basename(path).split("_")[0].split(".")[0]
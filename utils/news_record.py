@@ -0,0 +1,203 @@
+# رکورد یکسان خبر برای همه تولیدکننده‌ها (crawlerهای قدیمی، اسپایدرهای Scrapy) و نویسنده‌ها
+# (CSV پارتیشن‌بندی‌شده، Parquet، Elasticsearch)
+#
+#   record = NewsRecord(site="parsine", title=..., body=..., date_shamsi="۱۸ مهر ۱۳۹۷",
+#                       time="۰۹:۰۰", comment_count="۸", link=url)
+#   record.date_georgian_iso   # "2018-10-10"
+#   record.to_dict()           # سند Mongo / سطر JSON با نام فیلدهای ثابت
+#   NewsRecord.of(doc)         # dict قدیمی (comments_count، publication_date_shamsi، ...) -> NewsRecord
+#
+# مقدارها هنگام ساختن رکورد یکسان می‌شوند:
+#   - شمارنده‌ها (comment_count، view_count، like_count) و news_id -> int (ارقام فارسی هم)؛
+#     news_id خالی از link خوانده می‌شود
+#   - date_georgian_iso -> YYYY-MM-DD (اگر خالی باشد از date_shamsi)، date_shamsi -> YYYY/MM/DD،
+#     time -> HH:MM
+#   - متن‌ها str بدون فاصله ابتدا و انتها (None -> "")
+# مقدار نامعتبر None می‌شود، نه خطا؛ کراول به خاطر یک شمارنده بدشکل متوقف نمی‌شود.
+#
+# dataclass است (نه کلاس __slots__ ساده) تا Scrapy و ItemAdapter آن را مستقیماً به‌عنوان item بپذیرند.
+
+import re
+from dataclasses import dataclass, fields
+from datetime import date, datetime
+
+import jdatetime
+
+from utils.news_ids import news_id_of
+
+JALALI_MONTHS = {
+    "فروردین": 1,
+    "اردیبهشت": 2,
+    "خرداد": 3,
+    "تیر": 4,
+    "مرداد": 5,
+    "شهریور": 6,
+    "مهر": 7,
+    "آبان": 8,
+    "آذر": 9,
+    "دی": 10,
+    "بهمن": 11,
+    "اسفند": 12,
+}
+PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+JALALI_TEXT_DATE = re.compile(r"(\d{1,2})\s+(" + "|".join(JALALI_MONTHS) + r")\s+(\d{4})")
+JALALI_NUMERIC_DATE = re.compile(r"(1[34]\d\d)[/-](\d{1,2})[/-](\d{1,2})")
+GREGORIAN_DATE = re.compile(r"((?:19|20)\d\d)[/-](\d{1,2})[/-](\d{1,2})")
+CLOCK = re.compile(r"(\d{1,2}):(\d{2})")
+NUMBER = re.compile(r"\d[\d,٬]*")
+
+# نام‌های قدیمی فیلدها (سندهای Mongo، خروجی Parquet قبلی، سندهای Elasticsearch)
+ALIASES = {
+    "comments_count": "comment_count",
+    "raters": "like_count",  # khabaronline: تعداد امتیازدهنده‌ها
+    "subtitle": "abstract",
+    "date": "date_georgian_iso",
+    "publication_date_gregorian": "date_georgian_iso",
+    "publication_date_shamsi": "date_shamsi",
+    "publication_time": "time",
+}
+TEXT_FIELDS = ("site", "title", "abstract", "body", "category", "link")
+COUNT_FIELDS = ("comment_count", "view_count", "like_count")
+
+
+def to_text(value):
+    if value is None:
+        return ""
+    if type(value) is not str:
+        value = str(value)
+    return value.strip()
+
+
+def to_int(value):
+    """شمارنده -> int؛ "۱٬۲۳۴ نظر" -> 1234، خالی یا بدون عدد -> None."""
+    if value is None or type(value) is int:
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    match = NUMBER.search(str(value).translate(PERSIAN_DIGITS))
+    if not match:
+        return None
+    return int(match.group(0).replace(",", "").replace("٬", ""))
+
+
+def jalali_date(raw):
+    """تاریخ شمسی خام ("۱۸ مهر ۱۳۹۷"، "1402/3/11 - 14:20") -> jdatetime.date (یا None)."""
+    if not raw:
+        return None
+    if isinstance(raw, jdatetime.date):
+        return raw
+    raw = str(raw).translate(PERSIAN_DIGITS)
+    match = JALALI_TEXT_DATE.search(raw)
+    if match:
+        day, month, year = int(match.group(1)), JALALI_MONTHS[match.group(2)], int(match.group(3))
+    else:
+        match = JALALI_NUMERIC_DATE.search(raw)
+        if not match:
+            return None
+        year, month, day = (int(g) for g in match.groups())
+    try:
+        return jdatetime.date(year, month, day)
+    except ValueError:
+        return None
+
+
+def to_iso_date(value):
+    """date/datetime یا رشته میلادی ("2020-9-2"، "2020-09-02T10:00") -> "2020-09-02" (یا None)."""
+    if not value:
+        return None
+    if isinstance(value, (date, datetime)):
+        return (value.date() if isinstance(value, datetime) else value).isoformat()
+    if isinstance(value, jdatetime.date):
+        return value.togregorian().isoformat()
+    value = str(value)
+    if len(value) >= 10 and value[4] == "-" and value[7] == "-":
+        # حالت رایج (خروجی اسپایدرها) بدون regex
+        try:
+            return date.fromisoformat(value[:10]).isoformat()
+        except ValueError:
+            pass
+    match = GREGORIAN_DATE.search(value.translate(PERSIAN_DIGITS))
+    if not match:
+        return None
+    try:
+        return date(*(int(g) for g in match.groups())).isoformat()
+    except ValueError:
+        return None
+
+
+def to_time(value):
+    """"۰۹:۰۰ " -> "09:00" (یا None)."""
+    if not value:
+        return None
+    match = CLOCK.search(str(value).translate(PERSIAN_DIGITS))
+    if not match:
+        return None
+    return f"{int(match.group(1)):02d}:{match.group(2)}"
+
+
+@dataclass(slots=True)
+class NewsRecord:
+    site: str = ""
+    news_id: int | None = None
+    title: str = ""
+    abstract: str = ""
+    body: str = ""
+    date_georgian_iso: str | None = None
+    date_shamsi: str | None = None
+    time: str | None = None
+    category: str = ""
+    link: str = ""
+    comment_count: int | None = None
+    view_count: int | None = None
+    like_count: int | None = None
+    duplicate_of: str | None = None  # NearDuplicatePipeline در حالت tag
+
+    def __post_init__(self):
+        for name in TEXT_FIELDS:
+            setattr(self, name, to_text(getattr(self, name)))
+        for name in COUNT_FIELDS:
+            setattr(self, name, to_int(getattr(self, name)))
+        shamsi = jalali_date(self.date_shamsi)
+        self.date_shamsi = shamsi.strftime("%Y/%m/%d") if shamsi else None
+        self.date_georgian_iso = to_iso_date(self.date_georgian_iso) or (
+            shamsi.togregorian().isoformat() if shamsi else None
+        )
+        self.time = to_time(self.time)
+        self.news_id = news_id_of(self)
+        if self.duplicate_of is not None:
+            self.duplicate_of = str(self.duplicate_of)
+
+    @classmethod
+    def of(cls, item):
+        """NewsRecord از هر رکورد: خود NewsRecord، dict، آیتم Scrapy یا ItemAdapter."""
+        if isinstance(item, cls):
+            return item
+        return cls.from_mapping(item)
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """کلیدهای ناشناخته (مثل _id سند Mongo) نادیده گرفته می‌شوند؛ نام اصلی بر نام قدیمی مقدم است."""
+        values = {}
+        for key, value in mapping.items():
+            name = ALIASES.get(key, key)
+            if name in FIELDS and (name not in values or key == name):
+                values[name] = value
+        return cls(**values)
+
+    def get(self, name, default=None):
+        # همان رابط dict/ItemAdapter برای PartitionedCsvWriter و news_id_of
+        return getattr(self, name, default)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def shamsi(self):
+        """تاریخ شمسی YYYY/MM/DD؛ برای رکوردهایی که فقط تاریخ میلادی دارند محاسبه می‌شود."""
+        if self.date_shamsi or not self.date_georgian_iso:
+            return self.date_shamsi
+        return jdatetime.date.fromgregorian(
+            date=date.fromisoformat(self.date_georgian_iso)
+        ).strftime("%Y/%m/%d")
+
+
+FIELDS = tuple(field.name for field in fields(NewsRecord))
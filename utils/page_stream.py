@@ -0,0 +1,196 @@
+# تجزیه جریانی (feed) صفحه خبر با توقف زودهنگام، برای crawlerهای قدیمی
+#
+# تیتر، لید، بدنه و تاریخ در بخش بالایی صفحه هستند و نظرها، خبرهای مرتبط و پربازدیدها بعد از
+# آن‌ها می‌آیند. PageStream بدنه پاسخ را تکه‌تکه به parser جریانی lxml (HTMLPullParser) می‌دهد و
+# به محض بسته شدن عنصرهای لازم (انتخابگرهای ساده utils/article_body.py) خواندن و تجزیه را قطع
+# می‌کند؛ ادامه صفحه نه تجزیه می‌شود و نه (با close_early) دانلود:
+#
+#   page = fetch_page(session, link, {"title": "h1", "body": "div.body", "date": "span.en_date"},
+#                     timeout=15)
+#   page.text("title"), page.elements["body"]   # عنصر lxml همان فیلد
+#   page.fragment()                              # HTML فقط همین عنصرها (برای BeautifulSoup)
+#   page.complete                                # همه عنصرها پیدا شدند (وگرنه کل صفحه خوانده شد)
+#
+# پس از توقف، ادامه بدنه یا بدون تجزیه خوانده و دور ریخته می‌شود تا اتصال keep-alive
+# بماند (پیش‌فرض)، یا با close_early اتصال بسته می‌شود و بایت‌های باقی‌مانده اصلاً دانلود نمی‌شوند.
+# بستن اتصال هزینه اتصال (و TLS) تازه برای درخواست بعدی دارد، پس فقط وقتی باقی‌مانده بیش از
+# EARLY_CLOSE_MIN_BYTES (یا نامعلوم) است بسته می‌شود.
+#
+# متغیرهای محیطی: CRAWL_INCREMENTAL_PARSE=0 (خواندن و تجزیه کل صفحه مثل قبل)،
+# CRAWL_EARLY_CLOSE=1 (بستن اتصال پس از توقف).
+
+import os
+
+from utils.article_body import compile_selectors
+from utils.http_session import ResponseSkipped
+
+EARLY_CLOSE_MIN_BYTES = 16 * 1024
+# تکه کوچک‌تر = توقف دقیق‌تر؛ هزینه هر feed ناچیز است
+FEED_CHUNK_SIZE = 8 * 1024
+
+
+def incremental_enabled():
+    return os.environ.get("CRAWL_INCREMENTAL_PARSE", "1").lower() not in ("0", "false", "no", "")
+
+
+def early_close_enabled():
+    return os.environ.get("CRAWL_EARLY_CLOSE", "0").lower() in ("1", "true", "yes")
+
+
+class PageStream:
+    """
+    fields: نام -> انتخابگر ساده (یا چند انتخابگر با «,»). برای هر فیلد اولین عنصری که بسته
+    می‌شود نگه داشته می‌شود؛ done یعنی همه فیلدها پیدا شده‌اند و feed بیشتر لازم نیست.
+    """
+
+    def __init__(self, fields, encoding=None):
+        from lxml import etree
+
+        self.pending = {name: compile_selectors(selector) for name, selector in fields.items()}
+        self.elements = dict.fromkeys(fields)
+        self.encoding = encoding or "utf-8"
+        self.parser = etree.HTMLPullParser(events=("end",), encoding=self.encoding)
+        self.bytes_read = 0
+        self.done = not self.pending
+        self.root = None
+
+    def feed(self, data):
+        """یک تکه بدنه (bytes یا str)؛ خروجی: done."""
+        if self.done:
+            return True
+        if isinstance(data, str):
+            data = data.encode(self.encoding)
+        self.bytes_read += len(data)
+        self.parser.feed(data)
+        return self._read_events()
+
+    def _read_events(self):
+        pending = self.pending
+        for _, element in self.parser.read_events():
+            tag = element.tag
+            if not isinstance(tag, str):
+                continue
+            for name, matchers in list(pending.items()):
+                if any(matcher.matches(tag, element.attrib) for matcher in matchers):
+                    self.elements[name] = element
+                    del pending[name]
+            if not pending:
+                self.done = True
+                break
+        return self.done
+
+    def close(self):
+        """پایان ورودی؛ عنصرهای باز (صفحه ناقص یا تگ بسته‌نشده) همین‌جا بسته و بررسی می‌شوند."""
+        if self.root is None:
+            from lxml import etree
+
+            try:
+                self.root = self.parser.close()
+            except etree.XMLSyntaxError:  # ورودی خالی
+                self.root = etree.Element("html")
+            if not self.done:
+                self._read_events()
+        return self.root
+
+    @property
+    def complete(self):
+        return not self.pending
+
+    def text(self, name):
+        """متن عنصر فیلد با فاصله‌های یکی‌شده ("" اگر پیدا نشد)."""
+        element = self.elements.get(name)
+        if element is None:
+            return ""
+        return " ".join("".join(element.itertext()).split())
+
+    def fragment(self):
+        """
+        HTML عنصرهای پیدا شده به ترتیب سند (عنصر داخل عنصر دیگر فقط یک بار). BeautifulSoup
+        روی این چند کیلوبایت همان نتیجه انتخابگرهای fields روی کل صفحه را می‌دهد.
+        """
+        from lxml import etree
+
+        found = {element for element in self.elements.values() if element is not None}
+        root = self.close()
+        return "".join(
+            etree.tostring(element, encoding="unicode", method="html", with_tail=False)
+            for element in root.iter()
+            if element in found and not any(parent in found for parent in element.iterancestors())
+        )
+
+
+def parse_page(html, fields, chunk_size=FEED_CHUNK_SIZE):
+    """همان PageStream روی HTML کامل (مثلاً fixture)؛ تجزیه پس از پیدا شدن فیلدها متوقف می‌شود."""
+    page = PageStream(fields)
+    for start in range(0, len(html), chunk_size):
+        if page.feed(html[start : start + chunk_size]):
+            break
+    page.close()
+    return page
+
+
+def response_encoding(response):
+    """charset هدر Content-Type؛ در نبود آن utf-8 (نه ISO-8859-1 پیش‌فرض requests برای text/html)."""
+    content_type = response.headers.get("Content-Type") or ""
+    return response.encoding if "charset" in content_type.lower() else "utf-8"
+
+
+def read_page(response, fields, close_early=None, session=None):
+    """
+    بدنه پاسخ stream شده (session.get(..., stream=True)) را تا پیدا شدن فیلدها می‌خواند.
+    ادامه بدنه: بسته شدن اتصال (close_early) یا دور ریختن بدون تجزیه برای حفظ keep-alive.
+    session (اختیاری، make_session): سقف اندازه پاسخ و آمار پهنای باند.
+    """
+    if close_early is None:
+        close_early = early_close_enabled()
+    max_bytes = getattr(session.get_adapter(response.url), "max_bytes", None) if session else None
+    stats = getattr(session, "bandwidth", None)
+    page = PageStream(fields, response_encoding(response))
+    url = response.url
+    try:
+        for chunk in response.iter_content(FEED_CHUNK_SIZE):
+            if max_bytes and page.bytes_read + len(chunk) > max_bytes:
+                if stats is not None:
+                    stats.observe_skip(url, "too_large")
+                raise ResponseSkipped("too_large", response=response)
+            if page.feed(chunk):
+                break
+        else:
+            return page
+        length = response.headers.get("Content-Length")
+        unread = int(length) - response.raw.tell() if length and length.isdigit() else None
+        if close_early and (unread is None or unread > EARLY_CLOSE_MIN_BYTES):
+            response.close()
+            if stats is not None:
+                stats.observe_early_close(url, unread or 0)
+        else:
+            # ادامه بدنه بدون تجزیه دور ریخته می‌شود و اتصال به pool برمی‌گردد
+            response.raw.drain_conn()
+            response.raw.release_conn()
+        return page
+    finally:
+        page.close()
+        response.close()
+
+
+def fetch_page(session, url, fields, close_early=None, **kwargs):
+    """
+    (response، PageStream) یک صفحه. برای پاسخ غیر 200، PageStream برابر None است و بدنه
+    خوانده نشده (response.content / response.text مثل همیشه).
+    """
+    response = session.get(url, stream=True, **kwargs)
+    if response.status_code != 200:
+        return response, None
+    return response, read_page(response, fields, close_early, session)
+
+
+def fetch_html(session, url, fields, **kwargs):
+    """
+    HTML عنصرهای لازم صفحه (PageStream.fragment) برای parse_news مبتنی بر BeautifulSoup در
+    crawlerهای قدیمی؛ fields باید همه انتخابگرهای parse_news را پوشش دهد.
+    با CRAWL_INCREMENTAL_PARSE=0 یا پاسخ غیر 200، همان response.text کامل.
+    """
+    if not incremental_enabled():
+        return session.get(url, **kwargs).text
+    response, page = fetch_page(session, url, fields, **kwargs)
+    return response.text if page is None else page.fragment()
@@ -0,0 +1,342 @@
+# خروجی CSV پارتیشن‌بندی‌شده بر اساس سایت و ماه شمسی، با چرخش بر اساس اندازه
+#
+#   <root>/site=tabnak/year=1399/month=07/part-0001.csv
+#   <root>/site=tabnak/_manifest.json
+#
+# هر part ابتدا با نام موقت `.part-0001.csv.inprogress` نوشته می‌شود و فقط بعد از
+# بسته شدن (رسیدن به سقف اندازه، پایان اجرا یا خارج شدن از فایل‌های باز) با
+# os.replace به نام نهایی منتقل و در manifest ثبت می‌شود. پس هر فایل part-*.csv
+# کامل است و کارهای بعدی می‌توانند پارتیشن‌ها را موازی بخوانند و با مقایسه
+# updated_at هر پارتیشن فقط پارتیشن‌های تغییرکرده را دوباره پردازش کنند.
+#
+# چند نویسنده هم‌زمان روی یک سایت (workerهای frontier مشترک، یا entekhab و cms_archive در
+# orchestrator) مجازند: شماره‌گذاری partها، به‌روزرسانی manifest و بازیابی زیر قفل انحصاری
+# فایل .lock همان سایت انجام می‌شود و manifest زیر قفل دوباره از دیسک خوانده می‌شود. هر part
+# باز هم با flock نگه داشته می‌شود تا recover فقط partهای پروسه‌های مرده را بردارد.
+# (قفل‌ها با fcntl هستند؛ روی سیستم بدون fcntl مثل قبل فقط یک نویسنده برای هر سایت.)
+
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from io import StringIO
+
+try:
+    import fcntl
+except ImportError:  # ویندوز
+    fcntl = None
+
+from utils.jalali import Gregorian
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "_manifest.json"
+LOCK_NAME = ".lock"
+INPROGRESS_SUFFIX = ".inprogress"
+PART_PATTERN = re.compile(r"^\.?part-(\d+)\.csv(?:\.inprogress)?$")
+UNKNOWN = "unknown"
+
+# بدنه خبرها ممکن است از سقف پیش‌فرض ماژول csv بزرگ‌تر باشد
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+def jalali_partition(date_iso, by_month=True):
+    """`2020-09-02` -> `year=1399/month=06` (تاریخ نامعتبر -> year=unknown/month=unknown)."""
+    if not by_month:
+        return ""
+    try:
+        year, month, _ = Gregorian(str(date_iso)[:10]).persian_tuple()
+    except Exception:
+        return f"year={UNKNOWN}/month={UNKNOWN}"
+    return f"year={year}/month={month:02d}"
+
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _try_lock(f):
+    """flock انحصاری بدون انتظار؛ False اگر نویسنده دیگری فایل را نگه داشته است."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _OpenPart:
+    __slots__ = ("partition", "number", "tmp_path", "final_path", "file", "writer",
+                 "rows", "min_date", "max_date")
+
+    def __init__(self, partition, number, directory):
+        self.partition = partition
+        self.number = number
+        self.tmp_path = os.path.join(directory, f".part-{number:04d}.csv{INPROGRESS_SUFFIX}")
+        self.final_path = os.path.join(directory, f"part-{number:04d}.csv")
+        self.file = None
+        self.writer = None
+        self.rows = 0
+        self.min_date = None
+        self.max_date = None
+
+    def observe_date(self, date_iso):
+        if not date_iso:
+            return
+        if self.min_date is None or date_iso < self.min_date:
+            self.min_date = date_iso
+        if self.max_date is None or date_iso > self.max_date:
+            self.max_date = date_iso
+
+
+class PartitionedCsvWriter:
+    """
+    نویسنده CSV برای یک سایت. هر ردیف بر اساس `date_field` (تاریخ میلادی ISO)
+    در پارتیشن ماه شمسی خودش نوشته می‌شود و هر part با رسیدن به `max_bytes`
+    نهایی شده و part بعدی شروع می‌شود.
+    """
+
+    def __init__(
+        self,
+        root,
+        site,
+        fields,
+        date_field="date_georgian_iso",
+        max_bytes=128 * 1024 * 1024,
+        by_month=True,
+        max_open=16,
+        encoding="utf-8",
+    ):
+        self.root = root
+        self.site = site
+        self.fields = list(fields)
+        self.date_field = date_field
+        self.max_bytes = int(max_bytes) if max_bytes else 0
+        self.by_month = by_month
+        self.max_open = max(1, int(max_open))
+        self.encoding = encoding
+        self.site_dir = os.path.join(root, f"site={site}")
+        self.manifest_path = os.path.join(self.site_dir, MANIFEST_NAME)
+        self.lock_path = os.path.join(self.site_dir, LOCK_NAME)
+        self.open_parts = OrderedDict()  # partition -> _OpenPart (ترتیب LRU)
+        os.makedirs(self.site_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+        self.recover()
+
+    @contextmanager
+    def _site_lock(self):
+        """قفل انحصاری سایت برای شماره part، manifest و بازیابی (بین پروسه‌ها و نویسنده‌های یک پروسه)."""
+        with open(self.lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    # ---------------- manifest ----------------
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"site": self.site, "fields": self.fields, "partitions": {}}
+
+    def _save_manifest(self):
+        self.manifest["updated_at"] = _now()
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    # ---------------- مسیرها و شماره partها ----------------
+    def _partition_dir(self, partition):
+        return os.path.join(self.site_dir, *partition.split("/")) if partition else self.site_dir
+
+    def _next_number(self, partition):
+        """شماره بعد از بزرگ‌ترین part موجود؛ فقط زیر _site_lock (نویسنده‌های دیگر هم part می‌سازند)."""
+        number = 0
+        directory = self._partition_dir(partition)
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                match = PART_PATTERN.match(name)
+                if match:
+                    number = max(number, int(match.group(1)))
+        return number + 1
+
+    # ---------------- نوشتن ----------------
+    def write(self, row):
+        """row: dict یا هر شیء با متد get (مثلاً ItemAdapter)."""
+        date_iso = row.get(self.date_field) or ""
+        partition = jalali_partition(date_iso, self.by_month)
+        part = self.open_parts.get(partition)
+        if part is None:
+            part = self._open(partition)
+        else:
+            self.open_parts.move_to_end(partition)
+        part.writer.writerow(["" if row.get(name) is None else row.get(name) for name in self.fields])
+        part.rows += 1
+        part.observe_date(str(date_iso)[:10])
+        if self.max_bytes and part.file.tell() >= self.max_bytes:
+            self._finalize(partition)
+
+    def _open(self, partition):
+        while len(self.open_parts) >= self.max_open:
+            oldest = next(iter(self.open_parts))
+            self._finalize(oldest)
+        directory = self._partition_dir(partition)
+        os.makedirs(directory, exist_ok=True)
+        with self._site_lock():
+            part = _OpenPart(partition, self._next_number(partition), directory)
+            # "x": اگر نویسنده‌ای بدون قفل همین شماره را ساخته باشد خطا، نه بازنویسی
+            part.file = open(part.tmp_path, "x", newline="", encoding=self.encoding)
+            _try_lock(part.file)
+        part.writer = csv.writer(part.file, quoting=csv.QUOTE_ALL)
+        part.writer.writerow(self.fields)
+        self.open_parts[partition] = part
+        return part
+
+    def flush(self):
+        """داده partهای باز را روی دیسک می‌برد (قبل از ثبت پیشرفت، مثلاً در فایل لاگ)."""
+        for part in self.open_parts.values():
+            part.file.flush()
+            os.fsync(part.file.fileno())
+
+    def _finalize(self, partition):
+        part = self.open_parts.pop(partition)
+        part.file.flush()
+        os.fsync(part.file.fileno())
+        # بستن (و آزاد شدن flock) زیر قفل سایت، تا recover نویسنده دیگر part را پیش از انتشار برندارد
+        with self._site_lock():
+            part.file.close()
+            self._publish(part.partition, part.tmp_path, part.final_path,
+                          part.rows, part.min_date, part.max_date)
+
+    def _publish(self, partition, tmp_path, final_path, rows, min_date, max_date):
+        """فقط زیر _site_lock."""
+        os.replace(tmp_path, final_path)
+        entry = {
+            "file": os.path.relpath(final_path, self.site_dir).replace(os.sep, "/"),
+            "rows": rows,
+            "bytes": os.path.getsize(final_path),
+            "sha256": _sha256(final_path),
+            "min_date": min_date,
+            "max_date": max_date,
+            "finalized_at": _now(),
+        }
+        key = partition or "all"
+        # ورودی‌های نویسنده‌های دیگر از آخرین بار
+        self.manifest = self._load_manifest()
+        info = self.manifest["partitions"].setdefault(key, {"parts": []})
+        info["parts"] = [p for p in info["parts"] if p["file"] != entry["file"]]
+        info["parts"].append(entry)
+        info["rows"] = sum(p["rows"] for p in info["parts"])
+        info["updated_at"] = entry["finalized_at"]
+        self._save_manifest()
+        logger.info(f"Finalized {entry['file']} ({rows} rows, {entry['bytes']} bytes)")
+
+    def close(self):
+        for partition in list(self.open_parts):
+            self._finalize(partition)
+
+    # ---------------- بازیابی بعد از قطع ناگهانی ----------------
+    def recover(self):
+        """
+        partهای نیمه‌کاره اجرای قطع‌شده قبلی را تا آخرین ردیف کامل کوتاه کرده
+        و نهایی می‌کند تا داده‌ای که قبلاً flush شده از دست نرود. partهایی که نویسنده
+        زنده دیگری (همین پروسه یا پروسه دیگر) باز نگه داشته با flock شناخته و رها می‌شوند.
+        """
+        with self._site_lock():
+            for directory, _, names in os.walk(self.site_dir):
+                for name in names:
+                    match = PART_PATTERN.match(name)
+                    if not match or not name.endswith(INPROGRESS_SUFFIX):
+                        continue
+                    self._recover_part(directory, os.path.join(directory, name), int(match.group(1)))
+
+    def _recover_part(self, directory, tmp_path, number):
+        try:
+            f = open(tmp_path, "r+b")
+        except FileNotFoundError:  # هم‌زمان نهایی شد
+            return
+        with f:
+            if not _try_lock(f):
+                return
+            rows, min_date, max_date = self._truncate_to_complete_rows(f)
+        partition = os.path.relpath(directory, self.site_dir).replace(os.sep, "/")
+        partition = "" if partition == "." else partition
+        final_path = os.path.join(directory, f"part-{number:04d}.csv")
+        logger.warning(f"Recovered {rows} rows from interrupted part {tmp_path}")
+        self._publish(partition, tmp_path, final_path, rows, min_date, max_date)
+
+    def _truncate_to_complete_rows(self, f):
+        """
+        f: part باز (باینری). ردیف‌ها یکی‌یکی خوانده می‌شوند (نه کل فایل در حافظه) و فایل بعد
+        از آخرین ردیف کامل کوتاه می‌شود. با QUOTE_ALL هر ردیف کامل با \\r\\n در جایی تمام می‌شود
+        که تعداد " از ابتدای فایل زوج است (خط جدید داخل متن خبر بین دو " است).
+        """
+        header = None
+        date_index = None
+        rows = 0
+        min_date = max_date = None
+        end = 0
+        offset = 0
+        quotes = 0
+        record = []
+        for line in f:
+            offset += len(line)
+            quotes += line.count(b'"')
+            record.append(line)
+            if quotes % 2 or not line.endswith(b"\r\n"):
+                continue
+            try:
+                text = b"".join(record).decode("utf-8-sig" if header is None else self.encoding)
+                values = next(csv.reader([text]))
+            except (UnicodeDecodeError, csv.Error, StopIteration):
+                break
+            record = []
+            if header is None:
+                header = values
+                date_index = header.index(self.date_field) if self.date_field in header else None
+            elif len(values) != len(header):
+                break
+            else:
+                rows += 1
+                date = values[date_index][:10] if date_index is not None else ""
+                if date:
+                    min_date = date if min_date is None or date < min_date else min_date
+                    max_date = date if max_date is None or date > max_date else max_date
+            end = offset
+        if header is None:
+            # حتی سرستون کامل نوشته نشده
+            f.seek(0)
+            f.truncate()
+            f.write(self._header_bytes())
+        else:
+            f.truncate(end)
+        f.flush()
+        os.fsync(f.fileno())
+        return rows, min_date, max_date
+
+    def _header_bytes(self):
+        buffer = StringIO()
+        csv.writer(buffer, quoting=csv.QUOTE_ALL).writerow(self.fields)
+        return buffer.getvalue().encode(self.encoding)
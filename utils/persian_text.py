@@ -0,0 +1,50 @@
+# یکسان‌سازی متن فارسی برای مقایسه و جستجو (نه برای نمایش)
+#
+#   - ي/ى/ك عربی -> ی/ک فارسی، ة -> ه، أ/إ/آ -> ا
+#   - حذف اعراب، تطویل (ـ) و کاراکترهای جهت‌دهی؛ نیم‌فاصله -> فاصله
+#   - ارقام فارسی و عربی -> ارقام لاتین
+#   - حذف نشانه‌های نگارشی و یکی کردن فاصله‌ها
+
+import re
+
+CHAR_MAP = str.maketrans(
+    {
+        "ي": "ی",
+        "ى": "ی",
+        "ئ": "ی",
+        "ك": "ک",
+        "ة": "ه",
+        "ۀ": "ه",
+        "أ": "ا",
+        "إ": "ا",
+        "آ": "ا",
+        "ٱ": "ا",
+        "ؤ": "و",
+        "\u200c": " ",
+        **{chr(0x06F0 + i): str(i) for i in range(10)},
+        **{chr(0x0660 + i): str(i) for i in range(10)},
+    }
+)
+# اعراب، تطویل، کاراکترهای جهت‌دهی و zero-width
+IGNORED_CHARS = re.compile(
+    r"[\u064b-\u065f\u0670\u0640\u200b\u200d-\u200f\u061c\u202a-\u202e\u2066-\u2069\ufeff]"
+)
+NON_WORD = re.compile(r"[^\w\s]|_")
+SPACES = re.compile(r"\s+")
+WORD = re.compile(r"[^\W_]+")
+
+
+def normalize(text):
+    """متن یکسان‌شده با حروف کوچک؛ None و رشته خالی -> ""."""
+    if not text:
+        return ""
+    text = IGNORED_CHARS.sub("", str(text).translate(CHAR_MAP))
+    text = NON_WORD.sub(" ", text.lower())
+    return SPACES.sub(" ", text).strip()
+
+
+def tokens(text):
+    """کلمات متن یکسان‌شده (همان normalize(text).split() بدون ساختن رشته میانی)."""
+    if not text:
+        return []
+    return WORD.findall(IGNORED_CHARS.sub("", str(text).translate(CHAR_MAP)).lower())
@@ -0,0 +1,391 @@
+# ایندکس جستجوی متن کامل محلی (SQLite FTS5) به‌جای Elasticsearch
+#
+#   python -m utils.search_index build news.db output/site=*/**/*.csv tabnak_news_test.json
+#   python -m utils.search_index build news.db --mongo news_sites
+#   python -m utils.search_index search news.db "واکسن کرونا" --from 1399/10/01 --to 1399/12/29 --category سیاسی
+#
+#   with SearchIndex("news.db") as index:
+#       index.add_many(records)
+#       hits = index.search('"شورای شهر" تهران', from_date="2020-01-01", category="اجتماعی", limit=10)
+#
+# متن عنوان، لید و بدنه با همان یکسان‌سازی utils/persian_text.py (ی/ک عربی، اعراب، نیم‌فاصله، ارقام)
+# ایندکس می‌شود و عبارت جستجو هم همین‌طور یکسان می‌شود، پس «كتاب‌ها» و «کتاب ها» یکی‌اند.
+# جدول FTS بدون محتوا (content='') است و متن اصلی فقط یک بار در جدول news ذخیره می‌شود.
+#
+# افزودن تدریجی: هر خبر با site:news_id (در نبود آن link) کلید می‌خورد و نسخه تازه جایگزین قبلی
+# می‌شود؛ فایل‌هایی که اندازه و زمان تغییرشان عوض نشده دوباره خوانده نمی‌شوند و از هر collection
+# Mongo فقط سندهای بعد از آخرین _id ایندکس‌شده خوانده می‌شوند.
+#
+# عبارت جستجو: کلمه‌ها (همه لازم)، "عبارت دقیق"، پیشوند با *؛ ترتیب نتایج bm25 با وزن بیشتر
+# برای عنوان و لید (یا --sort date). بدون عبارت، خبرهای فیلترشده به ترتیب تاریخ برمی‌گردند.
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from utils.news_corpus import iter_input
+from utils.news_record import FIELDS, NewsRecord, jalali_date, to_iso_date
+from utils.persian_text import normalize, tokens
+
+TEXT_COLUMNS = ("title", "abstract", "body")
+# وزن bm25 ستون‌های TEXT_COLUMNS
+RANK_WEIGHTS = (10.0, 4.0, 1.0)
+COMMIT_EVERY = 2000
+QUERY_TERM = re.compile(r'"([^"]*)"?|(\S+)')
+SNIPPET_CHARS = 200
+# نام سایت از مسیر partهای PartitionedCsvWriter (output/site=tabnak/year=.../part-0001.csv)
+PARTITION_SITE = re.compile(r"(?:^|[\\/])site=([^\\/]+)")
+MONGO_BATCH = 1000
+
+
+def record_key(record):
+    if record.news_id is not None:
+        return f"{record.site}:{record.news_id}"
+    return record.link or f"{record.site}:{normalize(record.title)}:{record.date_georgian_iso}"
+
+
+def filter_date(value):
+    """تاریخ فیلتر شمسی (1399/07/01) یا میلادی (2020-09-22) -> YYYY-MM-DD."""
+    if not value:
+        return None
+    shamsi = jalali_date(value)
+    iso = shamsi.togregorian().isoformat() if shamsi else to_iso_date(value)
+    if iso is None:
+        raise ValueError(f"Unrecognized date: {value!r}")
+    return iso
+
+
+def match_expression(query):
+    """عبارت کاربر -> عبارت MATCH در FTS5 (هر واژه داخل "" تا نحو FTS5 از متن کاربر نشت نکند)."""
+    terms = []
+    for match in QUERY_TERM.finditer(query or ""):
+        phrase, word = match.groups()
+        words = tokens(phrase if phrase is not None else word)
+        if not words:
+            continue
+        expression = '"' + " ".join(words) + '"'
+        if phrase is None and word.endswith("*"):
+            expression += "*"
+        terms.append(expression)
+    return " ".join(terms)
+
+
+def snippet(record, query):
+    """خطی از بدنه (یا لید) که واژه‌ای از عبارت جستجو در آن هست، حداکثر SNIPPET_CHARS نویسه."""
+    lines = [line for text in (record.abstract, record.body) for line in text.split("\n") if line.strip()]
+    words, prefixes = set(), []
+    for match in QUERY_TERM.finditer(query or ""):
+        phrase, word = match.groups()
+        if phrase is None and word.endswith("*"):
+            prefixes.extend(tokens(word)[-1:])
+        words.update(tokens(phrase if phrase is not None else word))
+    prefixes = tuple(prefixes)
+    if not words:
+        return lines[0][:SNIPPET_CHARS] if lines else ""
+    for line in lines:
+        line_words = tokens(line)
+        hit = next(
+            (i for i, word in enumerate(line_words)
+             if word in words or (prefixes and word.startswith(prefixes))),
+            None,
+        )
+        if hit is None:
+            continue
+        # تقریب محل واژه در متن اصلی از روی شماره واژه
+        start = max(0, int(len(line) * hit / max(len(line_words), 1)) - SNIPPET_CHARS // 3)
+        text = line[start:start + SNIPPET_CHARS].strip()
+        return ("…" if start else "") + text + ("…" if start + SNIPPET_CHARS < len(line) else "")
+    return lines[0][:SNIPPET_CHARS] if lines else ""
+
+
+class SearchIndex:
+    """
+    ایندکس FTS5 یک فایل SQLite. add/add_many رکوردها را (dict، NewsRecord یا آیتم Scrapy) اضافه یا
+    جایگزین می‌کنند؛ تغییرات هر COMMIT_EVERY رکورد و در close ذخیره می‌شوند.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self._create()
+        self.pending = 0
+
+    def _create(self):
+        columns = ", ".join(
+            f"{name} INTEGER" if name.endswith(("_id", "_count")) else f"{name} TEXT"
+            for name in FIELDS
+        )
+        self.db.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS news (
+                id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, category_key TEXT, {columns}
+            );
+            CREATE INDEX IF NOT EXISTS news_date ON news (date_georgian_iso);
+            CREATE INDEX IF NOT EXISTS news_category ON news (category_key, date_georgian_iso);
+            CREATE TABLE IF NOT EXISTS sources (
+                name TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, position TEXT, records INTEGER
+            );
+            """
+        )
+        exists = self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'news_fts'"
+        ).fetchone()
+        if not exists:
+            self.db.execute(
+                "CREATE VIRTUAL TABLE news_fts USING fts5("
+                + ", ".join(TEXT_COLUMNS)
+                + ", content='', tokenize='unicode61 remove_diacritics 0')"
+            )
+            weights = ", ".join(str(weight) for weight in RANK_WEIGHTS)
+            self.db.execute(
+                "INSERT INTO news_fts (news_fts, rank) VALUES ('rank', ?)", (f"bm25({weights})",)
+            )
+            self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT count(*) FROM news").fetchone()[0]
+
+    # ---------------------------------------------------------
+    # افزودن
+    # ---------------------------------------------------------
+    def add(self, item):
+        record = NewsRecord.of(item)
+        key = record_key(record)
+        values = [getattr(record, name) for name in FIELDS]
+        old = self.db.execute(
+            "SELECT id, " + ", ".join(TEXT_COLUMNS) + " FROM news WHERE key = ?", (key,)
+        ).fetchone()
+        if old is None:
+            row_id = self.db.execute(
+                f"INSERT INTO news (key, category_key, {', '.join(FIELDS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(FIELDS))})",
+                (key, normalize(record.category), *values),
+            ).lastrowid
+        else:
+            row_id = old[0]
+            # جدول بدون محتوا: حذف با همان متن یکسان‌شده‌ای که ایندکس شده بود
+            self.db.execute(
+                f"INSERT INTO news_fts (news_fts, rowid, {', '.join(TEXT_COLUMNS)}) "
+                "VALUES ('delete', ?, ?, ?, ?)",
+                (row_id, *(normalize(text) for text in old[1:])),
+            )
+            self.db.execute(
+                f"UPDATE news SET category_key = ?, {', '.join(f'{name} = ?' for name in FIELDS)} "
+                "WHERE id = ?",
+                (normalize(record.category), *values, row_id),
+            )
+        self.db.execute(
+            f"INSERT INTO news_fts (rowid, {', '.join(TEXT_COLUMNS)}) VALUES (?, ?, ?, ?)",
+            (row_id, *(normalize(getattr(record, name)) for name in TEXT_COLUMNS)),
+        )
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY:
+            self.commit()
+
+    def add_many(self, items):
+        count = 0
+        for item in items:
+            self.add(item)
+            count += 1
+        return count
+
+    def commit(self):
+        self.db.commit()
+        self.pending = 0
+
+    def optimize(self):
+        """ادغام segmentهای FTS5 پس از افزودن‌های زیاد (جستجوی سریع‌تر، فایل کوچک‌تر)."""
+        self.db.execute("INSERT INTO news_fts (news_fts) VALUES ('optimize')")
+        self.commit()
+
+    def add_file(self, path):
+        """رکوردهای یک فایل JSON/JSONL/CSV؛ فایل بدون تغییر از آخرین بار نادیده گرفته می‌شود (خروجی: تعداد)."""
+        stat = os.stat(path)
+        name = os.path.abspath(path)
+        seen = self.db.execute(
+            "SELECT size, mtime_ns FROM sources WHERE name = ?", (name,)
+        ).fetchone()
+        if seen == (stat.st_size, stat.st_mtime_ns):
+            return 0
+        site = PARTITION_SITE.search(path)
+        records = iter_input(path)
+        if site:
+            records = ({**record, "site": record.get("site") or site.group(1)} for record in records)
+        count = self.add_many(records)
+        self.db.execute(
+            "INSERT OR REPLACE INTO sources (name, size, mtime_ns, records) VALUES (?, ?, ?, ?)",
+            (name, stat.st_size, stat.st_mtime_ns, count),
+        )
+        self.commit()
+        return count
+
+    def add_mongo(self, database, host="localhost", port=27017):
+        """سندهای همه collectionهای یک پایگاه Mongo، از آخرین _id ایندکس‌شده هر collection به بعد."""
+        try:
+            from bson import ObjectId
+            from pymongo import MongoClient
+        except ImportError:
+            raise ImportError("Indexing from Mongo requires pymongo (pip install pymongo)") from None
+        client = MongoClient(host, port)
+        total = 0
+        try:
+            db = client[database]
+            for collection_name in db.list_collection_names():
+                name = f"mongo://{host}:{port}/{database}/{collection_name}"
+                seen = self.db.execute(
+                    "SELECT position, records FROM sources WHERE name = ?", (name,)
+                ).fetchone()
+                query = {"_id": {"$gt": ObjectId(seen[0])}} if seen and seen[0] else {}
+                last_id, count = None, seen[1] if seen else 0
+                for document in db[collection_name].find(query).sort("_id", 1).batch_size(MONGO_BATCH):
+                    document.setdefault("site", collection_name)
+                    self.add(document)
+                    last_id = document["_id"]
+                    count += 1
+                    total += 1
+                if last_id is not None:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO sources (name, position, records) VALUES (?, ?, ?)",
+                        (name, str(last_id), count),
+                    )
+                self.commit()
+        finally:
+            client.close()
+        return total
+
+    # ---------------------------------------------------------
+    # جستجو
+    # ---------------------------------------------------------
+    def search(self, query="", from_date=None, to_date=None, category=None, site=None,
+               limit=20, offset=0, order="rank"):
+        """
+        فهرست dict رکوردها (فیلدهای NewsRecord به‌اضافه score و snippet). تاریخ‌ها شمسی یا میلادی،
+        category و site دقیق (category پس از یکسان‌سازی). order: rank یا date (جدیدترین اول).
+        """
+        expression = match_expression(query)
+        where, params = [], []
+        if expression:
+            where.append("news_fts MATCH ?")
+            params.append(expression)
+        if from_date:
+            where.append("n.date_georgian_iso >= ?")
+            params.append(filter_date(from_date))
+        if to_date:
+            where.append("n.date_georgian_iso <= ?")
+            params.append(filter_date(to_date))
+        if category:
+            where.append("n.category_key = ?")
+            params.append(normalize(category))
+        if site:
+            where.append("n.site = ?")
+            params.append(site)
+        columns = ", ".join(f"n.{name}" for name in FIELDS)
+        if expression:
+            sql = f"SELECT {columns}, f.rank FROM news_fts f JOIN news n ON n.id = f.rowid"
+        else:
+            sql = f"SELECT {columns}, NULL FROM news n"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if order == "date" or not expression:
+            sql += " ORDER BY n.date_georgian_iso DESC, n.id DESC"
+        else:
+            sql += " ORDER BY f.rank"
+        sql += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        hits = []
+        for row in self.db.execute(sql, params):
+            record = NewsRecord(**dict(zip(FIELDS, row[:-1], strict=True)))
+            hit = record.to_dict()
+            hit["score"] = -row[-1] if row[-1] is not None else None
+            hit["snippet"] = snippet(record, query)
+            hits.append(hit)
+        return hits
+
+
+# -------------------------------------------------------------
+# خط فرمان
+# -------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local SQLite FTS5 full-text index of crawled news.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="add JSON/JSONL/CSV files (or Mongo) to an index")
+    build.add_argument("database")
+    build.add_argument("inputs", nargs="*", help="files or glob patterns")
+    build.add_argument("--mongo", metavar="DB", help="also index every collection of this Mongo database")
+    build.add_argument("--mongo-host", default="localhost")
+    build.add_argument("--mongo-port", type=int, default=27017)
+    build.add_argument("--optimize", action="store_true", help="merge FTS segments after adding")
+    search = commands.add_parser("search", help="query an index")
+    search.add_argument("database")
+    search.add_argument("query", nargs="?", default="")
+    search.add_argument("--from", dest="from_date", help="Jalali (1399/07/01) or Gregorian date")
+    search.add_argument("--to", dest="to_date")
+    search.add_argument("--category")
+    search.add_argument("--site")
+    search.add_argument("-n", "--limit", type=int, default=20)
+    search.add_argument("--offset", type=int, default=0)
+    search.add_argument("--sort", choices=("rank", "date"), default="rank")
+    search.add_argument("--json", action="store_true", help="print full records as JSON lines")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        started = time.perf_counter()
+        count = 0
+        with SearchIndex(args.database) as index:
+            for pattern in args.inputs:
+                for path in sorted(glob.glob(pattern, recursive=True)) or [pattern]:
+                    count += index.add_file(path)
+            if args.mongo:
+                count += index.add_mongo(args.mongo, args.mongo_host, args.mongo_port)
+            if args.optimize:
+                index.optimize()
+            total = len(index)
+        print(
+            f"Indexed {count} records in {time.perf_counter() - started:.1f}s "
+            f"({total} in {args.database})",
+            file=sys.stderr,
+        )
+        return
+
+    if not os.path.exists(args.database):
+        parser.error(f"no index at {args.database}")
+    with SearchIndex(args.database) as index:
+        started = time.perf_counter()
+        try:
+            hits = index.search(
+                args.query, args.from_date, args.to_date, args.category, args.site,
+                limit=args.limit, offset=args.offset, order=args.sort,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        elapsed = time.perf_counter() - started
+    for hit in hits:
+        if args.json:
+            print(json.dumps(hit, ensure_ascii=False))
+        else:
+            print(f"{hit['date_shamsi'] or hit['date_georgian_iso'] or '-'}  {hit['site']}  {hit['title']}")
+            print(f"    {hit['link']}")
+            if hit["snippet"]:
+                print(f"    {hit['snippet']}")
+    print(f"{len(hits)} hits in {elapsed * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()